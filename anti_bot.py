@@ -0,0 +1,191 @@
+import re
+import time
+import logging
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+# Terms reported by debug_utils.detect_anti_bot_measures
+CAPTCHA_TERMS = ['captcha', 'recaptcha', 'hcaptcha', 'security check']
+BOT_SCRIPT_TERMS = ['botdetect', 'bot-detect', 'detectbot', 'cloudflare', 'distil']
+ERROR_TERMS = ['access denied', 'blocked', '403 forbidden', 'too many requests']
+
+# Markers of an interstitial challenge page that only a real browser gets past
+CHALLENGE_TERMS = ['cf-chl', 'challenge-platform', 'just a moment', 'checking your browser',
+                   'verify you are human', 'attention required']
+
+# Terms that mean "access denied" rather than "slow down"
+DENIED_TERMS = ['access denied', '403 forbidden', 'blocked']
+
+# Script boundaries, tracked in the same scan so script-only terms can be told apart
+SCRIPT_OPEN = '<script'
+SCRIPT_CLOSE = '</script'
+
+# Challenge and block pages are small; on a full-size 200 page the same words
+# are usually incidental (a reCAPTCHA on the contact form, Cloudflare's bot
+# management script) and must not derail the scrape
+BLOCK_PAGE_MAX_BYTES = 32 * 1024
+
+# Backoff used when a 429 has no usable Retry-After, and the most we ever wait
+DEFAULT_BACKOFF = 15
+MAX_BACKOFF = 120
+
+def _trie_pattern(terms):
+    """
+    Build a prefix-factored regex for a set of terms
+    
+    Terms sharing a prefix share a branch (c(?:aptcha|loudflare)), so at
+    each position the engine follows one path instead of trying every term
+    in turn. Longer terms are preferred where one term is a prefix of another.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = True
+    
+    def build(node):
+        end = node.get('') is True
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if end:
+            return '(?:' + body + ')?'
+        return body
+    
+    return build(trie)
+
+class AntiBotDetector:
+    """
+    Single-pass multi-term scanner for anti-bot and block-page markers
+    
+    Every term (plus the <script> boundaries) is compiled into one
+    case-insensitive bytes regex that walks the response body once. As in
+    Aho-Corasick's output links, a match also reports the terms contained
+    in it, so "recaptcha" counts as "captcha" too. Terms that only overlap
+    the end of an earlier match are not reported.
+    """
+    
+    def __init__(self):
+        self.terms = []
+        for term in CAPTCHA_TERMS + BOT_SCRIPT_TERMS + ERROR_TERMS + CHALLENGE_TERMS:
+            if term not in self.terms:
+                self.terms.append(term)
+        
+        tokens = self.terms + [SCRIPT_OPEN, SCRIPT_CLOSE]
+        self.pattern = re.compile(_trie_pattern(tokens).encode('ascii'), re.IGNORECASE)
+        
+        # Output links: every term found inside each term
+        self.contained = {
+            term: [other for other in self.terms if other in term]
+            for term in self.terms
+        }
+    
+    def scan(self, content):
+        """
+        Scan a page once for every term
+        
+        Args:
+            content (bytes or str): The response body
+        
+        Returns:
+            dict: {'terms': terms found anywhere, 'script_terms': terms found inside <script> tags}
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8', errors='ignore')
+        
+        terms = set()
+        script_terms = set()
+        in_script = False
+        
+        for match in self.pattern.finditer(content):
+            token = match.group().decode('ascii').lower()
+            if token == SCRIPT_OPEN:
+                in_script = True
+            elif token == SCRIPT_CLOSE:
+                in_script = False
+            else:
+                found = self.contained[token]
+                terms.update(found)
+                if in_script:
+                    script_terms.update(found)
+        
+        return {'terms': terms, 'script_terms': script_terms}
+    
+    def describe(self, scan):
+        """Human-readable issues for a scan, in the format detect_anti_bot_measures uses"""
+        issues = []
+        for term in CAPTCHA_TERMS:
+            if term in scan['terms']:
+                issues.append(f"Potential CAPTCHA detected ({term})")
+        for term in BOT_SCRIPT_TERMS:
+            if term in scan['script_terms']:
+                issues.append(f"Bot detection script found ({term})")
+        for term in ERROR_TERMS:
+            if term in scan['terms']:
+                issues.append(f"Access restriction message found ({term})")
+        for term in CHALLENGE_TERMS:
+            if term in scan['terms']:
+                issues.append(f"Browser challenge detected ({term})")
+        return issues
+    
+    def classify(self, status_code, content, headers=None):
+        """
+        Decide how to react to a response
+        
+        Args:
+            status_code (int): HTTP status of the response
+            content (bytes or str): The response body
+            headers (dict): Response headers (for Retry-After)
+        
+        Returns:
+            dict: {
+                'action': 'ok', 'backoff', 'selenium', 'cookie_handoff' or 'failed',
+                'status_code': ...,
+                'issues': [...],
+                'retry_after': seconds to wait before retrying (backoff only)
+            }
+        """
+        scan = self.scan(content or b'')
+        terms = scan['terms']
+        block_page = status_code != 200 or len(content or b'') <= BLOCK_PAGE_MAX_BYTES
+        
+        verdict = {
+            'action': 'ok' if status_code == 200 else 'failed',
+            'status_code': status_code,
+            'issues': self.describe(scan),
+            'retry_after': None,
+        }
+        
+        if status_code == 429 or (block_page and 'too many requests' in terms):
+            verdict['action'] = 'backoff'
+            verdict['retry_after'] = parse_retry_after((headers or {}).get('Retry-After'))
+        elif block_page and any(term in terms for term in CHALLENGE_TERMS + CAPTCHA_TERMS):
+            verdict['action'] = 'selenium'
+        elif status_code == 403 or (block_page and any(term in terms for term in DENIED_TERMS)):
+            verdict['action'] = 'cookie_handoff'
+        
+        return verdict
+
+def parse_retry_after(value, default=DEFAULT_BACKOFF):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), capped at MAX_BACKOFF"""
+    seconds = default
+    if value:
+        value = value.strip()
+        if value.isdigit():
+            seconds = int(value)
+        else:
+            try:
+                seconds = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                logger.debug(f"Unparseable Retry-After header: {value}")
+    return max(0, min(seconds, MAX_BACKOFF))
+
+# Shared detector; the compiled pattern is built once per process
+ANTI_BOT_DETECTOR = AntiBotDetector()
+
+def classify_response(status_code, content, headers=None):
+    """Classify a response with the shared detector (see AntiBotDetector.classify)"""
+    return ANTI_BOT_DETECTOR.classify(status_code, content, headers)
@@ -0,0 +1,148 @@
+import re
+import sys
+import time
+from bs4 import BeautifulSoup
+from html_analyzer import analyze_html_structure, get_top_candidates
+
+def legacy_analyze_html_structure(html_content, soup=None):
+    """The previous analyzer: a find_all() per classed tag and a re.match per pattern"""
+    if soup is None:
+        soup = BeautifulSoup(html_content, 'html.parser')
+    
+    property_related_patterns = [
+        r'.*property.*', r'.*listing.*', r'.*result.*', r'.*featured.*', r'.*card.*',
+        r'.*item.*', r'.*house.*', r'.*apartment.*', r'.*estate.*', r'.*real-estate.*'
+    ]
+    container_patterns = [
+        r'.*container.*', r'.*results.*', r'.*listings.*', r'.*properties.*', r'.*grid.*', r'.*list.*'
+    ]
+    
+    containers = {}
+    for tag in soup.find_all(class_=True):
+        class_str = ' '.join(tag.get('class', []))
+        for pattern in container_patterns:
+            if re.match(pattern, class_str, re.IGNORECASE):
+                selector = f".{tag.get('class')[0]}"
+                containers[selector] = containers.get(selector, 0) + 1
+    
+    property_elements = {}
+    for tag in soup.find_all(class_=True):
+        class_str = ' '.join(tag.get('class', []))
+        for pattern in property_related_patterns:
+            if re.match(pattern, class_str, re.IGNORECASE):
+                if len(tag.find_all()) > 5:
+                    selector = f".{tag.get('class')[0]}"
+                    property_elements[selector] = property_elements.get(selector, 0) + 1
+    
+    repeated = {}
+    for tag in soup.find_all(class_=True):
+        if len(tag.find_all()) > 3:
+            key = f"{tag.name}.{tag.get('class')[0]}"
+            repeated[key] = repeated.get(key, 0) + 1
+    repeated = {k: v for k, v in repeated.items() if v > 2}
+    
+    schema_elements = {}
+    for tag in soup.find_all(itemtype=True):
+        itemtype = tag.get('itemtype')
+        if 'schema.org' in itemtype and ('Product' in itemtype or 'Offer' in itemtype or 'Residence' in itemtype):
+            selector = f"[itemtype='{itemtype}']"
+            schema_elements[selector] = schema_elements.get(selector, 0) + 1
+    
+    return get_top_candidates({
+        'property_elements': property_elements,
+        'containers': containers,
+        'repeated_structures': repeated,
+        'schema_elements': schema_elements
+    })
+
+def make_listing_page(num_cards, nesting=8):
+    """Build a synthetic search-results page with nested classed wrappers"""
+    card = (
+        '<div class="listing-result property-card" itemtype="http://schema.org/Product">'
+        '<div class="listing-result__image"><img src="a.jpg"></div>'
+        '<div class="listing-result__title">Flat</div><div class="listing-result__price">R 1</div>'
+        '<ul class="listing-result__features"><li class="item">1</li><li class="item">2</li></ul>'
+        '<a class="listing-result__link" href="/x">View</a></div>'
+    )
+    opening = ''.join(f'<div class="results-container level-{i}">' for i in range(nesting))
+    closing = '</div>' * nesting
+    return f'<html><body>{opening}{card * num_cards}{closing}</body></html>'
+
+def keyword_candidates(candidates):
+    """Candidates from the keyword and schema.org heuristics, in ranked order
+    
+    Repeated structures now come from structural fingerprint clusters, so
+    only these groups are expected to match the legacy analyzer exactly.
+    """
+    return [c for c in candidates if c['type'] != 'repeated structure']
+
+def time_analyzer(analyze, html_content, soup):
+    start = time.perf_counter()
+    result = analyze(html_content, soup=soup)
+    return time.perf_counter() - start, result
+
+def benchmark_page(html_content):
+    """
+    Time parsing once, then both analyzers on the same soup
+    
+    Parsing costs the same for either analyzer, so the analyzer columns
+    exclude it; a speedup over parse + analysis would hide the difference.
+    
+    Returns:
+        dict: Timings and whether the keyword candidate rankings match
+    """
+    start = time.perf_counter()
+    soup = BeautifulSoup(html_content, 'html.parser')
+    parse_time = time.perf_counter() - start
+    
+    legacy_time, legacy_result = time_analyzer(legacy_analyze_html_structure, html_content, soup)
+    linear_time, linear_result = time_analyzer(analyze_html_structure, html_content, soup)
+    return {
+        'size_kb': len(html_content) / 1024,
+        'parse_ms': parse_time * 1000,
+        'legacy_ms': legacy_time * 1000,
+        'linear_ms': linear_time * 1000,
+        'same_ranking': keyword_candidates(legacy_result) == keyword_candidates(linear_result)
+    }
+
+def benchmark_scaling(card_counts=(250, 500, 1000, 2000, 4000)):
+    """
+    Time both analyzers on pages of increasing size
+    
+    Returns:
+        list: Per-size timings and whether the keyword candidate rankings match
+    """
+    return [dict(benchmark_page(make_listing_page(num_cards)), cards=num_cards, nesting=8)
+            for num_cards in card_counts]
+
+def benchmark_nesting(depths=(8, 64, 256, 1024), num_cards=250):
+    """
+    Time both analyzers on pages whose cards sit under ever deeper wrappers
+    
+    Every classed wrapper is an ancestor of every card, so the legacy
+    find_all() per classed tag grows with depth times page size while the
+    single post-order pass grows with the number of tags only.
+    
+    Returns:
+        list: Per-depth timings and whether the keyword candidate rankings match
+    """
+    return [dict(benchmark_page(make_listing_page(num_cards, nesting=depth)), cards=num_cards, nesting=depth)
+            for depth in depths]
+
+def print_rows(rows):
+    print(f"{'cards':>6} {'depth':>6} {'size':>9} {'parse':>9} {'legacy':>11} {'linear':>11} {'speedup':>8}  same")
+    for row in rows:
+        speedup = row['legacy_ms'] / row['linear_ms'] if row['linear_ms'] else 0
+        print(f"{row['cards']:6} {row['nesting']:6} {row['size_kb']:8.0f}K {row['parse_ms']:7.0f}ms "
+              f"{row['legacy_ms']:9.0f}ms {row['linear_ms']:9.0f}ms {speedup:7.1f}x  "
+              f"{'yes' if row['same_ranking'] else 'NO'}")
+
+if __name__ == "__main__":
+    # Usage: bench_html_analyzer.py [card counts...] | --nested [depths...]
+    args = sys.argv[1:]
+    if args and args[0] == '--nested':
+        depths = [int(arg) for arg in args[1:]] or (8, 64, 256, 1024)
+        print_rows(benchmark_nesting(depths))
+    else:
+        counts = [int(arg) for arg in args] or (250, 500, 1000, 2000, 4000)
+        print_rows(benchmark_scaling(counts))
@@ -0,0 +1,127 @@
+import sys
+import json
+import glob
+import time
+from extract_listing import PropertyListingExtractor
+
+def make_listing_page(num_related=40, num_photos=20, num_features=16):
+    """
+    Build a synthetic listing detail page with every field the parser reads
+    
+    Real pages carry far more unrelated markup than listing fields (menus,
+    similar listings, footers); num_related similar-listing cards stand in
+    for it, so the size of a page grows without adding fields.
+    """
+    structured = json.dumps({'@context': 'https://schema.org', '@type': 'Residence',
+                             'name': '2 Bedroom Apartment in Sea Point', 'address': 'Beach Road, Sea Point'})
+    crumbs = ''.join(f'<li><a class="breadcrumb__shape-link" href="/{name.lower()}">{name}</a></li>'
+                     for name in ('To Rent', 'Western Cape', 'Cape Town', 'Sea Point'))
+    photos = ''.join(f'<img class="details-page-photogrid__photo" src="https://images.example/p{i}_e.jpg">'
+                     for i in range(num_photos))
+    details = ''.join(
+        f'<li class="property-details__list-item"><div class="property-details__name-value">Detail {i} '
+        f'<span class="property-details__value">Value {i}</span></div></li>' for i in range(num_features))
+    features = ''.join(
+        f'<li class="property-features__list-item"><span class="property-features__name-value">Feature {i}'
+        + (f'<span class="property-features__value--boxed">{i}</span>' if i % 2 else
+           '<span class="property-features__list-icon-check"></span>')
+        + '</span></li>' for i in range(num_features))
+    related = ''.join(
+        f'<div class="listing-result"><div class="listing-result__image"><img src="r{i}.jpg"></div>'
+        f'<div class="listing-result__title">Flat {i}</div><div class="listing-result__price">R {i} 000</div>'
+        f'<ul class="listing-result__features"><li>2 beds</li><li>1 bath</li></ul>'
+        f'<a class="listing-result__link" href="/to-rent/western-cape/cape-town/sea-point/RR{i}">View</a></div>'
+        for i in range(num_related))
+    return (
+        '<html><head><title>Listing</title>'
+        f'<script type="application/ld+json">{structured}</script></head><body>'
+        f'<nav><ul class="breadcrumb">{crumbs}</ul></nav>'
+        f'<div class="details-page-photogrid">{photos}</div>'
+        '<div class="media-container"><img class="media-container__image" src="https://images.example/banner.jpg"></div>'
+        '<section class="listing-details">'
+        '<h1 class="listing-details__title">2 Bedroom Apartment in Sea Point</h1>'
+        '<div class="listing-price-display"><span class="listing-price-display__price">R 18 500</span></div>'
+        '<div class="listing-details__badge listing-details__badge--available-from"><span>1 March 2026</span></div>'
+        '<div class="listing-details__address">Beach Road, Sea Point</div>'
+        '<div class="listing-details__main-feature" title="Bedrooms">2</div>'
+        '<div class="listing-details__main-feature" title="Bathrooms">1</div></section>'
+        f'<ul class="property-details">{details}</ul><ul class="property-features">{features}</ul>'
+        '<div class="listing-description"><h2 class="listing-description__headline">Sea views</h2>'
+        '<div class="listing-description__text">A bright apartment a block from the promenade.</div></div>'
+        '<div id="contact-form-container" data-agent-id="123" data-listing-id="RR1" data-contact-type="agent">'
+        '<span class="agent-name">Jane Doe</span><span class="agent-tel">021 555 0100</span>'
+        '<span class="agent-email">jane@example.com</span><span class="agency-name">Acme Realty</span></div>'
+        f'<section class="similar-listings">{related}</section></body></html>'
+    )
+
+def time_parser(parse, html_content, url, repeat):
+    """Return the best wall-clock time of `repeat` runs of a parser"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(html_content, url)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def benchmark_listing_parser(html_files, repeat=5):
+    """
+    Compare the single-pass listing parser with the multi-pass reference
+    
+    Args:
+        html_files (list): Paths to saved listing detail pages, or (name, HTML)
+            pairs of generated ones
+        repeat (int): Number of timed runs per parser and file
+    
+    Returns:
+        list: Per-file timings and whether both parsers produced the same result
+    """
+    extractor = PropertyListingExtractor(use_selenium=False)
+    results = []
+    
+    for html_file in html_files:
+        if isinstance(html_file, tuple):
+            html_file, html_content = html_file
+        else:
+            with open(html_file, 'r', encoding='utf-8') as f:
+                html_content = f.read()
+        
+        url = f"file://{html_file}"
+        
+        # Both parsers must produce the same dict (ignoring the timestamp)
+        single = extractor._parse_listing_page(html_content, url)
+        multi = extractor._parse_listing_page_multipass(html_content, url)
+        single.pop('extracted_at', None)
+        multi.pop('extracted_at', None)
+        
+        multipass_time = time_parser(extractor._parse_listing_page_multipass, html_content, url, repeat)
+        single_time = time_parser(extractor._parse_listing_page, html_content, url, repeat)
+        
+        results.append({
+            'file': html_file,
+            'size_kb': len(html_content) / 1024,
+            'multipass_ms': multipass_time * 1000,
+            'single_pass_ms': single_time * 1000,
+            'same_result': single == multi
+        })
+    
+    return results
+
+if __name__ == "__main__":
+    # Usage: bench_listing_parser.py [path/to/listing.html ...]
+    if len(sys.argv) > 1:
+        html_files = sys.argv[1:]
+    else:
+        html_files = sorted(glob.glob('listing_*.html'))
+    
+    # Without saved pages, generate some of typical and larger sizes
+    if not html_files:
+        html_files = [(f"generated ({num_related} similar listings)", make_listing_page(num_related))
+                      for num_related in (10, 40, 160, 640)]
+    
+    print(f"{'file':40} {'size':>8} {'multi-pass':>12} {'single-pass':>12} {'speedup':>8}  same")
+    for row in benchmark_listing_parser(html_files):
+        speedup = row['multipass_ms'] / row['single_pass_ms'] if row['single_pass_ms'] else 0
+        print(f"{row['file'][-40:]:40} {row['size_kb']:7.0f}K {row['multipass_ms']:10.1f}ms "
+              f"{row['single_pass_ms']:10.1f}ms {speedup:7.1f}x  {'yes' if row['same_result'] else 'NO'}")
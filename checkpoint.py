@@ -0,0 +1,81 @@
+import os
+import json
+import time
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+class CrawlCheckpoint:
+    """
+    Crash-safe record of a crawl's progress
+    
+    A checkpoint looks like:
+        {
+            "base_url": "https://www.privateproperty.co.za/to-rent/...",
+            "next_url": "...?page=4", "page": 4, "retries": 0,
+            "scraped_pages": ["...", "..."], "failed_pages": [3],
+            "pagination_model": {...} or null,
+            "sink_path": "properties.jsonl", "sink_offset": 18234, "sink_count": 60,
+            "saved_at": "2024-01-01 12:00:00"
+        }
+    It is only written after the sink has been flushed and fsynced up to
+    sink_offset, and is swapped in with os.replace, so the file on disk is
+    always either the previous checkpoint or the new one.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+    
+    def save(self, state):
+        """Atomically replace the checkpoint with `state`"""
+        state = dict(state, saved_at=time.strftime("%Y-%m-%d %H:%M:%S"))
+        temp_path = None
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving checkpoint to {self.path}: {str(e)}")
+            # Saves happen after every page, so a failing one must not leave a file behind each time
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    def load(self, base_url=None):
+        """
+        Return the saved state, or None if there is no usable checkpoint
+        
+        Args:
+            base_url (str): Only accept a checkpoint of a crawl that started from this URL
+        """
+        try:
+            if not os.path.exists(self.path):
+                return None
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading checkpoint from {self.path}: {str(e)}")
+            return None
+        
+        if base_url is not None and state.get('base_url') != base_url:
+            logger.warning(f"Ignoring checkpoint {self.path}: it belongs to {state.get('base_url')}")
+            return None
+        
+        if 'page' in state:
+            logger.info(f"Resuming from checkpoint saved at {state.get('saved_at')}: page {state.get('page')}, "
+                        f"{len(state.get('scraped_pages', []))} pages done, {state.get('sink_count')} records")
+        else:
+            logger.info(f"Resuming from checkpoint saved at {state.get('saved_at')}")
+        return state
+    
+    def clear(self):
+        """Remove the checkpoint once the crawl has finished"""
+        try:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        except Exception as e:
+            logger.error(f"Error removing checkpoint {self.path}: {str(e)}")
@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTACT_CACHE_DB = os.environ.get('CONTACT_CACHE_DB', os.path.join(tempfile.gettempdir(), 'contact_cache.db'))
+
+# Contact details rarely change; pages without them are retried much sooner
+CONTACT_TTL = 7 * 24 * 3600
+AGENT_TTL = 7 * 24 * 3600
+NEGATIVE_TTL = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listing_contacts (
+    listing_id TEXT PRIMARY KEY,
+    status     TEXT NOT NULL,
+    record     TEXT NOT NULL,
+    stored_at  REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_listing_contacts_expires ON listing_contacts (expires_at);
+
+CREATE TABLE IF NOT EXISTS agent_contacts (
+    agent_key  TEXT PRIMARY KEY,
+    listing_id TEXT,
+    record     TEXT NOT NULL,
+    stored_at  REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_agent_contacts_expires ON agent_contacts (expires_at);
+"""
+
+def _normalize(text):
+    return ' '.join(str(text).lower().split())
+
+def agent_keys(agent=None, *names):
+    """
+    Keys under which an agent's contact details are indexed
+    
+    Args:
+        agent (dict): The 'agent' section from extract_listing's _extract_agent_info
+            (name, agency and the contact form's data-* attributes)
+        *names: Other names for the agent, e.g. the listing card's 'agent' text
+    
+    Returns:
+        list: Keys such as 'data-agent-id:123', 'name:jane doe|acme realty', 'name:jane doe'
+    """
+    agent = agent or {}
+    keys = []
+    for attr in sorted(agent):
+        if attr.startswith('data-') and 'agent' in attr and attr.endswith('id') and agent[attr]:
+            keys.append(f"{attr}:{_normalize(agent[attr])}")
+    
+    name = agent.get('name')
+    agency = agent.get('agency')
+    if name and agency:
+        keys.append(f"name:{_normalize(name)}|{_normalize(agency)}")
+    for candidate in [name, agency] + list(names):
+        if candidate and f"name:{_normalize(candidate)}" not in keys:
+            keys.append(f"name:{_normalize(candidate)}")
+    return keys
+
+def has_contact_details(record):
+    """Whether a contact record carries a phone number"""
+    return bool(record.get('phone_numbers') or (record.get('agent') or {}).get('phone'))
+
+class ContactCache:
+    """
+    Persistent cache of agent contact details
+    
+    listing_contacts maps a listing ID to the contact record extracted from
+    its page, or to a failure (negative entry) so a listing whose page just
+    showed no contact details is not reopened on every request. agent_contacts
+    indexes successful records by agent/agency (see agent_keys), so a new
+    listing from an agent we already have details for needs no browser.
+    Every entry carries its own expiry time.
+    """
+    
+    def __init__(self, db_path=DEFAULT_CONTACT_CACHE_DB, ttl=CONTACT_TTL, agent_ttl=AGENT_TTL,
+                 negative_ttl=NEGATIVE_TTL):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.agent_ttl = agent_ttl
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self.prune()
+    
+    def lookup(self, listing_id, keys=()):
+        """
+        Find unexpired contact details for a listing
+        
+        Args:
+            listing_id (str): The listing
+            keys (list): Agent keys to try when the listing itself is not cached
+        
+        Returns:
+            tuple: (record, source) where source is 'listing', 'agent' or 'negative'
+                (record is then {'error': ...}), or (None, None) on a miss
+        """
+        now = time.time()
+        with self.lock:
+            if listing_id:
+                row = self.conn.execute(
+                    'SELECT status, record FROM listing_contacts WHERE listing_id = ? AND expires_at > ?',
+                    (str(listing_id), now)).fetchone()
+                if row:
+                    return json.loads(row[1]), 'listing' if row[0] == 'ok' else 'negative'
+            
+            for key in keys:
+                row = self.conn.execute(
+                    'SELECT record FROM agent_contacts WHERE agent_key = ? AND expires_at > ?',
+                    (key, now)).fetchone()
+                if row:
+                    return json.loads(row[0]), 'agent'
+        
+        return None, None
+    
+    def put(self, listing_id, record, keys=()):
+        """Cache a successful lookup for the listing and under each agent key"""
+        now = time.time()
+        data = json.dumps(record, ensure_ascii=False)
+        with self.lock, self.conn:
+            if listing_id:
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO listing_contacts (listing_id, status, record, stored_at, expires_at) '
+                    "VALUES (?, 'ok', ?, ?, ?)", (str(listing_id), data, now, now + self.ttl))
+            # Only records that actually carry contact details are worth sharing
+            if keys and has_contact_details(record):
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO agent_contacts (agent_key, listing_id, record, stored_at, expires_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    [(key, listing_id, data, now, now + self.agent_ttl) for key in keys])
+    
+    def put_failure(self, listing_id, error):
+        """
+        Remember a lookup that found no contact details for negative_ttl seconds
+        
+        Only for pages that loaded: browser launch failures, crashes and
+        timeouts say nothing about the listing and should not be cached.
+        """
+        if not listing_id:
+            return
+        now = time.time()
+        data = json.dumps({'error': error}, ensure_ascii=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO listing_contacts (listing_id, status, record, stored_at, expires_at) '
+                "VALUES (?, 'failed', ?, ?, ?)", (str(listing_id), data, now, now + self.negative_ttl))
+    
+    def prune(self):
+        """Delete expired entries"""
+        now = time.time()
+        with self.lock, self.conn:
+            removed = self.conn.execute('DELETE FROM listing_contacts WHERE expires_at <= ?', (now,)).rowcount
+            removed += self.conn.execute('DELETE FROM agent_contacts WHERE expires_at <= ?', (now,)).rowcount
+        return removed
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,411 @@
+import time
+import asyncio
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from bs4 import BeautifulSoup
+from seen_set import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+class Requeue:
+    """A stage output that goes back to the first stage (e.g. a newly found page URL)"""
+    
+    def __init__(self, item):
+        self.item = item
+
+class Stage:
+    """
+    One step of a CrawlPipeline
+    
+    Args:
+        name (str): Name used in logs and stats
+        func (callable): func(item) -> result; a coroutine function when kind is 'async'
+        workers (int): Number of items the stage works on at once
+        kind (str): 'async' (runs on the event loop), 'thread' or 'process' (runs in a pool)
+        route (callable): route(result) -> list of outputs for the next stage. Runs on the
+            event loop, so it can safely update shared state. By default a None result
+            is dropped and anything else is passed on as one output.
+    """
+    
+    def __init__(self, name, func, workers=1, kind='thread', route=None):
+        if kind not in ('async', 'thread', 'process'):
+            raise ValueError(f"Unknown stage kind: {kind}")
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.kind = kind
+        self.route = route
+
+class StageStats:
+    """Throughput counters for one stage"""
+    
+    def __init__(self, stage):
+        self.name = stage.name
+        self.kind = stage.kind
+        self.workers = stage.workers
+        self.items = 0
+        self.outputs = 0
+        self.errors = 0
+        self.busy_seconds = 0.0     # Time spent inside the stage function
+        self.blocked_seconds = 0.0  # Time spent waiting for room downstream (backpressure)
+        self.max_queue = 0          # Deepest the stage's input queue got
+    
+    def as_dict(self, elapsed):
+        return {
+            'stage': self.name,
+            'kind': self.kind,
+            'workers': self.workers,
+            'items': self.items,
+            'outputs': self.outputs,
+            'errors': self.errors,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'blocked_seconds': round(self.blocked_seconds, 3),
+            'max_queue': self.max_queue,
+            'items_per_second': round(self.items / elapsed, 2) if elapsed else None,
+            # Share of the stage's worker time spent working; the busiest stage is the bottleneck
+            'utilization': round(self.busy_seconds / (elapsed * self.workers), 3) if elapsed else None,
+        }
+
+class CrawlPipeline:
+    """
+    Staged producer/consumer pipeline with bounded queues between stages
+    
+    Each stage runs `workers` items at once, on the event loop or in its own
+    thread or process pool, so network waits in one stage overlap with
+    parsing in another. Queues between stages hold at most `queue_size`
+    items: a fast producer waits for room instead of piling results up in
+    memory. Requeued items (newly found pages) go to an unbounded frontier,
+    since they are small and blocking on them could deadlock the loop.
+    
+    The run ends when every item, including the ones its outputs spawned,
+    has passed through the last stage, or when stop() is called.
+    """
+    
+    def __init__(self, stages, queue_size=8):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stage_stats = [StageStats(stage) for stage in stages]
+        self.elapsed = 0.0
+        self._loop = None
+        self._idle = None
+    
+    def run(self, source):
+        """
+        Push the source items through every stage
+        
+        Args:
+            source (iterable): Items for the first stage
+        
+        Returns:
+            list: Per-stage stats (see stats())
+        """
+        asyncio.run(self._run(list(source)))
+        self.log_stats()
+        return self.stats()
+    
+    def stop(self):
+        """Stop the run early; items still in flight are dropped. Safe to call from any stage."""
+        self._stopping = True
+        if self._idle is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._idle.set)
+            except RuntimeError:
+                pass  # The run already finished
+    
+    def stats(self):
+        """Per-stage counters, throughput and utilization"""
+        return [stats.as_dict(self.elapsed) for stats in self.stage_stats]
+    
+    def log_stats(self):
+        stats = self.stats()
+        for row in stats:
+            logger.info(f"Stage {row['stage']}: {row['items']} items, {row['items_per_second']}/s, "
+                        f"utilization {row['utilization']}, blocked {row['blocked_seconds']}s, "
+                        f"max queue {row['max_queue']}, errors {row['errors']}")
+        busiest = max(stats, key=lambda row: row['utilization'] or 0, default=None)
+        if busiest and busiest['items']:
+            logger.info(f"Pipeline finished in {self.elapsed:.1f}s; bottleneck: {busiest['stage']}")
+    
+    async def _run(self, source):
+        loop = self._loop = asyncio.get_running_loop()
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        self._frontier = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._stopping = False
+        self._active = 0
+        
+        for item in source:
+            self._active += 1
+            self._frontier.put_nowait(item)
+        if not self._active:
+            return
+        
+        executors = []
+        for stage in self.stages:
+            if stage.kind == 'thread':
+                executors.append(ThreadPoolExecutor(max_workers=stage.workers, thread_name_prefix=stage.name))
+            elif stage.kind == 'process':
+                executors.append(ProcessPoolExecutor(max_workers=stage.workers))
+            else:
+                executors.append(None)
+        
+        start = time.perf_counter()
+        tasks = [loop.create_task(self._feed())]
+        for index, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                tasks.append(loop.create_task(self._work(index, executors[index])))
+        
+        try:
+            await self._idle.wait()
+        finally:
+            self.elapsed = time.perf_counter() - start
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for executor in executors:
+                if executor is not None:
+                    executor.shutdown(wait=True, cancel_futures=True)
+    
+    async def _feed(self):
+        """Move frontier items into the first stage as it makes room"""
+        while True:
+            item = await self._frontier.get()
+            await self._put(0, item)
+    
+    async def _put(self, index, item):
+        queue = self._queues[index]
+        await queue.put(item)
+        stats = self.stage_stats[index]
+        stats.max_queue = max(stats.max_queue, queue.qsize())
+    
+    async def _work(self, index, executor):
+        stage = self.stages[index]
+        stats = self.stage_stats[index]
+        queue = self._queues[index]
+        last_stage = index == len(self.stages) - 1
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            item = await queue.get()
+            stats.items += 1
+            
+            started = time.perf_counter()
+            try:
+                if stage.kind == 'async':
+                    result = await stage.func(item)
+                else:
+                    result = await loop.run_in_executor(executor, stage.func, item)
+                
+                if stage.route is not None:
+                    outputs = stage.route(result) or []
+                else:
+                    outputs = [] if result is None else [result]
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stats.errors += 1
+                logger.error(f"Stage {stage.name} failed on an item: {str(e)}")
+                outputs = []
+            stats.busy_seconds += time.perf_counter() - started
+            
+            for output in outputs:
+                if self._stopping:
+                    break
+                # Count the output in before the item is counted out, so the
+                # pipeline never looks idle while work is still being handed on
+                if isinstance(output, Requeue):
+                    self._active += 1
+                    self._frontier.put_nowait(output.item)
+                elif not last_stage:
+                    self._active += 1
+                    blocked = time.perf_counter()
+                    await self._put(index + 1, output)
+                    stats.blocked_seconds += time.perf_counter() - blocked
+                stats.outputs += 1
+            
+            self._active -= 1
+            if self._active == 0:
+                self._idle.set()
+
+
+# Scrapers built inside parse worker processes, one per (class, base URL)
+_worker_scrapers = {}
+
+def parse_with(scraper, item, cards_as_html=False):
+    """
+    Parse stage body: find the listing cards and the next page of a fetched page
+    
+    The pagination model travels with the item, so a scraper in a worker
+    process builds the same URLs as the one that scheduled the page.
+    
+    Returns:
+        tuple: (url, page, cards, next_url, pagination_model); cards are soup
+        elements, or their HTML when they have to leave a worker process
+    """
+    html_content, url, page, pagination_model = item
+    if pagination_model is not None and scraper.pagination_model is None:
+        scraper.pagination_model = pagination_model
+    
+    soup = BeautifulSoup(html_content, 'html.parser')
+    cards = []
+    for selector, property_elements in scraper.find_property_elements(soup, html_content, first_only=True):
+        logger.info(f"Found {len(property_elements)} properties on page {page} with selector: {selector}")
+        cards = [str(elem) for elem in property_elements] if cards_as_html else property_elements
+    
+    next_url = scraper.find_next_page_url(soup, html_content, url, page) if cards else None
+    return url, page, cards, next_url, scraper.pagination_model
+
+def parse_in_process(scraper_class, base_url, item):
+    """Parse stage body for process pools, with a scraper cached per worker process"""
+    key = (scraper_class, base_url)
+    if key not in _worker_scrapers:
+        _worker_scrapers[key] = scraper_class(base_url)
+    return parse_with(_worker_scrapers[key], item, cards_as_html=True)
+
+def extract_card(scraper, card):
+    """Extract stage body: one listing from a card element or its HTML (None if it fails)"""
+    if isinstance(card, str):
+        card = BeautifulSoup(card, 'html.parser').find()
+    return scraper.extract_property(card)
+
+def enrich_safely(enrich, property_data):
+    """Run an enrich function, keeping the property as it was if enrichment fails"""
+    try:
+        return enrich(property_data)
+    except Exception as e:
+        logger.error(f"Error enriching property {property_data.get('listing_id')}: {str(e)}")
+        return property_data
+
+def crawl_listings(scraper, max_pages=None, enrich=None, sink=None, fetch_workers=4, parse_workers=2,
+                   parse_kind='thread', extract_workers=2, enrich_workers=4, queue_size=8):
+    """
+    Crawl a scraper's result pages through a fetch -> parse -> extract -> enrich -> sink pipeline
+    
+    Page 1 seeds the frontier. After every parsed page, each page the
+    pagination model links to that is not scheduled yet is requeued, along
+    with the page's next link, so pages revealed deeper in the pagination
+    are crawled too. Pages are scheduled once by canonical URL. Pages that
+    fail with requests are retried with Selenium after the pipeline drains.
+    
+    Parse finds the cards of a page and extract turns each card into a
+    listing, so one slow page does not hold up the cards of the others.
+    With parse_kind='process' the cards cross back from the worker process
+    as HTML and are re-parsed one card at a time.
+    
+    Args:
+        scraper: An ImprovedPropertyScraper
+        max_pages (int): Highest page number to crawl (None for all)
+        enrich (callable): enrich(property) -> property, e.g. adding contact info (optional)
+        sink (callable): sink(property); appends to scraper.properties by default
+        fetch_workers (int): Concurrent page downloads
+        parse_workers (int): Concurrent page parses
+        parse_kind (str): 'thread' or 'process' for the parse stage
+        extract_workers (int): Concurrent card extractions
+        enrich_workers (int): Concurrent enrich calls
+        queue_size (int): Capacity of each queue between stages
+    
+    Returns:
+        dict: {'pages': pages scheduled, 'failed_pages': [(url, page)], 'stages': per-stage stats}
+    """
+    if sink is None:
+        sink = scraper.properties.append
+    
+    scheduled = set()
+    failed = []
+    scheduled_up_to = 1  # Highest page number the pagination model has been scheduled to
+    
+    def schedule(url, page):
+        if url and canonicalize_url(url) not in scheduled and (max_pages is None or page <= max_pages):
+            scheduled.add(canonicalize_url(url))
+            return [Requeue((url, page))]
+        return []
+    
+    def fetch(item):
+        url, page = item
+        return url, page, scraper.fetch_page(url)
+    
+    def route_fetch(result):
+        url, page, html_content = result
+        if html_content is None:
+            failed.append((url, page))
+            return []
+        return [(html_content, url, page, scraper.pagination_model)]
+    
+    def route_parse(result):
+        nonlocal scheduled_up_to
+        url, page, cards, next_url, pagination_model = result
+        
+        # A process worker's model is a copy: keep the first one and the
+        # furthest page any of them has seen linked
+        if pagination_model is not None:
+            if scraper.pagination_model is None:
+                scraper.pagination_model = pagination_model
+            elif pagination_model is not scraper.pagination_model:
+                scraper.pagination_model.last_linked_page = max(scraper.pagination_model.last_linked_page,
+                                                                pagination_model.last_linked_page)
+        if not cards:
+            failed.append((url, page))
+            return []
+        
+        scraper.scraped_pages.add(canonicalize_url(url))
+        outputs = list(cards)
+        
+        model = scraper.pagination_model
+        if model and model.last_linked_page > scheduled_up_to:
+            for number in model.page_numbers(start_page=scheduled_up_to + 1, max_pages=max_pages):
+                outputs += schedule(model.url_for(number), number)
+            scheduled_up_to = model.last_linked_page
+        outputs += schedule(next_url, page + 1)
+        return outputs
+    
+    def route_extract(property_data):
+        if property_data is None or not scraper.is_new(property_data):
+            return []
+        return [property_data]
+    
+    if parse_kind == 'process':
+        parse = functools.partial(parse_in_process, type(scraper), scraper.base_url)
+    else:
+        parse = functools.partial(parse_with, scraper)
+    
+    stages = [
+        Stage('fetch', fetch, workers=fetch_workers, kind='thread', route=route_fetch),
+        Stage('parse', parse, workers=parse_workers, kind=parse_kind, route=route_parse),
+        Stage('extract', functools.partial(extract_card, scraper), workers=extract_workers, kind='thread',
+              route=route_extract),
+    ]
+    if enrich is not None:
+        stages.append(Stage('enrich', functools.partial(enrich_safely, enrich), workers=enrich_workers, kind='thread'))
+    stages.append(Stage('sink', sink, workers=1, kind='thread'))
+    
+    scheduled.add(canonicalize_url(scraper.base_url))
+    pipeline = CrawlPipeline(stages, queue_size=queue_size)
+    stage_stats = pipeline.run([(scraper.base_url, 1)])
+    
+    # Pages requests could not get go through the browser one at a time
+    failed_pages = []
+    while failed:
+        url, page = failed.pop(0)
+        logger.info(f"Falling back to Selenium for page {page}")
+        before = len(scraper.properties)
+        next_url = scraper.scrape_with_selenium(url=url, page=page)
+        if next_url is False:
+            failed_pages.append((url, page))
+        
+        # Selenium appends to scraper.properties; send them through enrich and sink instead
+        new_properties = scraper.properties[before:]
+        del scraper.properties[before:]
+        for property_data in new_properties:
+            sink(enrich_safely(enrich, property_data) if enrich else property_data)
+        
+        if isinstance(next_url, str) and schedule(next_url, page + 1):
+            failed.append((next_url, page + 1))
+    
+    logger.info(f"Crawled {len(scraper.scraped_pages)} of {len(scheduled)} scheduled pages, "
+                f"{len(failed_pages)} failed")
+    return {
+        'pages': len(scheduled),
+        'failed_pages': failed_pages,
+        'stages': stage_stats,
+    }
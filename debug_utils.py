@@ -3,6 +3,7 @@ import re
 import json
 import logging
 from bs4 import BeautifulSoup
+from anti_bot import ANTI_BOT_DETECTOR
 
 logger = logging.getLogger(__name__)
 
@@ -47,38 +48,46 @@ def analyze_html(html_content, output_file=None):
     
     return potential_containers
 
+def find_pagination_containers(soup):
+    """
+    Find elements that look like pagination blocks
+    
+    Returns:
+        list: BeautifulSoup elements, without duplicates
+    """
+    containers = []
+    seen = set()
+    
+    def add(element):
+        if element is not None and element.name and id(element) not in seen:
+            seen.add(id(element))
+            containers.append(element)
+    
+    # Look for common pagination patterns
+    for element in soup.select('.pagination, .pager, nav ul.pages, .page-numbers, .paging'):
+        add(element)
+    
+    # Look for anchor tags with page numbers
+    for link in soup.select('a[href*="page="], a[href*="/page/"]'):
+        parent = link.parent
+        for i in range(3):  # Check up to 3 levels up
+            if parent and parent.name:
+                add(parent)
+                parent = parent.parent
+    
+    return containers
+
 def find_pagination_patterns(html_content):
     """Find potential pagination elements in HTML"""
     soup = BeautifulSoup(html_content, 'html.parser')
     
     pagination_candidates = []
-    
-    # Look for common pagination patterns
-    pagination_elements = soup.select('.pagination, .pager, nav ul.pages, .page-numbers, .paging')
-    
-    for element in pagination_elements:
+    for element in find_pagination_containers(soup):
         pagination_candidates.append({
             'selector': get_css_selector(element),
             'html': str(element)[:200]
         })
     
-    # Look for anchor tags with page numbers
-    number_links = soup.select('a[href*="page="], a[href*="/page/"]')
-    if number_links:
-        parent_containers = set()
-        for link in number_links:
-            parent = link.parent
-            for i in range(3):  # Check up to 3 levels up
-                if parent and parent.name:
-                    parent_containers.add(parent)
-                    parent = parent.parent
-        
-        for container in parent_containers:
-            pagination_candidates.append({
-                'selector': get_css_selector(container),
-                'html': str(container)[:200]
-            })
-    
     return pagination_candidates
 
 def get_css_selector(element):
@@ -99,33 +108,8 @@ def get_css_selector(element):
 
 def detect_anti_bot_measures(html_content):
     """Detect potential anti-bot measures in response content"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    issues = []
-    
-    # Check for CAPTCHA
-    captcha_terms = ['captcha', 'recaptcha', 'hcaptcha', 'security check']
-    for term in captcha_terms:
-        if term.lower() in html_content.lower():
-            issues.append(f"Potential CAPTCHA detected ({term})")
-    
-    # Check for common robot detection scripts
-    bot_scripts = ['botdetect', 'bot-detect', 'detectbot', 'cloudflare', 'distil']
-    scripts = soup.find_all('script')
-    for script in scripts:
-        src = script.get('src', '')
-        content = script.text.lower()
-        for term in bot_scripts:
-            if term in src.lower() or term in content:
-                issues.append(f"Bot detection script found ({term})")
-    
-    # Check for common error messages
-    error_terms = ['access denied', 'blocked', '403 forbidden', 'too many requests']
-    for term in error_terms:
-        if term.lower() in html_content.lower():
-            issues.append(f"Access restriction message found ({term})")
-    
-    return issues
+    # One pass over the page for every term, see anti_bot.AntiBotDetector
+    return ANTI_BOT_DETECTOR.describe(ANTI_BOT_DETECTOR.scan(html_content))
 
 def inspect_website(html_file_path):
     """Main function to analyze a saved HTML file"""
@@ -0,0 +1,122 @@
+import io
+import logging
+
+# Try to import optional dependencies
+try:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+    from openpyxl.styles import Font
+    has_openpyxl = True
+except ImportError:
+    has_openpyxl = False
+
+logger = logging.getLogger(__name__)
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# (key, header) for each column; the header row is written before any data,
+# so the columns are fixed rather than discovered from the records
+PROPERTY_COLUMNS = [
+    ('listing_id', 'Listing ID'),
+    ('title', 'Title'),
+    ('price', 'Price'),
+    ('location', 'Location'),
+    ('bedrooms', 'Bedrooms'),
+    ('bathrooms', 'Bathrooms'),
+    ('features', 'Other Features'),
+    ('agent', 'Agent'),
+    ('is_featured', 'Featured'),
+    ('listing_type', 'Listing Type'),
+    ('description', 'Description'),
+    ('url', 'URL'),
+    ('image_url', 'Image URL'),
+]
+
+# Features that get their own column
+FEATURE_COLUMNS = ['bedrooms', 'bathrooms']
+
+def property_row(property_data, columns=PROPERTY_COLUMNS):
+    """
+    Flatten a property into one row of cell values
+    
+    Named features (bedrooms, bathrooms) get their own columns; the rest of
+    the features dict is joined into one "name: value" cell.
+    """
+    features = property_data.get('features') or {}
+    row = []
+    for key, _ in columns:
+        if key in FEATURE_COLUMNS:
+            value = features.get(key, '')
+        elif key == 'features':
+            value = '; '.join(f"{name}: {value}" if name else str(value)
+                              for name, value in features.items() if name not in FEATURE_COLUMNS)
+        else:
+            value = property_data.get(key, '')
+        row.append(value)
+    return row
+
+class ExcelStreamWriter:
+    """
+    Write properties to an .xlsx workbook one row at a time
+    
+    Uses openpyxl's write-only mode: each appended row is serialised to the
+    sheet's temporary XML file straight away instead of being kept as cell
+    objects, so memory does not grow with the number of rows. Only the
+    finished (compressed) file is held in memory, by to_bytes().
+    """
+    
+    def __init__(self, columns=PROPERTY_COLUMNS, sheet_title='Listings'):
+        if not has_openpyxl:
+            raise RuntimeError("Excel export requires the openpyxl package")
+        
+        self.columns = columns
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet(sheet_title)
+        self.sheet.freeze_panes = 'A2'  # Must be set before the first row is written
+        self.count = 0
+        
+        header_font = Font(bold=True)
+        header = []
+        for _, title in columns:
+            cell = WriteOnlyCell(self.sheet, value=title)
+            cell.font = header_font
+            header.append(cell)
+        self.sheet.append(header)
+    
+    def _cell(self, value):
+        if value is None:
+            return None
+        if isinstance(value, (dict, list)):
+            value = str(value)
+        if isinstance(value, str):
+            value = ILLEGAL_CHARACTERS_RE.sub('', value)
+            if value.startswith('='):
+                # Scraped text is data, never a formula
+                cell = WriteOnlyCell(self.sheet, value=value)
+                cell.data_type = 's'
+                return cell
+        return value
+    
+    def write(self, property_data):
+        """Append one property as a row"""
+        self.sheet.append([self._cell(value) for value in property_row(property_data, self.columns)])
+        self.count += 1
+    
+    def write_many(self, properties):
+        for property_data in properties:
+            self.write(property_data)
+    
+    def to_bytes(self):
+        """
+        Finish the workbook and return the .xlsx file
+        
+        A write-only workbook can only be saved once.
+        
+        Returns:
+            bytes: The workbook
+        """
+        buffer = io.BytesIO()
+        self.workbook.save(buffer)
+        logger.info(f"Exported {self.count} rows to Excel ({buffer.tell()} bytes)")
+        return buffer.getvalue()
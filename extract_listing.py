@@ -12,6 +12,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selector_stats import SELECTOR_STATS
 
 # Configure logging
 logging.basicConfig(
@@ -24,6 +25,115 @@ logging.basicConfig(
 )
 logger = logging.getLogger()
 
+class ListingFieldPlan:
+    """
+    Compiled single-pass plan for extracting fields from a listing detail page.
+    
+    Each field is declared once with the class, id or attribute value that
+    identifies its elements. The plan is indexed by those keys up front, so
+    collecting every field costs one walk over the tree plus a dict lookup
+    per class instead of one select() scan per field.
+    """
+    
+    def __init__(self, fields):
+        """
+        Args:
+            fields (list): (name, matchers, mode) tuples, where matchers is a list of
+                ('class', value), ('id', value) or ('attr', tag, attr, value) and
+                mode is 'first' or 'all'
+        """
+        self.fields = fields
+        self.first_only = set()
+        self.by_class = {}
+        self.by_id = {}
+        self.by_attr = {}
+        
+        for name, matchers, mode in fields:
+            if mode == 'first':
+                self.first_only.add(name)
+            for matcher in matchers:
+                if matcher[0] == 'class':
+                    self.by_class.setdefault(matcher[1], []).append(name)
+                elif matcher[0] == 'id':
+                    self.by_id.setdefault(matcher[1], []).append(name)
+                elif matcher[0] == 'attr':
+                    _, tag_name, attr, value = matcher
+                    self.by_attr.setdefault(attr, {}).setdefault(value, []).append((tag_name, name))
+                else:
+                    raise ValueError(f"Unknown matcher type: {matcher[0]}")
+    
+    def collect(self, soup):
+        """
+        Walk the tree once and collect the matching elements for every field
+        
+        Returns:
+            dict: field name -> first matching element (or None) for 'first' fields,
+                  list of matching elements in document order for 'all' fields
+        """
+        found = {name: [] for name, _, _ in self.fields}
+        by_class = self.by_class
+        by_id = self.by_id
+        by_attr = self.by_attr
+        
+        for tag in soup.find_all(True):
+            hits = []
+            
+            classes = tag.get('class')
+            if classes:
+                for cls in classes:
+                    names = by_class.get(cls)
+                    if names:
+                        hits.extend(names)
+            
+            if by_id:
+                names = by_id.get(tag.get('id'))
+                if names:
+                    hits.extend(names)
+            
+            for attr, values in by_attr.items():
+                entries = values.get(tag.get(attr))
+                if entries:
+                    for tag_name, name in entries:
+                        if tag_name is None or tag_name == tag.name:
+                            hits.append(name)
+            
+            for name in hits:
+                matches = found[name]
+                # A tag can match the same field through several classes; keep it once
+                if matches and matches[-1] is tag:
+                    continue
+                if name in self.first_only and matches:
+                    continue
+                matches.append(tag)
+        
+        for name in self.first_only:
+            found[name] = found[name][0] if found[name] else None
+        
+        return found
+
+# Field plan for privateproperty.co.za listing detail pages. Each entry mirrors
+# the selector used by the matching PropertyListingExtractor._extract_* helper.
+LISTING_FIELD_PLAN = ListingFieldPlan([
+    ('title', [('class', 'listing-details__title')], 'first'),
+    ('price', [('class', 'listing-price-display__price')], 'first'),
+    ('available_from', [('class', 'listing-details__badge--available-from')], 'all'),
+    ('detail_items', [('class', 'property-details__list-item')], 'all'),
+    ('main_features', [('class', 'listing-details__main-feature')], 'all'),
+    ('feature_items', [('class', 'property-features__list-item')], 'all'),
+    ('headline', [('class', 'listing-description__headline')], 'first'),
+    ('description', [('class', 'listing-description__text')], 'first'),
+    ('gallery_images', [('class', 'details-page-photogrid__photo')], 'all'),
+    ('banner_images', [('class', 'media-container__image')], 'all'),
+    ('agent_name', [('class', 'agent-name'), ('class', 'listing-details__agent-name')], 'first'),
+    ('agent_phone', [('class', 'agent-phone'), ('class', 'agent-tel')], 'first'),
+    ('agent_email', [('class', 'agent-email')], 'first'),
+    ('agency', [('class', 'agency-name'), ('class', 'agency')], 'first'),
+    ('contact_form', [('id', 'contact-form-container'), ('class', 'contact-form-container')], 'first'),
+    ('breadcrumbs', [('class', 'breadcrumb__shape-link')], 'all'),
+    ('address', [('class', 'listing-details__address')], 'first'),
+    ('ld_json', [('attr', 'script', 'type', 'application/ld+json')], 'all'),
+])
+
 class PropertyListingExtractor:
     """Class to extract detailed information from a property listing page"""
     
@@ -173,17 +283,19 @@ class PropertyListingExtractor:
                 ".listing-details__contact-agent"  # This is identified in the provided HTML
             ]
             
-            for selector in show_number_selectors:
+            # Any of them opens the same contact details, so the best-performing ones go first
+            for selector in SELECTOR_STATS.ordered('contact_show_number', show_number_selectors):
                 try:
                     # Find and click the button
-                    buttons = driver.find_elements(By.CSS_SELECTOR, selector)
-                    if len(buttons) > 0:
-                        if buttons[0].is_displayed():
-                            logger.info(f"Found contact button with selector: {selector}")
-                            buttons[0].click()
-                            # Wait for contact info to appear
-                            time.sleep(3)
-                            break
+                    with SELECTOR_STATS.timer('contact_show_number', selector) as timer:
+                        buttons = driver.find_elements(By.CSS_SELECTOR, selector)
+                        timer.hit = len(buttons) > 0 and buttons[0].is_displayed()
+                    if timer.hit:
+                        logger.info(f"Found contact button with selector: {selector}")
+                        buttons[0].click()
+                        # Wait for contact info to appear
+                        time.sleep(3)
+                        break
                 except NoSuchElementException:
                     continue
                 except Exception as e:
@@ -228,37 +340,22 @@ class PropertyListingExtractor:
             ]
             
             # Try to find phone numbers
-            for selector in phone_selectors:
-                try:
-                    elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                    if elements and len(elements) > 0:
-                        contact_info['phone'] = elements[0].text.strip()
-                        logger.info(f"Found phone: {contact_info['phone']}")
-                        break
-                except:
-                    continue
+            phone = self._first_element_text(driver, 'contact_phone', phone_selectors)
+            if phone is not None:
+                contact_info['phone'] = phone
+                logger.info(f"Found phone: {contact_info['phone']}")
             
             # Try to find emails
-            for selector in email_selectors:
-                try:
-                    elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                    if elements and len(elements) > 0:
-                        contact_info['email'] = elements[0].text.strip()
-                        logger.info(f"Found email: {contact_info['email']}")
-                        break
-                except:
-                    continue
-                    
+            email = self._first_element_text(driver, 'contact_email', email_selectors)
+            if email is not None:
+                contact_info['email'] = email
+                logger.info(f"Found email: {contact_info['email']}")
+            
             # Try to find agent names
-            for selector in name_selectors:
-                try:
-                    elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                    if elements and len(elements) > 0:
-                        contact_info['name'] = elements[0].text.strip()
-                        logger.info(f"Found agent name: {contact_info['name']}")
-                        break
-                except:
-                    continue
+            name = self._first_element_text(driver, 'contact_name', name_selectors)
+            if name is not None:
+                contact_info['name'] = name
+                logger.info(f"Found agent name: {contact_info['name']}")
             
             # Check if we found any contact info
             if not contact_info:
@@ -291,6 +388,24 @@ class PropertyListingExtractor:
         
         return contact_info
 
+    def _first_element_text(self, driver, group, selectors):
+        """
+        Text of the first element found
+        
+        The selectors are alternative ways to find the same field, so the
+        group's best-performing ones are tried first.
+        """
+        for selector in SELECTOR_STATS.ordered(group, selectors):
+            try:
+                with SELECTOR_STATS.timer(group, selector) as timer:
+                    elements = driver.find_elements(By.CSS_SELECTOR, selector)
+                    timer.hit = bool(elements)
+                if elements:
+                    return elements[0].text.strip()
+            except Exception:
+                continue
+        return None
+    
     def _save_html(self, html_content, filename):
         """Save HTML content to a file for debugging"""
         try:
@@ -301,7 +416,35 @@ class PropertyListingExtractor:
             logger.error(f"Error saving HTML content: {str(e)}")
     
     def _parse_listing_page(self, html_content, url):
-        """Extract all property information from the HTML content"""
+        """Extract all property information from the HTML content in a single pass"""
+        soup = BeautifulSoup(html_content, 'html.parser')
+        
+        # Walk the tree once and route each node to the fields it matches
+        nodes = LISTING_FIELD_PLAN.collect(soup)
+        
+        # Initialize the result dictionary
+        result = {
+            "url": url,
+            "extracted_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        
+        # Build the sections in the same order as the multi-pass parser
+        result.update(self._build_basic_info(
+            nodes['title'], nodes['price'], self._first_span(nodes['available_from'])))
+        result.update(self._build_property_details(nodes['detail_items'], nodes['main_features']))
+        result.update(self._build_features(nodes['feature_items']))
+        result.update(self._build_description(nodes['headline'], nodes['description']))
+        result.update(self._build_images(nodes['gallery_images'], nodes['banner_images']))
+        result.update(self._build_agent_info(
+            nodes['agent_name'], nodes['agent_phone'], nodes['agent_email'],
+            nodes['agency'], nodes['contact_form']))
+        result.update(self._build_location_info(nodes['breadcrumbs'], nodes['address']))
+        result.update(self._build_structured_data(nodes['ld_json']))
+        
+        return result
+    
+    def _parse_listing_page_multipass(self, html_content, url):
+        """Extract all property information with one select() scan per field (reference implementation)"""
         soup = BeautifulSoup(html_content, 'html.parser')
         
         # Initialize the result dictionary
@@ -336,22 +479,35 @@ class PropertyListingExtractor:
         
         return result
     
+    def _first_span(self, badges):
+        """Return the first <span> inside the given badge elements, in document order"""
+        for badge in badges:
+            span = badge.find('span')
+            if span:
+                return span
+        return None
+    
     def _extract_basic_info(self, soup):
         """Extract basic property information such as title, price"""
+        return self._build_basic_info(
+            soup.select_one('.listing-details__title'),
+            soup.select_one('.listing-price-display__price'),
+            soup.select_one('.listing-details__badge--available-from span')
+        )
+    
+    def _build_basic_info(self, title_elem, price_elem, available_from_elem):
+        """Build the basic information section from its matched elements"""
         result = {}
         
         # Extract title
-        title_elem = soup.select_one('.listing-details__title')
         if title_elem:
             result['title'] = title_elem.text.strip()
         
         # Extract price
-        price_elem = soup.select_one('.listing-price-display__price')
         if price_elem:
             result['price'] = price_elem.text.strip()
         
         # Extract available from date
-        available_from_elem = soup.select_one('.listing-details__badge--available-from span')
         if available_from_elem:
             result['available_from'] = available_from_elem.text.strip()
         
@@ -359,10 +515,16 @@ class PropertyListingExtractor:
     
     def _extract_property_details(self, soup):
         """Extract detailed property information"""
+        return self._build_property_details(
+            soup.select('.property-details__list-item'),
+            soup.select('.listing-details__main-feature')
+        )
+    
+    def _build_property_details(self, detail_items, main_features):
+        """Build the property details section from its matched elements"""
         result = {'property_details': {}}
         
         # Extract from property-details section
-        detail_items = soup.select('.property-details__list-item')
         for item in detail_items:
             name_elem = item.select_one('.property-details__name-value')
             if name_elem:
@@ -375,7 +537,6 @@ class PropertyListingExtractor:
                     result['property_details'][key] = value
         
         # Extract main features (bedrooms, bathrooms, etc.)
-        main_features = soup.select('.listing-details__main-feature')
         for feature in main_features:
             title = feature.get('title', '')
             if title:
@@ -386,10 +547,13 @@ class PropertyListingExtractor:
     
     def _extract_features(self, soup):
         """Extract property features"""
+        return self._build_features(soup.select('.property-features__list-item'))
+    
+    def _build_features(self, feature_items):
+        """Build the property features section from its matched elements"""
         result = {'features': {}}
         
         # Extract from property-features section
-        feature_items = soup.select('.property-features__list-item')
         for item in feature_items:
             name_elem = item.select_one('.property-features__name-value')
             if name_elem:
@@ -407,15 +571,20 @@ class PropertyListingExtractor:
     
     def _extract_description(self, soup):
         """Extract property description"""
+        return self._build_description(
+            soup.select_one('.listing-description__headline'),
+            soup.select_one('.listing-description__text')
+        )
+    
+    def _build_description(self, headline, description):
+        """Build the description section from its matched elements"""
         result = {}
         
         # Extract headline/subtitle
-        headline = soup.select_one('.listing-description__headline')
         if headline:
             result['headline'] = headline.text.strip()
         
         # Extract full description
-        description = soup.select_one('.listing-description__text')
         if description:
             result['description'] = description.text.strip()
         
@@ -423,10 +592,16 @@ class PropertyListingExtractor:
     
     def _extract_images(self, soup):
         """Extract all property images"""
+        return self._build_images(
+            soup.select('.details-page-photogrid__photo'),
+            soup.select('.media-container__image')
+        )
+    
+    def _build_images(self, gallery_images, banner_images):
+        """Build the images section from the gallery and banner elements"""
         result = {'images': []}
         
         # Extract from gallery section
-        gallery_images = soup.select('.details-page-photogrid__photo')
         for img in gallery_images:
             src = img.get('src')
             if src:
@@ -439,7 +614,6 @@ class PropertyListingExtractor:
         
         # If no gallery images found, try banner images
         if not result['images']:
-            banner_images = soup.select('.media-container__image')
             for img in banner_images:
                 src = img.get('src')
                 if src:
@@ -451,30 +625,35 @@ class PropertyListingExtractor:
     
     def _extract_agent_info(self, soup):
         """Extract agent or agency contact information"""
+        return self._build_agent_info(
+            soup.select_one('.agent-name, .listing-details__agent-name'),
+            soup.select_one('.agent-phone, .agent-tel'),
+            soup.select_one('.agent-email'),
+            soup.select_one('.agency-name, .agency'),
+            soup.select_one('#contact-form-container, .contact-form-container')
+        )
+    
+    def _build_agent_info(self, agent_name, agent_phone, agent_email, agency, contact_form):
+        """Build the agent section from its matched elements"""
         result = {'agent': {}}
         
         # Agent info is often loaded dynamically with JavaScript
         # Try to find any visible agent information
-        agent_name = soup.select_one('.agent-name, .listing-details__agent-name')
         if agent_name:
             result['agent']['name'] = agent_name.text.strip()
         
         # Try to find agent contact info
-        agent_phone = soup.select_one('.agent-phone, .agent-tel')
         if agent_phone:
             result['agent']['phone'] = agent_phone.text.strip()
         
-        agent_email = soup.select_one('.agent-email')
         if agent_email:
             result['agent']['email'] = agent_email.text.strip()
         
         # Try to find agency info
-        agency = soup.select_one('.agency-name, .agency')
         if agency:
             result['agent']['agency'] = agency.text.strip()
         
         # Check for contact form container which might have hidden agent info in data attributes
-        contact_form = soup.select_one('#contact-form-container, .contact-form-container')
         if contact_form:
             for attr in contact_form.attrs:
                 if attr.startswith('data-'):
@@ -485,10 +664,16 @@ class PropertyListingExtractor:
     
     def _extract_location_info(self, soup):
         """Extract location information"""
+        return self._build_location_info(
+            soup.select('.breadcrumb__shape-link'),
+            soup.select_one('.listing-details__address')
+        )
+    
+    def _build_location_info(self, breadcrumbs, address):
+        """Build the location section from the breadcrumb and address elements"""
         result = {'location': {}}
         
         # Extract from breadcrumbs
-        breadcrumbs = soup.select('.breadcrumb__shape-link')
         if breadcrumbs:
             path = []
             for crumb in breadcrumbs:
@@ -496,7 +681,6 @@ class PropertyListingExtractor:
             result['location']['path'] = path
         
         # Extract address if available
-        address = soup.select_one('.listing-details__address')
         if address:
             result['location']['address'] = address.text.strip()
         
@@ -504,10 +688,13 @@ class PropertyListingExtractor:
     
     def _extract_structured_data(self, soup):
         """Extract schema.org structured data"""
+        return self._build_structured_data(soup.select('script[type="application/ld+json"]'))
+    
+    def _build_structured_data(self, script_tags):
+        """Build the structured data section from JSON-LD script tags"""
         result = {'structured_data': {}}
         
         # Look for JSON-LD data
-        script_tags = soup.select('script[type="application/ld+json"]')
         for script in script_tags:
             try:
                 data = json.loads(script.string)
@@ -541,6 +728,32 @@ class PropertyListingExtractor:
             logger.error(f"Error saving property data: {str(e)}")
             return False
 
+def extract_agent_details(html_content):
+    """
+    Extract the agent section of a listing page without fetching anything
+    
+    Args:
+        html_content (str): HTML of the listing page
+    
+    Returns:
+        dict: Agent name, phone, email, agency and the contact form's agent/contact data-* attributes
+    """
+    soup = BeautifulSoup(html_content, 'html.parser')
+    return PropertyListingExtractor(use_selenium=False)._extract_agent_info(soup)['agent']
+
+def parse_listing_page(html_content, url):
+    """
+    Parse a listing page that has already been fetched
+    
+    Args:
+        html_content (str): HTML of the listing page
+        url (str): URL the page was fetched from
+    
+    Returns:
+        dict: The extracted property information (without the browser-only hidden contact details)
+    """
+    return PropertyListingExtractor(use_selenium=False)._parse_listing_page(html_content, url)
+
 def extract_property_listing(url, use_selenium=True, save_output=True, headless=True):
     """
     Extract information from a property listing URL
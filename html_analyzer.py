@@ -2,85 +2,122 @@ import re
 from bs4 import BeautifulSoup
 import logging
 
-def analyze_html_structure(html_content):
+# Class-name keywords that suggest a property listing element. Each used to be
+# matched as r'.*keyword.*', which is just a case-insensitive substring test.
+PROPERTY_KEYWORDS = (
+    'property', 'listing', 'result', 'featured', 'card',
+    'item', 'house', 'apartment', 'estate', 'real-estate'
+)
+
+# Class-name keywords for elements that often contain multiple listings
+CONTAINER_KEYWORDS = (
+    'container', 'results', 'listings', 'properties', 'grid', 'list'
+)
+
+# Precompiled alternations reject non-matching class strings with a single regex call
+PROPERTY_PATTERN = re.compile('|'.join(re.escape(k) for k in PROPERTY_KEYWORDS), re.IGNORECASE)
+CONTAINER_PATTERN = re.compile('|'.join(re.escape(k) for k in CONTAINER_KEYWORDS), re.IGNORECASE)
+
+def count_keyword_matches(class_str, pattern, keywords):
+    """
+    Count how many keywords occur in a class string
+    
+    Keeps the weighting of the original per-pattern loop, where a class string
+    matching several patterns was counted once for each of them.
+    """
+    if not pattern.search(class_str):
+        return 0
+    lowered = class_str.lower()
+    return sum(1 for keyword in keywords if keyword in lowered)
+
+def compute_subtree_sizes(soup):
+    """
+    Count the descendant tags of every tag in one post-order pass
+    
+    Args:
+        soup (BeautifulSoup): The parsed document
+        
+    Returns:
+        tuple: (tags in document order, dict of id(tag) -> number of descendant tags)
+    """
+    tags = soup.find_all(True)
+    sizes = {}
+    
+    # Reversed document order visits every descendant before its ancestors
+    for tag in reversed(tags):
+        parent = tag.parent
+        if parent is not None:
+            sizes[id(parent)] = sizes.get(id(parent), 0) + sizes.get(id(tag), 0) + 1
+    
+    return tags, sizes
+
+def analyze_html_structure(html_content, soup=None):
     """
     Analyzes a webpage's HTML structure to detect potential property listing elements
     and returns suggestions for CSS selectors.
     
+    Runs in linear time: descendant counts come from a single post-order pass
+    instead of a find_all() per classed tag.
+    
     Args:
         html_content (str): The HTML content to analyze
+        soup: Already parsed soup of html_content, if available
         
     Returns:
         dict: A dictionary containing potential selectors and their frequencies
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
+    return analyze_page_layout(html_content, soup=soup)['listings']
+
+def analyze_page_layout(html_content, soup=None):
+    """
+    Analyze a page for both listing card and pagination bar selectors
+    
+    Args:
+        html_content (str): The HTML content to analyze
+        soup: Already parsed soup of html_content, if available
+        
+    Returns:
+        dict: 'listings' (ranked candidates, as returned by analyze_html_structure)
+              and 'pagination' (pagination bar clusters, best first)
+    """
+    if soup is None:
+        soup = BeautifulSoup(html_content, 'html.parser')
     
     logging.info("Analyzing HTML structure to find potential property listing patterns...")
     
-    # Look for common property-related classes
-    property_related_patterns = [
-        r'.*property.*', 
-        r'.*listing.*',
-        r'.*result.*',
-        r'.*featured.*', 
-        r'.*card.*', 
-        r'.*item.*',
-        r'.*house.*',
-        r'.*apartment.*',
-        r'.*estate.*',
-        r'.*real-estate.*'
-    ]
-    
-    # Elements that often contain multiple listings
-    container_patterns = [
-        r'.*container.*',
-        r'.*results.*',
-        r'.*listings.*',
-        r'.*properties.*',
-        r'.*grid.*',
-        r'.*list.*'
-    ]
-    
-    # Find potential container elements
+    tags, subtree_sizes = compute_subtree_sizes(soup)
+    
     containers = {}
-    for tag in soup.find_all(class_=True):
-        class_str = ' '.join(tag.get('class', []))
-        for pattern in container_patterns:
-            if re.match(pattern, class_str, re.IGNORECASE):
-                selector = f".{tag.get('class')[0]}"
-                if selector in containers:
-                    containers[selector] += 1
-                else:
-                    containers[selector] = 1
-    
-    # Find potential property elements
     property_elements = {}
-    for tag in soup.find_all(class_=True):
-        class_str = ' '.join(tag.get('class', []))
-        for pattern in property_related_patterns:
-            if re.match(pattern, class_str, re.IGNORECASE):
-                child_count = len(tag.find_all())
-                # Property elements typically have multiple child elements
-                if child_count > 5:  
-                    selector = f".{tag.get('class')[0]}"
-                    if selector in property_elements:
-                        property_elements[selector] += 1
-                    else:
-                        property_elements[selector] = 1
-    
-    # Check for repeated similar structures (a strong indicator of listings)
-    repeated_structures = find_repeated_structures(soup)
-    
-    # Look for schema.org markup which often indicates property listings
     schema_elements = {}
-    for tag in soup.find_all(itemtype=True):
+    
+    for tag in tags:
+        classes = tag.get('class')
+        if classes:
+            class_str = ' '.join(classes)
+            selector = f".{classes[0]}"
+            
+            # Find potential container elements
+            hits = count_keyword_matches(class_str, CONTAINER_PATTERN, CONTAINER_KEYWORDS)
+            if hits:
+                containers[selector] = containers.get(selector, 0) + hits
+            
+            # Find potential property elements; they typically have multiple child elements
+            hits = count_keyword_matches(class_str, PROPERTY_PATTERN, PROPERTY_KEYWORDS)
+            if hits and subtree_sizes.get(id(tag), 0) > 5:
+                property_elements[selector] = property_elements.get(selector, 0) + hits
+        
+        # Look for schema.org markup which often indicates property listings
         itemtype = tag.get('itemtype')
-        if 'schema.org' in itemtype and ('Product' in itemtype or 'Offer' in itemtype or 'Residence' in itemtype):
+        if itemtype and 'schema.org' in itemtype and ('Product' in itemtype or 'Offer' in itemtype or 'Residence' in itemtype):
             selector = f"[itemtype='{itemtype}']"
-            if selector in schema_elements:
-                schema_elements[selector] += 1
-            else:
-                schema_elements[selector] = 1
+            schema_elements[selector] = schema_elements.get(selector, 0) + 1
+    
+    # Check for repeated similar structures (a strong indicator of listings)
+    clusters = find_structural_clusters(soup, tags=tags, subtree_sizes=subtree_sizes)
+    repeated_structures = {}
+    for cluster in clusters['cards']:
+        repeated_structures[cluster['selector']] = repeated_structures.get(cluster['selector'], 0) + cluster['count']
     
     # Combine and rank the results
     all_selectors = {
@@ -91,25 +128,169 @@ def analyze_html_structure(html_content):
     }
     
     # Get the top candidates
-    top_candidates = get_top_candidates(all_selectors)
+    return {
+        'listings': get_top_candidates(all_selectors),
+        'pagination': clusters['pagination']
+    }
+
+def compute_structural_fingerprints(tags):
+    """
+    Give every subtree a Merkle-style structural fingerprint in one pass
     
-    return top_candidates
+    A tag's fingerprint identifies its name together with the set of its
+    children's fingerprints, so two subtrees get the same fingerprint when
+    they have the same tag shape regardless of class names, text or how
+    many times a child shape repeats (a card with 3 or 4 feature badges).
+    Fingerprints are interned to small ints.
+    
+    Args:
+        tags (list): Tags in document order
+        
+    Returns:
+        dict: id(tag) -> fingerprint
+    """
+    interned = {}
+    fingerprints = {}
+    child_shapes = {}
+    
+    # Reversed document order visits every child before its parent
+    for tag in reversed(tags):
+        key = (tag.name, tuple(sorted(child_shapes.pop(id(tag), ()))))
+        fingerprint = interned.get(key)
+        if fingerprint is None:
+            fingerprint = len(interned)
+            interned[key] = fingerprint
+        fingerprints[id(tag)] = fingerprint
+        
+        parent = tag.parent
+        if parent is not None:
+            child_shapes.setdefault(id(parent), set()).add(fingerprint)
+    
+    return fingerprints
+
+def _element_selector(element):
+    """Short CSS selector for a single element: tag#id, tag.class or tag"""
+    if element.get('id'):
+        return f"{element.name}#{element['id']}"
+    if element.get('class'):
+        return f"{element.name}.{element['class'][0]}"
+    return element.name
+
+def _cluster_selector(members):
+    """CSS selector matching a cluster of sibling elements"""
+    first = members[0]
+    common = [cls for cls in first.get('class') or []
+              if all(cls in (member.get('class') or []) for member in members[1:])]
+    if common:
+        return f"{first.name}.{common[0]}"
+    
+    # No shared class (e.g. featured and standard cards side by side): scope by the parent
+    parent = first.parent
+    if parent is not None and parent.name and parent.name != '[document]':
+        return f"{_element_selector(parent)} > {first.name}"
+    return first.name
+
+def _looks_like_page_link(member):
+    """True if an element is (or wraps) a numbered or next/previous pagination link"""
+    link = member if member.name == 'a' else member.find('a')
+    if link is None or not link.get('href'):
+        return False
+    href = link['href']
+    if 'page=' in href or '/page/' in href:
+        return True
+    text = member.get_text(strip=True).lower()
+    if text.isdigit() and len(text) <= 4:
+        return True
+    return text in ('next', 'prev', 'previous', '>', '<', '»', '«', '›', '‹')
+
+def find_structural_clusters(soup, tags=None, subtree_sizes=None, min_count=3):
+    """
+    Cluster sibling subtrees that share a structural fingerprint
+    
+    Runs in linear time over the tree. Listing cards show up as large
+    clusters of rich subtrees; a pagination bar shows up as a cluster of
+    small siblings that are mostly numbered page links.
+    
+    Args:
+        soup (BeautifulSoup): The parsed document
+        tags (list): Tags in document order, if already computed
+        subtree_sizes (dict): Descendant counts from compute_subtree_sizes(), if already computed
+        min_count (int): Minimum number of siblings for a listing card cluster
+        
+    Returns:
+        dict: 'cards' and 'pagination' lists of clusters, best first. Each cluster
+              has 'selector', 'count', 'size' (average tags per member), 'depth' and 'score'.
+    """
+    if tags is None or subtree_sizes is None:
+        tags, subtree_sizes = compute_subtree_sizes(soup)
+    
+    fingerprints = compute_structural_fingerprints(tags)
+    
+    # Group siblings by (parent, fingerprint); document order keeps member order stable
+    depths = {}
+    groups = {}
+    for tag in tags:
+        parent = tag.parent
+        depth = depths.get(id(parent), 0) + 1
+        depths[id(tag)] = depth
+        key = (id(parent), fingerprints[id(tag)])
+        group = groups.get(key)
+        if group is None:
+            groups[key] = group = {'members': [], 'depth': depth}
+        group['members'].append(tag)
+    
+    cards = []
+    pagination = []
+    for group in groups.values():
+        members = group['members']
+        count = len(members)
+        if count < 2:
+            continue
+        
+        size = 1 + sum(subtree_sizes.get(id(member), 0) for member in members) / count
+        cluster = {
+            'count': count,
+            'size': round(size, 1),
+            'depth': group['depth'],
+            'score': round(count * size, 1),
+        }
+        
+        # Listing cards: several siblings, each with a real subtree (old threshold: > 3 children)
+        if count >= min_count and size > 4:
+            cluster['selector'] = _cluster_selector(members)
+            cards.append(cluster)
+        # Pagination bar: small siblings that are mostly page links
+        elif size <= 3 and sum(1 for member in members if _looks_like_page_link(member)) * 2 > count:
+            parent = members[0].parent
+            cluster['selector'] = _element_selector(parent) if parent is not None and parent.name != '[document]' else members[0].name
+            pagination.append(cluster)
+    
+    # Rank by total structure covered, preferring deeper (more specific) clusters on ties
+    cards.sort(key=lambda c: (c['score'], c['depth']), reverse=True)
+    pagination.sort(key=lambda c: (c['count'], c['depth']), reverse=True)
+    
+    return {'cards': cards, 'pagination': pagination}
 
-def find_repeated_structures(soup):
-    """Find elements that appear multiple times with similar structure"""
-    tag_counts = {}
-    
-    # Count how many times each tag appears with its class
-    for tag in soup.find_all(class_=True):
-        if len(tag.find_all()) > 3:  # Only consider tags with children
-            key = f"{tag.name}.{tag.get('class')[0]}"
-            if key in tag_counts:
-                tag_counts[key] += 1
-            else:
-                tag_counts[key] = 1
-    
-    # Filter to tags that appear multiple times
-    repeated = {k: v for k, v in tag_counts.items() if v > 2}
+def find_repeated_structures(soup, tags=None, subtree_sizes=None):
+    """
+    Find elements that appear multiple times with similar structure
+    
+    Uses structural fingerprint clusters (see find_structural_clusters), so
+    cards are matched on their shape rather than on their first class name.
+    
+    Args:
+        soup (BeautifulSoup): The parsed document
+        tags (list): Tags in document order, if already computed
+        subtree_sizes (dict): Descendant counts from compute_subtree_sizes(), if already computed
+        
+    Returns:
+        dict: selector -> number of matching elements, best cluster first
+    """
+    clusters = find_structural_clusters(soup, tags=tags, subtree_sizes=subtree_sizes)
+    
+    repeated = {}
+    for cluster in clusters['cards']:
+        repeated[cluster['selector']] = repeated.get(cluster['selector'], 0) + cluster['count']
     return repeated
 
 def get_top_candidates(selector_groups):
@@ -126,28 +307,26 @@ def get_top_candidates(selector_groups):
                 'type': 'schema.org element'
             })
     
-    # Second priority: property elements with high counts
-    sorted_property = sorted(selector_groups['property_elements'].items(), 
-                            key=lambda x: x[1], reverse=True)
-    for selector, count in sorted_property[:5]:  # Top 5 property selectors
-        if count > 1:
+    # Second priority: repeated structures, already ranked by structural cluster score
+    for selector, count in list(selector_groups['repeated_structures'].items())[:5]:  # Top 5 repeated structures
+        if count > 2:
             top_candidates.append({
                 'selector': selector,
                 'count': count,
                 'confidence': 'medium' if count > 5 else 'low',
-                'type': 'property element'
+                'type': 'repeated structure'
             })
     
-    # Third priority: repeated structures
-    sorted_repeated = sorted(selector_groups['repeated_structures'].items(), 
+    # Third priority: property elements with high counts
+    sorted_property = sorted(selector_groups['property_elements'].items(), 
                             key=lambda x: x[1], reverse=True)
-    for selector, count in sorted_repeated[:5]:  # Top 5 repeated structures
-        if count > 2:
+    for selector, count in sorted_property[:5]:  # Top 5 property selectors
+        if count > 1:
             top_candidates.append({
                 'selector': selector,
                 'count': count,
                 'confidence': 'medium' if count > 5 else 'low',
-                'type': 'repeated structure'
+                'type': 'property element'
             })
     
     return top_candidates
@@ -166,7 +345,8 @@ def suggest_selectors(html_file_path):
         with open(html_file_path, 'r', encoding='utf-8') as f:
             html_content = f.read()
         
-        candidates = analyze_html_structure(html_content)
+        layout = analyze_page_layout(html_content)
+        candidates = layout['listings']
         
         # Format the suggestions
         print("\n=== Suggested Property Listing Selectors ===")
@@ -179,6 +359,11 @@ def suggest_selectors(html_file_path):
             
             print(f"{confidence_indicator} {candidate['selector']} - Found {candidate['count']} times ({candidate['type']})")
         
+        if layout['pagination']:
+            print("\n=== Suggested Pagination Container ===")
+            for cluster in layout['pagination'][:3]:
+                print(f"{cluster['selector']} - {cluster['count']} page links")
+        
         # Return just the selectors for programmatic use
         return [candidate['selector'] for candidate in candidates]
         
@@ -3,16 +3,31 @@ from bs4 import BeautifulSoup
 import logging
 import time
 import random
+import threading
+import fcntl
 import json
 import os
+import sys
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urljoin
 import re
+from site_schemas import get_site_schema
+from selector_profiles import SelectorProfileStore
+from selector_stats import SELECTOR_STATS
+from html_analyzer import analyze_html_structure
+from pagination_model import PaginationModel, infer_pagination_model, set_query_param, fetch_all
+from anti_bot import classify_response
+from output_sink import JsonlSink, read_jsonl, merge_jsonl
+from checkpoint import CrawlCheckpoint
+from property_store import PropertyStore
+from shared_limits import shared_rate_limiter, shared_browser_semaphore
+from seen_set import SeenSet, canonicalize_url, property_key
+from work_queue import open_work_queue, default_worker_id
 
 # Try to import fake_useragent, but provide a fallback if not available
 try:
@@ -44,12 +59,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger()
 
+# Set SAVE_PAGE_SOURCE=1 to write every parsed results page to page_<n>_source.html
+SAVE_PAGE_SOURCE = os.environ.get('SAVE_PAGE_SOURCE', 'off').lower() in ('1', 'on', 'true', 'yes')
+
 class ImprovedPropertyScraper:
-    def __init__(self, base_url, output_file="properties.json"):
+    def __init__(self, base_url, output_file="properties.json", compress_output=False, store=None, seen=None,
+                 session=None, driver_pool=None, rate_limiter=None):
         self.base_url = base_url
         self.output_file = output_file
         self.properties = []
         
+        # Optional PropertyStore; scrape() upserts each page's listings into it
+        self.store = store
+        
+        # Optional SeenSet shared across runs; listings already in it are skipped
+        self.seen = seen
+        
+        # scrape() streams records to this JSON Lines file as pages complete and
+        # writes the legacy JSON array to output_file once at the end
+        self.jsonl_file = os.path.splitext(output_file)[0] + ('.jsonl.gz' if compress_output else '.jsonl')
+        
+        # Crawl frontier and sink offset, saved after every page so scrape(resume=True)
+        # can pick up an interrupted crawl
+        self.checkpoint_file = os.path.splitext(output_file)[0] + '.checkpoint.json'
+        
         # Handle user agent with or without the fake_useragent package
         if has_fake_ua:
             self.ua = UserAgent()
@@ -73,10 +106,12 @@ class ImprovedPropertyScraper:
             ".grid-item"                    # Grid-based layouts
         ]
         
-        # Website-specific extraction strategies
-        self.site_extractors = {
-            "privateproperty.co.za": self.extract_privateproperty_data
-        }
+        # Compiled extraction schema for this site (see site_schemas.json);
+        # its container selectors are tried before the generic fallbacks
+        self.site_schema = get_site_schema(self.base_url)
+        self.property_selectors = self.site_schema.containers + [
+            selector for selector in self.property_selectors if selector not in self.site_schema.containers
+        ]
         
         # Add pagination selectors - updated with newer syntax
         self.pagination_selectors = [
@@ -95,8 +130,40 @@ class ImprovedPropertyScraper:
         # Add max retries for failed pages
         self.max_retries = 3
         
-        # Track scraped pages to avoid duplicates
+        # URL template and page count inferred from the first results page;
+        # once known, the remaining pages are fetched max_workers at a time
+        self.pagination_model = None
+        self.max_workers = 4
+        
+        # One HTTP session for every page, so cookies handed over from a
+        # browser after a block page are sent on later requests; a batch
+        # passes one session (see shared_pools.create_session) to all its scrapers
+        self.session = session or requests.Session()
+        self.handoff_lock = threading.Lock()
+        self.cookie_handoffs = 0
+        
+        # Optional DriverPool to borrow browsers from instead of starting one per
+        # page, and the rate limiter consulted before every request and page load
+        # (by default the machine-wide one shared with other scraper processes)
+        self.driver_pool = driver_pool
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
+        
+        # Browsers started outside a pool hold a slot of the machine-wide
+        # browser semaphore while they run
+        self.browser_semaphore = shared_browser_semaphore()
+        self.driver_slots = {}
+        
+        # Track scraped pages (by canonical URL) to avoid duplicates
         self.scraped_pages = set()
+        
+        # Scheduled pages that failed with both requests and Selenium; checkpoints
+        # point back at the first one so a resumed crawl tries them again
+        self.failed_pages = set()
+        
+        # Selectors learned on earlier runs for this domain are tried first
+        self.domain = urlparse(self.base_url).netloc if '//' in self.base_url else self.base_url.split('/')[0]
+        self.selector_profiles = SelectorProfileStore()
+        self.learned_profile = self.selector_profiles.get(self.domain)
     
     def get_random_headers(self):
         """Generate random headers to avoid detection"""
@@ -110,106 +177,411 @@ class ImprovedPropertyScraper:
             'Upgrade-Insecure-Requests': '1',
         }
     
+    def learned_selectors(self, group):
+        """Selectors that matched on earlier runs for this domain"""
+        return self.learned_profile.get(group, [])
+    
+    def ordered_selectors(self, group, selectors):
+        """
+        The configured selectors, then any learned ones the list lacks
+        
+        Callers stop at the first match, so the configured order decides which
+        element wins (featured cards before standard ones, a specific "next"
+        link before a generic one); neither learning nor hit rates change it.
+        """
+        learned = self.learned_selectors(group)
+        return list(selectors) + [selector for selector in learned if selector not in selectors]
+    
+    def remember_selectors(self, group, selectors):
+        """
+        Add the selectors that matched to this domain's learned set
+        
+        Property and pagination selectors accumulate (in configured order), so a
+        page that lacks one kind of card does not make later pages skip it;
+        analyzer suggestions are replaced by the latest ones.
+        """
+        learned = self.learned_selectors(group)
+        if group == 'suggested':
+            if selectors and selectors != learned:
+                self.learned_profile = self.selector_profiles.learn(self.domain, group, selectors, merge=False)
+        elif any(selector not in learned for selector in selectors):
+            priority = self.property_selectors if group == 'property' else self.pagination_selectors
+            self.learned_profile = self.selector_profiles.learn(self.domain, group, selectors, priority=priority)
+    
+    def _match_selectors(self, soup, selectors, first_only):
+        """Return (selector, elements) pairs for the selectors that match"""
+        matches = []
+        for selector in selectors:
+            with SELECTOR_STATS.timer('property', selector) as timer:
+                try:
+                    elements = soup.select(selector)
+                except Exception as e:
+                    logger.debug(f"Error with selector {selector}: {str(e)}")
+                    continue
+                timer.hit = bool(elements)
+            if elements:
+                matches.append((selector, elements))
+                if first_only:
+                    break
+        return matches
+    
+    def find_property_elements(self, soup, html_content=None, first_only=False):
+        """
+        Find listing cards, trying only this domain's learned selectors first
+        
+        The site schema's own containers are always tried with the learned
+        selectors, so a kind of card the pages seen so far lacked is still
+        found. Falls back to the site's containers and then the generic
+        selectors (plus earlier analyzer suggestions), best hit rate first, when
+        those find nothing, then to fresh html_analyzer suggestions, and learns
+        whatever matched.
+        
+        Returns:
+            list: (selector, elements) pairs
+        """
+        learned = self.learned_selectors('property')
+        if learned:
+            learned = [selector for selector in self.property_selectors
+                       if selector in learned or selector in self.site_schema.containers] + \
+                [selector for selector in learned if selector not in self.property_selectors]
+            matches = self._match_selectors(soup, learned, first_only)
+            if matches:
+                self.remember_selectors('property', [selector for selector, _ in matches])
+                return matches
+            logger.info(f"Learned selectors for {self.domain} found nothing, re-learning")
+        
+        # The site's own containers keep their priority (featured cards before
+        # standard ones). The generic fallbacks are interchangeable guesses at an
+        # unknown layout, so the ones with the best hit rate per unit cost go first.
+        containers = [selector for selector in self.site_schema.containers if selector not in learned]
+        fallback = [selector for selector in self.property_selectors + self.learned_selectors('suggested')
+                    if selector not in learned and selector not in containers]
+        matches = self._match_selectors(soup, containers + SELECTOR_STATS.ordered('property', fallback), first_only)
+        
+        if not matches and html_content:
+            suggested = [candidate['selector'] for candidate in analyze_html_structure(html_content)]
+            if suggested:
+                self.remember_selectors('suggested', suggested)
+                matches = self._match_selectors(soup, suggested, first_only)
+        
+        if matches:
+            self.remember_selectors('property', [selector for selector, _ in matches])
+        return matches
+    
     def scrape_with_requests(self, url=None, page=1):
         """Attempt to scrape using requests and BeautifulSoup"""
         try:
             if url is None:
-                url = f"{self.base_url}?page={page}"
+                url = set_query_param(self.base_url, 'page', page)
             
             # Skip if this URL has already been scraped
-            if url in self.scraped_pages:
+            if canonicalize_url(url) in self.scraped_pages:
                 logger.info(f"Skipping already scraped URL: {url}")
                 return False
             
             logger.info(f"Scraping with requests: {url}")
             
-            headers = self.get_random_headers()
-            response = requests.get(url, headers=headers, timeout=20)
+            # Block and challenge pages go straight to the strategy that gets past
+            # them instead of through every property selector first
+            response, verdict = self.fetch_with_verdict(url)
             
-            if response.status_code != 200:
-                logger.error(f"Failed to fetch page: {response.status_code}")
+            if response is None:
+                logger.error(f"Failed to fetch page: {verdict['status_code']} ({verdict['action']})")
                 return False
             
-            self.scraped_pages.add(url)  # Mark as scraped
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Debug - save HTML for inspection
-            with open(f"page_{page}_source.html", "w", encoding="utf-8") as f:
-                f.write(response.text)
-            
-            # Try different selectors
-            properties_found = 0
-            for selector in self.property_selectors:
-                property_elements = soup.select(selector)
-                if property_elements:
-                    logger.info(f"Found {len(property_elements)} properties with selector: {selector}")
-                    properties_found = len(property_elements)
-                    self.extract_properties(property_elements)
-                    break
+            properties, next_url = self.parse_page(response.text, url, page)
             
-            if properties_found == 0:
+            if not properties:
                 logger.warning("No properties found with standard selectors")
                 return False
+            self.properties.extend(property_data for property_data in properties if self.is_new(property_data))
+            self.scraped_pages.add(canonicalize_url(url))  # Mark as scraped once it yielded listings
             
-            # Check if there's a next page and return its URL
-            has_next = self.has_next_page(soup)
-            if has_next:
-                return self.get_next_page_url(soup, url, page)
-            else:
+            if next_url is None:
                 logger.info("No more pages to scrape")
-                return None
+            return next_url
             
         except Exception as e:
             logger.error(f"Error in requests scraping: {str(e)}")
             return False
     
+    def iter_page_properties(self, soup, html_content):
+        """Yield the listings matched by the first working selector, each as soon as it is extracted"""
+        for selector, property_elements in self.find_property_elements(soup, html_content, first_only=True):
+            logger.info(f"Found {len(property_elements)} properties with selector: {selector}")
+            for elem in property_elements:
+                property_data = self.extract_property(elem)
+                if property_data is not None:
+                    yield property_data
+    
+    def extract_page_properties(self, soup, html_content):
+        """Extract the listings matched by the first working selector"""
+        return list(self.iter_page_properties(soup, html_content))
+    
+    def find_next_page_url(self, soup, html_content, url, page):
+        """
+        Learn the pagination model from page 1, then return the next page URL (None on the last page)
+        
+        There is a next page if this page shows a "next" control or links to a
+        higher page number; the model only builds its URL.
+        """
+        if page == 1 and self.pagination_model is None:
+            self.pagination_model = infer_pagination_model(html_content, url, soup)
+        
+        # Check if there's a next page and return its URL
+        linked_beyond = self.pagination_model is not None and self.pagination_model.observe(soup, url) > page
+        if linked_beyond or self.has_next_page(soup):
+            return self.get_next_page_url(soup, url, page)
+        return None
+    
+    def parse_page(self, html_content, url, page):
+        """
+        Parse one fetched results page without touching self.properties
+        
+        Learns the pagination model from page 1 and widens it from later pages
+        (see find_next_page_url).
+        
+        Returns:
+            tuple: (properties found on the page, next page URL or None)
+        """
+        soup = BeautifulSoup(html_content, 'html.parser')
+        
+        # Debug - save HTML for inspection
+        if SAVE_PAGE_SOURCE:
+            with open(f"page_{page}_source.html", "w", encoding="utf-8") as f:
+                f.write(html_content)
+        
+        # Try different selectors, starting with the ones learned for this domain
+        properties = self.extract_page_properties(soup, html_content)
+        if not properties:
+            return properties, None
+        return properties, self.find_next_page_url(soup, html_content, url, page)
+    
+    def fetch_with_verdict(self, url):
+        """
+        Fetch a page with requests and react to what the anti-bot detector sees
+        
+        Rate limiting is waited out (honouring Retry-After), an access-denied
+        page triggers one cookie handoff from a real browser, and a challenge
+        page is left for Selenium.
+        
+        Returns:
+            tuple: (response, verdict); response is None unless the verdict is 'ok'
+        """
+        handed_off = False
+        verdict = None
+        for attempt in range(self.max_retries):
+            self.throttle(url)
+            response = self.session.get(url, headers=self.get_random_headers(), timeout=20)
+            verdict = classify_response(response.status_code, response.content, response.headers)
+            if verdict['action'] == 'ok':
+                return response, verdict
+            
+            logger.warning(f"Anti-bot verdict for {url}: {verdict['action']} {verdict['issues']}")
+            if verdict['action'] == 'backoff':
+                logger.info(f"Backing off for {verdict['retry_after']:.0f}s")
+                time.sleep(verdict['retry_after'])
+            elif verdict['action'] == 'cookie_handoff' and not handed_off:
+                handed_off = self.handoff_cookies(url)
+                if not handed_off:
+                    break
+            else:
+                break
+        return None, verdict
+    
+    def handoff_cookies(self, url):
+        """
+        Open a page in a real browser and copy its cookies into the requests session
+        
+        The browser's user agent is pinned for later requests too, since
+        clearance cookies are tied to it. Concurrent callers share one handoff.
+        
+        Returns:
+            bool: True if the session now carries browser cookies
+        """
+        generation = self.cookie_handoffs
+        with self.handoff_lock:
+            if self.cookie_handoffs != generation:
+                # Another thread handed cookies over while we waited
+                return True
+            
+            driver = None
+            try:
+                logger.info(f"Handing cookies over from a browser session for {url}")
+                driver = self.acquire_driver()
+                self.throttle(url)
+                driver.get(url)
+                time.sleep(5)
+                
+                for cookie in driver.get_cookies():
+                    self.session.cookies.set(cookie['name'], cookie['value'],
+                                             domain=cookie.get('domain'), path=cookie.get('path', '/'))
+                user_agent = driver.execute_script("return navigator.userAgent")
+                self.get_random_user_agent = lambda: user_agent
+                
+                self.cookie_handoffs += 1
+                return True
+            except Exception as e:
+                logger.error(f"Cookie handoff failed for {url}: {str(e)}")
+                return False
+            finally:
+                if driver:
+                    self.release_driver(driver)
+    
+    def fetch_page(self, url):
+        """Fetch a results page with requests, returning its HTML or None"""
+        response, verdict = self.fetch_with_verdict(url)
+        if response is None:
+            logger.error(f"Failed to fetch page {url}: {verdict['status_code']} ({verdict['action']})")
+            return None
+        return response.text
+    
+    def scrape_scheduled_pages(self, start_page=2, max_pages=None, on_page=None):
+        """
+        Scrape the pages from start_page up to the highest one the pagination links to
+        
+        Linked pages are known to exist, so they are fetched concurrently and
+        extracted in page order; pages that fail or show no listings are
+        retried with Selenium. Pages already in scraped_pages (e.g. restored
+        from a checkpoint) are not fetched.
+        
+        Args:
+            start_page (int): First page to scrape
+            max_pages (int): Last page to scrape
+            on_page (callable): on_page(page) called after each page is done
+        
+        Returns:
+            tuple: (URL of the page after the last scheduled one, or None if the
+            last one shows no next page; that page's number)
+        """
+        model = self.pagination_model
+        scheduled = model.page_numbers(start_page=start_page, max_pages=max_pages)
+        pages = [page for page in scheduled if canonicalize_url(model.url_for(page)) not in self.scraped_pages]
+        urls = [model.url_for(page) for page in pages]
+        logger.info(f"Scheduling {len(urls)} pages from {model}")
+        
+        # Unless the last page says otherwise, go on while the pagination links further
+        last_page = scheduled[-1] if scheduled else start_page - 1
+        next_url = model.next_url(last_page) if model.last_linked_page > last_page else None
+        
+        for page, (url, html_content) in zip(pages, fetch_all(urls, self.fetch_page, self.max_workers)):
+            if html_content is not None and canonicalize_url(url) not in self.scraped_pages:
+                properties, page_next_url = self.parse_page(html_content, url, page)
+                if properties:
+                    self.properties.extend(property_data for property_data in properties if self.is_new(property_data))
+                    self.scraped_pages.add(canonicalize_url(url))
+                    self.failed_pages.discard(page)
+                    logger.info(f"Successfully scraped page {page} with requests")
+                    if page == last_page:
+                        next_url = page_next_url
+                    if on_page:
+                        on_page(page)
+                    continue
+            
+            logger.info(f"Falling back to Selenium for page {page}")
+            result = self.scrape_with_selenium(url=url, page=page)
+            if result is False:
+                logger.warning(f"Both scraping methods failed on page {page}")
+                self.failed_pages.add(page)
+            else:
+                self.failed_pages.discard(page)
+                if page == last_page:
+                    next_url = result
+            if on_page:
+                on_page(page)
+        
+        # Later pages may have linked beyond the batch
+        if next_url is None and model.last_linked_page > last_page:
+            next_url = model.next_url(last_page)
+        return next_url, last_page + 1
+    
+    def create_driver(self):
+        """Start a headless Chrome with a random user agent"""
+        options = Options()
+        options.add_argument("--headless")
+        options.add_argument("--disable-gpu")
+        options.add_argument(f"user-agent={self.get_random_user_agent()}")
+        
+        return webdriver.Chrome(options=options)
+    
+    def acquire_driver(self):
+        """A browser from the driver pool, or a new one (within the browser semaphore) without a pool"""
+        if self.driver_pool:
+            return self.driver_pool.acquire(self.create_driver)
+        if not self.browser_semaphore:
+            return self.create_driver()
+        
+        slot = self.browser_semaphore.acquire()
+        try:
+            driver = self.create_driver()
+        except BaseException:
+            self.browser_semaphore.release(slot)
+            raise
+        self.driver_slots[driver] = slot
+        return driver
+    
+    def release_driver(self, driver, broken=False):
+        """Return a browser to the driver pool (broken ones are quit), or quit it and free its slot"""
+        if self.driver_pool:
+            self.driver_pool.release(driver, broken=broken)
+            return
+        try:
+            driver.quit()
+        finally:
+            slot = self.driver_slots.pop(driver, None)
+            if slot is not None:
+                self.browser_semaphore.release(slot)
+    
+    def throttle(self, url):
+        """Wait for the rate limiter, if there is one, before requesting url"""
+        if self.rate_limiter:
+            waited = self.rate_limiter.acquire(url)
+            if waited:
+                logger.debug(f"Rate limiter delayed {url} by {waited:.2f}s")
+    
     def scrape_with_selenium(self, url=None, page=1):
         """Fallback to Selenium for JavaScript-heavy pages"""
         driver = None
         try:
-            options = Options()
-            options.add_argument("--headless")
-            options.add_argument("--disable-gpu")
-            options.add_argument(f"user-agent={self.get_random_user_agent()}")
-            
-            driver = webdriver.Chrome(options=options)
+            driver = self.acquire_driver()
             
             if url is None:
-                url = f"{self.base_url}?page={page}"
+                url = set_query_param(self.base_url, 'page', page)
             
             # Skip if this URL has already been scraped
-            if url in self.scraped_pages:
+            if canonicalize_url(url) in self.scraped_pages:
                 logger.info(f"Skipping already scraped URL: {url}")
                 if driver:
-                    driver.quit()
+                    self.release_driver(driver)
                 return False
             
             logger.info(f"Scraping with Selenium: {url}")
+            self.throttle(url)
             driver.get(url)
             
             # Wait for page to load dynamically
             time.sleep(5)  # Base wait
             
-            self.scraped_pages.add(url)  # Mark as scraped
-            
             # Debug - save screenshot and HTML
             driver.save_screenshot(f"page_{page}_screenshot.png")
             with open(f"page_{page}_selenium.html", "w", encoding="utf-8") as f:
                 f.write(driver.page_source)
             
             properties_found = 0
-            for selector in self.property_selectors:
+            for selector in self.ordered_selectors('property', self.property_selectors):
                 try:
                     # Wait for elements to be present
-                    WebDriverWait(driver, 10).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                    )
-                    property_elements = driver.find_elements(By.CSS_SELECTOR, selector)
+                    with SELECTOR_STATS.timer('property_selenium', selector) as timer:
+                        WebDriverWait(driver, 10).until(
+                            EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+                        )
+                        property_elements = driver.find_elements(By.CSS_SELECTOR, selector)
+                        timer.hit = bool(property_elements)
                     
                     if property_elements:
                         logger.info(f"Found {len(property_elements)} properties with Selenium using selector: {selector}")
                         properties_found = len(property_elements)
+                        self.remember_selectors('property', [selector])
                         self.extract_properties_selenium(property_elements)
                         break
                 except TimeoutException:
@@ -218,9 +590,11 @@ class ImprovedPropertyScraper:
             if properties_found == 0:
                 logger.warning("No properties found with Selenium")
                 if driver:
-                    driver.quit()
+                    self.release_driver(driver)
                 return False
             
+            self.scraped_pages.add(canonicalize_url(url))  # Mark as scraped once it yielded listings
+            
             # Check if there's a next page
             has_next = self.has_next_page_selenium(driver)
             
@@ -235,204 +609,72 @@ class ImprovedPropertyScraper:
                     # Return the new URL after navigation
                     next_url = driver.current_url
                     if next_url != current_url:  # Ensure we actually navigated
-                        driver.quit()
+                        self.release_driver(driver)
                         return next_url
                 
                 # Fallback: construct the next URL if click didn't work
-                driver.quit()
-                return self.get_next_page_url(BeautifulSoup(driver.page_source, 'html.parser'), 
-                                            current_url, page)
+                soup = BeautifulSoup(driver.page_source, 'html.parser')
+                self.release_driver(driver)
+                return self.get_next_page_url(soup, current_url, page)
             else:
                 logger.info("No more pages to scrape with Selenium")
-                driver.quit()
+                self.release_driver(driver)
                 return None
             
         except Exception as e:
             logger.error(f"Error in Selenium scraping: {str(e)}")
             if driver:
-                driver.quit()
+                self.release_driver(driver, broken=True)
             return False
     
-    def extract_properties(self, property_elements):
-        """Extract property data from BeautifulSoup elements"""
-        # Check if we have a site-specific extractor for the current domain
-        domain = self.base_url.split('/')[2] if '//' in self.base_url else self.base_url.split('/')[0]
+    def extract_properties(self, property_elements, into=None):
+        """
+        Extract property data from BeautifulSoup elements using the site's compiled schema
         
-        # Use site-specific extractor if available
-        for site, extractor in self.site_extractors.items():
-            if site in domain:
-                logger.info(f"Using specialized extractor for {site}")
-                extractor(property_elements)
-                return
+        Appends to `into` (self.properties by default) and returns that list.
+        """
+        logger.info(f"Using extraction schema for {self.site_schema.name}")
+        properties = self.properties if into is None else into
         
-        # Default generic extractor
-        for elem in property_elements:
-            try:
-                # These are generic selectors - adapt to your target site
-                title = elem.select_one('.property-title, .listing-title, h2, h3')
-                price = elem.select_one('.property-price, .listing-price, .price')
-                location = elem.select_one('.property-location, .listing-location, .address')
-                
-                property_data = {
-                    'title': title.text.strip() if title else 'No Title',
-                    'price': price.text.strip() if price else 'No Price',
-                    'location': location.text.strip() if location else 'No Location',
-                    # Add more fields as needed
-                }
-                
-                self.properties.append(property_data)
-                logger.debug(f"Extracted property: {property_data['title']}")
-                
-            except Exception as e:
-                logger.error(f"Error extracting property data: {str(e)}")
-
-    def extract_privateproperty_data(self, property_elements):
-        """Extract property data specific to privateproperty.co.za"""
         for elem in property_elements:
-            try:
-                # Determine if it's a featured listing or a standard listing
-                is_featured = 'featured-listing' in elem.get('class', [])
-                
-                # Select appropriate class prefixes based on listing type
-                prefix = 'featured-listing' if is_featured else 'listing-result'
-                
-                # Extract property details
-                title = elem.select_one(f'.{prefix}__title')
-                price = elem.select_one(f'.{prefix}__price')
-                location = elem.select_one(f'.{prefix}__address')
-                description = elem.select_one(f'.{prefix}__description')
-                
-                # Extract features (bedrooms, bathrooms, etc.)
-                features = {}
-                feature_elements = elem.select(f'.{prefix}__feature')
-                for feature in feature_elements:
-                    feature_title = feature.get('title', '').lower()
-                    if feature_title:
-                        feature_value = feature.text.strip()
-                        features[feature_title] = feature_value
-                
-                # Extract listing ID and type
-                listing_id = None
-                listing_type = None
-                wishlist_btn = elem.select_one(f'.{prefix}__wishlist-btn')
-                if wishlist_btn:
-                    listing_id = wishlist_btn.get('data-listing-id')
-                    listing_type = wishlist_btn.get('data-listing-type')
-                
-                # Extract agent or agency info
-                agent_name = elem.select_one(f'.{prefix}__agent-name')
-                advertiser_info = elem.select_one(f'.{prefix}__advertiser')
-                
-                # Create comprehensive property data
-                property_data = {
-                    'title': title.text.strip() if title else 'No Title',
-                    'price': price.text.strip() if price else 'No Price',
-                    'location': location.text.strip() if location else 'No Location',
-                    'description': description.text.strip() if description else '',
-                    'features': features,
-                    'listing_id': listing_id,
-                    'listing_type': listing_type,
-                    'is_featured': is_featured,
-                    'agent': agent_name.text.strip() if agent_name else '',
-                    'url': elem.get('href', '')
-                }
-                
-                self.properties.append(property_data)
-                logger.debug(f"Extracted property from Private Property: {property_data['title']}")
-                
-            except Exception as e:
-                logger.error(f"Error extracting Private Property data: {str(e)}")
-
+            property_data = self.extract_property(elem)
+            if property_data is not None:
+                properties.append(property_data)
+        
+        return properties
+    
+    def extract_property(self, elem):
+        """Extract one property from a BeautifulSoup card element (None if it fails)"""
+        try:
+            property_data = self.site_schema.extract_soup(elem, self.base_url)
+            logger.debug(f"Extracted property: {property_data.get('title')}")
+            return property_data
+        except Exception as e:
+            logger.error(f"Error extracting property data: {str(e)}")
+            return None
+    
+    def is_new(self, property_data):
+        """Whether a property has not been seen on an earlier run (always True without a SeenSet)"""
+        return self.seen is None or self.seen.add_property(property_data)
+    
     def extract_properties_selenium(self, property_elements):
-        """Extract property data from Selenium elements"""
-        # Check if we have a site-specific extractor for the current domain
-        domain = self.base_url.split('/')[2] if '//' in self.base_url else self.base_url.split('/')[0]
-        
-        # Use site-specific selenium extractor if available
-        for site, extractor in self.site_extractors.items():
-            if site in domain:
-                logger.info(f"Using specialized Selenium extractor for {site}")
-                self.extract_privateproperty_data_selenium(property_elements)
-                return
-        
-        # Default generic Selenium extractor
-        for elem in property_elements:
-            try:
-                # Generic selectors - adapt to your target site
-                title = elem.find_elements(By.CSS_SELECTOR, '.property-title, .listing-title, h2, h3')
-                price = elem.find_elements(By.CSS_SELECTOR, '.property-price, .listing-price, .price')
-                location = elem.find_elements(By.CSS_SELECTOR, '.property-location, .listing-location, .address')
-                
-                property_data = {
-                    'title': title[0].text.strip() if title else 'No Title',
-                    'price': price[0].text.strip() if price else 'No Price',
-                    'location': location[0].text.strip() if location else 'No Location',
-                    # Add more fields as needed
-                }
-                
-                self.properties.append(property_data)
-                logger.debug(f"Extracted property with Selenium: {property_data['title']}")
-                
-            except Exception as e:
-                logger.error(f"Error extracting property data with Selenium: {str(e)}")
-                
-    def extract_privateproperty_data_selenium(self, property_elements):
-        """Extract property data from Selenium elements specific to privateproperty.co.za"""
-        for elem in property_elements:
-            try:
-                # Determine if it's a featured listing or a standard listing
-                class_attribute = elem.get_attribute('class')
-                is_featured = class_attribute and 'featured-listing' in class_attribute
-                
-                # Select appropriate class prefixes based on listing type
-                prefix = 'featured-listing' if is_featured else 'listing-result'
-                
-                # Extract property details
-                title = elem.find_elements(By.CSS_SELECTOR, f'.{prefix}__title')
-                price = elem.find_elements(By.CSS_SELECTOR, f'.{prefix}__price')
-                location = elem.find_elements(By.CSS_SELECTOR, f'.{prefix}__address')
-                description = elem.find_elements(By.CSS_SELECTOR, f'.{prefix}__description')
-                
-                # Extract features (bedrooms, bathrooms, etc.)
-                features = {}
-                feature_elements = elem.find_elements(By.CSS_SELECTOR, f'.{prefix}__feature')
-                for feature in feature_elements:
-                    feature_title = feature.get_attribute('title')
-                    if feature_title:
-                        feature_title = feature_title.lower()
-                        feature_value = feature.text.strip()
-                        features[feature_title] = feature_value
-                
-                # Extract listing ID and type
-                listing_id = None
-                listing_type = None
-                wishlist_btn = elem.find_elements(By.CSS_SELECTOR, f'.{prefix}__wishlist-btn')
-                if wishlist_btn:
-                    listing_id = wishlist_btn[0].get_attribute('data-listing-id')
-                    listing_type = wishlist_btn[0].get_attribute('data-listing-type')
-                
-                # Extract agent or agency info
-                agent_name = elem.find_elements(By.CSS_SELECTOR, f'.{prefix}__agent-name')
-                
-                # Create comprehensive property data
-                property_data = {
-                    'title': title[0].text.strip() if title else 'No Title',
-                    'price': price[0].text.strip() if price else 'No Price',
-                    'location': location[0].text.strip() if location else 'No Location',
-                    'description': description[0].text.strip() if description else '',
-                    'features': features,
-                    'listing_id': listing_id,
-                    'listing_type': listing_type,
-                    'is_featured': is_featured,
-                    'agent': agent_name[0].text.strip() if agent_name else '',
-                    'url': elem.get_attribute('href') or ''
-                }
-                
+        """Extract property data from Selenium elements using the site's compiled schema"""
+        if not property_elements:
+            return
+        
+        logger.info(f"Using Selenium extraction schema for {self.site_schema.name}")
+        
+        try:
+            # WebElement.parent is the driver; all cards are read in one script call
+            driver = property_elements[0].parent
+            for property_data in self.site_schema.extract_selenium(driver, property_elements, self.base_url):
+                if not self.is_new(property_data):
+                    continue
                 self.properties.append(property_data)
-                logger.debug(f"Extracted property from Private Property with Selenium: {property_data['title']}")
+                logger.debug(f"Extracted property with Selenium: {property_data.get('title')}")
                 
-            except Exception as e:
-                logger.error(f"Error extracting Private Property data with Selenium: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error extracting property data with Selenium: {str(e)}")
     
     def save_properties(self):
         """Save the scraped properties to JSON file"""
@@ -451,61 +693,57 @@ class ImprovedPropertyScraper:
     
     def has_next_page(self, soup):
         """Check if there is a next page available based on pagination elements"""
-        for selector in self.pagination_selectors:
+        for selector in self.ordered_selectors('pagination', self.pagination_selectors):
             try:
-                next_button = soup.select_one(selector)
-                if next_button:
+                with SELECTOR_STATS.timer('pagination', selector) as timer:
+                    next_button = soup.select_one(selector)
                     # Check if the next button is disabled
-                    disabled = next_button.get('disabled') or 'disabled' in next_button.get('class', [])
-                    if not disabled:
-                        return True
+                    timer.hit = bool(next_button) and not (next_button.get('disabled') or 'disabled' in next_button.get('class', []))
+                if timer.hit:
+                    self.remember_selectors('pagination', [selector])
+                    return True
             except Exception as e:
                 logger.debug(f"Error checking pagination with selector {selector}: {str(e)}")
         return False
     
     def has_next_page_selenium(self, driver):
         """Check if there is a next page available using Selenium"""
-        for selector in self.pagination_selectors:
+        for selector in self.ordered_selectors('pagination', self.pagination_selectors):
             try:
-                next_buttons = driver.find_elements(By.CSS_SELECTOR, selector)
-                if next_buttons and len(next_buttons) > 0:
+                with SELECTOR_STATS.timer('pagination_selenium', selector) as timer:
+                    next_buttons = driver.find_elements(By.CSS_SELECTOR, selector)
                     # Check if the next button is disabled
-                    disabled = next_buttons[0].get_attribute('disabled') or 'disabled' in (next_buttons[0].get_attribute('class') or '')
-                    if not disabled:
-                        return True
+                    timer.hit = bool(next_buttons) and not (next_buttons[0].get_attribute('disabled') or 'disabled' in (next_buttons[0].get_attribute('class') or ''))
+                if timer.hit:
+                    self.remember_selectors('pagination', [selector])
+                    return True
             except Exception as e:
                 logger.debug(f"Error checking pagination with Selenium selector {selector}: {str(e)}")
         return False
     
     def get_next_page_url(self, soup, current_url, current_page):
         """Extract the URL of the next page"""
-        # First try to find a direct link to the next page
-        for selector in self.pagination_selectors:
+        # The inferred URL template builds the URL without rescanning the page
+        if self.pagination_model:
+            return self.pagination_model.next_url(current_page)
+        
+        # Otherwise try to find a direct link to the next page
+        for selector in self.ordered_selectors('pagination', self.pagination_selectors):
             try:
                 next_button = soup.select_one(selector)
                 if next_button and next_button.get('href'):
-                    next_url = next_button.get('href')
                     # Handle relative URLs
-                    if next_url.startswith('/'):
-                        parsed_url = urlparse(current_url)
-                        next_url = f"{parsed_url.scheme}://{parsed_url.netloc}{next_url}"
-                    return next_url
+                    return urljoin(current_url, next_button.get('href'))
             except Exception:
                 continue
         
-        # If no direct link found, construct the URL with page parameter
-        # Check if current URL already has query parameters
-        if '?' in current_url:
-            if 'page=' in current_url:
-                return re.sub(r'page=\d+', f'page={current_page + 1}', current_url)
-            else:
-                return f"{current_url}&page={current_page + 1}"
-        else:
-            return f"{current_url}?page={current_page + 1}"
+        # If no direct link found, construct the URL with page parameter,
+        # replacing any page parameter the current URL already has
+        return set_query_param(current_url, 'page', current_page + 1)
     
     def click_next_page_selenium(self, driver):
         """Click on the next page button using Selenium"""
-        for selector in self.pagination_selectors:
+        for selector in self.ordered_selectors('pagination', self.pagination_selectors):
             try:
                 next_buttons = driver.find_elements(By.CSS_SELECTOR, selector)
                 if next_buttons and len(next_buttons) > 0 and next_buttons[0].is_displayed():
@@ -521,36 +759,385 @@ class ImprovedPropertyScraper:
                 logger.debug(f"Error clicking next page with selector {selector}: {str(e)}")
         return False
     
-    def scrape(self, max_pages=None):
-        """Main scraping method with multiple strategies and auto pagination"""
+    def iter_properties(self, max_pages=None, keep=True):
+        """
+        Crawl the result pages lazily, yielding each property as soon as it is extracted
+        
+        Nothing is fetched ahead of the consumer: stopping the iteration (break,
+        or close() on the generator) cancels the crawl before the next card is
+        extracted or the next page is requested. Yielded properties are also
+        appended to self.properties unless keep is False, in which case memory
+        use does not grow with the number of properties.
+        
+        A page that fails with both requests and Selenium is retried up to
+        max_retries times; after that the crawl stops.
+        
+        Args:
+            max_pages (int): Highest page number to crawl (None for all)
+            keep (bool): Keep yielded properties in self.properties
+        
+        Yields:
+            tuple: (property, meta) where meta is
+                {'page': n, 'position': index on the page, 'index': index overall,
+                 'url': page URL, 'engine': 'requests' or 'selenium'}
+        """
+        page = 1
+        next_url = self.base_url
+        index = 0
+        retries = 0
+        
+        try:
+            while next_url and (max_pages is None or page <= max_pages):
+                url = next_url
+                logger.info(f"Processing page {page}")
+                
+                # Try requests first, extracting one card at a time
+                position = 0
+                found = 0
+                next_url = False
+                response = None
+                if canonicalize_url(url) not in self.scraped_pages:
+                    try:
+                        response, verdict = self.fetch_with_verdict(url)
+                    except Exception as e:
+                        logger.error(f"Error in requests scraping: {str(e)}")
+                
+                if response is not None:
+                    soup = BeautifulSoup(response.text, 'html.parser')
+                    for property_data in self.iter_page_properties(soup, response.text):
+                        found += 1
+                        if not self.is_new(property_data):
+                            continue
+                        if keep:
+                            self.properties.append(property_data)
+                        meta = {'page': page, 'position': position, 'index': index,
+                                'url': url, 'engine': 'requests'}
+                        position += 1
+                        index += 1
+                        yield property_data, meta
+                    if found:
+                        self.scraped_pages.add(canonicalize_url(url))
+                        next_url = self.find_next_page_url(soup, response.text, url, page)
+                
+                # Fall back to Selenium if requests failed
+                if not found:
+                    logger.info(f"Falling back to Selenium for page {page}")
+                    before = len(self.properties)
+                    next_url = self.scrape_with_selenium(url=url, page=page)
+                    for property_data in self.properties[before:]:
+                        meta = {'page': page, 'position': position, 'index': index,
+                                'url': url, 'engine': 'selenium'}
+                        position += 1
+                        index += 1
+                        yield property_data, meta
+                    if not keep:
+                        del self.properties[before:]
+                
+                if next_url is False:
+                    # Both scraping methods failed
+                    retries += 1
+                    logger.warning(f"Both scraping methods failed on page {page}, retry {retries}/{self.max_retries}")
+                    if retries >= self.max_retries:
+                        logger.error(f"Maximum retries reached for page {page}, stopping")
+                        return
+                    next_url = url
+                else:
+                    page += 1
+                    retries = 0
+        finally:
+            if self.seen:
+                self.seen.flush()
+            logger.info(f"Property iteration ended after {index} properties")
+    
+    def checkpoint_state(self, sink, next_url, page, retries):
+        """
+        Flush the sink to disk and describe where the crawl stands
+        
+        Only pages that succeeded are recorded as scraped. While a scheduled
+        page has failed, the frontier points back at the first such page, so a
+        resumed crawl reschedules from there (skipping pages already scraped).
+        
+        Returns:
+            dict: State for CrawlCheckpoint.save()
+        """
+        offset = sink.flush(fsync=True)
+        if self.failed_pages and self.pagination_model:
+            page = min(self.failed_pages)
+            next_url = self.pagination_model.url_for(page)
+            retries = 0
+        return {
+            'base_url': self.base_url,
+            'next_url': next_url,
+            'page': page,
+            'retries': retries,
+            'scraped_pages': sorted(self.scraped_pages),
+            'failed_pages': sorted(self.failed_pages),
+            'pagination_model': self.pagination_model.to_dict() if self.pagination_model else None,
+            'sink_path': sink.path,
+            'sink_offset': offset,
+            'sink_count': len(self.properties),
+        }
+    
+    def restore_checkpoint(self, state):
+        """
+        Restore the frontier of an interrupted crawl and reopen its output
+        
+        The JSONL file is cut back to the checkpointed offset (records written
+        after the last checkpoint belong to pages that will be scraped again)
+        and its records are reloaded into self.properties.
+        
+        Returns:
+            JsonlSink: The sink, open for appending
+        """
+        self.scraped_pages = set(state.get('scraped_pages', []))
+        self.failed_pages = set(state.get('failed_pages', []))
+        if state.get('pagination_model'):
+            self.pagination_model = PaginationModel.from_dict(state['pagination_model'])
+        
+        sink = JsonlSink(self.jsonl_file, append=True, truncate_to=state.get('sink_offset', 0))
+        if sink.offset:
+            self.properties = list(read_jsonl(self.jsonl_file))
+        else:
+            self.properties = []
+        
+        if len(self.properties) != state.get('sink_count'):
+            logger.warning(f"Checkpoint expected {state.get('sink_count')} records, found {len(self.properties)}")
+        logger.info(f"Restored {len(self.properties)} properties and {len(self.scraped_pages)} scraped pages")
+        return sink
+    
+    def scrape_queue(self, queue, max_pages=None, worker_id=None, poll_interval=5):
+        """
+        Scrape result pages as tasks from a shared WorkQueue (see work_queue)
+        
+        Every worker started on the same queue is both producer and consumer:
+        it seeds the first page (a no-op if the task exists), then leases page
+        tasks until none are pending or leased. Each page enqueues the pages
+        its pagination links to and its next page, and task keys are canonical
+        URLs, so each page is queued once however many workers find it. A page
+        that fails with both requests and Selenium is failed back to the
+        queue, which retries it later or dead-letters it.
+        
+        Each worker appends its listings to its own shard in queue_shard_dir()
+        and checkpoints the shard's offset after every completed task, so a
+        restarted worker keeps what it already delivered. Once the queue is
+        drained the shards are merged into output_file.
+        
+        Delivery is at least once: a worker that dies after writing a page
+        but before completing its task leaves the page to be scraped again
+        (the merge drops the duplicates).
+        
+        Args:
+            queue (WorkQueue): Queue shared by every worker on this crawl
+            max_pages (int): Last page to scrape (None for all)
+            worker_id (str): Lease owner and shard name (host:pid by default; give
+                a restarted worker its old ID to continue its shard)
+            poll_interval (float): Seconds to wait while other workers hold the remaining tasks
+        
+        Returns:
+            int: Number of page tasks this worker completed
+        """
+        worker_id = worker_id or default_worker_id()
+        shard_path, checkpoint = self.queue_shard(worker_id)
+        state = checkpoint.load(self.base_url)
+        sink = JsonlSink(shard_path, append=True, truncate_to=state['sink_offset'] if state else 0)
+        
+        queue.put('page', {'url': self.base_url, 'page': 1}, key=canonicalize_url(self.base_url))
+        completed = 0
+        
+        try:
+            while True:
+                task = queue.lease(worker_id, kinds=['page'])
+                if task is None:
+                    if queue.unfinished() == 0:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                
+                url, page = task['payload']['url'], task['payload']['page']
+                logger.info(f"Processing page {page} (task {task['id']}, attempt {task['attempts']})")
+                before = len(self.properties)
+                try:
+                    next_url = False
+                    html_content = self.fetch_page(url)
+                    if html_content is not None:
+                        properties, next_url = self.parse_page(html_content, url, page)
+                        if properties:
+                            self.properties.extend(property_data for property_data in properties if self.is_new(property_data))
+                            self.scraped_pages.add(canonicalize_url(url))
+                        else:
+                            next_url = False
+                    
+                    if next_url is False:
+                        logger.info(f"Falling back to Selenium for page {page}")
+                        queue.extend(task)
+                        next_url = self.scrape_with_selenium(url=url, page=page)
+                except Exception as e:
+                    logger.error(f"Error scraping page {page}: {str(e)}")
+                    next_url = False
+                
+                if next_url is False:
+                    del self.properties[before:]
+                    queue.fail(task, f"No properties found on {url}")
+                    continue
+                
+                # Queue the pages this one revealed: every page the pagination links
+                # to (if this worker knows the URL template) and the next page
+                if self.pagination_model:
+                    model = self.pagination_model
+                    added = queue.put_many(
+                        ('page', {'url': model.url_for(n), 'page': n}, canonicalize_url(model.url_for(n)))
+                        for n in model.page_numbers(start_page=page + 1, max_pages=max_pages))
+                    if added:
+                        logger.info(f"Queued {added} pages from {model}")
+                if next_url and (max_pages is None or page < max_pages):
+                    queue.put('page', {'url': next_url, 'page': page + 1}, key=canonicalize_url(next_url))
+                
+                # Results are durable (and the shard offset recorded) before the task is marked done
+                sink.write_many(self.properties[before:])
+                checkpoint.save({'base_url': self.base_url, 'worker_id': worker_id, 'sink_path': shard_path,
+                                 'sink_offset': sink.flush(fsync=True)})
+                if self.store:
+                    self.store.upsert_many(self.properties[before:])
+                if self.seen:
+                    self.seen.flush()
+                if queue.complete(task):
+                    completed += 1
+                logger.info(f"Completed page {page}: {len(self.properties) - before} properties")
+        except BaseException:
+            sink.close()
+            logger.info("Scraping interrupted; leased tasks return to the queue when their leases expire")
+            raise
+        sink.close()
+        
+        counts = queue.counts()
+        logger.info(f"Queue drained: this worker completed {completed} pages and found {len(self.properties)} "
+                    f"properties; queue totals {counts}")
+        if counts.get('dead'):
+            logger.warning(f"{counts['dead']} page tasks were dead-lettered; requeue them with retry_dead()")
+        
+        total = self.merge_queue_shards()
+        if total:
+            logger.info(f"Saved {total} properties from every worker's shard to {self.output_file}")
+        else:
+            logger.warning("No properties found by any worker")
+        
+        SELECTOR_STATS.save_snapshot()
+        return completed
+    
+    def queue_shard_dir(self):
+        """Directory holding the per-worker shards of a queue-driven crawl"""
+        return os.path.splitext(self.output_file)[0] + '.shards'
+    
+    def queue_shard(self, worker_id):
+        """
+        A worker's shard and the checkpoint recording how much of it is complete
+        
+        Returns:
+            tuple: (JSONL shard path, CrawlCheckpoint)
+        """
+        name = 'worker_' + re.sub(r'[^A-Za-z0-9_.-]', '_', worker_id)
+        shard_dir = self.queue_shard_dir()
+        suffix = '.jsonl.gz' if self.jsonl_file.endswith('.gz') else '.jsonl'
+        return (os.path.join(shard_dir, name + suffix),
+                CrawlCheckpoint(os.path.join(shard_dir, name + '.checkpoint.json')))
+    
+    def merge_queue_shards(self):
+        """
+        Merge every worker's shard into jsonl_file and output_file
+        
+        Each shard is read up to its checkpointed offset and listings are kept
+        once. Workers that finish together take turns under a flock, and each
+        merge reads every shard, so whichever runs last leaves output_file
+        complete.
+        
+        Returns:
+            int: Number of listings written
+        """
+        shard_dir = self.queue_shard_dir()
+        os.makedirs(shard_dir, exist_ok=True)
+        with open(os.path.join(shard_dir, 'merge.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                paths = []
+                ends = {}
+                for name in sorted(os.listdir(shard_dir)):
+                    if not name.endswith('.checkpoint.json'):
+                        continue
+                    state = CrawlCheckpoint(os.path.join(shard_dir, name)).load(self.base_url)
+                    if state:
+                        paths.append(state['sink_path'])
+                        ends[state['sink_path']] = state['sink_offset']
+                
+                sink = JsonlSink(self.jsonl_file)
+                merge_jsonl(paths, sink, key=property_key, ends=ends)
+                if sink.count:
+                    return sink.finalize(self.output_file)
+                sink.close()
+                return 0
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    
+    def scrape(self, max_pages=None, resume=False, queue=None, worker_id=None):
+        """
+        Main scraping method with multiple strategies and auto pagination
+        
+        Args:
+            max_pages (int): Last page to scrape (None for all)
+            resume (bool): Continue from the checkpoint of an interrupted crawl of
+                the same base_url instead of starting over
+            queue (WorkQueue): Scrape pages as tasks from this queue instead, so
+                several workers can drain one crawl (see scrape_queue)
+            worker_id (str): This worker's name on the queue (see scrape_queue)
+        """
+        if queue is not None:
+            return self.scrape_queue(queue, max_pages=max_pages, worker_id=worker_id)
+        
         total_properties = 0
         page = 1
         next_url = self.base_url  # Start with base URL
         retries = 0
         
-        while next_url and (max_pages is None or page <= max_pages):
-            logger.info(f"Processing page {page}")
-            
-            # Try requests first
-            next_url_result = self.scrape_with_requests(url=next_url, page=page)
-            
-            if next_url_result:
-                if isinstance(next_url_result, str):  # It's a URL for the next page
-                    logger.info(f"Successfully scraped page {page} with requests")
-                    next_url = next_url_result
-                    page += 1
-                    retries = 0  # Reset retries on success
-                else:
-                    # No more pages to scrape
-                    next_url = None
-            else:
-                # Fall back to Selenium if requests failed
-                logger.info(f"Falling back to Selenium for page {page}")
-                next_url_result = self.scrape_with_selenium(url=next_url, page=page)
+        checkpoint = CrawlCheckpoint(self.checkpoint_file)
+        state = checkpoint.load(self.base_url) if resume else None
+        
+        # Properties are streamed to JSONL as each page completes
+        if state:
+            sink = self.restore_checkpoint(state)
+            next_url, page, retries = state['next_url'], state['page'], state.get('retries', 0)
+        else:
+            sink = JsonlSink(self.jsonl_file)
+        written = len(self.properties)
+        
+        def save_progress(*args):
+            # Append the new records, then record a frontier that points past them
+            nonlocal written
+            sink.write_many(self.properties[written:])
+            if self.store:
+                self.store.upsert_many(self.properties[written:])
+            written = len(self.properties)
+            checkpoint.save(self.checkpoint_state(sink, next_url, page, retries))
+            if self.seen:
+                # Only after the checkpoint: a resumed crawl must not skip its own listings
+                self.seen.flush()
+        
+        try:
+            while next_url and (max_pages is None or page <= max_pages):
+                # Once the first page has revealed the URL template, fetch the pages
+                # the pagination links to together, then follow on from the last one
+                if self.pagination_model and 2 <= page <= self.pagination_model.last_linked_page:
+                    next_url, page = self.scrape_scheduled_pages(page, max_pages, on_page=save_progress)
+                    retries = 0
+                    save_progress()
+                    continue
+                
+                logger.info(f"Processing page {page}")
+                
+                # Try requests first
+                next_url_result = self.scrape_with_requests(url=next_url, page=page)
                 
                 if next_url_result:
                     if isinstance(next_url_result, str):  # It's a URL for the next page
-                        logger.info(f"Successfully scraped page {page} with Selenium")
+                        logger.info(f"Successfully scraped page {page} with requests")
                         next_url = next_url_result
                         page += 1
                         retries = 0  # Reset retries on success
@@ -558,31 +1145,65 @@ class ImprovedPropertyScraper:
                         # No more pages to scrape
                         next_url = None
                 else:
-                    # Both scraping methods failed
-                    retries += 1
-                    logger.warning(f"Both scraping methods failed on page {page}, retry {retries}/{self.max_retries}")
+                    # Fall back to Selenium if requests failed
+                    logger.info(f"Falling back to Selenium for page {page}")
+                    next_url_result = self.scrape_with_selenium(url=next_url, page=page)
                     
-                    if retries >= self.max_retries:
-                        logger.error(f"Maximum retries reached for page {page}, moving to next page")
-                        # Attempt to construct next page URL
-                        next_url = f"{self.base_url}?page={page + 1}"
-                        page += 1
-                        retries = 0
-            
-            # Add a random delay between requests
-            time.sleep(random.uniform(2, 5))
+                    if next_url_result:
+                        if isinstance(next_url_result, str):  # It's a URL for the next page
+                            logger.info(f"Successfully scraped page {page} with Selenium")
+                            next_url = next_url_result
+                            page += 1
+                            retries = 0  # Reset retries on success
+                        else:
+                            # No more pages to scrape
+                            next_url = None
+                    else:
+                        # Both scraping methods failed
+                        retries += 1
+                        logger.warning(f"Both scraping methods failed on page {page}, retry {retries}/{self.max_retries}")
+                        
+                        if retries >= self.max_retries:
+                            logger.error(f"Maximum retries reached for page {page}, moving to next page")
+                            # Predict the next page URL, keeping the sort and filter parameters
+                            if self.pagination_model:
+                                next_url = self.pagination_model.next_url(page)
+                            else:
+                                next_url = set_query_param(self.base_url, 'page', page + 1)
+                            page += 1
+                            retries = 0
+                
+                # Append this page's properties to the JSONL output and checkpoint
+                save_progress()
+                
+                # Add a random delay between requests
+                time.sleep(random.uniform(2, 5))
             
-            # Save properties periodically (every 3 pages)
-            if page % 3 == 0:
-                self.save_properties()
+            sink.write_many(self.properties[written:])
+            if self.store:
+                self.store.upsert_many(self.properties[written:])
+            if self.seen:
+                self.seen.flush()
+        except BaseException:
+            # Keep the checkpoint: scrape(resume=True) continues from it
+            sink.close()
+            logger.info(f"Scraping interrupted; resume from checkpoint {self.checkpoint_file}")
+            raise
         
         total_properties = len(self.properties)
         logger.info(f"Scraping completed. Total properties found: {total_properties}")
         
         if total_properties > 0:
-            self.save_properties()
+            # One streaming pass from the JSONL file; nothing is rewritten along the way
+            sink.finalize(self.output_file)
+            logger.info(f"Saved {total_properties} properties to {self.output_file}")
         else:
+            sink.close()
             logger.warning("No properties found across all pages and methods")
+        checkpoint.clear()
+        
+        # Keep a record of how each selector performed on this run
+        SELECTOR_STATS.save_snapshot()
 
 def load_config(config_file="scraper_config.json"):
     """Load configuration from JSON file or return defaults"""
@@ -613,8 +1234,34 @@ if __name__ == "__main__":
     target_url = config.get("target_url", "https://www.example-property-site.com/listings")
     max_pages = config.get("max_pages", 3)
     output_file = config.get("output_file", "properties.json")
+    compress_output = config.get("compress_output", False)
+    
+    # --resume continues an interrupted crawl from its checkpoint
+    resume = "--resume" in sys.argv[1:] or config.get("resume", False)
+    
+    logger.info(f"Starting scraper with URL: {target_url}" + (" (resuming)" if resume else ""))
     
-    logger.info(f"Starting scraper with URL: {target_url}")
+    # Optionally keep every listing (with price and status history) in SQLite
+    store_db = config.get("store_db")
+    store = PropertyStore(store_db) if store_db else None
     
-    scraper = ImprovedPropertyScraper(target_url, output_file=output_file)
-    scraper.scrape(max_pages=max_pages)
+    # Optionally skip listings already scraped on earlier runs
+    seen_dir = config.get("seen_dir")
+    seen = SeenSet(seen_dir) if seen_dir else None
+    
+    # Optionally drain the crawl from a shared work queue, so several workers
+    # (processes, containers or machines sharing the file) can split it
+    queue_db = config.get("queue_db")
+    queue = open_work_queue(queue_db, name=config.get("queue_name", canonicalize_url(target_url))) if queue_db else None
+    
+    scraper = ImprovedPropertyScraper(target_url, output_file=output_file, compress_output=compress_output,
+                                      store=store, seen=seen)
+    try:
+        scraper.scrape(max_pages=max_pages, resume=resume, queue=queue, worker_id=config.get("worker_id"))
+    finally:
+        if queue:
+            queue.close()
+        if store:
+            store.close()
+        if seen:
+            seen.close()
@@ -0,0 +1,336 @@
+import os
+import json
+import time
+import uuid
+import logging
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from output_sink import read_jsonl
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_DIR = os.environ.get('JOB_STORE_DIR', os.path.join(tempfile.gettempdir(), 'scraper_jobs'))
+
+# A running job's worker thread beats this often, however long a page takes
+HEARTBEAT_INTERVAL = 30
+
+# A running job without a beat or progress update for this long is reported as
+# stale: its worker died, most likely with the container
+HEARTBEAT_TIMEOUT = 120
+
+# Finished jobs are kept this long for clients to collect their results
+JOB_RETENTION = 24 * 3600
+
+def new_job(kind, params):
+    """A fresh job record"""
+    now = time.time()
+    return {
+        'job_id': uuid.uuid4().hex,
+        'kind': kind,
+        'params': params,
+        'status': 'queued',
+        'progress': {},
+        'result_count': 0,
+        'error': None,
+        'created_at': now,
+        'updated_at': now,
+        'heartbeat_at': now,
+    }
+
+class JobStore(ABC):
+    """
+    Where job state and partial results live
+    
+    Subclasses implement the storage, and cannot be created until they
+    implement every abstract method. Jobs are plain dicts (see new_job) and
+    results are appended as they are produced, so a client can page
+    through them while the job is still running.
+    """
+    
+    @abstractmethod
+    def create(self, job):
+        """Store a new job record"""
+    
+    @abstractmethod
+    def load(self, job_id):
+        """The job record, or None"""
+    
+    @abstractmethod
+    def save(self, job):
+        """Replace a job record"""
+    
+    @abstractmethod
+    def append_results(self, job_id, records):
+        """Append result records to a job"""
+    
+    @abstractmethod
+    def results(self, job_id, offset=0, limit=None):
+        """Results from `offset` on (at most `limit` of them)"""
+    
+    @abstractmethod
+    def request_cancel(self, job_id):
+        """
+        Ask a job to stop
+        
+        Kept apart from the job record, so the worker's next progress update
+        cannot overwrite it.
+        """
+    
+    @abstractmethod
+    def cancel_requested(self, job_id):
+        """Whether a cancel was requested for the job"""
+    
+    @abstractmethod
+    def beat(self, job_id):
+        """
+        Record that the job's worker is still alive
+        
+        Kept apart from the job record like cancel requests, so a beat from
+        the heartbeat thread cannot overwrite the worker's progress update.
+        """
+    
+    @abstractmethod
+    def last_beat(self, job_id):
+        """Time of the job's last beat, or None"""
+    
+    def update(self, job_id, **fields):
+        """Merge fields into a job and refresh its heartbeat"""
+        job = self.load(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+        job['updated_at'] = job['heartbeat_at'] = time.time()
+        self.save(job)
+        return job
+    
+    def get(self, job_id, offset=0, limit=None):
+        """
+        Job record plus results from `offset`, as returned to clients
+        
+        Returns:
+            dict: The job with 'results' and 'next_offset' added, or None
+        """
+        job = self.load(job_id)
+        if job is None:
+            return None
+        job['heartbeat_at'] = max(job['heartbeat_at'], self.last_beat(job_id) or 0)
+        if job['status'] == 'running' and time.time() - job['heartbeat_at'] > HEARTBEAT_TIMEOUT:
+            job['status'] = 'stale'
+        results = self.results(job_id, offset, limit)
+        job['cancel_requested'] = self.cancel_requested(job_id)
+        job['results'] = results
+        job['next_offset'] = offset + len(results)
+        return job
+
+class MemoryJobStore(JobStore):
+    """Job store in process memory (for tests and single-process use)"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.records = {}
+        self.cancelled = set()
+        self.beats = {}
+    
+    def create(self, job):
+        with self.lock:
+            self.jobs[job['job_id']] = dict(job)
+            self.records[job['job_id']] = []
+        return job
+    
+    def load(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+    
+    def save(self, job):
+        with self.lock:
+            self.jobs[job['job_id']] = dict(job)
+    
+    def append_results(self, job_id, records):
+        with self.lock:
+            self.records.setdefault(job_id, []).extend(records)
+    
+    def results(self, job_id, offset=0, limit=None):
+        with self.lock:
+            records = self.records.get(job_id, [])
+            end = None if limit is None else offset + limit
+            return list(records[offset:end])
+    
+    def request_cancel(self, job_id):
+        with self.lock:
+            if job_id in self.jobs:
+                self.cancelled.add(job_id)
+    
+    def cancel_requested(self, job_id):
+        with self.lock:
+            return job_id in self.cancelled
+    
+    def beat(self, job_id):
+        with self.lock:
+            self.beats[job_id] = time.time()
+    
+    def last_beat(self, job_id):
+        with self.lock:
+            return self.beats.get(job_id)
+
+class FileJobStore(JobStore):
+    """
+    Job store on local disk, shared by every invocation in the container
+    
+    Each job is a JSON state file (replaced atomically), a JSONL file its
+    results are appended to, a .heartbeat file whose mtime is its last beat
+    and, once cancelled, a .cancel marker file.
+    """
+    
+    def __init__(self, directory=DEFAULT_JOB_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.prune()
+    
+    def _state_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+    
+    def _results_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.jsonl")
+    
+    def _cancel_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.cancel")
+    
+    def _heartbeat_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.heartbeat")
+    
+    def create(self, job):
+        self.save(job)
+        open(self._results_path(job['job_id']), 'a').close()
+        return job
+    
+    def load(self, job_id):
+        # Job IDs come from clients; only accept what new_job generates
+        if not job_id or not str(job_id).isalnum():
+            return None
+        try:
+            with open(self._state_path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error loading job {job_id}: {str(e)}")
+            return None
+    
+    def save(self, job):
+        with self.lock:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(job, f, ensure_ascii=False)
+            os.replace(temp_path, self._state_path(job['job_id']))
+    
+    def append_results(self, job_id, records):
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        with self.lock:
+            with open(self._results_path(job_id), 'a', encoding='utf-8') as f:
+                f.write(data)
+    
+    def results(self, job_id, offset=0, limit=None):
+        path = self._results_path(job_id)
+        if not os.path.exists(path):
+            return []
+        results = []
+        for index, record in enumerate(read_jsonl(path)):
+            if index < offset:
+                continue
+            if limit is not None and len(results) >= limit:
+                break
+            results.append(record)
+        return results
+    
+    def request_cancel(self, job_id):
+        if self.load(job_id) is not None:
+            open(self._cancel_path(job_id), 'a').close()
+    
+    def cancel_requested(self, job_id):
+        return os.path.exists(self._cancel_path(job_id))
+    
+    def beat(self, job_id):
+        path = self._heartbeat_path(job_id)
+        with open(path, 'a'):
+            os.utime(path)
+    
+    def last_beat(self, job_id):
+        try:
+            return os.path.getmtime(self._heartbeat_path(job_id))
+        except OSError:
+            return None
+    
+    def prune(self):
+        """Delete jobs last updated more than JOB_RETENTION ago"""
+        cutoff = time.time() - JOB_RETENTION
+        try:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+        except OSError as e:
+            logger.debug(f"Error pruning job store: {str(e)}")
+
+def create_job_store(kind=None):
+    """Job store named by `kind` or the JOB_STORE environment variable ('file' or 'memory')"""
+    kind = (kind or os.environ.get('JOB_STORE', 'file')).lower()
+    if kind == 'memory':
+        return MemoryJobStore()
+    return FileJobStore()
+
+def start_job(store, kind, params, work):
+    """
+    Create a job and run it on a background thread
+    
+    While work() runs, a second thread beats every HEARTBEAT_INTERVAL
+    seconds, so a job stuck on one slow page (e.g. a browser contact lookup)
+    is not mistaken for a dead one. Both are daemon threads of this process:
+    if the container is recycled they die with it, the beats stop and the
+    job turns 'stale'. Nothing resumes a stale job; 'stale' means its
+    remaining work is lost and the client has to submit it again.
+    
+    Args:
+        store (JobStore): Where the job's state and results go
+        kind (str): Job type, e.g. 'multiple'
+        params (dict): Job parameters (JSON-serialisable)
+        work (callable): work(store, job_id) -> final progress dict; it
+            reports progress with store.update and results with
+            store.append_results, and should stop early once
+            store.cancel_requested(job_id) is True
+    
+    Returns:
+        dict: The job record as created
+    """
+    job = store.create(new_job(kind, params))
+    job_id = job['job_id']
+    
+    def beat(done):
+        while not done.wait(HEARTBEAT_INTERVAL):
+            try:
+                store.beat(job_id)
+            except Exception as e:
+                logger.error(f"Job {job_id} heartbeat failed: {str(e)}")
+    
+    def run():
+        store.update(job_id, status='running', started_at=time.time())
+        done = threading.Event()
+        threading.Thread(target=beat, args=(done,), name=f"job-{job_id[:8]}-heartbeat", daemon=True).start()
+        try:
+            progress = work(store, job_id)
+            status = 'cancelled' if store.cancel_requested(job_id) else 'completed'
+            fields = {'progress': progress} if progress else {}
+            store.update(job_id, status=status, finished_at=time.time(), **fields)
+            logger.info(f"Job {job_id} {status}")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            store.update(job_id, status='failed', error=str(e), finished_at=time.time())
+        finally:
+            done.set()
+    
+    threading.Thread(target=run, name=f"job-{job_id[:8]}", daemon=True).start()
+    logger.info(f"Started {kind} job {job_id}")
+    return job
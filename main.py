@@ -5,6 +5,8 @@ import logging
 import sys
 import re
 import random
+import threading
+import fcntl
 import requests
 from bs4 import BeautifulSoup
 from selenium import webdriver
@@ -14,8 +16,30 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urljoin
+from site_schemas import get_site_schema
+from selector_profiles import SelectorProfileStore
+from selector_stats import SELECTOR_STATS
+from html_analyzer import analyze_html_structure
+from pagination_model import PaginationModel, infer_pagination_model, set_query_param, preserve_query_params, fetch_all
+from anti_bot import classify_response
+from output_sink import JsonlSink, read_jsonl, merge_jsonl
+from checkpoint import CrawlCheckpoint
+from property_store import PropertyStore, DEFAULT_DB_PATH
+from shared_limits import shared_rate_limiter, shared_browser_semaphore
+from seen_set import canonicalize_url, property_key
+from work_queue import default_worker_id
+from excel_export import ExcelStreamWriter, XLSX_CONTENT_TYPE, has_openpyxl
+from result_cache import ResultCache
+from single_flight import SingleFlight
+from contact_cache import ContactCache, agent_keys, has_contact_details
+from extract_listing import extract_agent_details, parse_listing_page
+from job_store import create_job_store, start_job
+from crawl_pipeline import crawl_listings
+from shared_pools import create_session, RateLimiter, DriverPool
+from concurrent.futures import ThreadPoolExecutor
 import tempfile
+import hashlib
 
 # Try to import optional dependencies
 try:
@@ -38,17 +62,66 @@ logging.basicConfig(
 )
 logger = logging.getLogger()
 
+# Seen-listing store for delta crawls (property_store's default, in the temp directory)
+DELTA_STORE_DB = DEFAULT_DB_PATH
+
+# A delta crawl stops after this many consecutive already-stored listings
+DELTA_STOP_AFTER = 3
+
+# Page cap for a delta crawl, which only matters while the store is still empty
+DELTA_MAX_PAGES = 10
+
+# Results of 'latest' and 'multiple' requests, shared by warm invocations
+RESULT_CACHE = ResultCache()
+
+# Agent contact details by listing and by agent, so most lookups need no browser
+CONTACT_CACHE = ContactCache()
+
+# Concurrent identical requests (in this process or another) share one scrape
+SINGLE_FLIGHT = SingleFlight()
+
+# State and partial results of asynchronous 'multiple' jobs (JOB_STORE=file|memory)
+JOB_STORE = create_job_store()
+
+# Batch mode: URLs scraped at once, browsers shared by them, and the request
+# rate per host (burst of BATCH_BURST) that all of them together stay under
+# when the machine-wide limits (shared_limits) are turned off
+BATCH_MAX_WORKERS = 4
+BATCH_MAX_BROWSERS = 2
+BATCH_RATE = 2.0
+BATCH_BURST = 4
+BATCH_MAX_URLS = 50
+
+# Contact lookups run at once in a 'crawl' with contacts; each one may hold a
+# browser, and browsers are capped machine-wide anyway (shared_limits)
+CRAWL_CONTACT_WORKERS = 2
+
 #############################################################################
 # SECTION 1: PROPERTY SCRAPER 
 # (originally from improved_scraper.py)
 #############################################################################
 
 class ImprovedPropertyScraper:
-    def __init__(self, base_url, output_file="properties.json"):
+    def __init__(self, base_url, output_file="properties.json", compress_output=False, store=None, seen=None,
+                 session=None, driver_pool=None, rate_limiter=None):
         self.base_url = base_url
         self.output_file = output_file
         self.properties = []
         
+        # Optional PropertyStore; scrape() upserts each page's listings into it
+        self.store = store
+        
+        # Optional SeenSet shared across runs; listings already in it are skipped
+        self.seen = seen
+        
+        # scrape() streams records to this JSON Lines file as pages complete and
+        # writes the legacy JSON array to output_file once at the end
+        self.jsonl_file = os.path.splitext(output_file)[0] + ('.jsonl.gz' if compress_output else '.jsonl')
+        
+        # Crawl frontier and sink offset, saved after every page so scrape(resume=True)
+        # can pick up an interrupted crawl
+        self.checkpoint_file = os.path.splitext(output_file)[0] + '.checkpoint.json'
+        
         # Handle user agent with or without the fake_useragent package
         if has_fake_ua:
             self.ua = UserAgent()
@@ -72,10 +145,12 @@ class ImprovedPropertyScraper:
             ".grid-item"                    # Grid-based layouts
         ]
         
-        # Website-specific extraction strategies
-        self.site_extractors = {
-            "privateproperty.co.za": self.extract_privateproperty_data
-        }
+        # Compiled extraction schema for this site (see site_schemas.json);
+        # its container selectors are tried before the generic fallbacks
+        self.site_schema = get_site_schema(self.base_url)
+        self.property_selectors = self.site_schema.containers + [
+            selector for selector in self.property_selectors if selector not in self.site_schema.containers
+        ]
         
         # Add pagination selectors - updated with newer syntax
         self.pagination_selectors = [
@@ -94,8 +169,40 @@ class ImprovedPropertyScraper:
         # Add max retries for failed pages
         self.max_retries = 3
         
-        # Track scraped pages to avoid duplicates
+        # URL template and page count inferred from the first results page;
+        # once known, the remaining pages are fetched max_workers at a time
+        self.pagination_model = None
+        self.max_workers = 4
+        
+        # One HTTP session for every page, so cookies handed over from a
+        # browser after a block page are sent on later requests; a batch
+        # passes one session (see shared_pools.create_session) to all its scrapers
+        self.session = session or requests.Session()
+        self.handoff_lock = threading.Lock()
+        self.cookie_handoffs = 0
+        
+        # Optional DriverPool to borrow browsers from instead of starting one per
+        # page, and the rate limiter consulted before every request and page load
+        # (by default the machine-wide one shared with other scraper processes)
+        self.driver_pool = driver_pool
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
+        
+        # Browsers started outside a pool hold a slot of the machine-wide
+        # browser semaphore while they run
+        self.browser_semaphore = shared_browser_semaphore()
+        self.driver_slots = {}
+        
+        # Track scraped pages (by canonical URL) to avoid duplicates
         self.scraped_pages = set()
+        
+        # Scheduled pages that failed with both requests and Selenium; checkpoints
+        # point back at the first one so a resumed crawl tries them again
+        self.failed_pages = set()
+        
+        # Selectors learned on earlier runs for this domain are tried first
+        self.domain = urlparse(self.base_url).netloc if '//' in self.base_url else self.base_url.split('/')[0]
+        self.selector_profiles = SelectorProfileStore()
+        self.learned_profile = self.selector_profiles.get(self.domain)
     
     def get_random_headers(self):
         """Generate random headers to avoid detection"""
@@ -109,6 +216,97 @@ class ImprovedPropertyScraper:
             'Upgrade-Insecure-Requests': '1',
         }
     
+    def learned_selectors(self, group):
+        """Selectors that matched on earlier runs for this domain"""
+        return self.learned_profile.get(group, [])
+    
+    def ordered_selectors(self, group, selectors):
+        """
+        The configured selectors, then any learned ones the list lacks
+        
+        Callers stop at the first match, so the configured order decides which
+        element wins (featured cards before standard ones, a specific "next"
+        link before a generic one); neither learning nor hit rates change it.
+        """
+        learned = self.learned_selectors(group)
+        return list(selectors) + [selector for selector in learned if selector not in selectors]
+    
+    def remember_selectors(self, group, selectors):
+        """
+        Add the selectors that matched to this domain's learned set
+        
+        Property and pagination selectors accumulate (in configured order), so a
+        page that lacks one kind of card does not make later pages skip it;
+        analyzer suggestions are replaced by the latest ones.
+        """
+        learned = self.learned_selectors(group)
+        if group == 'suggested':
+            if selectors and selectors != learned:
+                self.learned_profile = self.selector_profiles.learn(self.domain, group, selectors, merge=False)
+        elif any(selector not in learned for selector in selectors):
+            priority = self.property_selectors if group == 'property' else self.pagination_selectors
+            self.learned_profile = self.selector_profiles.learn(self.domain, group, selectors, priority=priority)
+    
+    def _match_selectors(self, soup, selectors, first_only):
+        """Return (selector, elements) pairs for the selectors that match"""
+        matches = []
+        for selector in selectors:
+            with SELECTOR_STATS.timer('property', selector) as timer:
+                try:
+                    elements = soup.select(selector)
+                except Exception as e:
+                    logger.debug(f"Error with selector {selector}: {str(e)}")
+                    continue
+                timer.hit = bool(elements)
+            if elements:
+                matches.append((selector, elements))
+                if first_only:
+                    break
+        return matches
+    
+    def find_property_elements(self, soup, html_content=None, first_only=False):
+        """
+        Find listing cards, trying only this domain's learned selectors first
+        
+        The site schema's own containers are always tried with the learned
+        selectors, so a kind of card the pages seen so far lacked is still
+        found. Falls back to the site's containers and then the generic
+        selectors (plus earlier analyzer suggestions), best hit rate first, when
+        those find nothing, then to fresh html_analyzer suggestions, and learns
+        whatever matched.
+        
+        Returns:
+            list: (selector, elements) pairs
+        """
+        learned = self.learned_selectors('property')
+        if learned:
+            learned = [selector for selector in self.property_selectors
+                       if selector in learned or selector in self.site_schema.containers] + \
+                [selector for selector in learned if selector not in self.property_selectors]
+            matches = self._match_selectors(soup, learned, first_only)
+            if matches:
+                self.remember_selectors('property', [selector for selector, _ in matches])
+                return matches
+            logger.info(f"Learned selectors for {self.domain} found nothing, re-learning")
+        
+        # The site's own containers keep their priority (featured cards before
+        # standard ones). The generic fallbacks are interchangeable guesses at an
+        # unknown layout, so the ones with the best hit rate per unit cost go first.
+        containers = [selector for selector in self.site_schema.containers if selector not in learned]
+        fallback = [selector for selector in self.property_selectors + self.learned_selectors('suggested')
+                    if selector not in learned and selector not in containers]
+        matches = self._match_selectors(soup, containers + SELECTOR_STATS.ordered('property', fallback), first_only)
+        
+        if not matches and html_content:
+            suggested = [candidate['selector'] for candidate in analyze_html_structure(html_content)]
+            if suggested:
+                self.remember_selectors('suggested', suggested)
+                matches = self._match_selectors(soup, suggested, first_only)
+        
+        if matches:
+            self.remember_selectors('property', [selector for selector, _ in matches])
+        return matches
+    
     def scrape_with_requests(self, url=None, page=1):
         """Attempt to scrape using requests and BeautifulSoup"""
         try:
@@ -116,77 +314,290 @@ class ImprovedPropertyScraper:
                 url = self.base_url  # Use the full base_url with all query params, do not append ?page={page}
             
             # Skip if this URL has already been scraped
-            if url in self.scraped_pages:
+            if canonicalize_url(url) in self.scraped_pages:
                 logger.info(f"Skipping already scraped URL: {url}")
                 return False
             
             logger.info(f"Scraping with requests: {url}")
             
-            headers = self.get_random_headers()
-            response = requests.get(url, headers=headers, timeout=20)
+            # Block and challenge pages go straight to the strategy that gets past
+            # them instead of through every property selector first
+            response, verdict = self.fetch_with_verdict(url)
             
-            if response.status_code != 200:
-                logger.error(f"Failed to fetch page: {response.status_code}")
+            if response is None:
+                logger.error(f"Failed to fetch page: {verdict['status_code']} ({verdict['action']})")
                 return False
             
-            self.scraped_pages.add(url)  # Mark as scraped
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Debug - save HTML for inspection in non-serverless environment
-            # with open(f"page_{page}_source.html", "w", encoding="utf-8") as f:
-            #     f.write(response.text)
-            
-            # Try all selectors to get both featured and non-featured properties
-            properties_found = 0
-            for selector in self.property_selectors:
-                property_elements = soup.select(selector)
-                if property_elements:
-                    logger.info(f"Found {len(property_elements)} properties with selector: {selector}")
-                    properties_found += len(property_elements)
-                    self.extract_properties(property_elements)
-                    # No break here - try all selectors
+            properties, next_url = self.parse_page(response.text, url, page)
             
-            if properties_found == 0:
+            if not properties:
                 logger.warning("No properties found with standard selectors")
                 return False
+            self.properties.extend(property_data for property_data in properties if self.is_new(property_data))
+            self.scraped_pages.add(canonicalize_url(url))  # Mark as scraped once it yielded listings
             
-            # Check if there's a next page and return its URL
-            has_next = self.has_next_page(soup)
-            if has_next:
-                return self.get_next_page_url(soup, url, page)
-            else:
+            if next_url is None:
                 logger.info("No more pages to scrape")
-                return None
+            return next_url
             
         except Exception as e:
             logger.error(f"Error in requests scraping: {str(e)}")
             return False
     
+    def iter_page_properties(self, soup, html_content):
+        """Yield each listing on a parsed results page as soon as it is extracted"""
+        for selector, property_elements in self.find_property_elements(soup, html_content):
+            logger.info(f"Found {len(property_elements)} properties with selector: {selector}")
+            for elem in property_elements:
+                property_data = self.extract_property(elem)
+                if property_data is not None:
+                    yield property_data
+    
+    def extract_page_properties(self, soup, html_content):
+        """Extract every listing on a parsed results page"""
+        return list(self.iter_page_properties(soup, html_content))
+    
+    def find_next_page_url(self, soup, html_content, url, page):
+        """
+        Learn the pagination model from page 1, then return the next page URL (None on the last page)
+        
+        There is a next page if this page shows a "next" control or links to a
+        higher page number; the model only builds its URL.
+        """
+        if page == 1 and self.pagination_model is None:
+            self.pagination_model = infer_pagination_model(html_content, url, soup)
+        
+        # Check if there's a next page and return its URL
+        linked_beyond = self.pagination_model is not None and self.pagination_model.observe(soup, url) > page
+        if linked_beyond or self.has_next_page(soup):
+            return self.get_next_page_url(soup, url, page)
+        return None
+    
+    def parse_page(self, html_content, url, page):
+        """
+        Parse one fetched results page without touching self.properties
+        
+        Learns the pagination model from page 1 and widens it from later pages
+        (see find_next_page_url).
+        
+        Returns:
+            tuple: (properties found on the page, next page URL or None)
+        """
+        soup = BeautifulSoup(html_content, 'html.parser')
+        
+        # Debug - save HTML for inspection in non-serverless environment
+        # with open(f"page_{page}_source.html", "w", encoding="utf-8") as f:
+        #     f.write(html_content)
+        
+        # Try all selectors to get both featured and non-featured properties,
+        # starting with the ones learned for this domain
+        properties = self.extract_page_properties(soup, html_content)
+        if not properties:
+            return properties, None
+        return properties, self.find_next_page_url(soup, html_content, url, page)
+    
+    def fetch_with_verdict(self, url):
+        """
+        Fetch a page with requests and react to what the anti-bot detector sees
+        
+        Rate limiting is waited out (honouring Retry-After), an access-denied
+        page triggers one cookie handoff from a real browser, and a challenge
+        page is left for Selenium.
+        
+        Returns:
+            tuple: (response, verdict); response is None unless the verdict is 'ok'
+        """
+        handed_off = False
+        verdict = None
+        for attempt in range(self.max_retries):
+            self.throttle(url)
+            response = self.session.get(url, headers=self.get_random_headers(), timeout=20)
+            verdict = classify_response(response.status_code, response.content, response.headers)
+            if verdict['action'] == 'ok':
+                return response, verdict
+            
+            logger.warning(f"Anti-bot verdict for {url}: {verdict['action']} {verdict['issues']}")
+            if verdict['action'] == 'backoff':
+                logger.info(f"Backing off for {verdict['retry_after']:.0f}s")
+                time.sleep(verdict['retry_after'])
+            elif verdict['action'] == 'cookie_handoff' and not handed_off:
+                handed_off = self.handoff_cookies(url)
+                if not handed_off:
+                    break
+            else:
+                break
+        return None, verdict
+    
+    def handoff_cookies(self, url):
+        """
+        Open a page in a real browser and copy its cookies into the requests session
+        
+        The browser's user agent is pinned for later requests too, since
+        clearance cookies are tied to it. Concurrent callers share one handoff.
+        
+        Returns:
+            bool: True if the session now carries browser cookies
+        """
+        generation = self.cookie_handoffs
+        with self.handoff_lock:
+            if self.cookie_handoffs != generation:
+                # Another thread handed cookies over while we waited
+                return True
+            
+            driver = None
+            try:
+                logger.info(f"Handing cookies over from a browser session for {url}")
+                driver = self.acquire_driver()
+                self.throttle(url)
+                driver.get(url)
+                time.sleep(5)
+                
+                for cookie in driver.get_cookies():
+                    self.session.cookies.set(cookie['name'], cookie['value'],
+                                             domain=cookie.get('domain'), path=cookie.get('path', '/'))
+                user_agent = driver.execute_script("return navigator.userAgent")
+                self.get_random_user_agent = lambda: user_agent
+                
+                self.cookie_handoffs += 1
+                return True
+            except Exception as e:
+                logger.error(f"Cookie handoff failed for {url}: {str(e)}")
+                return False
+            finally:
+                if driver:
+                    self.release_driver(driver)
+    
+    def fetch_page(self, url):
+        """Fetch a results page with requests, returning its HTML or None"""
+        response, verdict = self.fetch_with_verdict(url)
+        if response is None:
+            logger.error(f"Failed to fetch page {url}: {verdict['status_code']} ({verdict['action']})")
+            return None
+        return response.text
+    
+    def scrape_scheduled_pages(self, start_page=2, max_pages=None, on_page=None):
+        """
+        Scrape the pages from start_page up to the highest one the pagination links to
+        
+        Linked pages are known to exist, so they are fetched concurrently and
+        extracted in page order; pages that fail or show no listings are
+        retried with Selenium. Pages already in scraped_pages (e.g. restored
+        from a checkpoint) are not fetched.
+        
+        Args:
+            start_page (int): First page to scrape
+            max_pages (int): Last page to scrape
+            on_page (callable): on_page(page) called after each page is done
+        
+        Returns:
+            tuple: (URL of the page after the last scheduled one, or None if the
+            last one shows no next page; that page's number)
+        """
+        model = self.pagination_model
+        scheduled = model.page_numbers(start_page=start_page, max_pages=max_pages)
+        pages = [page for page in scheduled if canonicalize_url(model.url_for(page)) not in self.scraped_pages]
+        urls = [model.url_for(page) for page in pages]
+        logger.info(f"Scheduling {len(urls)} pages from {model}")
+        
+        # Unless the last page says otherwise, go on while the pagination links further
+        last_page = scheduled[-1] if scheduled else start_page - 1
+        next_url = model.next_url(last_page) if model.last_linked_page > last_page else None
+        
+        for page, (url, html_content) in zip(pages, fetch_all(urls, self.fetch_page, self.max_workers)):
+            if html_content is not None and canonicalize_url(url) not in self.scraped_pages:
+                properties, page_next_url = self.parse_page(html_content, url, page)
+                if properties:
+                    self.properties.extend(property_data for property_data in properties if self.is_new(property_data))
+                    self.scraped_pages.add(canonicalize_url(url))
+                    self.failed_pages.discard(page)
+                    logger.info(f"Successfully scraped page {page} with requests")
+                    if page == last_page:
+                        next_url = page_next_url
+                    if on_page:
+                        on_page(page)
+                    continue
+            
+            logger.info(f"Falling back to Selenium for page {page}")
+            result = self.scrape_with_selenium(url=url, page=page)
+            if result is False:
+                logger.warning(f"Both scraping methods failed on page {page}")
+                self.failed_pages.add(page)
+            else:
+                self.failed_pages.discard(page)
+                if page == last_page:
+                    next_url = result
+            if on_page:
+                on_page(page)
+        
+        # Later pages may have linked beyond the batch
+        if next_url is None and model.last_linked_page > last_page:
+            next_url = model.next_url(last_page)
+        return next_url, last_page + 1
+    
+    def create_driver(self):
+        """Start a headless Chrome with a random user agent"""
+        options = Options()
+        options.add_argument("--headless")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument(f"user-agent={self.get_random_user_agent()}")
+        
+        return webdriver.Chrome(options=options)
+    
+    def acquire_driver(self):
+        """A browser from the driver pool, or a new one (within the browser semaphore) without a pool"""
+        if self.driver_pool:
+            return self.driver_pool.acquire(self.create_driver)
+        if not self.browser_semaphore:
+            return self.create_driver()
+        
+        slot = self.browser_semaphore.acquire()
+        try:
+            driver = self.create_driver()
+        except BaseException:
+            self.browser_semaphore.release(slot)
+            raise
+        self.driver_slots[driver] = slot
+        return driver
+    
+    def release_driver(self, driver, broken=False):
+        """Return a browser to the driver pool (broken ones are quit), or quit it and free its slot"""
+        if self.driver_pool:
+            self.driver_pool.release(driver, broken=broken)
+            return
+        try:
+            driver.quit()
+        finally:
+            slot = self.driver_slots.pop(driver, None)
+            if slot is not None:
+                self.browser_semaphore.release(slot)
+    
+    def throttle(self, url):
+        """Wait for the rate limiter, if there is one, before requesting url"""
+        if self.rate_limiter:
+            waited = self.rate_limiter.acquire(url)
+            if waited:
+                logger.debug(f"Rate limiter delayed {url} by {waited:.2f}s")
+    
     def scrape_with_selenium(self, url=None, page=1):
         """Fallback to Selenium for JavaScript-heavy pages"""
         driver = None
         try:
-            options = Options()
-            options.add_argument("--headless")
-            options.add_argument("--disable-gpu")
-            options.add_argument("--no-sandbox")
-            options.add_argument("--disable-dev-shm-usage")
-            options.add_argument(f"user-agent={self.get_random_user_agent()}")
-            
-            driver = webdriver.Chrome(options=options)
+            driver = self.acquire_driver()
             
             if url is None:
                 url = self.base_url  # Use the full base_url with all query params, do not append ?page={page}
             
             # Skip if this URL has already been scraped
-            if url in self.scraped_pages:
+            if canonicalize_url(url) in self.scraped_pages:
                 logger.info(f"Skipping already scraped URL: {url}")
                 if driver:
-                    driver.quit()
+                    self.release_driver(driver)
                 return False
             
             logger.info(f"Scraping with Selenium: {url}")
+            self.throttle(url)
             driver.get(url)
             
             # Wait for page to load dynamically
@@ -200,34 +611,52 @@ class ImprovedPropertyScraper:
                 driver.get(url)
                 time.sleep(3)
             
-            self.scraped_pages.add(url)  # Mark as scraped
+            # Only fall back to the full selector list (each miss waits 10s) when the
+            # selectors learned for this domain (and the site schema's containers) find nothing
+            learned = self.learned_selectors('property')
+            if learned:
+                learned = [selector for selector in self.property_selectors
+                           if selector in learned or selector in self.site_schema.containers] + \
+                    [selector for selector in learned if selector not in self.property_selectors]
+            selector_sets = [learned, [selector for selector in self.property_selectors if selector not in learned]]
             
             properties_found = 0
-            for selector in self.property_selectors:
-                try:
-                    # Wait for elements to be present
+            for selectors in selector_sets:
+                matched = []
+                for selector in selectors:
                     try:
-                        WebDriverWait(driver, 10).until(
-                            EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                        )
-                        property_elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                        
-                        if property_elements:
-                            logger.info(f"Found {len(property_elements)} properties with Selenium using selector: {selector}")
-                            properties_found += len(property_elements)
-                            self.extract_properties_selenium(property_elements)
-                            # No break here - try all selectors
-                    except TimeoutException:
-                        continue
-                except Exception as e:
-                    logger.debug(f"Error with selector {selector}: {str(e)}")
+                        # Wait for elements to be present
+                        try:
+                            with SELECTOR_STATS.timer('property_selenium', selector) as timer:
+                                WebDriverWait(driver, 10).until(
+                                    EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+                                )
+                                property_elements = driver.find_elements(By.CSS_SELECTOR, selector)
+                                timer.hit = bool(property_elements)
+                            
+                            if property_elements:
+                                logger.info(f"Found {len(property_elements)} properties with Selenium using selector: {selector}")
+                                properties_found += len(property_elements)
+                                matched.append(selector)
+                                self.extract_properties_selenium(property_elements)
+                                # No break here - try all selectors
+                        except TimeoutException:
+                            continue
+                    except Exception as e:
+                        logger.debug(f"Error with selector {selector}: {str(e)}")
+                
+                if matched:
+                    self.remember_selectors('property', matched)
+                    break
             
             if properties_found == 0:
                 logger.warning("No properties found with Selenium")
                 if driver:
-                    driver.quit()
+                    self.release_driver(driver)
                 return False
             
+            self.scraped_pages.add(canonicalize_url(url))  # Mark as scraped once it yielded listings
+            
             # Check if there's a next page
             has_next = self.has_next_page_selenium(driver)
             
@@ -242,246 +671,72 @@ class ImprovedPropertyScraper:
                     # Return the new URL after navigation
                     next_url = driver.current_url
                     if next_url != current_url:  # Ensure we actually navigated
-                        driver.quit()
+                        self.release_driver(driver)
                         return next_url
                 
                 # Fallback: construct the next URL if click didn't work
-                driver.quit()
-                return self.get_next_page_url(BeautifulSoup(driver.page_source, 'html.parser'), 
-                                            current_url, page)
+                soup = BeautifulSoup(driver.page_source, 'html.parser')
+                self.release_driver(driver)
+                return self.get_next_page_url(soup, current_url, page)
             else:
                 logger.info("No more pages to scrape with Selenium")
-                driver.quit()
+                self.release_driver(driver)
                 return None
             
         except Exception as e:
             logger.error(f"Error in Selenium scraping: {str(e)}")
             if driver:
-                driver.quit()
+                self.release_driver(driver, broken=True)
             return False
     
-    def extract_properties(self, property_elements):
-        """Extract property data from BeautifulSoup elements"""
-        # Check if we have a site-specific extractor for the current domain
-        domain = self.base_url.split('/')[2] if '//' in self.base_url else self.base_url.split('/')[0]
+    def extract_properties(self, property_elements, into=None):
+        """
+        Extract property data from BeautifulSoup elements using the site's compiled schema
         
-        # Use site-specific extractor if available
-        for site, extractor in self.site_extractors.items():
-            if site in domain:
-                logger.info(f"Using specialized extractor for {site}")
-                extractor(property_elements)
-                return
+        Appends to `into` (self.properties by default) and returns that list.
+        """
+        logger.info(f"Using extraction schema for {self.site_schema.name}")
+        properties = self.properties if into is None else into
         
-        # Default generic extractor
         for elem in property_elements:
-            try:
-                # These are generic selectors - adapt to your target site
-                title = elem.select_one('.property-title, .listing-title, h2, h3')
-                price = elem.select_one('.property-price, .listing-price, .price')
-                location = elem.select_one('.property-location, .listing-location, .address')
-                
-                # Extract image url
-                image = elem.select_one('img.property-image, img.listing-image, img.listing-result__image')
-                
-                property_data = {
-                    'title': title.text.strip() if title else 'No Title',
-                    'price': price.text.strip() if price else 'No Price',
-                    'location': location.text.strip() if location else 'No Location',
-                    'image_url': image.get('src') if image else None,
-                    # Add more fields as needed
-                }
-                
-                self.properties.append(property_data)
-                logger.debug(f"Extracted property: {property_data['title']}")
-                
-            except Exception as e:
-                logger.error(f"Error extracting property data: {str(e)}")
-
-    def extract_privateproperty_data(self, property_elements):
-        """Extract property data specific to privateproperty.co.za"""
-        for elem in property_elements:
-            try:
-                # Determine if it's a featured listing or a standard listing
-                is_featured = 'featured-listing' in elem.get('class', [])
-                
-                # Select appropriate class prefixes based on listing type
-                prefix = 'featured-listing' if is_featured else 'listing-result'
-                
-                # Extract property details
-                title = elem.select_one(f'.{prefix}__title')
-                price = elem.select_one(f'.{prefix}__price')
-                location = elem.select_one(f'.{prefix}__address')
-                description = elem.select_one(f'.{prefix}__description')
-                
-                # Extract image URL - look for img tag with specific class or any img inside the element
-                image = elem.select_one(f'img.{prefix}__image') or elem.select_one('img')
-                
-                # Extract features (bedrooms, bathrooms, etc.)
-                features = {}
-                feature_elements = elem.select(f'.{prefix}__feature')
-                for feature in feature_elements:
-                    feature_title = feature.get('title', '').lower()
-                    if feature_title:
-                        feature_value = feature.text.strip()
-                        features[feature_title] = feature_value
-                
-                # Extract listing ID and type
-                listing_id = None
-                listing_type = None
-                wishlist_btn = elem.select_one(f'.{prefix}__wishlist-btn')
-                if wishlist_btn:
-                    listing_id = wishlist_btn.get('data-listing-id')
-                    listing_type = wishlist_btn.get('data-listing-type')
-                
-                # Extract agent or agency info
-                agent_name = elem.select_one(f'.{prefix}__agent-name')
-                advertiser_info = elem.select_one(f'.{prefix}__advertiser')
-                
-                # Get property URL and make sure it's absolute
-                property_url = elem.get('href', '')
-                if property_url and not property_url.startswith('http'):
-                    # Extract domain from the base URL
-                    domain = self.base_url.split('/')[2] if '//' in self.base_url else self.base_url.split('/')[0]
-                    if '//' in self.base_url:
-                        scheme = self.base_url.split('/')[0] + '//'
-                    else:
-                        scheme = 'https://'
-                    property_url = f"{scheme}{domain}{property_url}"
-                
-                # Create comprehensive property data
-                property_data = {
-                    'title': title.text.strip() if title else 'No Title',
-                    'price': price.text.strip() if price else 'No Price',
-                    'location': location.text.strip() if location else 'No Location',
-                    'description': description.text.strip() if description else '',
-                    'features': features,
-                    'listing_id': listing_id,
-                    'listing_type': listing_type,
-                    'is_featured': is_featured,
-                    'agent': agent_name.text.strip() if agent_name else '',
-                    'url': property_url,
-                    'image_url': image.get('src') if image else None
-                }
-                
-                logger.debug(f"Extracted property from Private Property: {property_data['title']}")
-                logger.debug(f"Image URL: {property_data['image_url']}")
-                self.properties.append(property_data)
-                
-            except Exception as e:
-                logger.error(f"Error extracting Private Property data: {str(e)}")
-
+            property_data = self.extract_property(elem)
+            if property_data is not None:
+                properties.append(property_data)
+        
+        return properties
+    
+    def extract_property(self, elem):
+        """Extract one property from a BeautifulSoup card element (None if it fails)"""
+        try:
+            property_data = self.site_schema.extract_soup(elem, self.base_url)
+            logger.debug(f"Extracted property: {property_data.get('title')}")
+            return property_data
+        except Exception as e:
+            logger.error(f"Error extracting property data: {str(e)}")
+            return None
+    
+    def is_new(self, property_data):
+        """Whether a property has not been seen on an earlier run (always True without a SeenSet)"""
+        return self.seen is None or self.seen.add_property(property_data)
+    
     def extract_properties_selenium(self, property_elements):
-        """Extract property data from Selenium elements"""
-        # Check if we have a site-specific extractor for the current domain
-        domain = self.base_url.split('/')[2] if '//' in self.base_url else self.base_url.split('/')[0]
-        
-        # Use site-specific selenium extractor if available
-        for site, extractor in self.site_extractors.items():
-            if site in domain:
-                logger.info(f"Using specialized Selenium extractor for {site}")
-                self.extract_privateproperty_data_selenium(property_elements)
-                return
-        
-        # Default generic Selenium extractor
-        for elem in property_elements:
-            try:
-                # Generic selectors - adapt to your target site
-                title = elem.find_elements(By.CSS_SELECTOR, '.property-title, .listing-title, h2, h3')
-                price = elem.find_elements(By.CSS_SELECTOR, '.property-price, .listing-price, .price')
-                location = elem.find_elements(By.CSS_SELECTOR, '.property-location, .listing-location, .address')
-                
-                # Extract image url
-                image = elem.find_elements(By.CSS_SELECTOR, 'img.property-image, img.listing-image, img.listing-result__image')
-                
-                property_data = {
-                    'title': title[0].text.strip() if title else 'No Title',
-                    'price': price[0].text.strip() if price else 'No Price',
-                    'location': location[0].text.strip() if location else 'No Location',
-                    'image_url': image[0].get_attribute('src') if image else None,
-                    # Add more fields as needed
-                }
-                
-                self.properties.append(property_data)
-                logger.debug(f"Extracted property with Selenium: {property_data['title']}")
-                
-            except Exception as e:
-                logger.error(f"Error extracting property data with Selenium: {str(e)}")
-                
-    def extract_privateproperty_data_selenium(self, property_elements):
-        """Extract property data from Selenium elements specific to privateproperty.co.za"""
-        for elem in property_elements:
-            try:
-                # Determine if it's a featured listing or a standard listing
-                class_attribute = elem.get_attribute('class')
-                is_featured = class_attribute and 'featured-listing' in class_attribute
-                
-                # Select appropriate class prefixes based on listing type
-                prefix = 'featured-listing' if is_featured else 'listing-result'
-                
-                # Extract property details
-                title = elem.find_elements(By.CSS_SELECTOR, f'.{prefix}__title')
-                price = elem.find_elements(By.CSS_SELECTOR, f'.{prefix}__price')
-                location = elem.find_elements(By.CSS_SELECTOR, f'.{prefix}__address')
-                description = elem.find_elements(By.CSS_SELECTOR, f'.{prefix}__description')
-                
-                # Extract image URL - look for specific class or any img inside the element
-                image = elem.find_elements(By.CSS_SELECTOR, f'img.{prefix}__image')
-                if not image:
-                    image = elem.find_elements(By.CSS_SELECTOR, 'img')
-                
-                # Extract features (bedrooms, bathrooms, etc.)
-                features = {}
-                feature_elements = elem.find_elements(By.CSS_SELECTOR, f'.{prefix}__feature')
-                for feature in feature_elements:
-                    feature_title = feature.get_attribute('title')
-                    if feature_title:
-                        feature_title = feature_title.lower()
-                        feature_value = feature.text.strip()
-                        features[feature_title] = feature_value
-                
-                # Extract listing ID and type
-                listing_id = None
-                listing_type = None
-                wishlist_btn = elem.find_elements(By.CSS_SELECTOR, f'.{prefix}__wishlist-btn')
-                if wishlist_btn:
-                    listing_id = wishlist_btn[0].get_attribute('data-listing-id')
-                    listing_type = wishlist_btn[0].get_attribute('data-listing-type')
-                
-                # Extract agent or agency info
-                agent_name = elem.find_elements(By.CSS_SELECTOR, f'.{prefix}__agent-name')
-                
-                # Get property URL and make sure it's absolute
-                property_url = elem.get_attribute('href') or ''
-                if property_url and not property_url.startswith('http'):
-                    # Extract domain from the base URL
-                    domain = self.base_url.split('/')[2] if '//' in self.base_url else self.base_url.split('/')[0]
-                    if '//' in self.base_url:
-                        scheme = self.base_url.split('/')[0] + '//'
-                    else:
-                        scheme = 'https://'
-                    property_url = f"{scheme}{domain}{property_url}"
-                
-                # Create comprehensive property data
-                property_data = {
-                    'title': title[0].text.strip() if title else 'No Title',
-                    'price': price[0].text.strip() if price else 'No Price',
-                    'location': location[0].text.strip() if location else 'No Location',
-                    'description': description[0].text.strip() if description else '',
-                    'features': features,
-                    'listing_id': listing_id,
-                    'listing_type': listing_type,
-                    'is_featured': is_featured,
-                    'agent': agent_name[0].text.strip() if agent_name else '',
-                    'url': property_url,
-                    'image_url': image[0].get_attribute('src') if image else None
-                }
-                
-                logger.debug(f"Extracted property from Private Property with Selenium: {property_data['title']}")
-                logger.debug(f"Image URL: {property_data['image_url']}")
+        """Extract property data from Selenium elements using the site's compiled schema"""
+        if not property_elements:
+            return
+        
+        logger.info(f"Using Selenium extraction schema for {self.site_schema.name}")
+        
+        try:
+            # WebElement.parent is the driver; all cards are read in one script call
+            driver = property_elements[0].parent
+            for property_data in self.site_schema.extract_selenium(driver, property_elements, self.base_url):
+                if not self.is_new(property_data):
+                    continue
                 self.properties.append(property_data)
+                logger.debug(f"Extracted property with Selenium: {property_data.get('title')}")
                 
-            except Exception as e:
-                logger.error(f"Error extracting Private Property data with Selenium: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error extracting property data with Selenium: {str(e)}")
     
     def save_properties(self):
         """Save the scraped properties to JSON file"""
@@ -500,92 +755,62 @@ class ImprovedPropertyScraper:
     
     def has_next_page(self, soup):
         """Check if there is a next page available based on pagination elements"""
-        for selector in self.pagination_selectors:
+        for selector in self.ordered_selectors('pagination', self.pagination_selectors):
             try:
-                next_button = soup.select_one(selector)
-                if next_button:
+                with SELECTOR_STATS.timer('pagination', selector) as timer:
+                    next_button = soup.select_one(selector)
                     # Check if the next button is disabled
-                    disabled = next_button.get('disabled') or 'disabled' in next_button.get('class', [])
-                    if not disabled:
-                        return True
+                    timer.hit = bool(next_button) and not (next_button.get('disabled') or 'disabled' in next_button.get('class', []))
+                if timer.hit:
+                    self.remember_selectors('pagination', [selector])
+                    return True
             except Exception as e:
                 logger.debug(f"Error checking pagination with selector {selector}: {str(e)}")
         return False
     
     def has_next_page_selenium(self, driver):
         """Check if there is a next page available using Selenium"""
-        for selector in self.pagination_selectors:
+        for selector in self.ordered_selectors('pagination', self.pagination_selectors):
             try:
-                next_buttons = driver.find_elements(By.CSS_SELECTOR, selector)
-                if next_buttons and len(next_buttons) > 0:
+                with SELECTOR_STATS.timer('pagination_selenium', selector) as timer:
+                    next_buttons = driver.find_elements(By.CSS_SELECTOR, selector)
                     # Check if the next button is disabled
-                    disabled = next_buttons[0].get_attribute('disabled') or 'disabled' in (next_buttons[0].get_attribute('class') or '')
-                    if not disabled:
-                        return True
+                    timer.hit = bool(next_buttons) and not (next_buttons[0].get_attribute('disabled') or 'disabled' in (next_buttons[0].get_attribute('class') or ''))
+                if timer.hit:
+                    self.remember_selectors('pagination', [selector])
+                    return True
             except Exception as e:
                 logger.debug(f"Error checking pagination with Selenium selector {selector}: {str(e)}")
         return False
     
     def get_next_page_url(self, soup, current_url, current_page):
         """Extract the URL of the next page while preserving all query parameters"""
-        # First try to find a direct link to the next page
-        for selector in self.pagination_selectors:
+        # The inferred URL template builds the URL without rescanning the page
+        if self.pagination_model:
+            return self.pagination_model.next_url(current_page)
+        
+        # Otherwise try to find a direct link to the next page
+        for selector in self.ordered_selectors('pagination', self.pagination_selectors):
             try:
                 next_button = soup.select_one(selector)
                 if next_button and next_button.get('href'):
-                    next_url = next_button.get('href')
                     # Handle relative URLs
-                    if next_url.startswith('/'):
-                        parsed_url = urlparse(current_url)
-                        next_url = f"{parsed_url.scheme}://{parsed_url.netloc}{next_url}"
-                    
-                    # If the next URL doesn't have sorttype but original does, add it
-                    if 'sorttype=' in current_url and 'sorttype=' not in next_url:
-                        parsed_current = urlparse(current_url)
-                        parsed_next = urlparse(next_url)
-                        
-                        # Extract sorttype from current URL
-                        current_query = {k: v for k, v in [param.split('=') for param in parsed_current.query.split('&')] if param}
-                        
-                        # Preserve important query parameters
-                        for param in ['sorttype', 'sort', 'order']:
-                            if param in current_query and param not in next_url:
-                                next_url = self._add_query_param(next_url, param, current_query[param])
+                    next_url = urljoin(current_url, next_button.get('href'))
                     
-                    return next_url
+                    # If the next URL lost the sort order of the current one, add it back
+                    return preserve_query_params(next_url, current_url)
             except Exception:
                 continue
         
         # If no direct link found, construct the URL with page parameter
         # While preserving all other query parameters
-        from urllib.parse import parse_qsl, urlencode
-        parsed_url = urlparse(current_url)
-        path = parsed_url.path
-        query_dict = dict(parse_qsl(parsed_url.query))
-        
-        # Update or add page parameter
-        query_dict['page'] = str(current_page + 1)
-        
-        # Reconstruct query string
-        query_string = urlencode(query_dict)
-        
-        return f"{parsed_url.scheme}://{parsed_url.netloc}{path}?{query_string}"
-    
-    def _add_query_param(self, url, param_name, param_value):
-        """Helper method to add a query parameter to a URL"""
-        if '?' in url:
-            return f"{url}&{param_name}={param_value}"
-        else:
-            return f"{url}?{param_name}={param_value}"
+        return set_query_param(current_url, 'page', current_page + 1)
 
     def click_next_page_selenium(self, driver):
         """Click on the next page button using Selenium, preserving query parameters"""
         original_url = driver.current_url
-        parsed_original = urlparse(original_url)
-        original_query = {k: v for k, v in [param.split('=') if '=' in param else (param, '') 
-                         for param in parsed_original.query.split('&')] if k}
         
-        for selector in self.pagination_selectors:
+        for selector in self.ordered_selectors('pagination', self.pagination_selectors):
             try:
                 next_buttons = driver.find_elements(By.CSS_SELECTOR, selector)
                 if next_buttons and len(next_buttons) > 0 and next_buttons[0].is_displayed():
@@ -599,14 +824,9 @@ class ImprovedPropertyScraper:
                         
                         # Check if important parameters are preserved
                         new_url = driver.current_url
-                        parsed_new = urlparse(new_url)
-                        new_query = {k: v for k, v in [param.split('=') if '=' in param else (param, '') 
-                                   for param in parsed_new.query.split('&')] if k}
-                        
-                        # Check if sorttype was lost
-                        if 'sorttype' in original_query and 'sorttype' not in new_query:
+                        preserved_url = preserve_query_params(new_url, original_url)
+                        if preserved_url != new_url:
                             logger.info("Sort parameter was lost during navigation, preserving it")
-                            preserved_url = self._add_query_param(new_url, 'sorttype', original_query['sorttype'])
                             driver.get(preserved_url)
                             time.sleep(3)
                         
@@ -615,36 +835,385 @@ class ImprovedPropertyScraper:
                 logger.debug(f"Error clicking next page with selector {selector}: {str(e)}")
         return False
     
-    def scrape(self, max_pages=None):
-        """Main scraping method with multiple strategies and auto pagination"""
+    def iter_properties(self, max_pages=None, keep=True):
+        """
+        Crawl the result pages lazily, yielding each property as soon as it is extracted
+        
+        Nothing is fetched ahead of the consumer: stopping the iteration (break,
+        or close() on the generator) cancels the crawl before the next card is
+        extracted or the next page is requested. Yielded properties are also
+        appended to self.properties unless keep is False, in which case memory
+        use does not grow with the number of properties.
+        
+        A page that fails with both requests and Selenium is retried up to
+        max_retries times; after that the crawl stops.
+        
+        Args:
+            max_pages (int): Highest page number to crawl (None for all)
+            keep (bool): Keep yielded properties in self.properties
+        
+        Yields:
+            tuple: (property, meta) where meta is
+                {'page': n, 'position': index on the page, 'index': index overall,
+                 'url': page URL, 'engine': 'requests' or 'selenium'}
+        """
+        page = 1
+        next_url = self.base_url
+        index = 0
+        retries = 0
+        
+        try:
+            while next_url and (max_pages is None or page <= max_pages):
+                url = next_url
+                logger.info(f"Processing page {page}")
+                
+                # Try requests first, extracting one card at a time
+                position = 0
+                found = 0
+                next_url = False
+                response = None
+                if canonicalize_url(url) not in self.scraped_pages:
+                    try:
+                        response, verdict = self.fetch_with_verdict(url)
+                    except Exception as e:
+                        logger.error(f"Error in requests scraping: {str(e)}")
+                
+                if response is not None:
+                    soup = BeautifulSoup(response.text, 'html.parser')
+                    for property_data in self.iter_page_properties(soup, response.text):
+                        found += 1
+                        if not self.is_new(property_data):
+                            continue
+                        if keep:
+                            self.properties.append(property_data)
+                        meta = {'page': page, 'position': position, 'index': index,
+                                'url': url, 'engine': 'requests'}
+                        position += 1
+                        index += 1
+                        yield property_data, meta
+                    if found:
+                        self.scraped_pages.add(canonicalize_url(url))
+                        next_url = self.find_next_page_url(soup, response.text, url, page)
+                
+                # Fall back to Selenium if requests failed
+                if not found:
+                    logger.info(f"Falling back to Selenium for page {page}")
+                    before = len(self.properties)
+                    next_url = self.scrape_with_selenium(url=url, page=page)
+                    for property_data in self.properties[before:]:
+                        meta = {'page': page, 'position': position, 'index': index,
+                                'url': url, 'engine': 'selenium'}
+                        position += 1
+                        index += 1
+                        yield property_data, meta
+                    if not keep:
+                        del self.properties[before:]
+                
+                if next_url is False:
+                    # Both scraping methods failed
+                    retries += 1
+                    logger.warning(f"Both scraping methods failed on page {page}, retry {retries}/{self.max_retries}")
+                    if retries >= self.max_retries:
+                        logger.error(f"Maximum retries reached for page {page}, stopping")
+                        return
+                    next_url = url
+                else:
+                    page += 1
+                    retries = 0
+        finally:
+            if self.seen:
+                self.seen.flush()
+            logger.info(f"Property iteration ended after {index} properties")
+    
+    def checkpoint_state(self, sink, next_url, page, retries):
+        """
+        Flush the sink to disk and describe where the crawl stands
+        
+        Only pages that succeeded are recorded as scraped. While a scheduled
+        page has failed, the frontier points back at the first such page, so a
+        resumed crawl reschedules from there (skipping pages already scraped).
+        
+        Returns:
+            dict: State for CrawlCheckpoint.save()
+        """
+        offset = sink.flush(fsync=True)
+        if self.failed_pages and self.pagination_model:
+            page = min(self.failed_pages)
+            next_url = self.pagination_model.url_for(page)
+            retries = 0
+        return {
+            'base_url': self.base_url,
+            'next_url': next_url,
+            'page': page,
+            'retries': retries,
+            'scraped_pages': sorted(self.scraped_pages),
+            'failed_pages': sorted(self.failed_pages),
+            'pagination_model': self.pagination_model.to_dict() if self.pagination_model else None,
+            'sink_path': sink.path,
+            'sink_offset': offset,
+            'sink_count': len(self.properties),
+        }
+    
+    def restore_checkpoint(self, state):
+        """
+        Restore the frontier of an interrupted crawl and reopen its output
+        
+        The JSONL file is cut back to the checkpointed offset (records written
+        after the last checkpoint belong to pages that will be scraped again)
+        and its records are reloaded into self.properties.
+        
+        Returns:
+            JsonlSink: The sink, open for appending
+        """
+        self.scraped_pages = set(state.get('scraped_pages', []))
+        self.failed_pages = set(state.get('failed_pages', []))
+        if state.get('pagination_model'):
+            self.pagination_model = PaginationModel.from_dict(state['pagination_model'])
+        
+        sink = JsonlSink(self.jsonl_file, append=True, truncate_to=state.get('sink_offset', 0))
+        if sink.offset:
+            self.properties = list(read_jsonl(self.jsonl_file))
+        else:
+            self.properties = []
+        
+        if len(self.properties) != state.get('sink_count'):
+            logger.warning(f"Checkpoint expected {state.get('sink_count')} records, found {len(self.properties)}")
+        logger.info(f"Restored {len(self.properties)} properties and {len(self.scraped_pages)} scraped pages")
+        return sink
+    
+    def scrape_queue(self, queue, max_pages=None, worker_id=None, poll_interval=5):
+        """
+        Scrape result pages as tasks from a shared WorkQueue (see work_queue)
+        
+        Every worker started on the same queue is both producer and consumer:
+        it seeds the first page (a no-op if the task exists), then leases page
+        tasks until none are pending or leased. Each page enqueues the pages
+        its pagination links to and its next page, and task keys are canonical
+        URLs, so each page is queued once however many workers find it. A page
+        that fails with both requests and Selenium is failed back to the
+        queue, which retries it later or dead-letters it.
+        
+        Each worker appends its listings to its own shard in queue_shard_dir()
+        and checkpoints the shard's offset after every completed task, so a
+        restarted worker keeps what it already delivered. Once the queue is
+        drained the shards are merged into output_file.
+        
+        Delivery is at least once: a worker that dies after writing a page
+        but before completing its task leaves the page to be scraped again
+        (the merge drops the duplicates).
+        
+        Args:
+            queue (WorkQueue): Queue shared by every worker on this crawl
+            max_pages (int): Last page to scrape (None for all)
+            worker_id (str): Lease owner and shard name (host:pid by default; give
+                a restarted worker its old ID to continue its shard)
+            poll_interval (float): Seconds to wait while other workers hold the remaining tasks
+        
+        Returns:
+            int: Number of page tasks this worker completed
+        """
+        worker_id = worker_id or default_worker_id()
+        shard_path, checkpoint = self.queue_shard(worker_id)
+        state = checkpoint.load(self.base_url)
+        sink = JsonlSink(shard_path, append=True, truncate_to=state['sink_offset'] if state else 0)
+        
+        queue.put('page', {'url': self.base_url, 'page': 1}, key=canonicalize_url(self.base_url))
+        completed = 0
+        
+        try:
+            while True:
+                task = queue.lease(worker_id, kinds=['page'])
+                if task is None:
+                    if queue.unfinished() == 0:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                
+                url, page = task['payload']['url'], task['payload']['page']
+                logger.info(f"Processing page {page} (task {task['id']}, attempt {task['attempts']})")
+                before = len(self.properties)
+                try:
+                    next_url = False
+                    html_content = self.fetch_page(url)
+                    if html_content is not None:
+                        properties, next_url = self.parse_page(html_content, url, page)
+                        if properties:
+                            self.properties.extend(property_data for property_data in properties if self.is_new(property_data))
+                            self.scraped_pages.add(canonicalize_url(url))
+                        else:
+                            next_url = False
+                    
+                    if next_url is False:
+                        logger.info(f"Falling back to Selenium for page {page}")
+                        queue.extend(task)
+                        next_url = self.scrape_with_selenium(url=url, page=page)
+                except Exception as e:
+                    logger.error(f"Error scraping page {page}: {str(e)}")
+                    next_url = False
+                
+                if next_url is False:
+                    del self.properties[before:]
+                    queue.fail(task, f"No properties found on {url}")
+                    continue
+                
+                # Queue the pages this one revealed: every page the pagination links
+                # to (if this worker knows the URL template) and the next page
+                if self.pagination_model:
+                    model = self.pagination_model
+                    added = queue.put_many(
+                        ('page', {'url': model.url_for(n), 'page': n}, canonicalize_url(model.url_for(n)))
+                        for n in model.page_numbers(start_page=page + 1, max_pages=max_pages))
+                    if added:
+                        logger.info(f"Queued {added} pages from {model}")
+                if next_url and (max_pages is None or page < max_pages):
+                    queue.put('page', {'url': next_url, 'page': page + 1}, key=canonicalize_url(next_url))
+                
+                # Results are durable (and the shard offset recorded) before the task is marked done
+                sink.write_many(self.properties[before:])
+                checkpoint.save({'base_url': self.base_url, 'worker_id': worker_id, 'sink_path': shard_path,
+                                 'sink_offset': sink.flush(fsync=True)})
+                if self.store:
+                    self.store.upsert_many(self.properties[before:])
+                if self.seen:
+                    self.seen.flush()
+                if queue.complete(task):
+                    completed += 1
+                logger.info(f"Completed page {page}: {len(self.properties) - before} properties")
+        except BaseException:
+            sink.close()
+            logger.info("Scraping interrupted; leased tasks return to the queue when their leases expire")
+            raise
+        sink.close()
+        
+        counts = queue.counts()
+        logger.info(f"Queue drained: this worker completed {completed} pages and found {len(self.properties)} "
+                    f"properties; queue totals {counts}")
+        if counts.get('dead'):
+            logger.warning(f"{counts['dead']} page tasks were dead-lettered; requeue them with retry_dead()")
+        
+        total = self.merge_queue_shards()
+        if total:
+            logger.info(f"Saved {total} properties from every worker's shard to {self.output_file}")
+        else:
+            logger.warning("No properties found by any worker")
+        
+        SELECTOR_STATS.save_snapshot()
+        return completed
+    
+    def queue_shard_dir(self):
+        """Directory holding the per-worker shards of a queue-driven crawl"""
+        return os.path.splitext(self.output_file)[0] + '.shards'
+    
+    def queue_shard(self, worker_id):
+        """
+        A worker's shard and the checkpoint recording how much of it is complete
+        
+        Returns:
+            tuple: (JSONL shard path, CrawlCheckpoint)
+        """
+        name = 'worker_' + re.sub(r'[^A-Za-z0-9_.-]', '_', worker_id)
+        shard_dir = self.queue_shard_dir()
+        suffix = '.jsonl.gz' if self.jsonl_file.endswith('.gz') else '.jsonl'
+        return (os.path.join(shard_dir, name + suffix),
+                CrawlCheckpoint(os.path.join(shard_dir, name + '.checkpoint.json')))
+    
+    def merge_queue_shards(self):
+        """
+        Merge every worker's shard into jsonl_file and output_file
+        
+        Each shard is read up to its checkpointed offset and listings are kept
+        once. Workers that finish together take turns under a flock, and each
+        merge reads every shard, so whichever runs last leaves output_file
+        complete.
+        
+        Returns:
+            int: Number of listings written
+        """
+        shard_dir = self.queue_shard_dir()
+        os.makedirs(shard_dir, exist_ok=True)
+        with open(os.path.join(shard_dir, 'merge.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                paths = []
+                ends = {}
+                for name in sorted(os.listdir(shard_dir)):
+                    if not name.endswith('.checkpoint.json'):
+                        continue
+                    state = CrawlCheckpoint(os.path.join(shard_dir, name)).load(self.base_url)
+                    if state:
+                        paths.append(state['sink_path'])
+                        ends[state['sink_path']] = state['sink_offset']
+                
+                sink = JsonlSink(self.jsonl_file)
+                merge_jsonl(paths, sink, key=property_key, ends=ends)
+                if sink.count:
+                    return sink.finalize(self.output_file)
+                sink.close()
+                return 0
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    
+    def scrape(self, max_pages=None, resume=False, queue=None, worker_id=None):
+        """
+        Main scraping method with multiple strategies and auto pagination
+        
+        Args:
+            max_pages (int): Last page to scrape (None for all)
+            resume (bool): Continue from the checkpoint of an interrupted crawl of
+                the same base_url instead of starting over
+            queue (WorkQueue): Scrape pages as tasks from this queue instead, so
+                several workers can drain one crawl (see scrape_queue)
+            worker_id (str): This worker's name on the queue (see scrape_queue)
+        """
+        if queue is not None:
+            return self.scrape_queue(queue, max_pages=max_pages, worker_id=worker_id)
+        
         total_properties = 0
         page = 1
         next_url = self.base_url  # Start with full base_url (including query params)
         retries = 0
         
-        while next_url and (max_pages is None or page <= max_pages):
-            logger.info(f"Processing page {page}")
-            
-            # Try requests first
-            next_url_result = self.scrape_with_requests(url=next_url, page=page)
-            
-            if next_url_result:
-                if isinstance(next_url_result, str):  # It's a URL for the next page
-                    logger.info(f"Successfully scraped page {page} with requests")
-                    next_url = next_url_result
-                    page += 1
-                    retries = 0  # Reset retries on success
-                else:
-                    # No more pages to scrape
-                    next_url = None
-            else:
-                # Fall back to Selenium if requests failed
-                logger.info(f"Falling back to Selenium for page {page}")
-                next_url_result = self.scrape_with_selenium(url=next_url, page=page)
+        checkpoint = CrawlCheckpoint(self.checkpoint_file)
+        state = checkpoint.load(self.base_url) if resume else None
+        
+        # Properties are streamed to JSONL as each page completes
+        if state:
+            sink = self.restore_checkpoint(state)
+            next_url, page, retries = state['next_url'], state['page'], state.get('retries', 0)
+        else:
+            sink = JsonlSink(self.jsonl_file)
+        written = len(self.properties)
+        
+        def save_progress(*args):
+            # Append the new records, then record a frontier that points past them
+            nonlocal written
+            sink.write_many(self.properties[written:])
+            if self.store:
+                self.store.upsert_many(self.properties[written:])
+            written = len(self.properties)
+            checkpoint.save(self.checkpoint_state(sink, next_url, page, retries))
+            if self.seen:
+                # Only after the checkpoint: a resumed crawl must not skip its own listings
+                self.seen.flush()
+        
+        try:
+            while next_url and (max_pages is None or page <= max_pages):
+                # Once the first page has revealed the URL template, fetch the pages
+                # the pagination links to together, then follow on from the last one
+                if self.pagination_model and 2 <= page <= self.pagination_model.last_linked_page:
+                    next_url, page = self.scrape_scheduled_pages(page, max_pages, on_page=save_progress)
+                    retries = 0
+                    save_progress()
+                    continue
+                
+                logger.info(f"Processing page {page}")
+                
+                # Try requests first
+                next_url_result = self.scrape_with_requests(url=next_url, page=page)
                 
                 if next_url_result:
                     if isinstance(next_url_result, str):  # It's a URL for the next page
-                        logger.info(f"Successfully scraped page {page} with Selenium")
+                        logger.info(f"Successfully scraped page {page} with requests")
                         next_url = next_url_result
                         page += 1
                         retries = 0  # Reset retries on success
@@ -652,31 +1221,65 @@ class ImprovedPropertyScraper:
                         # No more pages to scrape
                         next_url = None
                 else:
-                    # Both scraping methods failed
-                    retries += 1
-                    logger.warning(f"Both scraping methods failed on page {page}, retry {retries}/{self.max_retries}")
+                    # Fall back to Selenium if requests failed
+                    logger.info(f"Falling back to Selenium for page {page}")
+                    next_url_result = self.scrape_with_selenium(url=next_url, page=page)
                     
-                    if retries >= self.max_retries:
-                        logger.error(f"Maximum retries reached for page {page}, moving to next page")
-                        # Attempt to construct next page URL
-                        next_url = f"{self.base_url}?page={page + 1}"
-                        page += 1
-                        retries = 0
-            
-            # Add a random delay between requests
-            time.sleep(random.uniform(2, 5))
+                    if next_url_result:
+                        if isinstance(next_url_result, str):  # It's a URL for the next page
+                            logger.info(f"Successfully scraped page {page} with Selenium")
+                            next_url = next_url_result
+                            page += 1
+                            retries = 0  # Reset retries on success
+                        else:
+                            # No more pages to scrape
+                            next_url = None
+                    else:
+                        # Both scraping methods failed
+                        retries += 1
+                        logger.warning(f"Both scraping methods failed on page {page}, retry {retries}/{self.max_retries}")
+                        
+                        if retries >= self.max_retries:
+                            logger.error(f"Maximum retries reached for page {page}, moving to next page")
+                            # Predict the next page URL, keeping the sort and filter parameters
+                            if self.pagination_model:
+                                next_url = self.pagination_model.next_url(page)
+                            else:
+                                next_url = set_query_param(preserve_query_params(self.base_url, next_url), 'page', page + 1)
+                            page += 1
+                            retries = 0
+                
+                # Append this page's properties to the JSONL output and checkpoint
+                save_progress()
+                
+                # Add a random delay between requests
+                time.sleep(random.uniform(2, 5))
             
-            # Save properties periodically (every 3 pages)
-            if page % 3 == 0:
-                self.save_properties()
+            sink.write_many(self.properties[written:])
+            if self.store:
+                self.store.upsert_many(self.properties[written:])
+            if self.seen:
+                self.seen.flush()
+        except BaseException:
+            # Keep the checkpoint: scrape(resume=True) continues from it
+            sink.close()
+            logger.info(f"Scraping interrupted; resume from checkpoint {self.checkpoint_file}")
+            raise
         
         total_properties = len(self.properties)
         logger.info(f"Scraping completed. Total properties found: {total_properties}")
         
         if total_properties > 0:
-            self.save_properties()
+            # One streaming pass from the JSONL file; nothing is rewritten along the way
+            sink.finalize(self.output_file)
+            logger.info(f"Saved {total_properties} properties to {self.output_file}")
         else:
+            sink.close()
             logger.warning("No properties found across all pages and methods")
+        checkpoint.clear()
+        
+        # Keep a record of how each selector performed on this run
+        SELECTOR_STATS.save_snapshot()
 
 #############################################################################
 # SECTION 2: AGENT CONTACT INFO EXTRACTOR 
@@ -688,6 +1291,8 @@ def extract_agent_contact_info(url, headless=True, timeout=30):
     Extract agent contact information from a property listing page
     """
     driver = None
+    semaphore = shared_browser_semaphore()
+    slot = None
     try:
         # Setup Selenium options
         options = Options()
@@ -698,6 +1303,10 @@ def extract_agent_contact_info(url, headless=True, timeout=30):
         options.add_argument("--disable-dev-shm-usage")
         options.add_argument("--window-size=1920,1080")
         
+        # Hold a machine-wide browser slot for as long as this browser runs
+        if semaphore:
+            slot = semaphore.acquire()
+        
         # Use Service with CHROMEDRIVER_PATH or default system path
         chromedriver_path = os.environ.get("CHROMEDRIVER_PATH", "/usr/bin/chromedriver")
         try:
@@ -713,6 +1322,9 @@ def extract_agent_contact_info(url, headless=True, timeout=30):
 
         # Navigate to the page
         logger.info(f"Navigating to: {url}")
+        rate_limiter = shared_rate_limiter()
+        if rate_limiter:
+            rate_limiter.acquire(url)
         driver.get(url)
         
         # Wait for the page to load
@@ -737,14 +1349,18 @@ def extract_agent_contact_info(url, headless=True, timeout=30):
                 "button.btn.outline"
             ]
             
-            for selector in button_selectors:
+            # Any of them finds the same button, so the best-performing ones go first
+            for selector in SELECTOR_STATS.ordered('contact_button', button_selectors):
                 try:
-                    if selector.startswith("//"):  # XPath
-                        buttons = driver.find_elements(By.XPATH, selector)
-                    else:  # CSS
-                        buttons = driver.find_elements(By.CSS_SELECTOR, selector)
+                    # Only the lookup is timed, not the scrolling, waiting and clicking
+                    with SELECTOR_STATS.timer('contact_button', selector) as timer:
+                        if selector.startswith("//"):  # XPath
+                            buttons = driver.find_elements(By.XPATH, selector)
+                        else:  # CSS
+                            buttons = driver.find_elements(By.CSS_SELECTOR, selector)
+                        timer.hit = bool(buttons)
                     
-                    if buttons and len(buttons) > 0:
+                    if buttons:
                         # Scroll to the button
                         driver.execute_script("arguments[0].scrollIntoView(true);", buttons[0])
                         time.sleep(1)
@@ -767,11 +1383,21 @@ def extract_agent_contact_info(url, headless=True, timeout=30):
                 # Filter to likely phone numbers and limit to first 3
                 contact_info['phone_numbers'] = [p for p in phone_matches if len(re.sub(r'\D', '', p)) >= 9][:3]
             
+            # Agent and agency details (with the contact form's data-* attributes) key the contact cache
+            try:
+                agent = extract_agent_details(page_text)
+                if agent:
+                    contact_info['agent'] = agent
+            except Exception as agent_err:
+                logger.debug(f"Could not extract agent details: {agent_err}")
+            
             # Look for agent name
             try:
                 agent_selectors = ['.agent-name', '.listing-agent-name', '.agent-details__name']
                 for selector in agent_selectors:
-                    elements = driver.find_elements(By.CSS_SELECTOR, selector)
+                    with SELECTOR_STATS.timer('agent_name', selector) as timer:
+                        elements = driver.find_elements(By.CSS_SELECTOR, selector)
+                        timer.hit = bool(elements)
                     if elements and len(elements) > 0:
                         contact_info['agent_name'] = elements[0].text.strip()
                         break
@@ -780,6 +1406,8 @@ def extract_agent_contact_info(url, headless=True, timeout=30):
                 
         except Exception as e:
             logger.error(f"Error extracting contact info: {str(e)}")
+            # Whatever was found is returned, but it is not conclusive enough to cache
+            contact_info['extraction_error'] = str(e)
             
         return contact_info
             
@@ -789,7 +1417,85 @@ def extract_agent_contact_info(url, headless=True, timeout=30):
     finally:
         if driver:
             driver.quit()
+        if slot is not None:
+            semaphore.release(slot)
+
+def get_agent_contact_info(property_data, url, cache=None):
+    """
+    Contact information for a listing, launching a browser only on a cache miss
+    
+    The listing's own cached record is used first, then a record cached for
+    the same agent or agency (by the card's agent name). A listing whose
+    page loaded without contact details is not reopened until its negative
+    entry expires. Browser failures, crashes and timeouts are not cached, so
+    the next request tries again.
+    
+    Args:
+        property_data (dict): The listing as scraped from the results page
+        url (str): Absolute URL of the listing page
+        cache (ContactCache): Defaults to the shared CONTACT_CACHE
+    
+    Returns:
+        dict: Contact information, or {"error": ..., "url": url}
+    """
+    cache = cache or CONTACT_CACHE
+    listing_id = property_data.get('listing_id') or url.rstrip('/').split('/')[-1]
+    card_keys = agent_keys(None, property_data.get('agent'))
+    
+    cached, source = cache.lookup(listing_id, card_keys)
+    if source == 'negative':
+        logger.info(f"Listing {listing_id} had no contact details recently, not reopening it: {cached.get('error')}")
+        return {"error": cached.get('error'), "url": url, "cached": True}
+    if cached is not None:
+        logger.info(f"Contact info for {listing_id} served from the {source} cache")
+        if source == 'agent':
+            cached = dict(cached, url=url, source='agent_cache')
+            cache.put(listing_id, cached)
+        return cached
+    
+    contact_info = extract_agent_contact_info(url, headless=True)
+    if not contact_info or 'error' in contact_info or 'extraction_error' in contact_info:
+        error = (contact_info or {}).get('error') or (contact_info or {}).get('extraction_error')
+        logger.warning(f"Contact lookup for {listing_id} failed, not caching it: {error}")
+    elif not has_contact_details(contact_info):
+        cache.put_failure(listing_id, 'No contact details on the listing page')
+    else:
+        keys = agent_keys(contact_info.get('agent'), contact_info.get('agent_name'), property_data.get('agent'))
+        cache.put(listing_id, contact_info, keys)
+    return contact_info
+
+def add_contact_info(property_data, url):
+    """
+    Add the agent's contact info (or the lookup error) to a listing that has a URL
+    
+    Args:
+        property_data (dict): The listing as scraped from the results page
+        url (str): URL of the results page, for listings with relative URLs
+    
+    Returns:
+        dict: property_data
+    """
+    if 'url' in property_data and property_data['url']:
+        property_url = property_data['url']
+        
+        # Make sure URL is absolute
+        if not property_url.startswith('http'):
+            parsed_base = urlparse(url)
+            base_url = f"{parsed_base.scheme}://{parsed_base.netloc}"
+            property_url = f"{base_url}{property_url}"
+        
+        # Extract contact info (from the contact cache when possible)
+        contact_info = get_agent_contact_info(property_data, property_url)
+        
+        # Add contact info to the property data
+        if contact_info:
+            if 'error' not in contact_info:
+                property_data['contact_info'] = contact_info
+            else:
+                property_data['contact_info_error'] = contact_info['error']
+    return property_data
 
+@SINGLE_FLIGHT.coalesce('latest')
 def handle_get_latest_listing_with_contact(url):
     """
     Get the latest property listing with contact info
@@ -804,41 +1510,26 @@ def handle_get_latest_listing_with_contact(url):
         logger.info(f"Getting latest listing from: {url}")
         
         # Always ensure we're sorting by newest for latest listing return
-        if '?' in url:
-            if 'sorttype=' not in url:
-                url = f"{url}&sorttype=3"  # Add sort by newest
-            else:
-                # Replace any existing sorttype with sorttype=3
-                url = re.sub(r'sorttype=\d+', 'sorttype=3', url)
-        else:
-            url = f"{url}?sorttype=3"  # Add sort by newest
+        url = set_query_param(url, 'sorttype', 3)
         
         logger.info(f"Using URL with sort parameter: {url}")
         
         scraper = ImprovedPropertyScraper(url)
-        next_url = scraper.base_url
-        page = 1
-
-        # Loop until we find a non-featured property or run out of pages
-        while next_url:
-            # try requests first, fallback to selenium
-            result = scraper.scrape_with_requests(url=next_url, page=page)
-            if result is False:
-                result = scraper.scrape_with_selenium(url=next_url, page=page)
-            
-            # advance or stop
-            if isinstance(result, str):
-                next_url = result
-                page += 1
-            else:
-                next_url = None
-            
-            # check for non-featured
-            non_featured = [p for p in scraper.properties if not p.get('is_featured', False)]
-            if non_featured:
-                latest_property = non_featured[0]
-                break
-        else:
+        
+        # Stream cards until the first non-featured one; closing the generator
+        # stops the crawl without touching any further cards or pages
+        latest_property = None
+        properties = scraper.iter_properties()
+        try:
+            for property_data, meta in properties:
+                if not property_data.get('is_featured', False):
+                    latest_property = property_data
+                    logger.info(f"Latest listing is card {meta['position'] + 1} on page {meta['page']}")
+                    break
+        finally:
+            properties.close()
+        
+        if latest_property is None:
             return {
                 "success": False,
                 "message": "No non-featured properties found",
@@ -846,24 +1537,7 @@ def handle_get_latest_listing_with_contact(url):
             }
         
         # If the property has a URL, get contact info
-        if 'url' in latest_property and latest_property['url']:
-            property_url = latest_property['url']
-            
-            # Make sure URL is absolute
-            if not property_url.startswith('http'):
-                parsed_base = urlparse(url)
-                base_url = f"{parsed_base.scheme}://{parsed_base.netloc}"
-                property_url = f"{base_url}{property_url}"
-                
-            # Extract contact info
-            contact_info = extract_agent_contact_info(property_url, headless=True)
-            
-            # Add contact info to the property data
-            if contact_info:
-                if 'error' not in contact_info:
-                    latest_property['contact_info'] = contact_info
-                else:
-                    latest_property['contact_info_error'] = contact_info['error']
+        add_contact_info(latest_property, url)
         
         return {
             "success": True,
@@ -878,6 +1552,30 @@ def handle_get_latest_listing_with_contact(url):
             "url": url
         }
 
+def collect_non_featured(scraper, num_listings):
+    """
+    Stream listings until the target number of non-featured ones is reached
+    
+    Closing the generator stops the crawl before any further page is fetched.
+    
+    Returns:
+        tuple: (non-featured properties, number of pages visited)
+    """
+    non_featured_properties = []
+    pages = 0
+    properties = scraper.iter_properties()
+    try:
+        for property_data, meta in properties:
+            pages = meta['page']
+            if not property_data.get('is_featured', False):
+                non_featured_properties.append(property_data)
+                if len(non_featured_properties) >= num_listings:
+                    break
+    finally:
+        properties.close()
+    return non_featured_properties, pages
+
+@SINGLE_FLIGHT.coalesce('multiple')
 def handle_scrape_multiple_listings(url, num_listings=10):
     """
     Scrape multiple property listings
@@ -899,11 +1597,9 @@ def handle_scrape_multiple_listings(url, num_listings=10):
         # Create a scraper with the temp output file
         scraper = ImprovedPropertyScraper(url, output_file=temp_output)
         
-        # Calculate how many pages to scrape based on average 10 listings per page
-        estimated_pages = max(1, int(num_listings / 10) + 1)
-        
-        # Scrape the pages
-        scraper.scrape(max_pages=estimated_pages)
+        non_featured_properties, pages = collect_non_featured(scraper, num_listings)
+        logger.info(f"Collected {len(non_featured_properties)} non-featured listings from {pages} pages")
+        scraper.save_properties()
         
         # Check if we got any properties
         if not scraper.properties:
@@ -913,9 +1609,6 @@ def handle_scrape_multiple_listings(url, num_listings=10):
                 "url": url
             }
         
-        # Filter out featured properties
-        non_featured_properties = [p for p in scraper.properties if not p.get('is_featured', False)]
-        
         # If no non-featured properties found
         if not non_featured_properties:
             return {
@@ -924,13 +1617,10 @@ def handle_scrape_multiple_listings(url, num_listings=10):
                 "url": url
             }
         
-        # Limit to requested number
-        limited_properties = non_featured_properties[:num_listings]
-        
         return {
             "success": True,
-            "count": len(limited_properties),
-            "properties": limited_properties
+            "count": len(non_featured_properties),
+            "properties": non_featured_properties
         }
         
     except Exception as e:
@@ -941,6 +1631,438 @@ def handle_scrape_multiple_listings(url, num_listings=10):
             "url": url
         }
 
+def handle_delta_crawl(url, stop_after=DELTA_STOP_AFTER, max_pages=DELTA_MAX_PAGES, db_path=DELTA_STORE_DB):
+    """
+    Crawl only the listings added since the last crawl
+    
+    Results are sorted newest first, so once `stop_after` consecutive
+    non-featured listings are already in the store every later page holds
+    only older listings and the crawl stops. Featured listings are pinned
+    to the top regardless of age and are not counted. Every listing seen is
+    upserted page by page (and up to the failure if the crawl breaks off),
+    so the next delta crawl stops at this one's newest listing.
+    
+    Args:
+        url (str): URL of the property listings page
+        stop_after (int): Consecutive known listings that end the crawl
+        max_pages (int): Highest page number to crawl
+        db_path (str): PropertyStore database holding the seen listings
+        
+    Returns:
+        dict: The new (non-featured) listings
+    """
+    try:
+        url = set_query_param(url, 'sorttype', 3)
+        logger.info(f"Delta crawl of {url}, stopping after {stop_after} known listings")
+        
+        scraper = ImprovedPropertyScraper(url)
+        new_properties = []
+        seen_properties = []
+        seen_ids = set()  # Listings pushed onto the next page mid-crawl show up twice
+        consecutive_known = 0
+        pages = 0
+        stopped_early = False
+        
+        result = {}
+        with PropertyStore(db_path) as store:
+            def save(batch):
+                for key, value in store.upsert_many(batch).items():
+                    result[key] = result.get(key, 0) + value
+            
+            properties = scraper.iter_properties(max_pages=max_pages, keep=False)
+            try:
+                for property_data, meta in properties:
+                    # Each finished page is stored before the next one is read
+                    if meta['page'] != pages and seen_properties:
+                        save(seen_properties)
+                        seen_properties = []
+                    pages = meta['page']
+                    seen_properties.append(property_data)
+                    if property_data.get('is_featured', False):
+                        continue
+                    
+                    listing_id = property_data.get('listing_id')
+                    if listing_id and (listing_id in seen_ids or store.is_known(listing_id)):
+                        consecutive_known += 1
+                        if consecutive_known >= stop_after:
+                            stopped_early = True
+                            break
+                    else:
+                        consecutive_known = 0
+                        new_properties.append(property_data)
+                    if listing_id:
+                        seen_ids.add(listing_id)
+            finally:
+                properties.close()
+                # Listings read before an error are stored too
+                save(seen_properties)
+        
+        logger.info(f"Delta crawl found {len(new_properties)} new listings on {pages} pages "
+                    f"({'stopped at known listings' if stopped_early else 'no known listings reached'}), "
+                    f"store: {result}")
+        
+        return {
+            "success": True,
+            "count": len(new_properties),
+            "pages": pages,
+            "stopped_early": stopped_early,
+            "properties": new_properties
+        }
+        
+    except Exception as e:
+        logger.error(f"Error in handle_delta_crawl: {str(e)}")
+        return {
+            "success": False,
+            "message": f"Error in delta crawl: {str(e)}",
+            "url": url
+        }
+
+def handle_export_multiple_listings_excel(url, num_listings=10):
+    """
+    Scrape multiple property listings into an Excel workbook
+    
+    Rows are written as listings stream in and the scraper keeps none of
+    them, so memory stays flat however many listings are requested.
+    
+    Args:
+        url (str): URL of the property listings page
+        num_listings (int): Number of listings to export
+        
+    Returns:
+        dict: {"success", "count", "filename", "content": xlsx bytes} or an error
+    """
+    if not has_openpyxl:
+        return {
+            "success": False,
+            "message": "Excel export requires the openpyxl package",
+            "url": url
+        }
+    
+    try:
+        logger.info(f"Exporting {num_listings} listings from {url} to Excel")
+        
+        scraper = ImprovedPropertyScraper(url)
+        writer = ExcelStreamWriter()
+        
+        properties = scraper.iter_properties(keep=False)
+        try:
+            for property_data, meta in properties:
+                if not property_data.get('is_featured', False):
+                    writer.write(property_data)
+                    if writer.count >= num_listings:
+                        break
+        finally:
+            properties.close()
+        
+        if not writer.count:
+            return {
+                "success": False,
+                "message": "No non-featured properties found",
+                "url": url
+            }
+        
+        return {
+            "success": True,
+            "count": writer.count,
+            "filename": f"listings_{time.strftime('%Y%m%d_%H%M%S')}.xlsx",
+            "content": writer.to_bytes()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error in handle_export_multiple_listings_excel: {str(e)}")
+        return {
+            "success": False,
+            "message": f"Error exporting listings: {str(e)}",
+            "url": url
+        }
+
+def handle_crawl_listings(url, max_pages=None, resume=False, contacts=False):
+    """
+    Crawl every results page of a URL, resumably
+    
+    The output and checkpoint live at a temp path derived from the URL, so
+    when an invocation is cut short (e.g. by the function timeout) calling
+    again with resume=True continues where it stopped instead of refetching
+    finished pages.
+    
+    With contacts=True every listing also gets its agent's contact info. That
+    crawl runs through the staged pipeline (see crawl_pipeline), so browser
+    contact lookups overlap with fetching and parsing later pages; it keeps
+    no checkpoint, so resume does not apply to it.
+    
+    Args:
+        url (str): URL of the property listings page
+        max_pages (int): Last page to crawl (None for all)
+        resume (bool): Continue from the last checkpoint for this URL
+        contacts (bool): Add agent contact info to every listing
+        
+    Returns:
+        dict: Crawled property listings
+    """
+    try:
+        url_key = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+        output_file = os.path.join(tempfile.gettempdir(), f"crawl_{url_key}.json")
+        logger.info(f"Crawling {url} into {output_file}" + (" (resuming)" if resume else ""))
+        
+        scraper = ImprovedPropertyScraper(url, output_file=output_file)
+        stages = None
+        if contacts:
+            if resume:
+                logger.warning("Crawls with contact info keep no checkpoint; crawling from the first page")
+            result = crawl_listings(scraper, max_pages=max_pages,
+                                    enrich=lambda property_data: add_contact_info(property_data, url),
+                                    enrich_workers=CRAWL_CONTACT_WORKERS)
+            stages = result['stages']
+            scraper.save_properties()
+        else:
+            scraper.scrape(max_pages=max_pages, resume=resume)
+        
+        if not scraper.properties:
+            return {
+                "success": False,
+                "message": "No properties found",
+                "url": url
+            }
+        
+        response = {
+            "success": True,
+            "count": len(scraper.properties),
+            "pages": len(scraper.scraped_pages),
+            "properties": scraper.properties
+        }
+        if stages is not None:
+            response["stages"] = stages
+        return response
+        
+    except Exception as e:
+        logger.error(f"Error in handle_crawl_listings: {str(e)}")
+        return {
+            "success": False,
+            "message": f"Error crawling listings: {str(e)}",
+            "url": url,
+            "resumable": True
+        }
+
+def url_list(value):
+    """URLs from a JSON list or a comma/whitespace separated string, duplicates dropped"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = re.split(r'[\s,]+', value)
+    urls = []
+    seen = set()
+    for url in value:
+        url = str(url).strip()
+        if url and canonicalize_url(url) not in seen:
+            seen.add(canonicalize_url(url))
+            urls.append(url)
+    return urls
+
+def handle_batch_listings(urls, listing_urls=None, num_listings=10, max_workers=BATCH_MAX_WORKERS):
+    """
+    Scrape several search and listing URLs in one invocation
+    
+    The URLs are processed max_workers at a time over one HTTP connection
+    pool, one pool of at most BATCH_MAX_BROWSERS browsers and one per-host
+    rate limiter (the machine-wide one unless SHARED_LIMITS is off), so a
+    batch pays for session setup and browser launches once and stays as
+    polite as a single scraper.
+    
+    Args:
+        urls (list): Search results URLs; up to num_listings non-featured listings are scraped from each
+        listing_urls (list): Listing page URLs, each fetched and parsed without a browser
+        num_listings (int): Number of listings to scrape per search URL
+        max_workers (int): URLs processed concurrently
+        
+    Returns:
+        dict: Per-URL results in request order, plus totals
+    """
+    listing_urls = listing_urls or []
+    session = create_session(pool_size=max_workers * 4)
+    rate_limiter = shared_rate_limiter() or RateLimiter(BATCH_RATE, BATCH_BURST)
+    driver_pool = DriverPool(BATCH_MAX_BROWSERS)
+    shared = {'session': session, 'driver_pool': driver_pool, 'rate_limiter': rate_limiter}
+    
+    def scrape_search(url):
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.json') as tmp:
+            temp_output = tmp.name
+        try:
+            scraper = ImprovedPropertyScraper(url, output_file=temp_output, **shared)
+            properties, pages = collect_non_featured(scraper, num_listings)
+            if not properties:
+                return {"url": url, "type": "search", "success": False, "message": "No non-featured properties found"}
+            return {"url": url, "type": "search", "success": True, "count": len(properties),
+                    "pages": pages, "properties": properties}
+        except Exception as e:
+            logger.error(f"Error scraping {url} in batch: {str(e)}")
+            return {"url": url, "type": "search", "success": False, "message": f"Error scraping listings: {str(e)}"}
+        finally:
+            if os.path.exists(temp_output):
+                os.remove(temp_output)
+    
+    # One scraper fetches every listing page, for its anti-bot handling and cookie handoff
+    fetcher = ImprovedPropertyScraper(listing_urls[0], **shared) if listing_urls else None
+    
+    def scrape_listing(url):
+        try:
+            html_content = fetcher.fetch_page(url)
+            if html_content is None:
+                return {"url": url, "type": "listing", "success": False, "message": "Failed to fetch listing page"}
+            return {"url": url, "type": "listing", "success": True, "property": parse_listing_page(html_content, url)}
+        except Exception as e:
+            logger.error(f"Error scraping listing {url} in batch: {str(e)}")
+            return {"url": url, "type": "listing", "success": False, "message": f"Error scraping listing: {str(e)}"}
+    
+    try:
+        logger.info(f"Batch of {len(urls)} search and {len(listing_urls)} listing URLs, {max_workers} at a time")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(scrape_search, url) for url in urls]
+            futures += [executor.submit(scrape_listing, url) for url in listing_urls]
+            results = [future.result() for future in futures]
+    finally:
+        driver_pool.close()
+        session.close()
+    
+    succeeded = sum(1 for result in results if result["success"])
+    return {
+        "success": succeeded > 0,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "count": sum(result.get("count", 1) for result in results if result["success"]),
+        "results": results
+    }
+
+def run_multiple_listings_job(store, job_id, url, num_listings):
+    """
+    Job body for an asynchronous 'multiple' request
+    
+    Streams listings with keep=False, so memory stays flat however many are
+    requested, and hands each page's non-featured listings to the job store
+    as soon as the page is done. Stops early when the job is cancelled.
+    
+    Args:
+        store (JobStore): The job store
+        job_id (str): The job being run
+        url (str): URL of the property listings page
+        num_listings (int): Number of non-featured listings to collect
+        
+    Returns:
+        dict: Final progress
+    """
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.json') as tmp:
+        temp_output = tmp.name
+    scraper = ImprovedPropertyScraper(url, output_file=temp_output)
+    
+    progress = {'pages': 0, 'scanned': 0, 'count': 0, 'target': num_listings}
+    batch = []
+    
+    def flush_batch():
+        if batch:
+            store.append_results(job_id, batch)
+            progress['count'] += len(batch)
+            del batch[:]
+        store.update(job_id, progress=dict(progress), result_count=progress['count'])
+        return not store.cancel_requested(job_id)
+    
+    properties = scraper.iter_properties(keep=False)
+    try:
+        for property_data, meta in properties:
+            if meta['page'] != progress['pages']:
+                if progress['pages'] and not flush_batch():
+                    break
+                progress['pages'] = meta['page']
+            progress['scanned'] += 1
+            if not property_data.get('is_featured', False):
+                batch.append(property_data)
+                if progress['count'] + len(batch) >= num_listings:
+                    break
+    finally:
+        properties.close()
+        flush_batch()
+        if os.path.exists(temp_output):
+            os.remove(temp_output)
+    
+    logger.info(f"Job {job_id}: {progress['count']} non-featured listings from {progress['pages']} pages")
+    return progress
+
+def handle_submit_multiple_listings_job(url, num_listings=10):
+    """
+    Start scraping multiple listings in the background
+    
+    Returns at once; the scrape is not bounded by this invocation's timeout.
+    Poll handle_job_status with the returned job ID for progress and results.
+    
+    Args:
+        url (str): URL of the property listings page
+        num_listings (int): Number of listings to scrape
+        
+    Returns:
+        dict: The job ID and its initial status
+    """
+    try:
+        job = start_job(JOB_STORE, 'multiple', {'url': url, 'num_listings': num_listings},
+                        lambda store, job_id: run_multiple_listings_job(store, job_id, url, num_listings))
+        return {
+            "success": True,
+            "job_id": job['job_id'],
+            "status": job['status'],
+            "url": url,
+            "num_listings": num_listings
+        }
+    except Exception as e:
+        logger.error(f"Error in handle_submit_multiple_listings_job: {str(e)}")
+        return {
+            "success": False,
+            "message": f"Error starting job: {str(e)}",
+            "url": url
+        }
+
+def handle_job_status(job_id, offset=0, limit=None, cancel=False):
+    """
+    Status, progress and results of an asynchronous job
+    
+    Args:
+        job_id (str): ID returned when the job was submitted
+        offset (int): Index of the first result to return, so a client can
+            fetch only the results added since its last poll
+        limit (int): Maximum number of results to return (None for all)
+        cancel (bool): Ask the job to stop after the current page
+        
+    Returns:
+        dict: status ('queued', 'running', 'completed', 'cancelled', 'failed'
+            or 'stale' if the worker was lost, e.g. with its container; stale
+            jobs are not resumed), progress, result_count, results from offset
+            and next_offset
+    """
+    try:
+        if cancel:
+            JOB_STORE.request_cancel(job_id)
+        job = JOB_STORE.get(job_id, offset, limit)
+        if job is None:
+            return {
+                "success": False,
+                "message": f"Unknown job: {job_id}",
+                "job_id": job_id
+            }
+        return {
+            "success": job['status'] not in ('failed', 'stale'),
+            "job_id": job_id,
+            "status": job['status'],
+            "progress": job['progress'],
+            "result_count": job['result_count'],
+            "error": job['error'],
+            "offset": offset,
+            "next_offset": job['next_offset'],
+            "properties": job['results']
+        }
+    except Exception as e:
+        logger.error(f"Error in handle_job_status: {str(e)}")
+        return {
+            "success": False,
+            "message": f"Error reading job: {str(e)}",
+            "job_id": job_id
+        }
+
 #############################################################################
 # SECTION 3: APPWRITE FUNCTION COMPONENTS
 # (Main function handling)
@@ -954,7 +2076,7 @@ def main(context):
         'Access-Control-Allow-Origin': '*',
         'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
         'Access-Control-Allow-Headers': 'Content-Type, Authorization',
-        'Access-Control-Expose-Headers': 'Content-Disposition'
+        'Access-Control-Expose-Headers': 'Content-Disposition, X-Cache'
     }
     
     # Handle OPTIONS preflight requests
@@ -969,33 +2091,101 @@ def main(context):
         mode = body.get('mode') or params.get('mode', 'latest')
         url = body.get('url') or params.get('url', 'https://www.privateproperty.co.za/to-rent/western-cape/cape-town/55')
         
+        # cache=false skips the cached result (the fresh one is still stored)
+        use_cache = str(body.get('cache', params.get('cache', 'true'))).lower() not in ('0', 'false', 'no')
+        
         context.log(f"Processing request with mode: {mode}, url: {url}")
         
         if mode == 'multiple':
             # Handle multiple listings mode
             num_listings = int(body.get('num_listings') or params.get('num_listings', 10))
-            result = handle_scrape_multiple_listings(url, num_listings)
+            output_format = str(body.get('format') or params.get('format', 'json')).lower()
+            if str(body.get('async') or params.get('async', '')).lower() in ('1', 'true', 'yes'):
+                # Run in the background and answer with a job ID to poll
+                result = handle_submit_multiple_listings_job(url, num_listings)
+                return context.res.json(result, 202 if result["success"] else 200, headers=cors_headers)
+            if output_format in ('excel', 'xlsx'):
+                result = handle_export_multiple_listings_excel(url, num_listings)
+                if result["success"]:
+                    return context.res.send(result["content"], 200, headers={
+                        **cors_headers,
+                        'Content-Type': XLSX_CONTENT_TYPE,
+                        'Content-Disposition': f'attachment; filename="{result["filename"]}"'
+                    })
+                return context.res.json(result, headers=cors_headers)
+            result, cache_status = RESULT_CACHE.fetch(
+                {'mode': 'multiple', 'url': url, 'num_listings': num_listings},
+                lambda: handle_scrape_multiple_listings(url, num_listings),
+                use_cache=use_cache
+            )
+            return context.res.json(result, headers={**cors_headers, 'X-Cache': cache_status})
+        elif mode == 'batch':
+            # Handle batch mode: many search and/or listing URLs in one invocation
+            urls = url_list(body.get('urls') or params.get('urls'))
+            listing_urls = url_list(body.get('listing_urls') or params.get('listing_urls'))
+            if not urls and not listing_urls:
+                return context.res.json({
+                    "success": False,
+                    "message": "Batch mode needs 'urls' and/or 'listing_urls'"
+                }, 400, headers=cors_headers)
+            if len(urls) + len(listing_urls) > BATCH_MAX_URLS:
+                return context.res.json({
+                    "success": False,
+                    "message": f"Batch mode accepts at most {BATCH_MAX_URLS} URLs; submit larger sets as several batches"
+                }, 400, headers=cors_headers)
+            num_listings = int(body.get('num_listings') or params.get('num_listings', 10))
+            result = handle_batch_listings(urls, listing_urls, num_listings)
+            return context.res.json(result, headers=cors_headers)
+        elif mode == 'job':
+            # Handle job polling: status, progress and results from offset
+            job_id = body.get('job_id') or params.get('job_id', '')
+            offset = int(body.get('offset') or params.get('offset', 0))
+            limit = body.get('limit') or params.get('limit')
+            cancel = str(body.get('cancel') or params.get('cancel', '')).lower() in ('1', 'true', 'yes')
+            result = handle_job_status(job_id, offset, int(limit) if limit else None, cancel)
+            return context.res.json(result, headers=cors_headers)
+        elif mode == 'delta':
+            # Handle incremental mode: only listings added since the last delta crawl
+            stop_after = int(body.get('stop_after') or params.get('stop_after', DELTA_STOP_AFTER))
+            max_pages = int(body.get('max_pages') or params.get('max_pages', DELTA_MAX_PAGES))
+            result = handle_delta_crawl(url, stop_after, max_pages)
+            return context.res.json(result, headers=cors_headers)
+        elif mode == 'crawl':
+            # Handle full crawl mode; resume=true continues an interrupted crawl,
+            # contacts=true adds agent contact info to every listing
+            max_pages = body.get('max_pages') or params.get('max_pages')
+            resume = str(body.get('resume') or params.get('resume', '')).lower() in ('1', 'true', 'yes')
+            contacts = str(body.get('contacts') or params.get('contacts', '')).lower() in ('1', 'true', 'yes')
+            result = handle_crawl_listings(url, int(max_pages) if max_pages else None, resume, contacts)
             return context.res.json(result, headers=cors_headers)
         else:
             # Handle latest listing mode
-            result = handle_get_latest_listing_with_contact(url)
-            return context.res.json(result, headers=cors_headers)
-
+            result, cache_status = RESULT_CACHE.fetch(
+                {'mode': 'latest', 'url': url},
+                lambda: handle_get_latest_listing_with_contact(url),
+                use_cache=use_cache
+            )
+            return context.res.json(result, headers={**cors_headers, 'X-Cache': cache_status})
+    
     except Exception as e:
         context.error(f"Error in main function: {str(e)}")
         return context.res.json({
             "success": False,
             "message": f"Server error: {str(e)}"
         }, 500, headers=cors_headers)
+    
+    finally:
+        SELECTOR_STATS.save_snapshot()
 
 # Local testing
 if __name__ == "__main__":
     class MockRequest:
-        def __init__(self, mode='latest', url=None, num_listings=None, method='GET'):
+        def __init__(self, mode='latest', url=None, num_listings=None, method='GET', format=None):
             self.body = {
                 'mode': mode,
                 'url': url,
-                'num_listings': num_listings
+                'num_listings': num_listings,
+                'format': format
             }
             self.query = {}
             self.method = method
@@ -1058,4 +2248,16 @@ if __name__ == "__main__":
     context = MockContext(req, res)
     main(context)
     
+    # Test multiple listings as an Excel download
+    print("\n==== TEST 3: EXPORT MULTIPLE LISTINGS (30) TO EXCEL ====")
+    req = MockRequest(
+        mode='multiple', 
+        url='https://www.privateproperty.co.za/to-rent/western-cape/cape-town/55?sorttype=3', 
+        num_listings=30,
+        format='excel'
+    )
+    res = MockResponse()
+    context = MockContext(req, res)
+    main(context)
+    
     print("\nLocal testing completed!")
\ No newline at end of file
@@ -0,0 +1,226 @@
+import io
+import os
+import json
+import time
+import gzip
+import logging
+import tempfile
+import textwrap
+import threading
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+class JsonlSink:
+    """
+    Append-only JSON Lines writer for scraped records
+    
+    Records are encoded as they arrive and written in batches of
+    `buffer_size`, so each byte reaches the disk once. The file is fsynced
+    at most every `fsync_interval` seconds (and on close). With compression
+    on, every flush writes a complete gzip member: the file stays readable
+    up to the last flush even if the process dies, and `offset` is always a
+    safe point to truncate back to.
+    
+    finalize() turns the lines into the legacy pretty-printed JSON array
+    (what save_properties used to write) with an atomic rename.
+    """
+    
+    def __init__(self, path, compress=None, buffer_size=50, fsync_interval=5.0, append=False,
+                 truncate_to=None):
+        """
+        Args:
+            path (str): The JSONL file to write
+            compress (bool): Gzip the output (default: when path ends in .gz)
+            buffer_size (int): Records held in memory before a write
+            fsync_interval (float): Minimum seconds between fsyncs
+            append (bool): Keep records already in the file instead of truncating it
+            truncate_to (int): With append, first cut the file back to this offset
+                (a flush() return value), dropping anything written after it
+        """
+        self.path = path
+        self.compress = path.endswith('.gz') if compress is None else compress
+        self.buffer_size = buffer_size
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.count = 0
+        self.last_fsync = time.monotonic()
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if append and truncate_to is not None and os.path.exists(path):
+            if os.path.getsize(path) > truncate_to:
+                logger.info(f"Truncating {path} back to offset {truncate_to}")
+                os.truncate(path, truncate_to)
+        self.file = open(path, 'ab' if append else 'wb')
+        self.offset = self.file.tell()
+    
+    def write(self, record):
+        """Queue one record; it reaches the file with the next batch"""
+        line = json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n'
+        with self.lock:
+            self.buffer.append(line)
+            self.count += 1
+            if len(self.buffer) >= self.buffer_size:
+                self._flush(fsync=False)
+    
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+    
+    def flush(self, fsync=True):
+        """
+        Write buffered records out
+        
+        Returns:
+            int: File offset after the last complete record (safe to truncate back to)
+        """
+        with self.lock:
+            return self._flush(fsync)
+    
+    def _flush(self, fsync):
+        if self.buffer:
+            data = b''.join(self.buffer)
+            self.buffer = []
+            if self.compress:
+                # A closed member per flush keeps the file valid at every offset we report
+                with gzip.GzipFile(fileobj=self.file, mode='ab') as member:
+                    member.write(data)
+            else:
+                self.file.write(data)
+            self.file.flush()
+            self.offset = self.file.tell()
+        
+        if fsync or time.monotonic() - self.last_fsync >= self.fsync_interval:
+            os.fsync(self.file.fileno())
+            self.last_fsync = time.monotonic()
+        return self.offset
+    
+    def close(self):
+        """Flush, fsync and close the file"""
+        with self.lock:
+            if self.file.closed:
+                return
+            self._flush(fsync=True)
+            self.file.close()
+    
+    def finalize(self, json_path, indent=2):
+        """
+        Close the sink and write its records as one JSON array, atomically
+        
+        The array is streamed record by record and is byte-for-byte what
+        json.dump(records, f, ensure_ascii=False, indent=indent) produces.
+        
+        Returns:
+            int: Number of records written
+        """
+        self.close()
+        return write_json_array(read_jsonl(self.path), json_path, indent)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+def read_jsonl(path, end=None):
+    """
+    Yield the records of a (possibly gzipped) JSONL file
+    
+    Args:
+        path (str): The file
+        end (int): Stop at this offset (a JsonlSink.flush() return value), ignoring
+            anything written after it
+    """
+    with open(path, 'rb') as f:
+        compressed = f.read(2) == GZIP_MAGIC
+    
+    if end is None:
+        opener = gzip.open if compressed else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    
+    with open(path, 'rb') as raw:
+        if compressed:
+            # Offsets fall between gzip members; the compressed prefix is small
+            lines = gzip.GzipFile(fileobj=io.BytesIO(raw.read(end)))
+        else:
+            lines = raw
+        position = 0
+        for line in lines:
+            position += len(line)
+            if not compressed and position > end:
+                break
+            if line.strip():
+                yield json.loads(line)
+
+def merge_jsonl(paths, sink, key=None, ends=None):
+    """
+    Copy the records of several JSONL files into a sink, in order
+    
+    Args:
+        paths (list): JSONL files; missing ones are skipped
+        sink (JsonlSink): Where the records go
+        key (callable): key(record); only the first record with each key is kept
+        ends (dict): {path: offset} to read each file only up to (see read_jsonl)
+    
+    Returns:
+        int: Number of records written
+    """
+    seen = set()
+    written = 0
+    for path in paths:
+        if not path or not os.path.exists(path):
+            continue
+        end = ends.get(path) if ends else None
+        batch = []
+        for record in read_jsonl(path, end):
+            record_key = key(record) if key else None
+            if record_key:
+                if record_key in seen:
+                    continue
+                seen.add(record_key)
+            batch.append(record)
+        sink.write_many(batch)
+        written += len(batch)
+    return written
+
+def write_json_array(records, json_path, indent=2):
+    """
+    Stream records into a JSON array file via a temp file and os.replace
+    
+    Returns:
+        int: Number of records written
+    """
+    directory = os.path.dirname(os.path.abspath(json_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    count = 0
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for record in records:
+                item = json.dumps(record, ensure_ascii=False, indent=indent)
+                if indent:
+                    f.write(',\n' if count else '[\n')
+                    f.write(textwrap.indent(item, ' ' * indent, lambda line: True))
+                else:
+                    f.write(', ' if count else '[')
+                    f.write(item)
+                count += 1
+            if count == 0:
+                f.write('[]')
+            else:
+                f.write('\n]' if indent else ']')
+        os.replace(temp_path, json_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    
+    logger.info(f"Wrote {count} records to {json_path}")
+    return count
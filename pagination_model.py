@@ -0,0 +1,242 @@
+import re
+import time
+import random
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urlunparse, urljoin, parse_qsl, urlencode
+from bs4 import BeautifulSoup
+from debug_utils import find_pagination_containers
+
+logger = logging.getLogger(__name__)
+
+# Query parameters sites commonly use for the page number
+PAGE_PARAMS = ['page', 'pg', 'p', 'pagenumber', 'page_number', 'pageindex', 'currentpage']
+
+# Path-style pagination such as /to-rent/cape-town/page/3
+PATH_PAGE_PATTERN = re.compile(r'/(page|p)/(\d+)/?$', re.IGNORECASE)
+
+def get_query_param(url, name, default=None):
+    """Return the value of a query parameter in a URL"""
+    for key, value in parse_qsl(urlparse(url).query, keep_blank_values=True):
+        if key == name:
+            return value
+    return default
+
+def set_query_param(url, name, value):
+    """
+    Set a query parameter in a URL, keeping every other parameter and their order
+    
+    Unlike string concatenation this replaces an existing value instead of
+    appending a duplicate, and encodes the value properly.
+    """
+    parsed = urlparse(url)
+    query = parse_qsl(parsed.query, keep_blank_values=True)
+    updated = []
+    replaced = False
+    for key, current in query:
+        if key == name:
+            if not replaced:
+                updated.append((key, str(value)))
+                replaced = True
+        else:
+            updated.append((key, current))
+    if not replaced:
+        updated.append((name, str(value)))
+    return urlunparse(parsed._replace(query=urlencode(updated)))
+
+def preserve_query_params(url, source_url, names=('sorttype', 'sort', 'order')):
+    """Copy parameters such as the sort order from source_url into url when url lost them"""
+    for name in names:
+        value = get_query_param(source_url, name)
+        if value is not None and get_query_param(url, name) is None:
+            url = set_query_param(url, name, value)
+    return url
+
+class PaginationModel:
+    """
+    URL template for a paginated result set, and the highest page linked so far
+    
+    Built once from the first results page, it predicts the URL of any page,
+    so the pages a pagination bar links to can be scheduled together instead
+    of discovered one "Next" link at a time. Bars often show only a window
+    of page numbers (1-5 of 50), so last_linked_page is a lower bound on the
+    page count, raised by observe() as later pages show further numbers;
+    whether a page after it exists is still decided by the pages themselves.
+    """
+    
+    def __init__(self, first_url, last_linked_page, param=None, path_prefix=None, current_page=1):
+        self.first_url = first_url
+        self.last_linked_page = last_linked_page
+        self.param = param              # Query parameter holding the page number
+        self.path_prefix = path_prefix  # Or the path segment before it, e.g. 'page'
+        self.current_page = current_page
+    
+    def url_for(self, page):
+        """Predicted URL of a page (sort and filter parameters of the first URL are kept)"""
+        if self.param:
+            if page == 1 and self.current_page == 1 and get_query_param(self.first_url, self.param) is None:
+                return self.first_url
+            return set_query_param(self.first_url, self.param, page)
+        
+        parsed = urlparse(self.first_url)
+        path = PATH_PAGE_PATTERN.sub('', parsed.path).rstrip('/')
+        if page > 1:
+            path = f"{path}/{self.path_prefix}/{page}"
+        return urlunparse(parsed._replace(path=path or '/'))
+    
+    def next_url(self, page):
+        """Predicted URL of the page after `page` (the caller decides whether there is one)"""
+        return self.url_for(page + 1)
+    
+    def page_numbers(self, start_page=2, max_pages=None):
+        """Pages from start_page to the highest one linked so far, capped at max_pages"""
+        last_page = self.last_linked_page if max_pages is None else min(self.last_linked_page, max_pages)
+        return list(range(start_page, last_page + 1))
+    
+    def observe(self, soup, current_url):
+        """
+        Raise last_linked_page from the pagination links of another results page
+        
+        Returns:
+            int: The highest page linked so far
+        """
+        numbers = _linked_page_numbers(soup, current_url).get((self.param, self.path_prefix))
+        if numbers and max(numbers) > self.last_linked_page:
+            self.last_linked_page = max(numbers)
+            logger.debug(f"Pagination now links up to page {self.last_linked_page}")
+        return self.last_linked_page
+    
+    def to_dict(self):
+        """Plain dict of the model, for checkpoints"""
+        return {
+            'first_url': self.first_url,
+            'last_linked_page': self.last_linked_page,
+            'param': self.param,
+            'path_prefix': self.path_prefix,
+            'current_page': self.current_page,
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a model saved with to_dict()"""
+        # Checkpoints written before last_linked_page existed call it total_pages
+        last_linked_page = data.get('last_linked_page', data.get('total_pages'))
+        return cls(data['first_url'], last_linked_page, param=data.get('param'),
+                   path_prefix=data.get('path_prefix'), current_page=data.get('current_page', 1))
+    
+    def __repr__(self):
+        scheme = f"?{self.param}=N" if self.param else f"/{self.path_prefix}/N"
+        return f"PaginationModel({scheme}, pages linked up to {self.last_linked_page})"
+
+def _page_number_in(url):
+    """Return (param, path_prefix, number) if the URL carries a page number, else None"""
+    parsed = urlparse(url)
+    for key, value in parse_qsl(parsed.query, keep_blank_values=True):
+        if key.lower() in PAGE_PARAMS and value.isdigit():
+            return key, None, int(value)
+    
+    match = PATH_PAGE_PATTERN.search(parsed.path)
+    if match:
+        return None, match.group(1), int(match.group(2))
+    return None
+
+def _linked_page_numbers(soup, current_url):
+    """
+    Page numbers linked from a page's pagination blocks, by how they carry the number
+    
+    Returns:
+        dict: {(param, path_prefix): [page numbers]} for same-host links inside
+        the blocks found by find_pagination_containers()
+    """
+    current_host = urlparse(current_url).netloc
+    schemes = {}
+    seen_links = set()
+    
+    for container in find_pagination_containers(soup):
+        for link in container.find_all('a', href=True):
+            if id(link) in seen_links:
+                continue
+            seen_links.add(id(link))
+            
+            url = urljoin(current_url, link['href'])
+            if urlparse(url).netloc != current_host:
+                continue
+            found = _page_number_in(url)
+            if found:
+                param, path_prefix, number = found
+                schemes.setdefault((param, path_prefix), []).append(number)
+    return schemes
+
+def infer_pagination_model(html_content, current_url, soup=None):
+    """
+    Infer the page URL template from one results page
+    
+    Links inside the pagination blocks found by find_pagination_containers()
+    are grouped by how they carry the page number (a query parameter or a
+    /page/N path segment); the most common scheme wins. Its largest page
+    number is only the highest page linked so far, not the page count.
+    
+    Args:
+        html_content (str): HTML of the results page
+        current_url (str): URL the page was fetched from
+        soup: Already parsed soup of html_content, if available
+    
+    Returns:
+        PaginationModel: The inferred model, or None if the page has no usable pagination
+    """
+    if soup is None:
+        soup = BeautifulSoup(html_content, 'html.parser')
+    
+    schemes = _linked_page_numbers(soup, current_url)
+    if not schemes:
+        return None
+    
+    (param, path_prefix), numbers = max(schemes.items(), key=lambda item: len(item[1]))
+    
+    current = _page_number_in(current_url)
+    current_page = current[2] if current and current[:2] == (param, path_prefix) else 1
+    last_linked_page = max(numbers + [current_page])
+    if last_linked_page <= current_page:
+        return None
+    
+    model = PaginationModel(current_url, last_linked_page, param=param, path_prefix=path_prefix,
+                            current_page=current_page)
+    logger.info(f"Inferred {model} from {current_url}")
+    return model
+
+def fetch_all(urls, fetch, max_workers=4, jitter=(0.5, 2.0)):
+    """
+    Fetch URLs concurrently
+    
+    Each worker waits a random `jitter` delay before its request so the
+    site sees a trickle rather than a burst.
+    
+    Args:
+        urls (list): URLs to fetch
+        fetch (callable): fetch(url) -> result (None on failure)
+        max_workers (int): Number of concurrent requests
+    
+    Yields:
+        tuple: (url, result) pairs in the order of `urls`, each as soon as it
+        and every earlier URL are done, so callers can process (and
+        checkpoint) pages while later ones are still in flight. A caller that
+        stops early (break, exception, close()) cancels the requests that have
+        not started; only the ones in flight are waited for.
+    """
+    def fetch_one(url):
+        if jitter:
+            time.sleep(random.uniform(*jitter))
+        try:
+            return fetch(url)
+        except Exception as e:
+            logger.error(f"Error fetching {url}: {str(e)}")
+            return None
+    
+    if not urls:
+        return
+    
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        yield from zip(urls, executor.map(fetch_one, urls))
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,352 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# The working directory of a deployed function may be read-only; the temp directory is
+# writable and survives between warm invocations
+DEFAULT_DB_PATH = os.environ.get('PROPERTY_STORE_DB', os.path.join(tempfile.gettempdir(), 'properties.db'))
+
+# SQLite caps the number of host parameters in one statement; stay well below it
+MAX_IN_PARAMS = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    listing_id   TEXT PRIMARY KEY,
+    title        TEXT,
+    price_text   TEXT,
+    price        INTEGER,
+    area         TEXT,
+    location     TEXT,
+    listing_type TEXT,
+    is_featured  INTEGER NOT NULL DEFAULT 0,
+    status       TEXT NOT NULL DEFAULT 'active',
+    url          TEXT,
+    data         TEXT NOT NULL,
+    first_seen   REAL NOT NULL,
+    last_seen    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_listings_area ON listings (area);
+CREATE INDEX IF NOT EXISTS idx_listings_price ON listings (price);
+CREATE INDEX IF NOT EXISTS idx_listings_listing_type ON listings (listing_type);
+CREATE INDEX IF NOT EXISTS idx_listings_first_seen ON listings (first_seen);
+CREATE INDEX IF NOT EXISTS idx_listings_last_seen ON listings (last_seen);
+
+CREATE TABLE IF NOT EXISTS listing_changes (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    listing_id TEXT NOT NULL,
+    field      TEXT NOT NULL,
+    old_value  TEXT,
+    new_value  TEXT,
+    changed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_listing_changes_listing ON listing_changes (listing_id, changed_at);
+CREATE INDEX IF NOT EXISTS idx_listing_changes_changed_at ON listing_changes (changed_at);
+"""
+
+UPSERT_SQL = """
+INSERT INTO listings (listing_id, title, price_text, price, area, location, listing_type,
+                      is_featured, status, url, data, first_seen, last_seen)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'active', ?, ?, ?, ?)
+ON CONFLICT (listing_id) DO UPDATE SET
+    title = excluded.title,
+    price_text = excluded.price_text,
+    price = excluded.price,
+    area = excluded.area,
+    location = excluded.location,
+    listing_type = excluded.listing_type,
+    is_featured = excluded.is_featured,
+    status = 'active',
+    url = excluded.url,
+    data = excluded.data,
+    last_seen = excluded.last_seen
+"""
+
+LISTING_ID_PATTERN = re.compile(r'^[A-Z]{1,3}\d+$')
+
+def parse_price(price_text):
+    """Whole-rand price from text such as 'R 12 500' (None for 'POA' and the like)"""
+    if price_text is None:
+        return None
+    if isinstance(price_text, (int, float)):
+        return int(price_text)
+    digits = re.sub(r'[^\d]', '', str(price_text).split('.')[0])
+    return int(digits) if digits else None
+
+def derive_area(property_data):
+    """
+    Area of a listing: an explicit 'area' field, else the URL path segment
+    before the listing ID (/to-rent/western-cape/cape-town/sea-point/RR123),
+    else the location text
+    """
+    if property_data.get('area'):
+        return property_data['area']
+    
+    segments = [segment for segment in urlparse(property_data.get('url') or '').path.split('/') if segment]
+    if len(segments) >= 2 and LISTING_ID_PATTERN.match(segments[-1]):
+        return segments[-2]
+    
+    location = property_data.get('location')
+    if location and location != 'No Location':
+        return location.split(',')[-1].strip()
+    return None
+
+class PropertyStore:
+    """
+    SQLite store of scraped listings, keyed by listing_id
+    
+    Every listing keeps its latest data plus first/last seen timestamps, and
+    listing_changes records each price or status change, so "what is new",
+    "what changed" and history queries run against indexes instead of
+    reloading old JSON. The database runs in WAL mode so readers are not
+    blocked by a crawl that is writing.
+    """
+    
+    def __init__(self, db_path=DEFAULT_DB_PATH, batch_size=200):
+        """
+        Args:
+            db_path (str): SQLite database file (created if missing)
+            batch_size (int): Listings written per transaction by upsert_many
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+    
+    def upsert(self, property_data, seen_at=None):
+        """Insert or update one listing (see upsert_many)"""
+        return self.upsert_many([property_data], seen_at)
+    
+    def upsert_many(self, properties, seen_at=None):
+        """
+        Insert or update listings in batched transactions
+        
+        Price and status changes against the stored row are written to
+        listing_changes in the same transaction. Listings without a
+        listing_id cannot be keyed and are skipped.
+        
+        Args:
+            properties (iterable): Scraped property dicts
+            seen_at (float): Timestamp to record (default: now)
+        
+        Returns:
+            dict: {'inserted': n, 'updated': n, 'changes': n, 'skipped': n}
+        """
+        seen_at = seen_at or time.time()
+        result = {'inserted': 0, 'updated': 0, 'changes': 0, 'skipped': 0}
+        
+        batch = []
+        for property_data in properties:
+            if not property_data.get('listing_id'):
+                result['skipped'] += 1
+                continue
+            batch.append(property_data)
+            if len(batch) >= self.batch_size:
+                self._upsert_batch(batch, seen_at, result)
+                batch = []
+        if batch:
+            self._upsert_batch(batch, seen_at, result)
+        
+        return result
+    
+    def _upsert_batch(self, batch, seen_at, result):
+        # The last occurrence of a listing in the batch wins
+        by_id = {}
+        for property_data in batch:
+            by_id[str(property_data['listing_id'])] = property_data
+        
+        with self.lock, self.conn:
+            existing = self._fetch_rows(list(by_id), 'listing_id, price, price_text, status')
+            
+            rows = []
+            changes = []
+            for listing_id, property_data in by_id.items():
+                price = parse_price(property_data.get('price'))
+                current = existing.get(listing_id)
+                if current is None:
+                    result['inserted'] += 1
+                else:
+                    result['updated'] += 1
+                    if current['price'] != price:
+                        changes.append((listing_id, 'price', current['price_text'], property_data.get('price'), seen_at))
+                    if current['status'] != 'active':
+                        changes.append((listing_id, 'status', current['status'], 'active', seen_at))
+                
+                rows.append((
+                    listing_id,
+                    property_data.get('title'),
+                    property_data.get('price'),
+                    price,
+                    derive_area(property_data),
+                    property_data.get('location'),
+                    property_data.get('listing_type'),
+                    1 if property_data.get('is_featured') else 0,
+                    property_data.get('url'),
+                    json.dumps(property_data, ensure_ascii=False),
+                    seen_at,
+                    seen_at,
+                ))
+            
+            self.conn.executemany(UPSERT_SQL, rows)
+            if changes:
+                self.conn.executemany(
+                    'INSERT INTO listing_changes (listing_id, field, old_value, new_value, changed_at) '
+                    'VALUES (?, ?, ?, ?, ?)', changes)
+            result['changes'] += len(changes)
+    
+    def _fetch_rows(self, listing_ids, columns='*'):
+        """Rows for the given IDs as {listing_id: row}, queried in chunks"""
+        rows = {}
+        for start in range(0, len(listing_ids), MAX_IN_PARAMS):
+            chunk = listing_ids[start:start + MAX_IN_PARAMS]
+            placeholders = ','.join('?' * len(chunk))
+            for row in self.conn.execute(
+                    f'SELECT {columns} FROM listings WHERE listing_id IN ({placeholders})', chunk):
+                rows[row['listing_id']] = row
+        return rows
+    
+    def mark_removed(self, seen_before, area=None):
+        """
+        Mark active listings not seen since `seen_before` as removed
+        
+        Call after a full crawl with the crawl's start time; a listing that
+        shows up again later becomes active again (both are recorded as
+        status changes).
+        
+        Args:
+            seen_before (float): Listings last seen before this timestamp are removed
+            area (str): Only consider listings in this area
+        
+        Returns:
+            int: Number of listings marked removed
+        """
+        query = "SELECT listing_id FROM listings WHERE status = 'active' AND last_seen < ?"
+        params = [seen_before]
+        if area is not None:
+            query += ' AND area = ?'
+            params.append(area)
+        
+        now = time.time()
+        with self.lock, self.conn:
+            listing_ids = [row['listing_id'] for row in self.conn.execute(query, params)]
+            self.conn.executemany(
+                "UPDATE listings SET status = 'removed' WHERE listing_id = ?",
+                [(listing_id,) for listing_id in listing_ids])
+            self.conn.executemany(
+                "INSERT INTO listing_changes (listing_id, field, old_value, new_value, changed_at) "
+                "VALUES (?, 'status', 'active', 'removed', ?)",
+                [(listing_id, now) for listing_id in listing_ids])
+        
+        if listing_ids:
+            logger.info(f"Marked {len(listing_ids)} listings as removed")
+        return len(listing_ids)
+    
+    def get(self, listing_id):
+        """The stored property dict for a listing, or None"""
+        with self.lock:
+            row = self.conn.execute('SELECT data FROM listings WHERE listing_id = ?', (str(listing_id),)).fetchone()
+        return json.loads(row['data']) if row else None
+    
+    def is_known(self, listing_id):
+        """Whether a listing is already in the store (a primary key lookup)"""
+        with self.lock:
+            row = self.conn.execute('SELECT 1 FROM listings WHERE listing_id = ?', (str(listing_id),)).fetchone()
+        return row is not None
+    
+    def known_ids(self, listing_ids):
+        """The subset of listing_ids already in the store"""
+        with self.lock:
+            return set(self._fetch_rows([str(listing_id) for listing_id in listing_ids], 'listing_id'))
+    
+    def query(self, area=None, min_price=None, max_price=None, listing_type=None, status='active',
+              seen_since=None, new_since=None, limit=None):
+        """
+        Listings matching every given filter, most recently seen first
+        
+        Args:
+            area (str): Area as returned by derive_area
+            min_price, max_price (int): Price bounds in rand
+            listing_type (str): data-listing-type value
+            status (str): 'active', 'removed' or None for both
+            seen_since (float): Last seen at or after this timestamp
+            new_since (float): First seen at or after this timestamp
+            limit (int): Maximum number of listings
+        
+        Returns:
+            list: Property dicts, each with 'first_seen', 'last_seen' and 'status' added
+        """
+        conditions = []
+        params = []
+        for clause, value in [('area = ?', area), ('price >= ?', min_price), ('price <= ?', max_price),
+                              ('listing_type = ?', listing_type), ('status = ?', status),
+                              ('last_seen >= ?', seen_since), ('first_seen >= ?', new_since)]:
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        
+        query = 'SELECT data, first_seen, last_seen, status FROM listings'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY last_seen DESC'
+        if limit:
+            query += ' LIMIT ?'
+            params.append(int(limit))
+        
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        
+        listings = []
+        for row in rows:
+            property_data = json.loads(row['data'])
+            property_data.update(first_seen=row['first_seen'], last_seen=row['last_seen'], status=row['status'])
+            listings.append(property_data)
+        return listings
+    
+    def changes(self, listing_id=None, since=None):
+        """
+        Recorded price and status changes, oldest first
+        
+        Returns:
+            list: {'listing_id', 'field', 'old_value', 'new_value', 'changed_at'} dicts
+        """
+        conditions = []
+        params = []
+        if listing_id is not None:
+            conditions.append('listing_id = ?')
+            params.append(str(listing_id))
+        if since is not None:
+            conditions.append('changed_at >= ?')
+            params.append(since)
+        
+        query = 'SELECT listing_id, field, old_value, new_value, changed_at FROM listing_changes'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY changed_at, id'
+        
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(query, params)]
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
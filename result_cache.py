@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from seen_set import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'scraper_result_cache'))
+
+# Seconds a result is served as fresh, then served stale while it is refreshed
+DEFAULT_TTL = int(os.environ.get('RESULT_CACHE_TTL', 300))
+DEFAULT_STALE_TTL = int(os.environ.get('RESULT_CACHE_STALE_TTL', 3600))
+
+# A refresh marker older than this belongs to a refresh that died
+REFRESH_TIMEOUT = 600
+
+def normalize_params(params):
+    """Cache key material: URL values canonicalized, keys sorted, empty values dropped"""
+    normalized = {}
+    for key, value in params.items():
+        if value is None or value == '':
+            continue
+        if key == 'url' or key.endswith('_url'):
+            value = canonicalize_url(str(value))
+        elif isinstance(value, str):
+            value = value.strip().lower()
+        normalized[key] = value
+    return json.dumps(normalized, sort_keys=True)
+
+class ResultCache:
+    """
+    Disk-backed result cache with a TTL and a stale-while-revalidate window
+    
+    Entries are JSON files in a local directory (/tmp by default), so they
+    survive across warm invocations of the function. A result younger than
+    `ttl` is returned as is (HIT). Up to `ttl + stale_ttl` it is still
+    returned immediately (STALE), and a background thread recomputes it.
+    Older or missing results are computed inline (MISS).
+    
+    Only one refresh per key runs at a time. A thread set guards this
+    process, and an O_EXCL marker file guards other processes sharing the
+    directory.
+    """
+    
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.lock = threading.Lock()
+        self.refreshing = set()
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+    
+    def key_for(self, params):
+        """Cache key for a set of request parameters"""
+        return hashlib.sha256(normalize_params(params).encode('utf-8')).hexdigest()[:32]
+    
+    def get(self, key):
+        """
+        Returns:
+            tuple: (value, age in seconds), or (None, None) if absent or unreadable
+        """
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            return entry['value'], time.time() - entry['stored_at']
+        except FileNotFoundError:
+            return None, None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache entry {key}: {str(e)}")
+            return None, None
+    
+    def set(self, key, value):
+        """Store a value atomically (temp file + os.replace)"""
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'stored_at': time.time(), 'value': value}, f, ensure_ascii=False)
+            os.replace(temp_path, self._path(key))
+        except Exception as e:
+            logger.error(f"Error writing cache entry {key}: {str(e)}")
+        self.prune()
+    
+    def prune(self):
+        """Delete entries past the stale window"""
+        cutoff = time.time() - self.ttl - self.stale_ttl
+        try:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+        except OSError as e:
+            logger.debug(f"Error pruning result cache: {str(e)}")
+    
+    def fetch(self, params, compute, use_cache=True, cacheable=None):
+        """
+        Return a cached result for `params`, computing it when needed
+        
+        Args:
+            params (dict): Request parameters identifying the result
+            compute (callable): compute() -> result (JSON-serialisable)
+            use_cache (bool): False to compute and store without reading the cache
+            cacheable (callable): cacheable(result) -> bool; by default only
+                results with "success": True are stored
+        
+        Returns:
+            tuple: (result, status) where status is 'HIT', 'STALE', 'MISS' or 'BYPASS'
+        """
+        if cacheable is None:
+            cacheable = lambda result: isinstance(result, dict) and result.get('success') is True
+        
+        key = self.key_for(params)
+        if use_cache:
+            value, age = self.get(key)
+            if value is not None and age < self.ttl:
+                return value, 'HIT'
+            if value is not None and age < self.ttl + self.stale_ttl:
+                logger.info(f"Serving stale result ({int(age)}s old) for {params}, refreshing in background")
+                self.refresh_in_background(key, compute, cacheable)
+                return value, 'STALE'
+        
+        result = compute()
+        if cacheable(result):
+            self.set(key, result)
+        return result, 'MISS' if use_cache else 'BYPASS'
+    
+    def refresh_in_background(self, key, compute, cacheable):
+        """Recompute an entry on a daemon thread unless a refresh is already running"""
+        marker = self._path(key) + '.refresh'
+        with self.lock:
+            if key in self.refreshing:
+                return
+            try:
+                if os.path.exists(marker) and time.time() - os.path.getmtime(marker) > REFRESH_TIMEOUT:
+                    os.remove(marker)
+                os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            except FileExistsError:
+                return  # Another process is refreshing it
+            except OSError as e:
+                logger.warning(f"Could not create refresh marker for {key}: {str(e)}")
+            self.refreshing.add(key)
+        
+        def refresh():
+            try:
+                result = compute()
+                if cacheable(result):
+                    self.set(key, result)
+                    logger.info(f"Refreshed cache entry {key}")
+            except Exception as e:
+                logger.error(f"Error refreshing cache entry {key}: {str(e)}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+                if os.path.exists(marker):
+                    os.remove(marker)
+        
+        threading.Thread(target=refresh, name=f"cache-refresh-{key[:8]}", daemon=True).start()
@@ -0,0 +1,437 @@
+import os
+import re
+import math
+import mmap
+import heapq
+import fcntl
+import struct
+import bisect
+import hashlib
+import logging
+import tempfile
+from array import array
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that never change what a page shows
+TRACKING_PARAMS = {'fbclid', 'gclid', 'msclkid', 'ref', 'source'}
+
+# Listing IDs such as RR4191874: up to three letters and a number without leading zeros
+LISTING_ID_PATTERN = re.compile(r'^([A-Z]{1,3})([1-9]\d{0,13}|0)$')
+NUMBER_BITS = 48
+
+BLOOM_HEADER = struct.Struct('<8sQQQ')  # magic, bits, hashes, items added
+BLOOM_MAGIC = b'SEENBLM1'
+IDS_HEADER = struct.Struct('<8sQ')      # magic, count
+IDS_MAGIC = b'SEENIDS1'
+
+# Merge writes go out in chunks of this many IDs
+MERGE_CHUNK = 65536
+
+# The delta log is merged into the sorted ID file once it holds more than this
+# share of the sorted file's IDs, and at least COMPACT_MIN_IDS of them
+COMPACT_FRACTION = 0.125
+COMPACT_MIN_IDS = 65536
+
+def canonicalize_url(url):
+    """
+    Canonical form of a URL for deduplication
+    
+    Scheme and host are lowercased, default ports, fragments, tracking
+    parameters (utm_*, fbclid, ...) and trailing slashes are dropped and the
+    remaining query parameters are sorted, so ?page=2&sorttype=3 and
+    ?sorttype=3&page=2#top are the same page.
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').lower()
+    port = parsed.port
+    if port is None or (scheme, port) in (('http', 80), ('https', 443)):
+        netloc = host
+    else:
+        netloc = f"{host}:{port}"
+    
+    path = parsed.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/') or '/'
+    
+    query = sorted((key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+                   if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS)
+    return urlunparse((scheme, netloc, path, '', urlencode(query), ''))
+
+def property_key(property_data):
+    """Deduplication key of a scraped property: its listing ID, or else its canonical URL"""
+    return property_data.get('listing_id') or canonicalize_url(property_data.get('url') or '')
+
+def pack_listing_id(listing_id):
+    """
+    Pack a listing ID such as 'RR4191874' into one unsigned 64-bit integer
+    
+    The letters (base 27) go in the top bits and the number in the low 48.
+    
+    Returns:
+        int: The packed ID, or None if the ID does not have that shape
+    """
+    match = LISTING_ID_PATTERN.match(str(listing_id))
+    if not match:
+        return None
+    prefix = 0
+    for char in match.group(1):
+        prefix = prefix * 27 + (ord(char) - ord('A') + 1)
+    return (prefix << NUMBER_BITS) | int(match.group(2))
+
+def _lock(fd):
+    fcntl.flock(fd, fcntl.LOCK_EX)
+
+def _unlock(fd):
+    fcntl.flock(fd, fcntl.LOCK_UN)
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter in a memory-mapped file
+    
+    The bit array is mapped with MAP_SHARED, so every process that opens the
+    same file sees bits set by the others straight away. Additions are held
+    in memory until flush(), which sets their bits under an exclusive flock;
+    lookups read the map without locking (bits are only ever set, so a
+    concurrent flush can at worst make a lookup miss an item being added).
+    
+    Sizing: about 9.6 bits per item at a 1% false-positive rate, i.e. 12 MB
+    for ten million items.
+    """
+    
+    def __init__(self, path, capacity=10000000, error_rate=0.01):
+        """
+        Args:
+            path (str): Filter file (created if missing)
+            capacity (int): Expected number of items (only used when creating)
+            error_rate (float): Target false-positive rate at capacity (only used when creating)
+        """
+        self.path = path
+        self.pending = set()
+        
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        _lock(self.fd)
+        try:
+            if os.fstat(self.fd).st_size == 0:
+                bits = max(64, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+                bits = (bits + 7) // 8 * 8
+                hashes = max(1, int(round(bits / capacity * math.log(2))))
+                os.ftruncate(self.fd, BLOOM_HEADER.size + bits // 8)
+                os.pwrite(self.fd, BLOOM_HEADER.pack(BLOOM_MAGIC, bits, hashes, 0), 0)
+                logger.info(f"Created Bloom filter {path}: {bits // 8} bytes, {hashes} hashes")
+        finally:
+            _unlock(self.fd)
+        
+        self.mm = mmap.mmap(self.fd, 0)
+        magic, self.bits, self.hashes, _ = BLOOM_HEADER.unpack_from(self.mm, 0)
+        if magic != BLOOM_MAGIC:
+            raise ValueError(f"{path} is not a Bloom filter file")
+    
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1, h2 = struct.unpack('<QQ', digest)
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+    
+    def __contains__(self, item):
+        if item in self.pending:
+            return True
+        mm = self.mm
+        offset = BLOOM_HEADER.size
+        for position in self._positions(item):
+            if not mm[offset + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+    
+    def add(self, item):
+        """Queue an item; it becomes visible to other processes on flush()"""
+        self.pending.add(item)
+    
+    @property
+    def count(self):
+        """Items added to the file so far (duplicates included)"""
+        return BLOOM_HEADER.unpack_from(self.mm, 0)[3]
+    
+    def flush(self):
+        """Set the bits of every pending item under an exclusive lock"""
+        if not self.pending:
+            return
+        mm = self.mm
+        offset = BLOOM_HEADER.size
+        _lock(self.fd)
+        try:
+            for item in self.pending:
+                for position in self._positions(item):
+                    mm[offset + (position >> 3)] |= 1 << (position & 7)
+            magic, bits, hashes, count = BLOOM_HEADER.unpack_from(mm, 0)
+            BLOOM_HEADER.pack_into(mm, 0, magic, bits, hashes, count + len(self.pending))
+            mm.flush()
+        finally:
+            _unlock(self.fd)
+        self.pending = set()
+    
+    def close(self):
+        self.flush()
+        self.mm.close()
+        os.close(self.fd)
+
+class PackedIdSet:
+    """
+    Exact set of packed listing IDs: a sorted uint64 array plus an append-only delta log
+    
+    The sorted file is memory-mapped and searched with bisect, so a lookup
+    touches a handful of pages and ten million IDs take 80 MB of disk and
+    page cache rather than a Python set's gigabyte. Additions are held in
+    memory until flush(), which appends them to the delta log (<path>.delta)
+    under a lock file, so a flush costs the size of the batch rather than of
+    the whole set. Every process keeps the delta's IDs in a small in-memory
+    set. Once the delta holds more than COMPACT_FRACTION of the sorted file
+    (and at least COMPACT_MIN_IDS), the flush that crossed the line merges it
+    into a new sorted file, swaps that in with os.replace and starts an
+    empty delta. Readers pick up other processes' flushes on refresh()
+    (flush() refreshes the flushing process).
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.delta_path = path + '.delta'
+        self.lock_path = path + '.lock'
+        self.pending = set()
+        self.mm = None
+        self.ids = []
+        self.identity = None
+        self.delta = set()
+        self.delta_offset = 0
+        self.refresh()
+    
+    def refresh(self):
+        """Map the current sorted file and read new delta entries if other processes have flushed"""
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH)
+            try:
+                self._refresh()
+            finally:
+                _unlock(lock_file.fileno())
+    
+    def _refresh(self):
+        """refresh() with the lock already held"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            stat = None
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size) if stat else None
+        if identity != self.identity:
+            # Only a compaction replaces the sorted file (and it always grows), and
+            # it merges the old delta in: start over on the new, empty delta
+            self.delta = set()
+            self.delta_offset = 0
+            if stat is None:
+                self._release()
+            else:
+                with open(self.path, 'rb') as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, count = IDS_HEADER.unpack_from(mm, 0)
+                if magic != IDS_MAGIC:
+                    mm.close()
+                    raise ValueError(f"{self.path} is not a packed ID file")
+                
+                self._release()
+                self.mm = mm
+                self.ids = memoryview(mm)[IDS_HEADER.size:IDS_HEADER.size + count * 8].cast('Q')
+            self.identity = identity
+        
+        try:
+            stat = os.stat(self.delta_path)
+        except FileNotFoundError:
+            return
+        
+        # Entries are whole uint64s; a partial one left by a crash is ignored
+        end = stat.st_size - stat.st_size % 8
+        if end > self.delta_offset:
+            entries = array('Q')
+            with open(self.delta_path, 'rb') as f:
+                f.seek(self.delta_offset)
+                entries.frombytes(f.read(end - self.delta_offset))
+            self.delta.update(packed_id for packed_id in entries if not self._in_sorted(packed_id))
+            self.delta_offset = end
+    
+    def _release(self):
+        if self.mm is not None:
+            self.ids.release()
+            self.mm.close()
+            self.mm = None
+            self.ids = []
+    
+    def _in_sorted(self, packed_id):
+        index = bisect.bisect_left(self.ids, packed_id)
+        return index < len(self.ids) and self.ids[index] == packed_id
+    
+    def __contains__(self, packed_id):
+        return packed_id in self.pending or packed_id in self.delta or self._in_sorted(packed_id)
+    
+    def __len__(self):
+        return len(self.ids) + len(self.delta) + len(self.pending)
+    
+    def add(self, packed_id):
+        """Queue an ID; it is written to the delta log on flush()"""
+        if packed_id not in self:
+            self.pending.add(packed_id)
+    
+    def flush(self):
+        """Append pending IDs to the delta log (under an exclusive lock), compacting it when it has grown"""
+        if not self.pending:
+            return
+        
+        with open(self.lock_path, 'a') as lock_file:
+            _lock(lock_file.fileno())
+            try:
+                # Other workers may have flushed some of the same IDs since they were queued
+                self._refresh()
+                new_ids = array('Q', sorted(packed_id for packed_id in self.pending
+                                            if packed_id not in self.delta and not self._in_sorted(packed_id)))
+                if new_ids:
+                    with open(self.delta_path, 'ab') as f:
+                        # Cut off a partial entry left by a crashed writer before appending
+                        if os.fstat(f.fileno()).st_size > self.delta_offset:
+                            f.truncate(self.delta_offset)
+                        new_ids.tofile(f)
+                        f.flush()
+                        os.fsync(f.fileno())
+                        self.delta_offset = f.tell()
+                    self.delta.update(new_ids)
+                self.pending = set()
+                
+                if len(self.delta) > max(COMPACT_MIN_IDS, len(self.ids) * COMPACT_FRACTION):
+                    self._compact()
+            finally:
+                _unlock(lock_file.fileno())
+    
+    def _compact(self):
+        """Merge the delta into a new sorted file and start an empty delta (lock held)"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        merged = heapq.merge(self.ids, sorted(self.delta))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(IDS_HEADER.pack(IDS_MAGIC, 0))
+                count = 0
+                last = None
+                chunk = array('Q')
+                for packed_id in merged:
+                    if packed_id == last:
+                        continue
+                    last = packed_id
+                    chunk.append(packed_id)
+                    if len(chunk) >= MERGE_CHUNK:
+                        chunk.tofile(f)
+                        count += len(chunk)
+                        chunk = array('Q')
+                chunk.tofile(f)
+                count += len(chunk)
+                f.seek(0)
+                f.write(IDS_HEADER.pack(IDS_MAGIC, count))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        
+        # The delta's IDs are in the sorted file now. Readers that see the new
+        # sorted file read the delta again from the start, and a crash before
+        # this point only leaves IDs in both, which readers skip.
+        with open(self.delta_path, 'wb') as f:
+            os.fsync(f.fileno())
+        logger.info(f"Compacted {len(self.delta)} delta IDs into {self.path} ({count} IDs)")
+        self._refresh()
+    
+    def close(self):
+        self.flush()
+        self._release()
+
+class SeenSet:
+    """
+    Persistent, shareable record of listings and URLs already seen
+    
+    Listing IDs of the usual shape (see pack_listing_id) go into an exact
+    PackedIdSet; other IDs and canonicalized URLs go into a Bloom filter,
+    which can report a false positive (1% at capacity) but never a false
+    negative. Their files live in one directory and can be opened by several
+    processes at once. Additions become durable and visible to other
+    processes on flush().
+    """
+    
+    def __init__(self, directory, capacity=10000000, error_rate=0.01):
+        """
+        Args:
+            directory (str): Where the files live (created if missing)
+            capacity (int): Expected number of Bloom filter items
+            error_rate (float): Bloom filter false-positive rate at capacity
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.ids = PackedIdSet(os.path.join(directory, 'listing_ids.bin'))
+        self.bloom = BloomFilter(os.path.join(directory, 'seen.bloom'), capacity, error_rate)
+    
+    def _listing_key(self, listing_id):
+        packed = pack_listing_id(listing_id)
+        if packed is not None:
+            return self.ids, packed
+        return self.bloom, f"id:{listing_id}"
+    
+    def has_listing(self, listing_id):
+        store, key = self._listing_key(listing_id)
+        return key in store
+    
+    def add_listing(self, listing_id):
+        """Mark a listing as seen; returns True if it had not been seen before"""
+        store, key = self._listing_key(listing_id)
+        if key in store:
+            return False
+        store.add(key)
+        return True
+    
+    def has_url(self, url):
+        return f"url:{canonicalize_url(url)}" in self.bloom
+    
+    def add_url(self, url):
+        """Mark a URL as seen; returns True if it (probably) had not been seen before"""
+        key = f"url:{canonicalize_url(url)}"
+        if key in self.bloom:
+            return False
+        self.bloom.add(key)
+        return True
+    
+    def add_property(self, property_data):
+        """
+        Mark a scraped property as seen, by listing ID or else by its canonical URL
+        
+        Returns:
+            bool: True if the property is new
+        """
+        if property_data.get('listing_id'):
+            return self.add_listing(property_data['listing_id'])
+        if property_data.get('url'):
+            return self.add_url(property_data['url'])
+        return True
+    
+    def refresh(self):
+        """Pick up IDs other processes have flushed"""
+        self.ids.refresh()
+    
+    def flush(self):
+        self.ids.flush()
+        self.bloom.flush()
+    
+    def close(self):
+        self.ids.close()
+        self.bloom.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
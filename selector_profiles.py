@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import tempfile
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Shared by every scraper process on the box unless SELECTOR_PROFILES_FILE says otherwise
+DEFAULT_PROFILES_FILE = os.path.join(tempfile.gettempdir(), "selector_profiles.json")
+
+class SelectorProfileStore:
+    """
+    Persistent per-domain record of which selectors actually matched
+    
+    A profile looks like:
+        {
+            "property": [".featured-listing", ".listing-result"],
+            "pagination": [".paging a.next"],
+            "suggested": [".listing-card"],
+            "updated_at": "2024-01-01 12:00:00"
+        }
+    where "suggested" holds html_analyzer suggestions for pages none of the
+    configured selectors matched.
+    
+    Every change re-reads the file under an exclusive flock on
+    <profiles_file>.lock, so scrapers in several processes add to one
+    profile instead of overwriting each other's.
+    """
+    
+    def __init__(self, profiles_file=None):
+        self.profiles_file = profiles_file or os.environ.get("SELECTOR_PROFILES_FILE", DEFAULT_PROFILES_FILE)
+        self._profiles = None
+    
+    def _load(self, reload=False):
+        if self._profiles is None or reload:
+            self._profiles = {}
+            try:
+                if os.path.exists(self.profiles_file):
+                    with open(self.profiles_file, 'r', encoding='utf-8') as f:
+                        self._profiles = json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading selector profiles from {self.profiles_file}: {str(e)}")
+        return self._profiles
+    
+    @contextmanager
+    def _locked(self):
+        """Hold the profiles lock and yield the profiles as currently on disk"""
+        with open(self.profiles_file + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield self._load(reload=True)
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    
+    def _save(self):
+        """Write the profiles atomically so a crash never leaves a half-written file"""
+        try:
+            directory = os.path.dirname(os.path.abspath(self.profiles_file))
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._profiles, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.profiles_file)
+        except Exception as e:
+            logger.error(f"Error saving selector profiles to {self.profiles_file}: {str(e)}")
+    
+    def get(self, domain):
+        """Return the learned profile for a domain (empty if nothing was learned yet)"""
+        return dict(self._load().get(domain, {}))
+    
+    def learn(self, domain, group, selectors, merge=True, priority=None):
+        """
+        Record the selectors that matched for a domain
+        
+        A page only shows some kinds of card (one without featured listings
+        matches no featured selector), so by default the selectors are added
+        to the ones already learned rather than replacing them.
+        
+        Args:
+            domain (str): Host the selectors were used on
+            group (str): 'property', 'pagination' or 'suggested'
+            selectors (list): The selectors that matched
+            merge (bool): Add to the learned selectors instead of replacing them
+            priority (list): Configured selector order; learned selectors are kept
+                in this order, followed by any it does not contain
+        
+        Returns:
+            dict: The updated profile
+        """
+        with self._locked() as profiles:
+            profile = profiles.setdefault(domain, {})
+            learned = list(profile.get(group, [])) if merge else []
+            learned += [selector for selector in selectors if selector not in learned]
+            if priority:
+                rank = {selector: index for index, selector in enumerate(priority)}
+                learned.sort(key=lambda selector: rank.get(selector, len(rank)))
+            profile[group] = learned
+            profile['updated_at'] = time.strftime("%Y-%m-%d %H:%M:%S")
+            self._save()
+        logger.info(f"Learned {group} selectors for {domain}: {learned}")
+        return dict(profile)
+    
+    def forget(self, domain, group=None):
+        """Drop a learned group (or the whole profile) for a domain"""
+        with self._locked() as profiles:
+            if group is None:
+                profiles.pop(domain, None)
+            elif domain in profiles:
+                profiles[domain].pop(group, None)
+            self._save()
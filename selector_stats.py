@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Snapshots are appended here (one JSON object per line) so drift can be compared over time
+DEFAULT_STATS_FILE = os.path.join(tempfile.gettempdir(), "selector_stats.jsonl")
+
+# Once the stats file grows past this size it is cut back to its latest snapshots
+MAX_STATS_BYTES = int(os.environ.get("SELECTOR_STATS_MAX_BYTES", 1024 * 1024))
+KEEP_SNAPSHOTS = 100
+
+# Bytes read per step when looking for the last snapshot from the end of the file
+TAIL_BLOCK = 64 * 1024
+
+# Assumed cost of a selector that has never been timed (seconds)
+PRIOR_COST = 0.01
+
+class SelectorTimer:
+    """Times one selector evaluation; set `hit` before the block ends"""
+
+    def __init__(self, stats, group, selector):
+        self.stats = stats
+        self.group = group
+        self.selector = selector
+        self.hit = False
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stats.record(self.group, self.selector, self.hit, time.perf_counter() - self.start)
+        return False
+
+class SelectorStats:
+    """
+    Live hit/miss/time counters for selector lists, with adaptive ordering
+
+    ordered() sorts a group by estimated hit probability per second spent.
+    It is meant for lists of interchangeable selectors, such as several ways
+    to find the same button or field, where any match is as good as the
+    first. Lists where the configured order decides which element wins
+    (featured cards before standard ones, a specific "next" link before a
+    generic one) keep that order and are only timed. The order is
+    recomputed every `reorder_every` evaluations of a group rather than on
+    every call.
+    """
+
+    def __init__(self, stats_file=None, reorder_every=20):
+        self.stats_file = stats_file or os.environ.get("SELECTOR_STATS_FILE", DEFAULT_STATS_FILE)
+        self.reorder_every = reorder_every
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.pending = {}
+        self.orders = {}
+        self.loaded = False
+
+    def _load_latest(self):
+        """Seed the counters from the most recent snapshot, once per process"""
+        self.loaded = True
+        try:
+            if not os.path.exists(self.stats_file):
+                return
+            last_line = self._read_last_line()
+            if last_line:
+                snapshot = json.loads(last_line)
+                for group, selectors in snapshot.get('groups', {}).items():
+                    for selector, counts in selectors.items():
+                        self.counters.setdefault(group, {})[selector] = {
+                            'hits': counts['hits'],
+                            'misses': counts['misses'],
+                            'seconds': counts['seconds'],
+                        }
+        except Exception as e:
+            logger.error(f"Error loading selector stats from {self.stats_file}: {str(e)}")
+
+    def _read_last_line(self):
+        """The last non-empty line of the stats file, read backwards from the end"""
+        with open(self.stats_file, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            tail = b''
+            while position > 0:
+                step = min(TAIL_BLOCK, position)
+                position -= step
+                f.seek(position)
+                tail = f.read(step) + tail
+                lines = tail.rstrip(b'\n').split(b'\n')
+                if len(lines) > 1 or position == 0:
+                    return lines[-1].decode('utf-8') if lines[-1].strip() else None
+        return None
+
+    def timer(self, group, selector):
+        """Context manager that records one timed evaluation of a selector"""
+        return SelectorTimer(self, group, selector)
+
+    def record(self, group, selector, hit, seconds):
+        """Record one evaluation of a selector"""
+        with self.lock:
+            if not self.loaded:
+                self._load_latest()
+            counts = self.counters.setdefault(group, {}).setdefault(
+                selector, {'hits': 0, 'misses': 0, 'seconds': 0.0})
+            if hit:
+                counts['hits'] += 1
+            else:
+                counts['misses'] += 1
+            counts['seconds'] += seconds
+            self.pending[group] = self.pending.get(group, 0) + 1
+
+    def _score(self, counts, prior_cost):
+        """Hit probability (Laplace-smoothed) per second of average cost"""
+        if counts is None:
+            return 0.5 / prior_cost
+        attempts = counts['hits'] + counts['misses']
+        probability = (counts['hits'] + 1) / (attempts + 2)
+        cost = (counts['seconds'] + prior_cost) / (attempts + 1)
+        return probability / cost
+
+    def ordered(self, group, selectors):
+        """
+        Return the selectors best-first for this group
+
+        Unseen selectors keep their configured relative order.
+        """
+        selectors = list(selectors)
+        with self.lock:
+            if not self.loaded:
+                self._load_latest()
+            cached = self.orders.get(group)
+            if (cached is not None and cached[0] == selectors
+                    and self.pending.get(group, 0) < self.reorder_every):
+                return list(cached[1])
+
+            # Untimed selectors are assumed to cost what this group usually costs
+            group_counts = self.counters.get(group, {})
+            attempts = sum(c['hits'] + c['misses'] for c in group_counts.values())
+            seconds = sum(c['seconds'] for c in group_counts.values())
+            prior_cost = seconds / attempts if attempts and seconds > 0 else PRIOR_COST
+            
+            order = sorted(selectors, key=lambda s: self._score(group_counts.get(s), prior_cost), reverse=True)
+            self.orders[group] = (selectors, order)
+            self.pending[group] = 0
+            return list(order)
+
+    def export(self):
+        """
+        Snapshot of every counter
+
+        Returns:
+            dict: {'taken_at': ..., 'groups': {group: {selector: counts and derived rates}}}
+        """
+        with self.lock:
+            groups = {}
+            for group, selectors in self.counters.items():
+                groups[group] = {}
+                for selector, counts in selectors.items():
+                    attempts = counts['hits'] + counts['misses']
+                    groups[group][selector] = {
+                        'hits': counts['hits'],
+                        'misses': counts['misses'],
+                        'seconds': round(counts['seconds'], 4),
+                        'hit_rate': round(counts['hits'] / attempts, 3) if attempts else None,
+                        'avg_ms': round(1000 * counts['seconds'] / attempts, 2) if attempts else None,
+                    }
+            return {'taken_at': time.strftime("%Y-%m-%d %H:%M:%S"), 'groups': groups}
+
+    def save_snapshot(self):
+        """
+        Append the current counters to the stats file
+
+        Writers in every process take an exclusive flock on <stats_file>.lock;
+        once the file exceeds MAX_STATS_BYTES it is compacted to its latest
+        snapshots (at most KEEP_SNAPSHOTS, and half that size).
+        """
+        if not self.counters:
+            return False
+        try:
+            line = json.dumps(self.export(), ensure_ascii=False) + '\n'
+            with open(self.stats_file + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    with open(self.stats_file, 'a', encoding='utf-8') as f:
+                        f.write(line)
+                        size = f.tell()
+                    if size > MAX_STATS_BYTES:
+                        self._compact()
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving selector stats to {self.stats_file}: {str(e)}")
+            return False
+
+    def _compact(self):
+        """Atomically rewrite the stats file with only its latest snapshots (lock held)"""
+        with open(self.stats_file, 'r', encoding='utf-8') as f:
+            lines = [line for line in f if line.strip()][-KEEP_SNAPSHOTS:]
+        # Keep at most half the size limit so the next compaction is not one save away
+        while len(lines) > 1 and sum(len(line.encode('utf-8')) for line in lines) > MAX_STATS_BYTES // 2:
+            lines.pop(0)
+        directory = os.path.dirname(os.path.abspath(self.stats_file))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+        os.replace(temp_path, self.stats_file)
+        logger.info(f"Compacted {self.stats_file} to its last {len(lines)} snapshots")
+
+# Process-wide counters shared by every scraper and extractor
+SELECTOR_STATS = SelectorStats()
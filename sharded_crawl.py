@@ -0,0 +1,243 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import logging
+import multiprocessing
+from multiprocessing import util
+from urllib.parse import urlparse, urljoin
+from bs4 import BeautifulSoup
+from improved_scraper import ImprovedPropertyScraper, load_config
+from shared_pools import create_session, DriverPool
+from shared_limits import SharedRateLimiter, shared_browser_semaphore, DEFAULT_RATE_PER_HOST, DEFAULT_BURST, \
+    DEFAULT_MAX_BROWSERS
+from output_sink import JsonlSink, merge_jsonl
+from checkpoint import CrawlCheckpoint
+from seen_set import canonicalize_url, property_key
+from selector_stats import SELECTOR_STATS
+
+logger = logging.getLogger(__name__)
+
+# Workers for a sharded crawl (overridable in the config file). The request rate
+# and burst default to the machine-wide ones (shared_limits), so this crawl and
+# any other scraper on the machine refill the shared buckets at the same rate.
+# Each worker keeps its browser (and its browser slot) between pages, so there
+# are no more workers than slots.
+DEFAULT_WORKERS = max(1, min(multiprocessing.cpu_count(), DEFAULT_MAX_BROWSERS))
+
+# Area pages end in a numeric location ID, e.g. /to-rent/western-cape/cape-town/55
+AREA_PATH_PATTERN = re.compile(r'/\d+$')
+
+def expand_region(region_url):
+    """
+    Area URLs linked from a region page
+    
+    A region such as https://www.privateproperty.co.za/to-rent/western-cape
+    links to its areas (.../western-cape/cape-town/55); every link below the
+    region's path that ends in a location ID is taken.
+    
+    Returns:
+        list: Area URLs in page order, or [region_url] if the page links to none
+    """
+    scraper = ImprovedPropertyScraper(region_url)
+    html_content = scraper.fetch_page(region_url)
+    if html_content is None:
+        logger.error(f"Could not fetch region page {region_url}")
+        return [region_url]
+    
+    prefix = urlparse(region_url).path.rstrip('/') + '/'
+    host = urlparse(region_url).netloc.lower()
+    areas = []
+    seen = set()
+    for link in BeautifulSoup(html_content, 'html.parser').select('a[href]'):
+        url = urljoin(region_url, link['href'])
+        parsed = urlparse(url)
+        if parsed.netloc.lower() != host or not parsed.path.startswith(prefix):
+            continue
+        if not AREA_PATH_PATTERN.search(parsed.path.rstrip('/')):
+            continue
+        area = f"{parsed.scheme}://{parsed.netloc}{parsed.path.rstrip('/')}"
+        if canonicalize_url(area) not in seen:
+            seen.add(canonicalize_url(area))
+            areas.append(area)
+    
+    logger.info(f"Region {region_url} expanded into {len(areas)} areas")
+    return areas or [region_url]
+
+def shard_output_file(shard_dir, area_url):
+    """Per-area output file inside shard_dir, named after the area's canonical URL"""
+    key = hashlib.sha1(canonicalize_url(area_url).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(shard_dir, f"area_{key}.json")
+
+# Set in each worker process by _init_worker
+_worker = {}
+
+def _init_worker(rate_limiter, max_browsers):
+    _worker['rate_limiter'] = rate_limiter
+    _worker['session'] = create_session()
+    _worker['driver_pool'] = DriverPool(max_browsers)
+    # Quit the worker's browsers when the pool shuts the process down
+    util.Finalize(None, _worker['driver_pool'].close, exitpriority=10)
+
+def crawl_area(task):
+    """
+    Crawl one area in a worker process
+    
+    Args:
+        task (dict): {'url', 'output_file', 'max_pages', 'resume'}
+    
+    Returns:
+        dict: {'url', 'jsonl_file', 'count', 'pages', 'error'}
+    """
+    url = task['url']
+    try:
+        scraper = ImprovedPropertyScraper(url, output_file=task['output_file'],
+                                          session=_worker.get('session'),
+                                          driver_pool=_worker.get('driver_pool'),
+                                          rate_limiter=_worker.get('rate_limiter'))
+        scraper.scrape(max_pages=task['max_pages'], resume=task['resume'])
+        return {'url': url, 'jsonl_file': scraper.jsonl_file, 'count': len(scraper.properties),
+                'pages': len(scraper.scraped_pages), 'error': None}
+    except Exception as e:
+        logger.error(f"Error crawling area {url}: {str(e)}")
+        return {'url': url, 'jsonl_file': None, 'count': 0, 'pages': 0, 'error': str(e)}
+
+def merge_shards(results, output_file, compress_output=False):
+    """
+    Merge the areas' JSONL shards into one sink, dropping listings seen in an earlier area
+    
+    Neighbouring areas overlap, so a listing is kept once, from the first
+    area (in request order) that has it.
+    
+    Returns:
+        int: Number of listings written
+    """
+    jsonl_file = os.path.splitext(output_file)[0] + ('.jsonl.gz' if compress_output else '.jsonl')
+    sink = JsonlSink(jsonl_file)
+    merge_jsonl([result['jsonl_file'] for result in results], sink, key=property_key)
+    
+    if sink.count:
+        return sink.finalize(output_file)
+    sink.close()
+    return 0
+
+def sharded_crawl(areas, output_file="properties.json", workers=DEFAULT_WORKERS, max_pages=None,
+                  rate=DEFAULT_RATE_PER_HOST, burst=DEFAULT_BURST, max_browsers=1,
+                  compress_output=False, resume=False, sources=None):
+    """
+    Crawl many areas across worker processes and merge them into one output
+    
+    Each area is one task; a worker crawls it with the normal scraper into
+    its own shard (so an area can resume from its own checkpoint) and the
+    shards are merged once every area is done. A run checkpoint records the
+    finished areas (those that produced listings), so resume=True only
+    crawls the rest.
+    
+    Worker browsers stay open between pages and each holds a slot of the
+    machine-wide browser semaphore, so workers * max_browsers is capped at
+    its slot count; further workers would wait for a slot and time out.
+    
+    Args:
+        areas (list): Area URLs
+        output_file (str): Merged JSON output (the JSONL sink sits next to it)
+        workers (int): Worker processes
+        max_pages (int): Last page to crawl in each area (None for all)
+        rate (float): Requests per second per host, across all workers and any
+            other scraper process on the machine (see shared_limits)
+        burst (int): Requests per host that may go out back to back
+        max_browsers (int): Browsers per worker process
+        compress_output (bool): Gzip the merged JSONL sink
+        resume (bool): Continue an interrupted run over the same areas
+        sources (list): What the user asked for (area and region URLs) when
+            areas were expanded from regions. The run checkpoint is keyed on
+            these (default: areas), so a region that links to other areas by
+            the time the run is resumed still finds its checkpoint.
+    
+    Returns:
+        dict: {'areas', 'failed' (areas with an error or no listings), 'count', 'output_file',
+               'workers' (after the caps)}
+    """
+    shard_dir = os.path.splitext(output_file)[0] + '_shards'
+    os.makedirs(shard_dir, exist_ok=True)
+    
+    run_key = 'sharded:' + hashlib.sha1('\n'.join(sorted(sources or areas)).encode('utf-8')).hexdigest()
+    checkpoint = CrawlCheckpoint(os.path.join(shard_dir, 'run.checkpoint.json'))
+    state = checkpoint.load(run_key) if resume else None
+    if resume and state is None:
+        logger.warning(f"No checkpoint of this run in {shard_dir}; crawling every area "
+                       f"(areas resume from their own checkpoints)")
+    done = state['done'] if state else {}
+    if done:
+        logger.info(f"Resuming sharded crawl: {len([url for url in areas if url in done])} of {len(areas)} "
+                    f"areas already done")
+    
+    tasks = [{'url': url, 'output_file': shard_output_file(shard_dir, url), 'max_pages': max_pages,
+              'resume': resume} for url in areas if url not in done]
+    rate_limiter = SharedRateLimiter(rate=rate, burst=burst)
+    semaphore = shared_browser_semaphore()
+    if semaphore and workers * max_browsers > semaphore.slots:
+        logger.warning(f"Only {semaphore.slots} browser slots for {workers} workers with {max_browsers} "
+                       f"browsers each; using {max(1, semaphore.slots // max_browsers)} workers")
+        workers = max(1, semaphore.slots // max_browsers)
+    workers = max(1, min(workers, len(tasks) or 1))
+    logger.info(f"Crawling {len(tasks)} areas with {workers} workers at {rate} requests/s per host")
+    
+    if tasks:
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(rate_limiter, max_browsers)) as pool:
+            for result in pool.imap_unordered(crawl_area, tasks):
+                logger.info(f"Area {result['url']}: {result['count']} listings from {result['pages']} pages"
+                            + (f" (error: {result['error']})" if result['error'] else ""))
+                # An area without listings most likely failed to load; leave it for --resume
+                if not result['error'] and result['count']:
+                    done[result['url']] = result
+                    checkpoint.save({'base_url': run_key, 'done': done})
+            pool.close()
+            pool.join()
+    
+    # Areas finished before a resume that the regions no longer link to are kept, after the rest
+    failed = [url for url in areas if url not in done]
+    merged = [url for url in areas if url in done] + [url for url in done if url not in areas]
+    count = merge_shards([done[url] for url in merged], output_file, compress_output)
+    logger.info(f"Merged {count} listings from {len(done)} areas into {output_file}")
+    if not failed:
+        checkpoint.clear()
+    else:
+        logger.warning(f"{len(failed)} areas failed; run again with --resume to retry them")
+    
+    SELECTOR_STATS.save_snapshot()
+    return {'areas': len(areas), 'failed': failed, 'count': count, 'output_file': output_file,
+            'workers': workers}
+
+if __name__ == "__main__":
+    # Usage: python sharded_crawl.py [config.json] [--resume]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    config = load_config(args[0]) if args else load_config()
+    
+    # Areas to crawl: listed directly and/or expanded from region pages
+    areas = list(config.get("areas", []))
+    for region in config.get("regions", []):
+        areas.extend(expand_region(region))
+    if not areas and config.get("target_url"):
+        areas = [config["target_url"]]
+    sources = list(config.get("areas", [])) + list(config.get("regions", [])) or areas
+    
+    # Drop duplicates (areas listed twice or reached from two regions)
+    unique = {}
+    for url in areas:
+        unique.setdefault(canonicalize_url(url), url)
+    areas = list(unique.values())
+    
+    result = sharded_crawl(
+        areas,
+        output_file=config.get("output_file", "properties.json"),
+        workers=config.get("workers", DEFAULT_WORKERS),
+        max_pages=config.get("max_pages"),
+        rate=config.get("rate_per_host", DEFAULT_RATE_PER_HOST),
+        burst=config.get("burst", DEFAULT_BURST),
+        max_browsers=config.get("browsers_per_worker", 1),
+        compress_output=config.get("compress_output", False),
+        resume="--resume" in sys.argv[1:] or config.get("resume", False),
+        sources=sources
+    )
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,174 @@
+import os
+import re
+import time
+import fcntl
+import struct
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Limits shared by every scraper process on this machine (SHARED_LIMITS=off disables them)
+SHARED_LIMITS_ENABLED = os.environ.get('SHARED_LIMITS', 'on').lower() not in ('0', 'off', 'false', 'no')
+DEFAULT_LIMITS_DIR = os.environ.get('SHARED_LIMITS_DIR', os.path.join(tempfile.gettempdir(), 'scraper_limits'))
+DEFAULT_RATE_PER_HOST = float(os.environ.get('SHARED_RATE_PER_HOST', 4.0))
+DEFAULT_BURST = int(os.environ.get('SHARED_BURST', 8))
+DEFAULT_MAX_BROWSERS = int(os.environ.get('SHARED_MAX_BROWSERS', 4))
+
+# How long a caller waits for a browser slot before giving up
+DEFAULT_SLOT_TIMEOUT = 300
+
+BUCKET = struct.Struct('<dd')  # tokens, last update (epoch seconds)
+
+def _host_key(url):
+    host = urlparse(url).netloc.lower() if url else ''
+    return re.sub(r'[^a-z0-9.-]', '_', host) or 'default'
+
+class SharedRateLimiter:
+    """
+    Token bucket per host, shared by every process on the machine
+    
+    Each host's bucket is 16 bytes in its own file under `directory`, read
+    and updated under an exclusive flock, so all processes (and threads)
+    using the same directory draw from one bucket. Nothing is held open
+    between calls, so an instance can be passed to worker processes.
+    Processes should agree on rate and burst; each refills at its own.
+    """
+    
+    def __init__(self, directory=DEFAULT_LIMITS_DIR, rate=DEFAULT_RATE_PER_HOST, burst=DEFAULT_BURST):
+        self.directory = directory
+        self.rate = rate
+        self.burst = burst
+        os.makedirs(directory, exist_ok=True)
+    
+    def acquire(self, url=None):
+        """
+        Wait for a request slot for url's host
+        
+        Returns:
+            float: Seconds spent waiting
+        """
+        path = os.path.join(self.directory, f"rate_{_host_key(url)}.bucket")
+        waited = 0.0
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            while True:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    now = time.time()
+                    data = os.pread(fd, BUCKET.size, 0)
+                    tokens, updated = BUCKET.unpack(data) if len(data) == BUCKET.size else (self.burst, now)
+                    tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+                    if tokens >= 1:
+                        os.pwrite(fd, BUCKET.pack(tokens - 1, now), 0)
+                        return waited
+                    os.pwrite(fd, BUCKET.pack(tokens, now), 0)
+                    delay = (1 - tokens) / self.rate
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                time.sleep(delay)
+                waited += delay
+        finally:
+            os.close(fd)
+
+class BrowserSemaphore:
+    """
+    At most `slots` browsers at once across every process on the machine
+    
+    Slot i is an exclusive flock on browser_slot_<i>.lock. A process that
+    dies releases its slots with its file descriptors, so a crash never
+    leaks one.
+    """
+    
+    def __init__(self, directory=DEFAULT_LIMITS_DIR, slots=DEFAULT_MAX_BROWSERS,
+                 timeout=DEFAULT_SLOT_TIMEOUT, poll_interval=0.5):
+        self.directory = directory
+        self.slots = slots
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.held = {}
+        os.makedirs(directory, exist_ok=True)
+    
+    def acquire(self, timeout=None):
+        """
+        Take a free slot, waiting for one if all are held
+        
+        Returns:
+            int: The slot; hand it back with release()
+        
+        Raises:
+            TimeoutError: If no slot came free within the timeout
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.time() + timeout
+        logged = False
+        while True:
+            for slot in range(self.slots):
+                with self.lock:
+                    if slot in self.held:
+                        continue
+                    fd = os.open(os.path.join(self.directory, f"browser_slot_{slot}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        os.close(fd)
+                        continue
+                    self.held[slot] = fd
+                    return slot
+            if time.time() >= deadline:
+                raise TimeoutError(f"No browser slot free after {timeout}s ({self.slots} in use)")
+            if not logged:
+                logger.info(f"All {self.slots} browser slots are in use; waiting")
+                logged = True
+            time.sleep(self.poll_interval)
+    
+    def release(self, slot):
+        with self.lock:
+            fd = self.held.pop(slot, None)
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+    
+    @contextmanager
+    def slot(self):
+        """Hold a browser slot for a with block"""
+        slot = self.acquire()
+        try:
+            yield slot
+        finally:
+            self.release(slot)
+    
+    def __getstate__(self):
+        # Held slots belong to this process; a copy in a worker starts with none
+        state = dict(self.__dict__, held={})
+        del state['lock']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+def shared_rate_limiter():
+    """The machine-wide SharedRateLimiter from the SHARED_* settings, or None if disabled"""
+    if not SHARED_LIMITS_ENABLED:
+        return None
+    with _shared_lock:
+        if 'rate_limiter' not in _shared:
+            _shared['rate_limiter'] = SharedRateLimiter()
+        return _shared['rate_limiter']
+
+def shared_browser_semaphore():
+    """The machine-wide BrowserSemaphore from the SHARED_* settings, or None if disabled"""
+    if not SHARED_LIMITS_ENABLED:
+        return None
+    with _shared_lock:
+        if 'browser_semaphore' not in _shared:
+            _shared['browser_semaphore'] = BrowserSemaphore()
+        return _shared['browser_semaphore']
@@ -0,0 +1,176 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from shared_limits import shared_browser_semaphore
+
+logger = logging.getLogger(__name__)
+
+def create_session(pool_size=10):
+    """
+    A requests session whose connection pool can serve pool_size threads at once
+    
+    The default adapter keeps 10 connections per host and discards the
+    rest, so concurrent fetches beyond that reconnect (and renegotiate TLS)
+    on every request.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+class RateLimiter:
+    """
+    Token bucket per host, shared by every thread of a process
+    
+    Each host gets `burst` tokens that refill at `rate` per second;
+    acquire() takes one, sleeping until one is available.
+    """
+    
+    def __init__(self, rate=2.0, burst=4):
+        self.rate = rate
+        self.burst = burst
+        self.lock = threading.Lock()
+        self.buckets = {}
+    
+    def acquire(self, url=None):
+        """
+        Wait for a request slot for url's host
+        
+        Returns:
+            float: Seconds spent waiting
+        """
+        host = urlparse(url).netloc.lower() if url else ''
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                tokens, updated = self.buckets.get(host, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - updated) * self.rate)
+                if tokens >= 1:
+                    self.buckets[host] = (tokens - 1, now)
+                    return waited
+                self.buckets[host] = (tokens, now)
+                delay = (1 - tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+class DriverPool:
+    """
+    At most `size` browsers, reused across pages and scrapers
+    
+    acquire() hands out an idle driver, starts a new one while fewer than
+    `size` exist, and otherwise blocks until one is released. A driver
+    released as broken (or after close()) is quit instead of kept.
+    
+    Every driver also holds a slot of the machine-wide browser semaphore
+    (see shared_limits) from launch until it is quit, so pools in separate
+    processes together stay under its limit.
+    """
+    
+    def __init__(self, size=2, semaphore=None):
+        self.size = size
+        self.semaphore = semaphore or shared_browser_semaphore()
+        self.condition = threading.Condition()
+        self.idle = []
+        self.busy = set()
+        self.slots = {}
+        self.starting = 0
+        self.closed = False
+    
+    def acquire(self, create):
+        """
+        Borrow a driver
+        
+        Args:
+            create (callable): create() -> a new driver, used when the pool has room
+        
+        Returns:
+            WebDriver: The driver; hand it back with release()
+        """
+        with self.condition:
+            while True:
+                if self.closed:
+                    raise RuntimeError("Driver pool is closed")
+                if self.idle:
+                    driver = self.idle.pop()
+                    self.busy.add(driver)
+                    return driver
+                if len(self.busy) + self.starting < self.size:
+                    self.starting += 1
+                    break
+                self.condition.wait()
+        
+        slot = None
+        try:
+            if self.semaphore:
+                slot = self.semaphore.acquire()
+            driver = create()
+        except BaseException:
+            if slot is not None:
+                self.semaphore.release(slot)
+            with self.condition:
+                self.starting -= 1
+                self.condition.notify()
+            raise
+        
+        with self.condition:
+            self.starting -= 1
+            self.busy.add(driver)
+            if slot is not None:
+                self.slots[driver] = slot
+        return driver
+    
+    def release(self, driver, broken=False):
+        """Hand a driver back (releasing one that is not checked out does nothing)"""
+        with self.condition:
+            if driver not in self.busy:
+                return
+            self.busy.discard(driver)
+            keep = not broken and not self.closed
+            if keep:
+                self.idle.append(driver)
+            self.condition.notify()
+        if not keep:
+            self._quit(driver)
+    
+    @contextmanager
+    def driver(self, create):
+        """Borrow a driver for a with block; it is quit if the block raises"""
+        driver = self.acquire(create)
+        broken = True
+        try:
+            yield driver
+            broken = False
+        finally:
+            self.release(driver, broken=broken)
+    
+    def _quit(self, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.debug(f"Error quitting pooled driver: {str(e)}")
+        with self.condition:
+            slot = self.slots.pop(driver, None)
+        if slot is not None:
+            self.semaphore.release(slot)
+    
+    def close(self):
+        """Quit idle drivers now and busy ones when they are released"""
+        with self.condition:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.condition.notify_all()
+        for driver in idle:
+            self._quit(driver)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import fcntl
+import hashlib
+import inspect
+import logging
+import tempfile
+import functools
+import threading
+from concurrent.futures import Future
+from result_cache import normalize_params
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLIGHT_DIR = os.environ.get('SINGLE_FLIGHT_DIR', os.path.join(tempfile.gettempdir(), 'scraper_single_flight'))
+
+# How long a caller waits for another process's computation before doing its own
+DEFAULT_WAIT_TIMEOUT = 300
+
+# Result files only hand a result to processes already waiting; older ones are removed
+RESULT_RETENTION = 600
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into one computation
+    
+    Within a process, the first caller for a key (the leader) computes and
+    every concurrent caller with the same key waits on the leader's Future.
+    Across processes, the leader also holds an exclusive flock on the key's
+    lock file while it computes and writes the result to a result file
+    before releasing it; a process that finds the lock taken waits for it
+    and then reads that result instead of computing again. If the other
+    process failed (no fresh result file) or the wait times out, the
+    caller computes itself.
+    """
+    
+    def __init__(self, directory=DEFAULT_FLIGHT_DIR, wait_timeout=DEFAULT_WAIT_TIMEOUT, poll_interval=0.25):
+        self.directory = directory
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        os.makedirs(directory, exist_ok=True)
+    
+    def key_for(self, params):
+        return hashlib.sha256(normalize_params(params).encode('utf-8')).hexdigest()[:32]
+    
+    def do(self, key, compute):
+        """
+        Run compute() once for all concurrent callers with the same key
+        
+        Returns:
+            tuple: (result, shared) where shared is True if another caller computed it
+        """
+        with self.lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.in_flight[key] = future
+        
+        if not leader:
+            logger.info(f"Waiting for in-flight computation {key[:8]}")
+            return future.result(), True
+        
+        try:
+            result, shared = self._do_across_processes(key, compute)
+            future.set_result(result)
+            return result, shared
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+    
+    def _do_across_processes(self, key, compute):
+        lock_path = os.path.join(self.directory, key + '.lock')
+        result_path = os.path.join(self.directory, key + '.result.json')
+        started = time.time()
+        
+        with open(lock_path, 'a') as lock_file:
+            locked = self._acquire(lock_file, started)
+            try:
+                if locked == 'waited':
+                    # We had to wait: another process just computed this
+                    result = self._read_result(result_path, started)
+                    if result is not None:
+                        logger.info(f"Shared result of computation {key[:8]} from another process")
+                        return result, True
+                
+                result = compute()
+                if locked is not None:
+                    self._write_result(result_path, result)
+                return result, False
+            finally:
+                if locked is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                self._prune()
+    
+    def _acquire(self, lock_file, started):
+        """
+        Take the flock, waiting up to wait_timeout
+        
+        Returns:
+            str: 'free' if nobody held it, 'waited' if another process did, None on timeout
+        """
+        deadline = started + self.wait_timeout
+        state = 'free'
+        while True:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return state
+            except BlockingIOError:
+                state = 'waited'
+                if time.time() >= deadline:
+                    logger.warning("Timed out waiting for another process; computing without the lock")
+                    return None
+                time.sleep(self.poll_interval)
+    
+    def _read_result(self, result_path, since):
+        try:
+            with open(result_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if entry['finished_at'] >= since:
+                return entry['result']
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+    
+    def _write_result(self, result_path, result):
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'finished_at': time.time(), 'result': result}, f, ensure_ascii=False)
+            os.replace(temp_path, result_path)
+        except Exception as e:
+            logger.error(f"Error writing single-flight result: {str(e)}")
+    
+    def _prune(self):
+        cutoff = time.time() - RESULT_RETENTION
+        try:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if name.endswith('.result.json') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+        except OSError as e:
+            logger.debug(f"Error pruning single-flight results: {str(e)}")
+    
+    def coalesce(self, name):
+        """
+        Decorator: concurrent calls with equal arguments share one computation
+        
+        The key is `name` plus the call's arguments (URLs canonicalized), so
+        f(url) and f(url=url) coalesce. Results must be JSON-serialisable to
+        be shared across processes.
+        """
+        def decorator(func):
+            signature = inspect.signature(func)
+            
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = self.key_for(dict(bound.arguments, handler=name))
+                result, shared = self.do(key, lambda: func(*args, **kwargs))
+                return result
+            return wrapper
+        return decorator
@@ -0,0 +1,304 @@
+import os
+import json
+import logging
+import soupsieve
+from urllib.parse import urlparse, urljoin
+
+logger = logging.getLogger(__name__)
+
+# Schema file shipped next to this module; SITE_SCHEMAS_FILE can point elsewhere
+DEFAULT_SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "site_schemas.json")
+
+# Host key used when no site-specific schema matches
+DEFAULT_SITE = "*"
+
+# Reads every field of every card in one browser round trip. Mirrors
+# WebElement.get_attribute(): the DOM property wins (so href/src come back
+# resolved), falling back to the raw attribute.
+BULK_EXTRACT_JS = """
+var elements = arguments[0];
+var variants = arguments[1];
+
+function readValue(node, attr) {
+    if (attr === 'text') {
+        return node.innerText || '';
+    }
+    var prop = node[attr];
+    if (typeof prop === 'string' && prop) {
+        return prop;
+    }
+    return node.getAttribute(attr);
+}
+
+function pick(root, selectors) {
+    if (!selectors.length) {
+        return root;
+    }
+    for (var i = 0; i < selectors.length; i++) {
+        var found = root.querySelector(selectors[i]);
+        if (found) {
+            return found;
+        }
+    }
+    return null;
+}
+
+return elements.map(function(el) {
+    var index = variants.length - 1;
+    for (var v = 0; v < variants.length; v++) {
+        if (variants[v].when_class === null || el.classList.contains(variants[v].when_class)) {
+            index = v;
+            break;
+        }
+    }
+    var raw = {};
+    variants[index].fields.forEach(function(field) {
+        if (field.variant) {
+            return;
+        }
+        if (field.many) {
+            var items = [];
+            el.querySelectorAll(field.selectors[0]).forEach(function(node) {
+                items.push([field.key_attr ? readValue(node, field.key_attr) : null, readValue(node, field.attr)]);
+            });
+            raw[field.name] = items;
+        } else {
+            var node = pick(el, field.selectors);
+            raw[field.name] = node ? readValue(node, field.attr) : null;
+        }
+    });
+    return {variant: index, raw: raw};
+});
+"""
+
+def _absolute_url(value, base_url):
+    """Resolve a site-relative link against the scraper's base URL"""
+    if value and not value.startswith('http'):
+        parsed = urlparse(base_url if '//' in base_url else f"https://{base_url}")
+        return urljoin(f"{parsed.scheme}://{parsed.netloc}/", value)
+    return value
+
+# Transforms a schema field can name; each takes (value, base_url)
+TRANSFORMS = {
+    "strip": lambda value, base_url: value.strip(),
+    "lower": lambda value, base_url: value.lower(),
+    "absolute_url": _absolute_url,
+}
+
+class CompiledField:
+    """One output field of a site schema with its selectors compiled"""
+    
+    def __init__(self, name, spec, prefix=None):
+        self.name = name
+        self.attr = spec.get("attr", "text")
+        self.default = spec.get("default")
+        self.many = spec.get("many", False)
+        self.key_attr = spec.get("key_attr")
+        self.variant_value = spec.get("variant")
+        
+        selectors = spec.get("selector", [])
+        if isinstance(selectors, str):
+            selectors = [selectors]
+        if prefix is not None:
+            selectors = [selector.replace("{prefix}", prefix) for selector in selectors]
+        self.selectors = selectors
+        self.matchers = [soupsieve.compile(selector) for selector in selectors]
+        
+        # Text is always stripped, like the hand-written extractors did
+        transform = spec.get("transform", "strip" if self.attr == "text" else None)
+        self.transform = TRANSFORMS[transform] if transform else None
+        key_transform = spec.get("key_transform")
+        self.key_transform = TRANSFORMS[key_transform] if key_transform else None
+    
+    def finish(self, value, base_url):
+        """Apply the field transform and default to a raw extracted value"""
+        if value is None:
+            return self.default
+        if self.transform:
+            value = self.transform(value, base_url)
+        return value
+    
+    def finish_many(self, pairs, base_url):
+        """Turn (key, value) pairs from a repeated field into a dict"""
+        result = {}
+        for key, value in pairs:
+            if not key:
+                continue
+            if self.key_transform:
+                key = self.key_transform(key, base_url)
+            result[key] = value.strip() if self.attr == "text" else value
+        return result
+    
+    def read_soup(self, elem):
+        """Read this field's raw value from a BeautifulSoup element"""
+        if self.many:
+            return [(node.get(self.key_attr, '') if self.key_attr else None, self._soup_value(node))
+                    for node in self.matchers[0].select(elem)]
+        
+        if not self.matchers:
+            return self._soup_value(elem)
+        for matcher in self.matchers:
+            node = matcher.select_one(elem)
+            if node is not None:
+                return self._soup_value(node)
+        return None
+    
+    def _soup_value(self, node):
+        if self.attr == "text":
+            return node.text
+        return node.get(self.attr)
+    
+    def js_spec(self):
+        """Serializable description of this field for BULK_EXTRACT_JS"""
+        return {
+            "name": self.name,
+            "selectors": self.selectors,
+            "attr": self.attr,
+            "many": self.many,
+            "key_attr": self.key_attr,
+            "variant": self.variant_value,
+        }
+
+class CompiledSiteSchema:
+    """A site's extraction schema, compiled once and shared by both scraping engines"""
+    
+    def __init__(self, name, spec):
+        self.name = name
+        self.containers = list(spec.get("containers", []))
+        
+        variants = spec.get("variants") or [{}]
+        self.variants = []
+        for variant in variants:
+            prefix = variant.get("prefix")
+            fields = [CompiledField(field_name, field_spec, prefix)
+                      for field_name, field_spec in spec.get("fields", {}).items()]
+            self.variants.append({
+                "when_class": variant.get("when_class"),
+                "values": variant.get("values", {}),
+                "fields": fields,
+            })
+        
+        # Built once so every Selenium page reuses the same payload
+        self.js_variants = [
+            {"when_class": variant["when_class"], "fields": [field.js_spec() for field in variant["fields"]]}
+            for variant in self.variants
+        ]
+    
+    def _variant_for_classes(self, classes):
+        for variant in self.variants:
+            if variant["when_class"] is None or variant["when_class"] in classes:
+                return variant
+        return self.variants[-1]
+    
+    def _build(self, variant, raw, base_url):
+        property_data = {}
+        for field in variant["fields"]:
+            if field.variant_value:
+                property_data[field.name] = variant["values"].get(field.variant_value)
+            elif field.many:
+                property_data[field.name] = field.finish_many(raw.get(field.name) or [], base_url)
+            else:
+                property_data[field.name] = field.finish(raw.get(field.name), base_url)
+        return property_data
+    
+    def extract_soup(self, elem, base_url):
+        """
+        Extract one property from a BeautifulSoup container element
+        
+        Args:
+            elem: The listing card element
+            base_url (str): URL used to resolve relative links
+        
+        Returns:
+            dict: The property data, with fields in schema order
+        """
+        variant = self._variant_for_classes(elem.get('class', []))
+        raw = {field.name: field.read_soup(elem) for field in variant["fields"] if not field.variant_value}
+        return self._build(variant, raw, base_url)
+    
+    def extract_selenium(self, driver, elements, base_url):
+        """
+        Extract every property from Selenium container elements in one script call
+        
+        Args:
+            driver: The WebDriver the elements belong to
+            elements (list): The listing card WebElements
+            base_url (str): URL used to resolve relative links
+        
+        Returns:
+            list: The property data for each element, in order
+        """
+        if not elements:
+            return []
+        rows = driver.execute_script(BULK_EXTRACT_JS, elements, self.js_variants)
+        return [self._build(self.variants[row["variant"]], row["raw"], base_url) for row in rows]
+
+# Raw schema specs keyed by host, and the compiled schemas built from them
+_schema_specs = None
+_compiled_schemas = {}
+
+def load_site_schemas(schema_file=None):
+    """
+    Load site schemas from a JSON file and reset the compiled cache
+    
+    Args:
+        schema_file (str): Path to the schema file (defaults to SITE_SCHEMAS_FILE or site_schemas.json)
+    
+    Returns:
+        dict: The raw schema specs keyed by host
+    """
+    global _schema_specs
+    schema_file = schema_file or os.environ.get("SITE_SCHEMAS_FILE", DEFAULT_SCHEMA_FILE)
+    
+    specs = {}
+    try:
+        with open(schema_file, 'r', encoding='utf-8') as f:
+            specs = json.load(f)
+        logger.info(f"Loaded {len(specs)} site schemas from {schema_file}")
+    except Exception as e:
+        logger.error(f"Error loading site schemas from {schema_file}: {str(e)}")
+    
+    # Always keep a generic schema to fall back on
+    specs.setdefault(DEFAULT_SITE, {"fields": {}})
+    
+    _schema_specs = {host.lower(): spec for host, spec in specs.items()}
+    _compiled_schemas.clear()
+    return _schema_specs
+
+def register_site_schema(host, spec):
+    """Add or replace the schema for a host at runtime"""
+    if _schema_specs is None:
+        load_site_schemas()
+    host = host.lower()
+    _schema_specs[host] = spec
+    _compiled_schemas.pop(host, None)
+
+def _compiled(host):
+    schema = _compiled_schemas.get(host)
+    if schema is None:
+        schema = CompiledSiteSchema(host, _schema_specs[host])
+        _compiled_schemas[host] = schema
+    return schema
+
+def get_site_schema(url_or_host):
+    """
+    Look up the compiled schema for a URL or host name
+    
+    The host and then each parent domain are tried as dict keys, so
+    www.privateproperty.co.za resolves to the privateproperty.co.za schema.
+    
+    Returns:
+        CompiledSiteSchema: The site's schema, or the generic one
+    """
+    if _schema_specs is None:
+        load_site_schemas()
+    
+    host = urlparse(url_or_host).netloc if '//' in url_or_host else url_or_host.split('/')[0]
+    host = host.split(':')[0].lower()
+    
+    labels = host.split('.')
+    for i in range(len(labels)):
+        candidate = '.'.join(labels[i:])
+        if candidate in _schema_specs:
+            return _compiled(candidate)
+    return _compiled(DEFAULT_SITE)
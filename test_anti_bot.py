@@ -0,0 +1,69 @@
+import sys
+import time
+from email.utils import formatdate
+
+from anti_bot import (AntiBotDetector, classify_response, parse_retry_after, BLOCK_PAGE_MAX_BYTES,
+                      DEFAULT_BACKOFF, MAX_BACKOFF)
+
+LISTINGS_PAGE = '<html><body>' + '<div class="listing-result">Flat</div>' * 2000 + '</body></html>'
+
+def test_scan():
+    """One scan finds every term, terms inside longer ones, and which ones sit in scripts"""
+    detector = AntiBotDetector()
+    scan = detector.scan('<p>Please complete the reCAPTCHA</p><script src="/cloudflare/botdetect.js"></script>'
+                         '<p>Cloudflare</p>')
+    assert {'recaptcha', 'captcha', 'cloudflare', 'botdetect'} <= scan['terms']
+    assert scan['script_terms'] == {'cloudflare', 'botdetect'}
+    assert detector.scan(b'') == {'terms': set(), 'script_terms': set()}
+    
+    issues = detector.describe(scan)
+    assert "Potential CAPTCHA detected (captcha)" in issues
+    assert "Bot detection script found (botdetect)" in issues
+    # Bot terms outside scripts are not reported as scripts
+    assert not any('script' in issue for issue in detector.describe(detector.scan('<p>cloudflare</p>')))
+    print("✓ Terms are found in one scan and script terms are told apart")
+
+def test_classify():
+    """Each kind of response gets the matching reaction"""
+    assert classify_response(200, LISTINGS_PAGE)['action'] == 'ok'
+    assert classify_response(500, b'Server error')['action'] == 'failed'
+    
+    verdict = classify_response(429, b'', {'Retry-After': '30'})
+    assert verdict['action'] == 'backoff' and verdict['retry_after'] == 30
+    assert classify_response(200, b'<h1>Too Many Requests</h1>')['action'] == 'backoff'
+    
+    assert classify_response(200, b'<title>Just a moment...</title><div id="cf-chl-widget">')['action'] == 'selenium'
+    assert classify_response(403, b'<p>Please verify you are human</p>')['action'] == 'selenium'
+    assert classify_response(403, b'Forbidden')['action'] == 'cookie_handoff'
+    assert classify_response(200, b'<h1>Access Denied</h1>')['action'] == 'cookie_handoff'
+    print("✓ Responses are classified as ok, backoff, selenium, cookie handoff or failed")
+
+def test_incidental_terms_on_full_pages():
+    """A full-size page that mentions a captcha or a block is still a normal page"""
+    page = LISTINGS_PAGE + '<script src="https://www.google.com/recaptcha/api.js"></script><p>Blocked dates</p>'
+    assert len(page) > BLOCK_PAGE_MAX_BYTES
+    verdict = classify_response(200, page)
+    assert verdict['action'] == 'ok'
+    assert "Potential CAPTCHA detected (recaptcha)" in verdict['issues']
+    print("✓ Incidental terms on full-size pages do not derail the scrape")
+
+def test_retry_after():
+    """Retry-After is read as seconds or an HTTP date and capped"""
+    assert parse_retry_after(None) == DEFAULT_BACKOFF
+    assert parse_retry_after('12') == 12
+    assert parse_retry_after('100000') == MAX_BACKOFF
+    assert parse_retry_after('not a date') == DEFAULT_BACKOFF
+    assert 50 <= parse_retry_after(formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert parse_retry_after(formatdate(time.time() - 60, usegmt=True)) == 0
+    print("✓ Retry-After headers are parsed and capped")
+
+if __name__ == "__main__":
+    try:
+        test_scan()
+        test_classify()
+        test_incidental_terms_on_full_pages()
+        test_retry_after()
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    print("All anti-bot tests passed")
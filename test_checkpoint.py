@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+import tempfile
+
+from checkpoint import CrawlCheckpoint
+
+BASE_URL = "https://www.privateproperty.co.za/to-rent/western-cape/cape-town/55"
+STATE = {'base_url': BASE_URL, 'next_url': BASE_URL + '?page=4', 'page': 4, 'retries': 0,
+         'scraped_pages': [BASE_URL, BASE_URL + '?page=2', BASE_URL + '?page=3'],
+         'sink_path': 'properties.jsonl', 'sink_offset': 18234, 'sink_count': 60}
+
+def new_checkpoint():
+    return CrawlCheckpoint(os.path.join(tempfile.mkdtemp(prefix='test_checkpoint_'), 'checkpoint.json'))
+
+def test_save_and_load():
+    """A saved state loads back with its save time added"""
+    checkpoint = new_checkpoint()
+    assert checkpoint.load() is None
+    checkpoint.save(STATE)
+    state = checkpoint.load(BASE_URL)
+    assert 'saved_at' in state
+    assert {key: value for key, value in state.items() if key != 'saved_at'} == STATE
+    
+    checkpoint.save(dict(STATE, page=5))
+    assert checkpoint.load()['page'] == 5
+    assert [name for name in os.listdir(os.path.dirname(checkpoint.path))] == ['checkpoint.json']
+    print("✓ Checkpoints round-trip")
+
+def test_other_crawls_are_ignored():
+    """A checkpoint of a crawl from another URL is not resumed"""
+    checkpoint = new_checkpoint()
+    checkpoint.save(STATE)
+    assert checkpoint.load(BASE_URL + '/other') is None
+    assert checkpoint.load() is not None
+    print("✓ Checkpoints of other crawls are ignored")
+
+def test_failed_save_keeps_the_previous_checkpoint():
+    """A state that cannot be written leaves the last good checkpoint in place"""
+    checkpoint = new_checkpoint()
+    checkpoint.save(STATE)
+    checkpoint.save(dict(STATE, page=object()))  # not JSON-serialisable
+    assert checkpoint.load(BASE_URL)['page'] == 4
+    assert os.listdir(os.path.dirname(checkpoint.path)) == ['checkpoint.json']
+    print("✓ A failed save keeps the previous checkpoint")
+
+def test_corrupt_and_cleared_checkpoints():
+    """An unreadable checkpoint means starting over, as does a cleared one"""
+    checkpoint = new_checkpoint()
+    with open(checkpoint.path, 'w') as f:
+        f.write('{"base_url": ')
+    assert checkpoint.load() is None
+    
+    checkpoint.save(STATE)
+    checkpoint.clear()
+    assert not os.path.exists(checkpoint.path)
+    assert checkpoint.load() is None
+    checkpoint.clear()
+    print("✓ Corrupt and cleared checkpoints are not resumed")
+
+if __name__ == "__main__":
+    try:
+        test_save_and_load()
+        test_other_crawls_are_ignored()
+        test_failed_save_keeps_the_previous_checkpoint()
+        test_corrupt_and_cleared_checkpoints()
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    print("All checkpoint tests passed")
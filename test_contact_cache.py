@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import tempfile
+from unittest import mock
+
+# Keep the test away from the shared limiter, the selector files and the contact cache of real crawls
+TEST_DIR = tempfile.mkdtemp(prefix='test_contact_cache_')
+os.environ['SHARED_LIMITS'] = 'off'
+os.environ['SELECTOR_STATS_FILE'] = os.path.join(TEST_DIR, 'selector_stats.jsonl')
+os.environ['SELECTOR_PROFILES_FILE'] = os.path.join(TEST_DIR, 'selector_profiles.json')
+os.environ['CONTACT_CACHE_DB'] = os.path.join(TEST_DIR, 'contacts.db')
+
+import main
+from contact_cache import ContactCache, agent_keys
+
+AGENT = {'name': 'Jane  Doe', 'agency': 'Acme Realty', 'data-agent-id': '123', 'data-listing-id': 'RR1'}
+RECORD = {'phone_numbers': ['021 555 0100'], 'agent': {'name': 'Jane Doe', 'phone': '021 555 0100'}}
+
+def new_cache(**options):
+    return ContactCache(os.path.join(tempfile.mkdtemp(prefix='test_contact_cache_'), 'contacts.db'), **options)
+
+def test_agent_keys():
+    """Agents are keyed by ID, name and agency, and each name on its own"""
+    keys = agent_keys(AGENT, 'JANE DOE', 'Other Name')
+    assert keys == ['data-agent-id:123', 'name:jane doe|acme realty', 'name:jane doe', 'name:acme realty',
+                    'name:other name'], keys
+    assert agent_keys() == []
+    assert agent_keys(None, 'Jane') == ['name:jane']
+    print("✓ Agent keys cover IDs, name with agency and plain names")
+
+def test_listing_and_agent_hits():
+    """A cached listing is a listing hit; another listing by the same agent is an agent hit"""
+    cache = new_cache()
+    keys = agent_keys(AGENT)
+    assert cache.lookup('RR1', keys) == (None, None)
+    
+    cache.put('RR1', RECORD, keys)
+    assert cache.lookup('RR1', keys) == (RECORD, 'listing')
+    assert cache.lookup('RR2', agent_keys({'name': 'jane doe'})) == (RECORD, 'agent')
+    assert cache.lookup('RR3', agent_keys({'name': 'Someone Else'})) == (None, None)
+    cache.close()
+    print("✓ Listings and agents are looked up from the cache")
+
+def test_records_without_details_are_not_shared():
+    """A record with no phone number is cached for its listing but not for the agent"""
+    cache = new_cache()
+    keys = agent_keys(AGENT)
+    cache.put('RR1', {'phone_numbers': [], 'agent': {'name': 'Jane Doe'}}, keys)
+    assert cache.lookup('RR1', keys)[1] == 'listing'
+    assert cache.lookup('RR2', keys) == (None, None)
+    cache.close()
+    print("✓ Records without contact details are not shared between listings")
+
+def test_negative_entries():
+    """A failed lookup is remembered briefly, then retried"""
+    cache = new_cache(negative_ttl=0.2)
+    keys = agent_keys(AGENT)
+    cache.put_failure('RR1', 'Timed out')
+    assert cache.lookup('RR1', keys) == ({'error': 'Timed out'}, 'negative')
+    
+    time.sleep(0.3)
+    assert cache.lookup('RR1', keys) == (None, None)
+    cache.put('RR1', RECORD, keys)
+    assert cache.lookup('RR1', keys) == (RECORD, 'listing')
+    cache.close()
+    print("✓ Failed lookups are cached until the negative TTL passes")
+
+def test_expiry_and_persistence():
+    """Entries survive reopening until they expire, and prune() removes them"""
+    path = os.path.join(tempfile.mkdtemp(prefix='test_contact_cache_'), 'contacts.db')
+    cache = ContactCache(path, ttl=0.2, agent_ttl=0.2)
+    cache.put('RR1', RECORD, agent_keys(AGENT))
+    cache.close()
+    
+    cache = ContactCache(path)
+    assert cache.lookup('RR1')[1] == 'listing'
+    time.sleep(0.3)
+    assert cache.lookup('RR1', agent_keys(AGENT)) == (None, None)
+    assert cache.prune() == 1 + len(agent_keys(AGENT))
+    cache.close()
+    print("✓ Entries persist until they expire")
+
+def test_only_conclusive_lookups_are_cached():
+    """Pages without contact details are negative-cached; browser failures are retried"""
+    cache = new_cache()
+    url = "https://www.privateproperty.co.za/to-rent/western-cape/cape-town/55/RR1"
+    failures = [
+        {"url": url, "error": "Chromedriver not found or not executable"},
+        {"error": "Message: invalid session id", "url": url},
+        {"url": url, "phone_numbers": ['021 555 0100'], "extraction_error": "Message: tab crashed"},
+    ]
+    for result in failures:
+        with mock.patch.object(main, 'extract_agent_contact_info', return_value=result):
+            assert main.get_agent_contact_info({'listing_id': 'RR1'}, url, cache) == result
+        assert cache.lookup('RR1') == (None, None), result
+    
+    with mock.patch.object(main, 'extract_agent_contact_info', return_value={"url": url, "phone_numbers": []}):
+        main.get_agent_contact_info({'listing_id': 'RR1'}, url, cache)
+    assert cache.lookup('RR1')[1] == 'negative'
+    
+    with mock.patch.object(main, 'extract_agent_contact_info', side_effect=AssertionError("browser opened")):
+        assert main.get_agent_contact_info({'listing_id': 'RR1'}, url, cache)['cached']
+    
+    with mock.patch.object(main, 'extract_agent_contact_info', return_value=dict(RECORD, url=url)):
+        main.get_agent_contact_info({'listing_id': 'RR2'}, url, cache)
+    assert cache.lookup('RR2')[1] == 'listing'
+    cache.close()
+    print("✓ Only pages that loaded are cached, with or without contact details")
+
+if __name__ == "__main__":
+    try:
+        test_agent_keys()
+        test_listing_and_agent_hits()
+        test_records_without_details_are_not_shared()
+        test_negative_entries()
+        test_expiry_and_persistence()
+        test_only_conclusive_lookups_are_cached()
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    print("All contact cache tests passed")
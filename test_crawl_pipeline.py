@@ -0,0 +1,153 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+from unittest import mock
+
+# Keep the test away from the shared limiter and the selector files of real crawls
+TEST_DIR = tempfile.mkdtemp(prefix='test_crawl_pipeline_')
+os.environ['SHARED_LIMITS'] = 'off'
+os.environ['SELECTOR_STATS_FILE'] = os.path.join(TEST_DIR, 'selector_stats.jsonl')
+os.environ['SELECTOR_PROFILES_FILE'] = os.path.join(TEST_DIR, 'selector_profiles.json')
+
+from crawl_pipeline import CrawlPipeline, Stage, Requeue, crawl_listings
+from improved_scraper import ImprovedPropertyScraper
+from seen_set import canonicalize_url
+
+BASE_URL = "https://www.privateproperty.co.za/to-rent/western-cape/cape-town/55"
+PAGES = 5
+PER_PAGE = 3
+
+def results_page(page):
+    """A results page with PER_PAGE listings that links two pages ahead, like a sliding pager"""
+    cards = ''
+    for i in range(PER_PAGE):
+        listing_id = f"RR{4000000 + page * 100 + i}"
+        cards += (f'<a class="listing-result" href="/to-rent/western-cape/cape-town/55/{listing_id}">'
+                  f'<div class="listing-result__title">Flat {page}-{i}</div>'
+                  f'<div class="listing-result__price">R {page}{i}000</div>'
+                  f'<button class="listing-result__wishlist-btn" data-listing-id="{listing_id}"></button></a>')
+    links = ''.join(f'<a href="{BASE_URL}?page={n}">{n}</a>' for n in range(1, min(page + 2, PAGES) + 1))
+    if page < PAGES:
+        links += f'<a class="pagination__next" href="{BASE_URL}?page={page + 1}">Next</a>'
+    return f'<html><body><div class="results">{cards}</div><div class="pagination">{links}</div></body></html>'
+
+def page_number(url):
+    return int(url.split('page=')[1]) if 'page=' in url else 1
+
+def run_crawl(fetch_page, **options):
+    scraper = ImprovedPropertyScraper(BASE_URL, output_file=os.path.join(TEST_DIR, 'properties.json'))
+    with mock.patch.object(scraper, 'fetch_page', side_effect=fetch_page), \
+         mock.patch.object(scraper, 'scrape_with_selenium', return_value=False):
+        result = crawl_listings(scraper, **options)
+    return scraper, result
+
+def test_backpressure_and_requeue():
+    """A fast producer waits for a slow consumer, and requeued items run through every stage"""
+    consumed = []
+    
+    def produce(number):
+        outputs = [number * 10 + i for i in range(5)]
+        if number < 3:
+            outputs.append(Requeue(number + 1))
+        return outputs
+    
+    def consume(item):
+        time.sleep(0.01)
+        consumed.append(item)
+    
+    pipeline = CrawlPipeline([
+        Stage('produce', produce, workers=1, kind='thread', route=lambda outputs: outputs),
+        Stage('consume', consume, workers=1, kind='thread'),
+    ], queue_size=2)
+    stats = pipeline.run([1])
+    
+    assert sorted(consumed) == sorted(number * 10 + i for number in (1, 2, 3) for i in range(5))
+    produce_stats, consume_stats = stats
+    assert produce_stats['items'] == 3 and produce_stats['outputs'] == 17
+    assert consume_stats['items'] == 15
+    assert consume_stats['max_queue'] <= 2
+    assert produce_stats['blocked_seconds'] > 0
+    assert consume_stats['utilization'] > produce_stats['utilization']
+    print("✓ Bounded queues hold the producer back and requeued items are processed")
+
+def test_stop():
+    """stop() ends the run without waiting for the remaining items"""
+    done = []
+    
+    def work(item):
+        if item == 2:
+            pipeline.stop()
+        done.append(item)
+        return [Requeue(item + 1)]
+    
+    pipeline = CrawlPipeline([Stage('work', work, workers=1, kind='thread', route=lambda outputs: outputs)])
+    pipeline.run([0])
+    assert max(done) <= 3, done
+    print("✓ stop() ends the run early")
+
+def test_crawl_listings():
+    """Every page is crawled once, including pages linked only from later pages"""
+    fetched = []
+    lock = threading.Lock()
+    
+    def fetch_page(url):
+        with lock:
+            fetched.append(url)
+        return results_page(page_number(url))
+    
+    def enrich(property_data):
+        if property_data['listing_id'].endswith('01'):
+            raise ValueError("contact lookup failed")
+        return dict(property_data, contact_info={'agent': 'test'})
+    
+    scraper, result = run_crawl(fetch_page, enrich=enrich, fetch_workers=3)
+    
+    # Page 1 only links up to page 3; pages 4 and 5 are found from later pages
+    assert sorted(page_number(url) for url in fetched) == [1, 2, 3, 4, 5], fetched
+    assert len(scraper.properties) == PAGES * PER_PAGE
+    assert len({p['listing_id'] for p in scraper.properties}) == PAGES * PER_PAGE
+    assert scraper.scraped_pages == {canonicalize_url(url) for url in fetched}
+    assert result['pages'] == PAGES and result['failed_pages'] == []
+    
+    # A failed enrichment keeps the listing as it was
+    enriched = [p for p in scraper.properties if 'contact_info' in p]
+    assert len(enriched) == PAGES * PER_PAGE - PAGES
+    
+    assert [row['stage'] for row in result['stages']] == ['fetch', 'parse', 'extract', 'enrich', 'sink']
+    assert all(row['errors'] == 0 for row in result['stages'])
+    print("✓ The pipeline crawls every page once and enriches every listing")
+
+def test_max_pages_and_failed_pages():
+    """max_pages caps the crawl, and pages that fail everywhere are reported"""
+    def fetch_page(url):
+        return None if page_number(url) == 2 else results_page(page_number(url))
+    
+    scraper, result = run_crawl(fetch_page, max_pages=3)
+    
+    assert {p['listing_id'][:-2] for p in scraper.properties} == {'RR40001', 'RR40003'}
+    assert [page for url, page in result['failed_pages']] == [2]
+    assert result['pages'] == 3
+    print("✓ max_pages is honoured and failed pages are reported")
+
+def test_parse_in_processes():
+    """Cards parsed in worker processes are extracted in the parent"""
+    scraper, result = run_crawl(lambda url: results_page(page_number(url)), parse_kind='process', parse_workers=2)
+    
+    assert len(scraper.properties) == PAGES * PER_PAGE
+    assert scraper.pagination_model is not None and scraper.pagination_model.last_linked_page == PAGES
+    assert result['stages'][1]['kind'] == 'process'
+    print("✓ Parsing runs in worker processes")
+
+if __name__ == "__main__":
+    try:
+        test_backpressure_and_requeue()
+        test_stop()
+        test_crawl_listings()
+        test_max_pages_and_failed_pages()
+        test_parse_in_processes()
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    print("All crawl pipeline tests passed")
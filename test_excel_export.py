@@ -0,0 +1,64 @@
+import io
+import sys
+
+from excel_export import ExcelStreamWriter, property_row, PROPERTY_COLUMNS, has_openpyxl
+
+PROPERTY = {
+    'listing_id': 'RR4191874',
+    'title': '2 Bedroom Apartment',
+    'price': 'R 12 500',
+    'features': {'bedrooms': '2', 'bathrooms': '1', 'Parking': '1', '': 'Pet friendly'},
+    'is_featured': False,
+    'url': 'https://www.privateproperty.co.za/to-rent/x/RR4191874',
+}
+
+def load_rows(content):
+    from openpyxl import load_workbook
+    sheet = load_workbook(io.BytesIO(content)).active
+    return [[cell.value for cell in row] for row in sheet.iter_rows()], sheet
+
+def test_property_row():
+    """Named features get their own columns and the rest share one cell"""
+    row = dict(zip([key for key, _ in PROPERTY_COLUMNS], property_row(PROPERTY)))
+    assert row['bedrooms'] == '2' and row['bathrooms'] == '1'
+    assert row['features'] == 'Parking: 1; Pet friendly'
+    assert row['location'] == ''
+    print("✓ Properties flatten into one row")
+
+def test_workbook():
+    """The workbook has a header row and one row per property"""
+    if not has_openpyxl:
+        print("- openpyxl not installed, skipping")
+        return
+    writer = ExcelStreamWriter()
+    writer.write_many([PROPERTY, dict(PROPERTY, listing_id='RR2', is_featured=True)])
+    assert writer.count == 2
+    rows, sheet = load_rows(writer.to_bytes())
+    assert rows[0] == [title for _, title in PROPERTY_COLUMNS]
+    assert [row[0] for row in rows[1:]] == ['RR4191874', 'RR2']
+    assert sheet.freeze_panes == 'A2'
+    print("✓ Rows are streamed into the workbook")
+
+def test_scraped_text_is_never_a_formula():
+    """Text starting with '=' is stored as a string, and illegal characters are dropped"""
+    if not has_openpyxl:
+        print("- openpyxl not installed, skipping")
+        return
+    writer = ExcelStreamWriter()
+    writer.write(dict(PROPERTY, title='=HYPERLINK("http://evil.example","Click")', description='Bad\x07 byte'))
+    rows, sheet = load_rows(writer.to_bytes())
+    title = sheet.cell(row=2, column=2)
+    assert title.value == '=HYPERLINK("http://evil.example","Click")'
+    assert title.data_type == 's'
+    assert rows[1][[key for key, _ in PROPERTY_COLUMNS].index('description')] == 'Bad byte'
+    print("✓ Formula-like text is escaped")
+
+if __name__ == "__main__":
+    try:
+        test_property_row()
+        test_workbook()
+        test_scraped_text_is_never_a_formula()
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    print("All Excel export tests passed")
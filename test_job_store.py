@@ -0,0 +1,155 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+
+import job_store
+from job_store import JobStore, MemoryJobStore, FileJobStore, start_job, HEARTBEAT_TIMEOUT
+
+def stores():
+    return [MemoryJobStore(), FileJobStore(tempfile.mkdtemp(prefix='test_job_store_'))]
+
+def wait_for_status(store, job_id, statuses, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = store.get(job_id)
+        if job['status'] in statuses:
+            return job
+        time.sleep(0.02)
+    return store.get(job_id)
+
+def test_results_are_paged_while_running():
+    """Results appear as they are produced and are paged with next_offset"""
+    for store in stores():
+        step = threading.Event()
+        
+        def work(store, job_id):
+            for batch in range(3):
+                store.append_results(job_id, [{'listing_id': f"RR{batch}{i}"} for i in range(2)])
+                store.update(job_id, progress={'pages': batch + 1})
+                if batch == 0:
+                    step.wait(5)
+            return {'pages': 3}
+        
+        job_id = start_job(store, 'multiple', {'url': 'https://example.com'}, work)['job_id']
+        job = wait_for_status(store, job_id, ['running'])
+        deadline = time.time() + 5
+        while not job['results'] and time.time() < deadline:
+            job = store.get(job_id)
+        assert job['status'] == 'running'
+        assert [record['listing_id'] for record in job['results']] == ['RR00', 'RR01']
+        assert job['next_offset'] == 2
+        
+        step.set()
+        job = wait_for_status(store, job_id, ['completed'])
+        assert job['progress'] == {'pages': 3}
+        later = store.get(job_id, offset=2, limit=3)
+        assert [record['listing_id'] for record in later['results']] == ['RR10', 'RR11', 'RR20']
+        assert later['next_offset'] == 5
+        assert store.get(job_id, offset=later['next_offset'])['results'] == [{'listing_id': 'RR21'}]
+    print("✓ Results are paged while the job runs")
+
+def test_cancel_and_failure():
+    """A cancelled job stops early; a job that raises is reported as failed"""
+    for store in stores():
+        def work(store, job_id):
+            for page in range(100):
+                if store.cancel_requested(job_id):
+                    return {'pages': page}
+                time.sleep(0.01)
+            return {'pages': 100}
+        
+        job_id = start_job(store, 'multiple', {}, work)['job_id']
+        store.request_cancel(job_id)
+        job = wait_for_status(store, job_id, ['cancelled', 'completed'])
+        assert job['status'] == 'cancelled' and job['cancel_requested']
+        assert job['progress']['pages'] < 100
+        
+        def broken(store, job_id):
+            raise ValueError("no listings")
+        
+        job_id = start_job(store, 'multiple', {}, broken)['job_id']
+        job = wait_for_status(store, job_id, ['failed'])
+        assert job['status'] == 'failed' and job['error'] == "no listings"
+    print("✓ Cancelled and failed jobs are reported")
+
+def test_stale_jobs():
+    """A running job whose heartbeat stopped is reported as stale"""
+    for store in stores():
+        job_id = start_job(store, 'multiple', {}, lambda store, job_id: time.sleep(0.2))['job_id']
+        wait_for_status(store, job_id, ['running'])
+        job = store.load(job_id)
+        job['heartbeat_at'] -= HEARTBEAT_TIMEOUT + 1
+        store.save(job)
+        assert store.get(job_id)['status'] == 'stale'
+    print("✓ Jobs that stopped reporting are stale")
+
+def test_slow_jobs_keep_beating():
+    """A job stuck on one slow step keeps its heartbeat and is not reported as stale"""
+    interval, timeout = job_store.HEARTBEAT_INTERVAL, job_store.HEARTBEAT_TIMEOUT
+    job_store.HEARTBEAT_INTERVAL, job_store.HEARTBEAT_TIMEOUT = 0.05, 0.3
+    try:
+        for store in stores():
+            release = threading.Event()
+            job_id = start_job(store, 'multiple', {}, lambda store, job_id: release.wait(5))['job_id']
+            wait_for_status(store, job_id, ['running'])
+            time.sleep(0.6)
+            assert store.get(job_id)['status'] == 'running'
+            release.set()
+            wait_for_status(store, job_id, ['completed'])
+            
+            # Once the worker is gone, the beats stop
+            job = store.load(job_id)
+            job['status'] = 'running'
+            store.save(job)
+            time.sleep(0.4)
+            assert store.get(job_id)['status'] == 'stale'
+    finally:
+        job_store.HEARTBEAT_INTERVAL, job_store.HEARTBEAT_TIMEOUT = interval, timeout
+    print("✓ Slow jobs keep beating and lost ones turn stale")
+
+def test_file_store_is_shared():
+    """A second FileJobStore on the directory sees the jobs, results and cancels of the first"""
+    directory = tempfile.mkdtemp(prefix='test_job_store_')
+    first, second = FileJobStore(directory), FileJobStore(directory)
+    job_id = start_job(first, 'multiple', {}, lambda store, job_id: store.append_results(job_id, [{'n': 1}]))['job_id']
+    wait_for_status(first, job_id, ['completed'])
+    
+    job = second.get(job_id)
+    assert job['status'] == 'completed' and job['results'] == [{'n': 1}]
+    second.request_cancel(job_id)
+    assert first.cancel_requested(job_id)
+    
+    # Job IDs come from clients, so anything but a generated ID is unknown
+    for job_id in ['../etc/passwd', '', None, job_id + '/x']:
+        assert second.load(job_id) is None
+    second.request_cancel('../x')
+    assert not os.path.exists(os.path.join(os.path.dirname(directory), 'x.cancel'))
+    print("✓ File job stores share state through the directory")
+
+def test_store_interface():
+    """A JobStore missing part of the interface cannot be created"""
+    class PartialJobStore(JobStore):
+        def create(self, job):
+            return job
+    
+    try:
+        PartialJobStore()
+        assert False, "PartialJobStore should not be instantiable"
+    except TypeError:
+        pass
+    print("✓ Incomplete job stores are rejected")
+
+if __name__ == "__main__":
+    try:
+        test_results_are_paged_while_running()
+        test_cancel_and_failure()
+        test_stale_jobs()
+        test_slow_jobs_keep_beating()
+        test_file_store_is_shared()
+        test_store_interface()
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    print("All job store tests passed")
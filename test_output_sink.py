@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import gzip
+import tempfile
+
+from output_sink import JsonlSink, read_jsonl, merge_jsonl, write_json_array
+
+RECORDS = [{'listing_id': f"RR{i}", 'title': f"Flat {i} – Sea Point", 'price': i * 1000} for i in range(120)]
+
+def temp_path(name):
+    return os.path.join(tempfile.mkdtemp(prefix='test_output_sink_'), name)
+
+def test_roundtrip():
+    """Records come back in order, plain and gzipped, after buffered writes"""
+    for name in ['out.jsonl', 'out.jsonl.gz']:
+        path = temp_path(name)
+        with JsonlSink(path, buffer_size=7) as sink:
+            sink.write_many(RECORDS)
+            assert sink.count == len(RECORDS)
+        assert list(read_jsonl(path)) == RECORDS
+        with open(path, 'rb') as f:
+            assert (f.read(2) == b'\x1f\x8b') == name.endswith('.gz')
+    print("✓ Plain and gzipped sinks round-trip their records")
+
+def test_flushed_data_survives_a_crash():
+    """Everything up to the last flush is readable even if the sink is never closed"""
+    for name in ['out.jsonl', 'out.jsonl.gz']:
+        path = temp_path(name)
+        sink = JsonlSink(path, buffer_size=1000)
+        sink.write_many(RECORDS[:50])
+        offset = sink.flush(fsync=True)
+        sink.write_many(RECORDS[50:])  # still buffered when the "crash" happens
+        assert os.path.getsize(path) == offset
+        assert list(read_jsonl(path)) == RECORDS[:50]
+    print("✓ Flushed records survive an unclosed sink")
+
+def test_finalize():
+    """finalize() writes exactly what json.dump would, atomically"""
+    path = temp_path('out.jsonl')
+    json_path = path.replace('.jsonl', '.json')
+    sink = JsonlSink(path)
+    sink.write_many(RECORDS[:3])
+    assert sink.finalize(json_path) == 3
+    with open(json_path, encoding='utf-8') as f:
+        assert f.read() == json.dumps(RECORDS[:3], ensure_ascii=False, indent=2)
+    
+    assert write_json_array([], json_path) == 0
+    with open(json_path, encoding='utf-8') as f:
+        assert json.load(f) == []
+    print("✓ finalize() writes the legacy JSON array")
+
+def test_append_and_truncate():
+    """Appending keeps earlier records and truncate_to drops a torn tail"""
+    for name in ['out.jsonl', 'out.jsonl.gz']:
+        path = temp_path(name)
+        sink = JsonlSink(path)
+        sink.write_many(RECORDS[:10])
+        offset = sink.flush()
+        sink.close()
+        with open(path, 'ab') as f:
+            f.write(b'{"listing_id": "torn')
+        
+        with JsonlSink(path, append=True, truncate_to=offset) as sink:
+            sink.write_many(RECORDS[10:20])
+        assert list(read_jsonl(path)) == RECORDS[:20]
+    print("✓ Appending sinks resume after the last good offset")
+
+def test_read_up_to_offset():
+    """read_jsonl(end) ignores whatever was written after a recorded offset"""
+    for name in ['out.jsonl', 'out.jsonl.gz']:
+        path = temp_path(name)
+        sink = JsonlSink(path)
+        sink.write_many(RECORDS[:30])
+        offset = sink.flush()
+        sink.write_many(RECORDS[30:40])
+        sink.close()
+        assert list(read_jsonl(path, offset)) == RECORDS[:30]
+        assert list(read_jsonl(path, 0)) == []
+        assert list(read_jsonl(path)) == RECORDS[:40]
+    print("✓ read_jsonl stops at a given offset")
+
+def test_merge():
+    """merge_jsonl keeps the first record per key across files and skips missing ones"""
+    first, second = temp_path('a.jsonl'), temp_path('b.jsonl.gz')
+    with JsonlSink(first) as sink:
+        sink.write_many(RECORDS[:20])
+    with JsonlSink(second) as sink:
+        sink.write_many([dict(record, price=0) for record in RECORDS[10:30]])
+        offset = sink.flush()
+        sink.write_many(RECORDS[30:40])
+    
+    merged_path = temp_path('merged.jsonl')
+    with JsonlSink(merged_path) as merged:
+        written = merge_jsonl([first, temp_path('missing.jsonl'), second], merged,
+                              key=lambda record: record['listing_id'], ends={second: offset})
+    merged = list(read_jsonl(merged_path))
+    assert written == len(merged) == 30
+    assert merged[:20] == RECORDS[:20]
+    assert all(record['price'] == 0 for record in merged[20:])
+    print("✓ merge_jsonl deduplicates across files")
+
+if __name__ == "__main__":
+    try:
+        test_roundtrip()
+        test_flushed_data_survives_a_crash()
+        test_finalize()
+        test_append_and_truncate()
+        test_read_up_to_offset()
+        test_merge()
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    print("All output sink tests passed")
@@ -0,0 +1,72 @@
+import sys
+import time
+import threading
+
+from pagination_model import PaginationModel, set_query_param, preserve_query_params, fetch_all
+
+BASE_URL = "https://www.privateproperty.co.za/to-rent/western-cape/cape-town/55"
+
+def test_query_params():
+    """Page numbers replace an existing value and sort parameters are carried over"""
+    url = BASE_URL + '?sorttype=3&page=2'
+    assert set_query_param(url, 'page', 3) == BASE_URL + '?sorttype=3&page=3'
+    assert set_query_param(BASE_URL, 'page', 2) == BASE_URL + '?page=2'
+    assert preserve_query_params(BASE_URL + '?page=4', url) == BASE_URL + '?page=4&sorttype=3'
+    print("✓ Query parameters are set without duplicates")
+
+def test_url_for():
+    """Predicted page URLs keep the first URL's parameters, by query or by path"""
+    model = PaginationModel(BASE_URL + '?sorttype=3', 5, param='page')
+    assert model.url_for(1) == BASE_URL + '?sorttype=3'
+    assert model.next_url(1) == BASE_URL + '?sorttype=3&page=2'
+    
+    model = PaginationModel(BASE_URL + '/page/2', 5, path_prefix='page', current_page=2)
+    assert model.url_for(1) == BASE_URL
+    assert model.url_for(3) == BASE_URL + '/page/3'
+    print("✓ Page URLs follow the inferred template")
+
+def test_fetch_all_order():
+    """Results come back in the order of the URLs, failures as None"""
+    def fetch(url):
+        if url.endswith('3'):
+            raise ValueError("connection reset")
+        time.sleep(0.01 * (5 - int(url[-1])))
+        return url.upper()
+    
+    urls = [f"{BASE_URL}?page={n}" for n in range(1, 5)]
+    results = list(fetch_all(urls, fetch, max_workers=4, jitter=None))
+    assert [url for url, _ in results] == urls
+    assert [result for _, result in results] == [urls[0].upper(), urls[1].upper(), None, urls[3].upper()]
+    print("✓ fetch_all yields results in order")
+
+def test_fetch_all_stops_early():
+    """A caller that stops early cancels the requests that have not started"""
+    fetched = []
+    lock = threading.Lock()
+    
+    def fetch(url):
+        with lock:
+            fetched.append(url)
+        time.sleep(0.05)
+        return url
+    
+    urls = [f"{BASE_URL}?page={n}" for n in range(1, 41)]
+    for url, result in fetch_all(urls, fetch, max_workers=2, jitter=None):
+        break
+    
+    # Only the requests already running when the loop stopped are finished
+    assert len(fetched) <= 4, len(fetched)
+    time.sleep(0.2)
+    assert len(fetched) <= 4, len(fetched)
+    print("✓ Stopping early cancels pending requests")
+
+if __name__ == "__main__":
+    try:
+        test_query_params()
+        test_url_for()
+        test_fetch_all_order()
+        test_fetch_all_stops_early()
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    print("All pagination model tests passed")
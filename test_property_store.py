@@ -0,0 +1,145 @@
+import os
+import sys
+import time
+import tempfile
+from unittest import mock
+
+# Keep the delta crawl test away from the shared limiter and the selector files of real crawls
+TEST_DIR = tempfile.mkdtemp(prefix='test_property_store_')
+os.environ['SHARED_LIMITS'] = 'off'
+os.environ['SELECTOR_STATS_FILE'] = os.path.join(TEST_DIR, 'selector_stats.jsonl')
+os.environ['SELECTOR_PROFILES_FILE'] = os.path.join(TEST_DIR, 'selector_profiles.json')
+
+import main
+from property_store import PropertyStore, parse_price, derive_area, DEFAULT_DB_PATH
+
+URL = "https://www.privateproperty.co.za/to-rent/western-cape/cape-town/sea-point/{}"
+
+def listing(listing_id, price='R 12 500', **fields):
+    return dict({'listing_id': listing_id, 'title': f"Flat {listing_id}", 'price': price,
+                 'url': URL.format(listing_id), 'listing_type': '1'}, **fields)
+
+def new_store(**options):
+    return PropertyStore(os.path.join(tempfile.mkdtemp(prefix='test_property_store_'), 'properties.db'), **options)
+
+def test_parse_price_and_area():
+    """Prices parse to whole rands and the area comes from the listing URL"""
+    assert parse_price('R 12 500') == 12500
+    assert parse_price('R 1 250 000.50') == 1250000
+    assert parse_price(9500) == 9500
+    assert parse_price('POA') is None and parse_price(None) is None
+    
+    assert derive_area(listing('RR1')) == 'sea-point'
+    assert derive_area({'area': 'green-point', 'url': URL.format('RR1')}) == 'green-point'
+    assert derive_area({'url': 'https://example.com/x', 'location': 'Main Road, Sea Point'}) == 'Sea Point'
+    assert derive_area({'location': 'No Location'}) is None
+    print("✓ Prices and areas are derived from scraped fields")
+
+def test_upsert():
+    """Listings are inserted once, updated in place and skipped without an ID"""
+    store = new_store(batch_size=2)
+    result = store.upsert_many([listing('RR1'), listing('RR2'), listing('RR3'), {'title': 'No ID'}], seen_at=100)
+    assert result == {'inserted': 3, 'updated': 0, 'changes': 0, 'skipped': 1}
+    
+    result = store.upsert_many([listing('RR1', title='Renamed'), listing('RR4')], seen_at=200)
+    assert result == {'inserted': 1, 'updated': 1, 'changes': 0, 'skipped': 0}
+    assert store.get('RR1')['title'] == 'Renamed'
+    assert store.get('RR9') is None
+    
+    # A listing twice in one batch is stored once, with its last data
+    result = store.upsert_many([listing('RR5', title='First'), listing('RR5', title='Second')], seen_at=300)
+    assert result['inserted'] == 1
+    assert store.get('RR5')['title'] == 'Second'
+    
+    assert store.known_ids(['RR1', 'RR5', 'RR9']) == {'RR1', 'RR5'}
+    assert store.is_known('RR4') and not store.is_known('RR9')
+    
+    rows = store.query(area='sea-point', new_since=150)
+    assert [row['listing_id'] for row in rows] == ['RR5', 'RR4']
+    assert rows[0]['first_seen'] == 300 and rows[0]['status'] == 'active'
+    store.close()
+    print("✓ Listings are upserted by ID")
+
+def test_price_changes():
+    """A price change is recorded with the old and new price text"""
+    store = new_store()
+    store.upsert(listing('RR1', 'R 12 500'), seen_at=100)
+    store.upsert(listing('RR1', 'R 12 500'), seen_at=200)
+    assert store.changes('RR1') == []
+    
+    result = store.upsert(listing('RR1', 'R 11 000'), seen_at=300)
+    assert result['changes'] == 1
+    assert store.changes('RR1') == [{'listing_id': 'RR1', 'field': 'price', 'old_value': 'R 12 500',
+                                     'new_value': 'R 11 000', 'changed_at': 300}]
+    assert [row['listing_id'] for row in store.query(min_price=11000, max_price=11000)] == ['RR1']
+    store.close()
+    print("✓ Price changes are tracked")
+
+def test_removal_and_return():
+    """Listings missing from a crawl are marked removed, and reactivated when they return"""
+    store = new_store()
+    crawl_started = time.time()
+    store.upsert_many([listing('RR1'), listing('RR2'), listing('RR3', area='green-point')], seen_at=crawl_started - 100)
+    store.upsert(listing('RR1'), seen_at=crawl_started)
+    
+    assert store.mark_removed(crawl_started, area='sea-point') == 1
+    assert [row['listing_id'] for row in store.query(status='removed')] == ['RR2']
+    assert store.mark_removed(crawl_started) == 1  # RR3, outside the area above
+    assert store.mark_removed(crawl_started) == 0
+    
+    store.upsert(listing('RR2'))
+    statuses = [(change['field'], change['old_value'], change['new_value']) for change in store.changes('RR2')]
+    assert statuses == [('status', 'active', 'removed'), ('status', 'removed', 'active')]
+    assert {row['listing_id'] for row in store.query()} == {'RR1', 'RR2'}
+    store.close()
+    print("✓ Removed listings are tracked and reactivated")
+
+def test_default_path():
+    """The default database lives in the temp directory, which a deployed function can write to"""
+    if 'PROPERTY_STORE_DB' not in os.environ:
+        assert os.path.dirname(DEFAULT_DB_PATH) == tempfile.gettempdir()
+    print("✓ The default database is in the temp directory")
+
+def fake_iter_properties(pages, fail_on=None):
+    """Stands in for iter_properties: yields the listings of each page, raising at fail_on (page, position)"""
+    def iter_properties(self, max_pages=None, keep=True):
+        for page, listings in enumerate(pages, 1):
+            for position, property_data in enumerate(listings):
+                if (page, position) == fail_on:
+                    raise ConnectionError("connection reset")
+                yield property_data, {'page': page, 'position': position}
+    return iter_properties
+
+def test_delta_crawl():
+    """A delta crawl stores what it read even when it fails, and stops at known listings"""
+    db_path = os.path.join(TEST_DIR, 'delta.db')
+    pages = [[listing('RR1'), {'title': 'No ID'}, {'title': 'No ID either'}, listing('RR2')],
+             [listing('RR3'), listing('RR4'), listing('RR5')]]
+    
+    with mock.patch.object(main.ImprovedPropertyScraper, 'iter_properties', fake_iter_properties(pages, (2, 2))):
+        result = main.handle_delta_crawl(URL.format(''), stop_after=2, db_path=db_path)
+    assert not result['success']
+    with PropertyStore(db_path) as store:
+        assert store.known_ids(['RR1', 'RR2', 'RR3', 'RR4', 'RR5']) == {'RR1', 'RR2', 'RR3', 'RR4'}
+    
+    # Listings without an ID are new every time and never end the crawl
+    pages = [[listing('RR6'), {'title': 'No ID'}, {'title': 'No ID'}, listing('RR1'), listing('RR2')],
+             [listing('RR7')]]
+    with mock.patch.object(main.ImprovedPropertyScraper, 'iter_properties', fake_iter_properties(pages)):
+        result = main.handle_delta_crawl(URL.format(''), stop_after=2, db_path=db_path)
+    assert result['success'] and result['stopped_early'] and result['pages'] == 1
+    assert [p.get('listing_id') for p in result['properties']] == ['RR6', None, None]
+    print("✓ Delta crawls store listings page by page and stop at known ones")
+
+if __name__ == "__main__":
+    try:
+        test_parse_price_and_area()
+        test_upsert()
+        test_price_changes()
+        test_removal_and_return()
+        test_default_path()
+        test_delta_crawl()
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    print("All property store tests passed")
@@ -0,0 +1,120 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+
+from result_cache import ResultCache, REFRESH_TIMEOUT
+
+PARAMS = {'mode': 'single', 'url': 'https://www.privateproperty.co.za/to-rent/x?page=1&utm_source=mail'}
+
+def counting_compute(calls, release=None):
+    """compute() that counts its calls and, given an Event, waits for it first"""
+    def compute():
+        if release is not None:
+            release.wait(5)
+        calls.append(time.time())
+        return {'success': True, 'call': len(calls)}
+    return compute
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_hit_miss_bypass():
+    """Fresh results are served from the cache; use_cache=False recomputes"""
+    cache = ResultCache(tempfile.mkdtemp(prefix='test_result_cache_'), ttl=60, stale_ttl=60)
+    calls = []
+    compute = counting_compute(calls)
+    
+    assert cache.fetch(PARAMS, compute) == ({'success': True, 'call': 1}, 'MISS')
+    assert cache.fetch(PARAMS, compute) == ({'success': True, 'call': 1}, 'HIT')
+    
+    # Equivalent parameters share the entry
+    same = {'url': 'https://www.privateproperty.co.za/to-rent/x/?page=1', 'mode': ' Single ', 'filter': ''}
+    assert cache.fetch(same, compute)[1] == 'HIT'
+    
+    assert cache.fetch(PARAMS, compute, use_cache=False) == ({'success': True, 'call': 2}, 'BYPASS')
+    assert cache.fetch(PARAMS, compute) == ({'success': True, 'call': 2}, 'HIT')
+    print("✓ Fresh results are cache hits and equivalent parameters share an entry")
+
+def test_failures_are_not_cached():
+    """Results without success are returned but not stored"""
+    cache = ResultCache(tempfile.mkdtemp(prefix='test_result_cache_'), ttl=60, stale_ttl=60)
+    assert cache.fetch(PARAMS, lambda: {'success': False}) == ({'success': False}, 'MISS')
+    assert cache.get(cache.key_for(PARAMS)) == (None, None)
+    print("✓ Failed results are not cached")
+
+def test_expired_results_are_recomputed():
+    """A result past the stale window is computed inline"""
+    cache = ResultCache(tempfile.mkdtemp(prefix='test_result_cache_'), ttl=0, stale_ttl=0)
+    calls = []
+    compute = counting_compute(calls)
+    cache.fetch(PARAMS, compute)
+    assert cache.fetch(PARAMS, compute) == ({'success': True, 'call': 2}, 'MISS')
+    print("✓ Expired results are recomputed")
+
+def test_stale_while_revalidate():
+    """A stale result is served at once and refreshed once in the background"""
+    directory = tempfile.mkdtemp(prefix='test_result_cache_')
+    cache = ResultCache(directory, ttl=60, stale_ttl=3600)
+    key = cache.key_for(PARAMS)
+    cache.fetch(PARAMS, counting_compute([]))
+    cache.ttl = 0  # everything stored is now stale
+    marker = cache._path(key) + '.refresh'
+    
+    calls = []
+    release = threading.Event()
+    compute = counting_compute(calls, release)
+    assert cache.fetch(PARAMS, compute) == ({'success': True, 'call': 1}, 'STALE')
+    assert os.path.exists(marker)
+    
+    # Requests during the refresh are served stale without starting another one
+    for _ in range(5):
+        assert cache.fetch(PARAMS, compute)[1] == 'STALE'
+    # A second process sharing the directory sees the marker and does not refresh either
+    other = ResultCache(directory, ttl=0, stale_ttl=3600)
+    assert other.fetch(PARAMS, compute)[1] == 'STALE'
+    
+    release.set()
+    assert wait_for(lambda: not os.path.exists(marker))
+    assert len(calls) == 1
+    cache.ttl = 60
+    assert cache.fetch(PARAMS, compute) == ({'success': True, 'call': 1}, 'HIT')
+    print("✓ Stale results are served while a single background refresh runs")
+
+def test_abandoned_refresh_marker():
+    """A marker left by a refresh that died only blocks refreshes until it times out"""
+    cache = ResultCache(tempfile.mkdtemp(prefix='test_result_cache_'), ttl=0, stale_ttl=3600)
+    key = cache.key_for(PARAMS)
+    cache.set(key, {'success': True, 'call': 0})
+    marker = cache._path(key) + '.refresh'
+    
+    calls = []
+    compute = counting_compute(calls)
+    open(marker, 'w').close()
+    assert cache.fetch(PARAMS, compute)[1] == 'STALE'
+    time.sleep(0.1)
+    assert calls == []
+    
+    old = time.time() - REFRESH_TIMEOUT - 1
+    os.utime(marker, (old, old))
+    assert cache.fetch(PARAMS, compute)[1] == 'STALE'
+    assert wait_for(lambda: len(calls) == 1 and not os.path.exists(marker))
+    print("✓ Abandoned refresh markers expire")
+
+if __name__ == "__main__":
+    try:
+        test_hit_miss_bypass()
+        test_failures_are_not_cached()
+        test_expired_results_are_recomputed()
+        test_stale_while_revalidate()
+        test_abandoned_refresh_marker()
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    print("All result cache tests passed")
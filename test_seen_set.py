@@ -0,0 +1,136 @@
+import os
+import sys
+import tempfile
+import multiprocessing
+
+import seen_set
+from seen_set import SeenSet, PackedIdSet, canonicalize_url, pack_listing_id
+
+WORKERS = 4
+LISTINGS_PER_WORKER = 300
+URLS_PER_WORKER = 100
+
+def test_canonicalize_url():
+    """Equivalent URLs canonicalize to the same string"""
+    a = canonicalize_url("HTTPS://www.PrivateProperty.co.za:443/to-rent/x/?page=2&sorttype=3&utm_source=mail#top")
+    b = canonicalize_url("https://www.privateproperty.co.za/to-rent/x?sorttype=3&fbclid=abc&page=2")
+    assert a == b == "https://www.privateproperty.co.za/to-rent/x?page=2&sorttype=3", a
+    assert canonicalize_url("https://example.com:8080/") == "https://example.com:8080/"
+    print("✓ Equivalent URLs share a canonical form")
+
+def test_pack_listing_id():
+    """Listing IDs pack into distinct integers; other shapes are left to the Bloom filter"""
+    ids = ['RR4191874', 'T4191874', 'RR4191875', 'ABC1', 'R0']
+    packed = [pack_listing_id(listing_id) for listing_id in ids]
+    assert None not in packed
+    assert len(set(packed)) == len(ids)
+    assert all(0 <= value < 2 ** 64 for value in packed)
+    for listing_id in ['rr123', 'RR0123', 'ABCD1', '12345', '']:
+        assert pack_listing_id(listing_id) is None, listing_id
+    print("✓ Listing IDs pack into unique 64-bit integers")
+
+def test_persistence():
+    """Flushed listings and URLs are seen by a set reopened from the same directory"""
+    directory = tempfile.mkdtemp(prefix='test_seen_set_')
+    with SeenSet(directory, capacity=1000) as seen:
+        assert seen.add_property({'listing_id': 'RR1000001'})
+        assert not seen.add_property({'listing_id': 'RR1000001'})
+        assert seen.add_property({'listing_id': 'odd-id-7'})
+        assert seen.add_property({'url': 'https://example.com/listing/7?utm_medium=x'})
+        assert not seen.add_url('https://EXAMPLE.com/listing/7/')
+    
+    with SeenSet(directory) as seen:
+        assert seen.has_listing('RR1000001')
+        assert seen.has_listing('odd-id-7')
+        assert seen.has_url('https://example.com/listing/7')
+        assert not seen.has_listing('RR1000002')
+        assert not seen.has_url('https://example.com/listing/8')
+    print("✓ Seen listings and URLs persist across reopening")
+
+def add_batch(directory, worker):
+    """Worker process: add this worker's listings and URLs, flushing in several batches"""
+    seen = SeenSet(directory, capacity=10000)
+    for i in range(LISTINGS_PER_WORKER):
+        seen.add_listing(f"RR{worker * 100000 + i + 1}")
+        if i < URLS_PER_WORKER:
+            seen.add_url(f"https://example.com/w{worker}/listing/{i}")
+        if i % 50 == 49:
+            seen.flush()
+    seen.close()
+
+def test_concurrent_flushes():
+    """Processes flushing into one directory at once lose none of each other's additions"""
+    directory = tempfile.mkdtemp(prefix='test_seen_set_')
+    SeenSet(directory, capacity=10000).close()
+    
+    processes = [multiprocessing.Process(target=add_batch, args=(directory, worker)) for worker in range(WORKERS)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    
+    with SeenSet(directory) as seen:
+        assert len(seen.ids) == WORKERS * LISTINGS_PER_WORKER, len(seen.ids)
+        assert seen.bloom.count == WORKERS * URLS_PER_WORKER, seen.bloom.count
+        for worker in range(WORKERS):
+            for i in range(LISTINGS_PER_WORKER):
+                assert seen.has_listing(f"RR{worker * 100000 + i + 1}")
+            for i in range(URLS_PER_WORKER):
+                assert seen.has_url(f"https://example.com/w{worker}/listing/{i}")
+    print(f"✓ {WORKERS} processes flushing concurrently kept every listing and URL")
+
+def test_delta_and_compaction():
+    """Flushes append to the delta log, which is merged into the sorted file once it grows"""
+    directory = tempfile.mkdtemp(prefix='test_seen_set_')
+    path = os.path.join(directory, 'listing_ids.bin')
+    min_ids = seen_set.COMPACT_MIN_IDS
+    seen_set.COMPACT_MIN_IDS = 150
+    try:
+        writer = PackedIdSet(path)
+        reader = PackedIdSet(path)
+        for batch in range(3):
+            for i in range(40):
+                writer.add(batch * 1000 + i)
+            writer.add(0)  # Already flushed after the first batch
+            writer.flush()
+            # Each flush only appends its own batch
+            assert os.path.getsize(path + '.delta') == 8 * 40 * (batch + 1)
+            assert not os.path.exists(path)
+            reader.refresh()
+            assert len(reader) == 40 * (batch + 1) and (batch * 1000 + 39) in reader
+        
+        # A crashed writer's partial entry is ignored, then cut off by the next flush
+        with open(path + '.delta', 'ab') as f:
+            f.write(b'\x01\x02\x03')
+        reader.refresh()
+        assert len(reader) == 120
+        
+        for i in range(40):
+            writer.add(3000 + i)
+        writer.flush()
+        # 160 delta IDs passed the threshold: they now live in the sorted file
+        assert os.path.getsize(path + '.delta') == 0
+        assert os.path.getsize(path) == 16 + 8 * 160
+        
+        reader.refresh()
+        assert len(reader) == 160 and len(reader.delta) == 0
+        assert all(batch * 1000 + i in reader for batch in range(4) for i in range(40))
+        assert 999 not in reader
+        writer.close()
+        reader.close()
+    finally:
+        seen_set.COMPACT_MIN_IDS = min_ids
+    print("✓ Flushes append to the delta log and compaction merges it")
+
+if __name__ == "__main__":
+    try:
+        test_canonicalize_url()
+        test_pack_listing_id()
+        test_persistence()
+        test_concurrent_flushes()
+        test_delta_and_compaction()
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    print("All seen set tests passed")
@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import tempfile
+from unittest import mock
+
+# Keep the test away from the shared limiter and the selector files of real crawls
+TEST_DIR = tempfile.mkdtemp(prefix='test_sharded_crawl_')
+os.environ['SHARED_LIMITS'] = 'off'
+os.environ['SHARED_LIMITS_DIR'] = os.path.join(TEST_DIR, 'limits')
+os.environ['SELECTOR_STATS_FILE'] = os.path.join(TEST_DIR, 'selector_stats.jsonl')
+os.environ['SELECTOR_PROFILES_FILE'] = os.path.join(TEST_DIR, 'selector_profiles.json')
+
+import sharded_crawl
+from sharded_crawl import expand_region, shard_output_file, merge_shards
+from output_sink import JsonlSink, read_jsonl
+
+REGION = "https://www.privateproperty.co.za/to-rent/western-cape"
+AREAS = [f"{REGION}/cape-town/{n}" for n in (55, 56, 57)]
+
+def area_listings(url):
+    """Three listings per area; neighbouring areas share one"""
+    n = int(url.rsplit('/', 1)[1])
+    return [{'listing_id': f"RR{n}{i}", 'url': f"{url}/RR{n}{i}"} for i in range(2)] + \
+        [{'listing_id': f"RR{n + 1}0", 'url': f"{url}/RR{n + 1}0"}]
+
+def fake_crawl_area(task):
+    """Stands in for crawl_area in the worker processes; area 56 fails while the fail_56 marker exists"""
+    url = task['url']
+    if url.endswith('/56') and os.path.exists(os.path.join(TEST_DIR, 'fail_56')):
+        return {'url': url, 'jsonl_file': None, 'count': 0, 'pages': 0, 'error': "Timed out"}
+    jsonl_file = os.path.splitext(task['output_file'])[0] + '.jsonl'
+    with JsonlSink(jsonl_file) as sink:
+        sink.write_many(area_listings(url))
+    with open(os.path.join(TEST_DIR, 'crawled.log'), 'a') as f:
+        f.write(url + '\n')
+    return {'url': url, 'jsonl_file': jsonl_file, 'count': 3, 'pages': 1, 'error': None}
+
+def test_expand_region():
+    """A region page expands into the area links below it, once each"""
+    html = (f'<a href="/to-rent/western-cape/cape-town/55">Cape Town</a>'
+            f'<a href="{REGION}/cape-town/55/">Cape Town again</a>'
+            f'<a href="/to-rent/western-cape/stellenbosch/56?utm_source=x">Stellenbosch</a>'
+            f'<a href="/to-rent/gauteng/johannesburg/100">Elsewhere</a>'
+            f'<a href="/to-rent/western-cape/cape-town">No ID</a>'
+            f'<a href="https://other.example/to-rent/western-cape/x/9">Other host</a>')
+    with mock.patch('improved_scraper.ImprovedPropertyScraper.fetch_page', return_value=html):
+        assert expand_region(REGION) == [f"{REGION}/cape-town/55", f"{REGION}/stellenbosch/56"]
+    with mock.patch('improved_scraper.ImprovedPropertyScraper.fetch_page', return_value=None):
+        assert expand_region(REGION) == [REGION]
+    print("✓ Regions expand into their areas")
+
+def test_shard_output_file():
+    """Equivalent area URLs share a shard"""
+    shard_dir = os.path.join(TEST_DIR, 'shards')
+    assert shard_output_file(shard_dir, AREAS[0]) == shard_output_file(shard_dir, AREAS[0] + '/?utm_source=x')
+    assert shard_output_file(shard_dir, AREAS[0]) != shard_output_file(shard_dir, AREAS[1])
+    print("✓ Shard files are named after the canonical area URL")
+
+def test_merge_shards():
+    """Listings found in several areas are kept once, from the first area"""
+    results = []
+    for url in AREAS:
+        jsonl_file = os.path.join(TEST_DIR, 'merge', url.rsplit('/', 1)[1] + '.jsonl')
+        with JsonlSink(jsonl_file) as sink:
+            sink.write_many(area_listings(url))
+        results.append({'url': url, 'jsonl_file': jsonl_file})
+    results.append({'url': REGION, 'jsonl_file': None})
+    
+    output_file = os.path.join(TEST_DIR, 'merge', 'properties.json')
+    assert merge_shards(results, output_file) == 7
+    with open(output_file) as f:
+        merged = json.load(f)
+    assert [item['listing_id'] for item in merged] == ['RR550', 'RR551', 'RR560', 'RR561', 'RR570', 'RR571', 'RR580']
+    assert merged[2]['url'].startswith(AREAS[0])
+    print("✓ Shards are merged without duplicate listings")
+
+def test_resume_retries_failed_areas():
+    """A resumed run crawls only the areas that failed before"""
+    output_file = os.path.join(TEST_DIR, 'run', 'properties.json')
+    crawled_log = os.path.join(TEST_DIR, 'crawled.log')
+    open(os.path.join(TEST_DIR, 'fail_56'), 'w').close()
+    
+    with mock.patch.object(sharded_crawl, 'crawl_area', fake_crawl_area):
+        result = sharded_crawl.sharded_crawl(AREAS, output_file=output_file, workers=2)
+        assert result['failed'] == [AREAS[1]]
+        assert result['count'] == 6
+        
+        os.remove(os.path.join(TEST_DIR, 'fail_56'))
+        os.remove(crawled_log)
+        result = sharded_crawl.sharded_crawl(AREAS, output_file=output_file, workers=2, resume=True)
+    
+    with open(crawled_log) as f:
+        assert f.read().split() == [AREAS[1]]
+    assert result['failed'] == [] and result['count'] == 7
+    assert not os.path.exists(os.path.join(TEST_DIR, 'run', 'properties_shards', 'run.checkpoint.json'))
+    print("✓ Resumed runs retry only the failed areas")
+
+def test_resume_after_region_changes():
+    """A region that links to another area on resume still finds its checkpoint, and keeps done areas"""
+    output_file = os.path.join(TEST_DIR, 'region', 'properties.json')
+    crawled_log = os.path.join(TEST_DIR, 'crawled.log')
+    open(os.path.join(TEST_DIR, 'fail_56'), 'w').close()
+    
+    with mock.patch.object(sharded_crawl, 'crawl_area', fake_crawl_area):
+        result = sharded_crawl.sharded_crawl(AREAS, output_file=output_file, workers=2, sources=[REGION])
+        assert result['failed'] == [AREAS[1]]
+        
+        os.remove(os.path.join(TEST_DIR, 'fail_56'))
+        os.remove(crawled_log)
+        # The region no longer links to area 55 but now links to area 58
+        areas = AREAS[1:] + [f"{REGION}/cape-town/58"]
+        result = sharded_crawl.sharded_crawl(areas, output_file=output_file, workers=2, resume=True,
+                                             sources=[REGION])
+    
+    with open(crawled_log) as f:
+        assert sorted(f.read().split()) == [AREAS[1], areas[2]]
+    assert result['failed'] == [] and result['count'] == 9
+    print("✓ Resumed runs are keyed on the requested regions, not the expanded areas")
+
+def test_workers_capped_at_browser_slots():
+    """No more workers than browser slots, since each worker keeps its browser open"""
+    output_file = os.path.join(TEST_DIR, 'capped', 'properties.json')
+    semaphore = mock.Mock(slots=2)
+    with mock.patch.object(sharded_crawl, 'crawl_area', fake_crawl_area), \
+         mock.patch.object(sharded_crawl, 'shared_browser_semaphore', return_value=semaphore):
+        result = sharded_crawl.sharded_crawl(AREAS, output_file=output_file, workers=8)
+    assert result['workers'] == 2 and result['failed'] == []
+    print("✓ Workers are capped at the browser slots")
+
+if __name__ == "__main__":
+    try:
+        test_expand_region()
+        test_shard_output_file()
+        test_merge_shards()
+        test_resume_retries_failed_areas()
+        test_resume_after_region_changes()
+        test_workers_capped_at_browser_slots()
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    print("All sharded crawl tests passed")
@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import pickle
+import tempfile
+import multiprocessing
+
+from shared_limits import SharedRateLimiter, BrowserSemaphore
+
+URL = "https://www.privateproperty.co.za/to-rent/x?page=1"
+PROCESSES = 3
+REQUESTS_PER_PROCESS = 10
+RATE = 20.0
+BURST = 5
+
+def request_worker(limiter, times_path):
+    """Worker process: take REQUESTS_PER_PROCESS slots, logging when each was granted"""
+    for _ in range(REQUESTS_PER_PROCESS):
+        limiter.acquire(URL)
+        with open(times_path, 'a') as f:
+            f.write(f"{time.time()}\n")
+
+def test_burst_then_rate():
+    """A full bucket allows a burst, after which requests wait for the rate"""
+    limiter = SharedRateLimiter(tempfile.mkdtemp(prefix='test_shared_limits_'), rate=RATE, burst=BURST)
+    assert sum(limiter.acquire(URL) for _ in range(BURST)) == 0
+    waited = limiter.acquire(URL)
+    assert 0 < waited <= 1.5 / RATE, waited
+    
+    # Other hosts have their own bucket
+    assert limiter.acquire("https://example.com/") == 0
+    print("✓ Requests burst up to the bucket size, then follow the rate")
+
+def test_processes_share_one_bucket():
+    """Processes using one directory are held to one rate between them"""
+    directory = tempfile.mkdtemp(prefix='test_shared_limits_')
+    times_path = os.path.join(directory, 'times.log')
+    limiter = SharedRateLimiter(directory, rate=RATE, burst=BURST)
+    
+    processes = [multiprocessing.Process(target=request_worker, args=(limiter, times_path)) for _ in range(PROCESSES)]
+    started = time.time()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    
+    with open(times_path) as f:
+        times = sorted(float(line) for line in f)
+    total = PROCESSES * REQUESTS_PER_PROCESS
+    assert len(times) == total
+    assert times[-1] - started >= (total - BURST) / RATE * 0.95, times[-1] - started
+    # No window ever holds more than the burst plus what the rate refills
+    for i, first in enumerate(times):
+        for j in range(i, total):
+            assert j - i + 1 <= BURST + (times[j] - first) * RATE + 1, (i, j)
+    print(f"✓ {PROCESSES} processes shared one request rate")
+
+def hold_slot(semaphore, ready, release):
+    """Worker process: hold a browser slot until told to let go, or die holding it"""
+    semaphore.acquire()
+    ready.set()
+    if release.wait(5):
+        return
+    os._exit(1)
+
+def test_browser_slots_across_processes():
+    """Slots held by other processes are unavailable until released or their holder dies"""
+    directory = tempfile.mkdtemp(prefix='test_shared_limits_')
+    semaphore = BrowserSemaphore(directory, slots=2, poll_interval=0.02)
+    # One event each: killing a process that waits on an Event can leave it unusable
+    ready = [multiprocessing.Event(), multiprocessing.Event()]
+    release = [multiprocessing.Event(), multiprocessing.Event()]
+    holders = [multiprocessing.Process(target=hold_slot, args=(semaphore, ready[i], release[i])) for i in range(2)]
+    for holder in holders:
+        holder.start()
+    for event in ready:
+        assert event.wait(5)
+    
+    try:
+        semaphore.acquire(timeout=0.1)
+        assert False, "no slot should be free"
+    except TimeoutError:
+        pass
+    
+    # A holder that dies gives its slot back
+    holders[0].kill()
+    holders[0].join()
+    slot = semaphore.acquire(timeout=1)
+    assert slot in (0, 1)
+    semaphore.release(slot)
+    
+    release[1].set()
+    holders[1].join()
+    with semaphore.slot() as first, semaphore.slot() as second:
+        assert {first, second} == {0, 1}
+    print("✓ Browser slots are shared by processes and freed when a holder dies")
+
+def test_copies_hold_no_slots():
+    """A pickled semaphore (as sent to worker processes) starts without the sender's slots"""
+    semaphore = BrowserSemaphore(tempfile.mkdtemp(prefix='test_shared_limits_'), slots=1)
+    slot = semaphore.acquire()
+    copy = pickle.loads(pickle.dumps(semaphore))
+    assert copy.held == {}
+    copy.release(slot)  # not the copy's to release
+    try:
+        copy.acquire(timeout=0)
+        assert False, "the slot is still held by the original"
+    except TimeoutError:
+        pass
+    semaphore.release(slot)
+    assert copy.acquire(timeout=0) == slot
+    print("✓ Copies of a semaphore hold no slots")
+
+if __name__ == "__main__":
+    try:
+        test_burst_then_rate()
+        test_processes_share_one_bucket()
+        test_browser_slots_across_processes()
+        test_copies_hold_no_slots()
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    print("All shared limits tests passed")
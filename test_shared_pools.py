@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+
+# Pools in this test get an explicit semaphore or none; keep them off the machine-wide one
+os.environ['SHARED_LIMITS'] = 'off'
+
+from shared_pools import create_session, RateLimiter, DriverPool
+from shared_limits import BrowserSemaphore
+
+class FakeDriver:
+    """Stands in for a WebDriver"""
+    
+    def __init__(self):
+        self.quit_calls = 0
+    
+    def quit(self):
+        self.quit_calls += 1
+
+def test_session_pool_size():
+    """The session keeps as many connections per host as there are fetch threads"""
+    session = create_session(pool_size=16)
+    for prefix in ['https://', 'http://']:
+        adapter = session.get_adapter(prefix + 'www.privateproperty.co.za')
+        assert adapter._pool_maxsize == 16 and adapter._pool_connections == 16
+    print("✓ Sessions are sized for their fetch threads")
+
+def test_rate_limiter():
+    """Threads share one bucket per host"""
+    limiter = RateLimiter(rate=20.0, burst=4)
+    url = "https://www.privateproperty.co.za/to-rent/x"
+    started = time.monotonic()
+    threads = [threading.Thread(target=lambda: [limiter.acquire(url) for _ in range(3)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 12 requests: 4 from the burst, 8 more at 20 per second
+    assert time.monotonic() - started >= 8 / 20.0 * 0.9
+    assert limiter.acquire("https://example.com/") == 0
+    print("✓ Requests share a per-host rate")
+
+def test_driver_pool_reuse_and_limit():
+    """Drivers are reused, at most `size` exist, and broken ones are quit"""
+    created = []
+    
+    def create():
+        created.append(FakeDriver())
+        return created[-1]
+    
+    pool = DriverPool(size=2)
+    first = pool.acquire(create)
+    second = pool.acquire(create)
+    assert len(created) == 2
+    
+    # A third borrower waits for a driver to come back
+    borrowed = []
+    waiter = threading.Thread(target=lambda: borrowed.append(pool.acquire(create)))
+    waiter.start()
+    time.sleep(0.1)
+    assert borrowed == []
+    pool.release(first)
+    waiter.join(2)
+    assert borrowed == [first] and len(created) == 2
+    
+    pool.release(second, broken=True)
+    assert second.quit_calls == 1
+    with pool.driver(create) as driver:
+        assert driver not in (first, second)
+    assert len(created) == 3
+    
+    try:
+        with pool.driver(create) as driver:
+            raise ValueError("page crashed")
+    except ValueError:
+        pass
+    assert driver.quit_calls == 1
+    
+    pool.close()
+    assert created[2].quit_calls == 1  # idle at close
+    pool.release(first)
+    assert first.quit_calls == 1  # busy at close, quit on release
+    try:
+        pool.acquire(create)
+        assert False, "a closed pool hands out no drivers"
+    except RuntimeError:
+        pass
+    print("✓ Driver pools reuse drivers within their size")
+
+def test_driver_pool_browser_slots():
+    """Each live driver holds a browser slot until it is quit"""
+    semaphore = BrowserSemaphore(tempfile.mkdtemp(prefix='test_shared_pools_'), slots=1)
+    pool = DriverPool(size=2, semaphore=semaphore)
+    driver = pool.acquire(FakeDriver)
+    try:
+        semaphore.acquire(timeout=0)
+        assert False, "the only slot belongs to the pool's driver"
+    except TimeoutError:
+        pass
+    
+    # A failed launch gives its slot back
+    pool.release(driver, broken=True)
+    def fail():
+        raise OSError("chromedriver not found")
+    try:
+        pool.acquire(fail)
+        assert False, "the launch should fail"
+    except OSError:
+        pass
+    semaphore.release(semaphore.acquire(timeout=0))
+    pool.close()
+    print("✓ Pooled drivers hold machine-wide browser slots")
+
+if __name__ == "__main__":
+    try:
+        test_session_pool_size()
+        test_rate_limiter()
+        test_driver_pool_reuse_and_limit()
+        test_driver_pool_browser_slots()
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    print("All shared pool tests passed")
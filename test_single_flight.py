@@ -0,0 +1,175 @@
+import os
+import sys
+import time
+import fcntl
+import tempfile
+import threading
+import multiprocessing
+
+from single_flight import SingleFlight
+
+PROCESSES = 4
+
+def test_threads_share_one_computation():
+    """Concurrent callers in one process wait for the leader's result"""
+    flight = SingleFlight(tempfile.mkdtemp(prefix='test_single_flight_'))
+    calls = []
+    results = []
+    
+    def compute():
+        calls.append(1)
+        time.sleep(0.3)
+        return {'listings': 3}
+    
+    def call():
+        results.append(flight.do('key', compute))
+    
+    threads = [threading.Thread(target=call) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(calls) == 1
+    assert all(result == {'listings': 3} for result, _ in results)
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    print("✓ Concurrent calls in one process share one computation")
+
+def test_errors_reach_every_waiter():
+    """An exception in the leader is raised in every waiting caller, and the next call computes again"""
+    flight = SingleFlight(tempfile.mkdtemp(prefix='test_single_flight_'))
+    errors = []
+    
+    def compute():
+        time.sleep(0.2)
+        raise RuntimeError("blocked")
+    
+    def call():
+        try:
+            flight.do('key', compute)
+        except RuntimeError as e:
+            errors.append(str(e))
+    
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == ["blocked"] * 3
+    assert flight.do('key', lambda: 'ok') == ('ok', False)
+    print("✓ Errors are raised in every waiting caller")
+
+def flight_worker(directory, barrier, counter_path, results_path, fail):
+    """Worker process: call do() once, logging computations and results to files"""
+    flight = SingleFlight(directory, poll_interval=0.02)
+    
+    def compute():
+        with open(counter_path, 'a') as f:
+            f.write(f"{os.getpid()}\n")
+        time.sleep(0.5)
+        if fail:
+            raise RuntimeError("failed")
+        return {'computed_by': os.getpid()}
+    
+    if barrier is not None:
+        barrier.wait()
+    try:
+        result, shared = flight.do('page-1', compute)
+    except RuntimeError:
+        return
+    with open(results_path, 'a') as f:
+        f.write(f"{result['computed_by']} {shared}\n")
+
+def run_processes(fail_first=False):
+    directory = tempfile.mkdtemp(prefix='test_single_flight_')
+    counter_path = os.path.join(directory, 'computations.log')
+    results_path = os.path.join(directory, 'results.log')
+    barrier = multiprocessing.Barrier(PROCESSES - 1 if fail_first else PROCESSES)
+    
+    processes = []
+    for i in range(PROCESSES):
+        failing = fail_first and i == 0
+        process = multiprocessing.Process(target=flight_worker,
+                                          args=(directory, None if failing else barrier, counter_path,
+                                                results_path, failing))
+        process.start()
+        processes.append(process)
+        if failing:
+            time.sleep(0.2)  # let the failing process take the lock first
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    
+    with open(counter_path) as f:
+        computations = f.read().split()
+    with open(results_path) as f:
+        results = [line.split() for line in f]
+    return computations, results
+
+def test_processes_share_one_computation():
+    """Processes computing the same key at once share the first one's result"""
+    computations, results = run_processes()
+    assert len(computations) == 1, computations
+    assert len(results) == PROCESSES
+    assert {computed_by for computed_by, _ in results} == {computations[0]}
+    assert sorted(shared for _, shared in results) == ['False'] + ['True'] * (PROCESSES - 1)
+    print(f"✓ {PROCESSES} processes shared one computation")
+
+def test_failed_leader_process():
+    """When the process holding the lock fails, a waiting process computes instead"""
+    computations, results = run_processes(fail_first=True)
+    assert len(computations) == 2, computations
+    assert len(results) == PROCESSES - 1
+    assert {computed_by for computed_by, _ in results} == {computations[1]}
+    print("✓ A failed computation in another process is redone by a waiting one")
+
+def test_wait_timeout():
+    """A caller stops waiting for a lock that is held too long and computes itself"""
+    directory = tempfile.mkdtemp(prefix='test_single_flight_')
+    flight = SingleFlight(directory, wait_timeout=0.2, poll_interval=0.02)
+    
+    with open(os.path.join(directory, 'stuck.lock'), 'a') as lock_file:
+        # flock locks held through another open file description block like another process's
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        started = time.time()
+        assert flight.do('stuck', lambda: 'computed') == ('computed', False)
+        assert time.time() - started >= 0.2
+    print("✓ Callers stop waiting after wait_timeout")
+
+def test_coalesce_decorator():
+    """Calls with equivalent arguments share a key, whether passed by position or keyword"""
+    flight = SingleFlight(tempfile.mkdtemp(prefix='test_single_flight_'))
+    
+    @flight.coalesce('scrape')
+    def scrape(url, max_pages=1):
+        time.sleep(0.3)
+        return url
+    
+    keys = set()
+    original_do = flight.do
+    
+    def recording_do(key, compute):
+        keys.add(key)
+        return original_do(key, compute)
+    
+    flight.do = recording_do
+    scrape('https://www.privateproperty.co.za/to-rent/x?page=1')
+    scrape(url='https://www.privateproperty.co.za/to-rent/x/?page=1&utm_source=mail', max_pages=1)
+    assert len(keys) == 1
+    scrape('https://www.privateproperty.co.za/to-rent/x?page=1', max_pages=2)
+    assert len(keys) == 2
+    print("✓ Equivalent calls coalesce on one key")
+
+if __name__ == "__main__":
+    try:
+        test_threads_share_one_computation()
+        test_errors_reach_every_waiter()
+        test_processes_share_one_computation()
+        test_failed_leader_process()
+        test_wait_timeout()
+        test_coalesce_decorator()
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    print("All single flight tests passed")
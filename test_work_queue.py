@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import tempfile
+from unittest import mock
+
+# Keep the test away from the shared limiter and the selector files of real crawls
+TEST_DIR = tempfile.mkdtemp(prefix='test_work_queue_')
+os.environ['SHARED_LIMITS'] = 'off'
+os.environ['SELECTOR_STATS_FILE'] = os.path.join(TEST_DIR, 'selector_stats.jsonl')
+os.environ['SELECTOR_PROFILES_FILE'] = os.path.join(TEST_DIR, 'selector_profiles.json')
+
+from work_queue import WorkQueue, open_work_queue
+from improved_scraper import ImprovedPropertyScraper
+
+BASE_URL = "https://www.privateproperty.co.za/to-rent/western-cape/cape-town/55"
+PAGES = 5
+PER_PAGE = 3
+
+def results_page(page):
+    """A results page with PER_PAGE listings that links to every page"""
+    cards = ''
+    for i in range(PER_PAGE):
+        listing_id = f"RR{4000000 + page * 100 + i}"
+        cards += (f'<a class="listing-result" href="/to-rent/western-cape/cape-town/55/{listing_id}">'
+                  f'<div class="listing-result__title">Flat {page}-{i}</div>'
+                  f'<div class="listing-result__price">R {page}{i}000</div>'
+                  f'<button class="listing-result__wishlist-btn" data-listing-id="{listing_id}"></button></a>')
+    links = ''.join(f'<a href="{BASE_URL}?page={n}">{n}</a>' for n in range(1, PAGES + 1))
+    if page < PAGES:
+        links += f'<a class="pagination__next" href="{BASE_URL}?page={page + 1}">Next</a>'
+    return f'<html><body><div class="results">{cards}</div><div class="pagination">{links}</div></body></html>'
+
+def page_number(url):
+    return int(url.split('page=')[1]) if 'page=' in url else 1
+
+def run_worker(queue, output_file, worker_id, fetch_page):
+    scraper = ImprovedPropertyScraper(BASE_URL, output_file=output_file)
+    with mock.patch.object(scraper, 'fetch_page', side_effect=fetch_page), \
+         mock.patch.object(scraper, 'scrape_with_selenium', return_value=False), \
+         mock.patch('time.sleep'):
+        return scraper.scrape_queue(queue, worker_id=worker_id, poll_interval=0.1)
+
+def new_queue(name):
+    return open_work_queue(os.path.join(TEST_DIR, f"{name}.db"), visibility_timeout=0.5, retry_delay=0.1)
+
+def test_lease_expiry():
+    """A task whose worker stops renewing its lease is handed to another worker"""
+    queue = new_queue('lease')
+    queue.put('page', {'page': 1}, key='p1')
+    
+    first = queue.lease('w1')
+    assert first is not None
+    assert queue.lease('w2') is None
+    
+    time.sleep(0.6)
+    second = queue.lease('w2')
+    assert second is not None and second['id'] == first['id']
+    assert second['attempts'] == 2
+    
+    # The first worker's lease is gone, so it can no longer complete the task
+    assert not queue.complete(first)
+    assert queue.complete(second)
+    assert queue.unfinished() == 0
+    queue.close()
+    print("✓ Expired leases are re-leased and stale leases cannot complete")
+
+def test_dead_letter_and_retry():
+    """A task that keeps failing is dead-lettered and retry_dead() requeues it"""
+    queue = new_queue('dead')
+    queue.put('page', {'page': 1}, key='p1', max_attempts=2)
+    
+    assert queue.fail(queue.lease('w1'), "first failure") == 'pending'
+    assert queue.lease('w1') is None  # waiting out the retry delay
+    time.sleep(0.15)
+    assert queue.fail(queue.lease('w1'), "second failure") == 'dead'
+    
+    dead = queue.dead_letters()
+    assert [task['key'] for task in dead] == ['p1']
+    assert dead[0]['error'] == "second failure"
+    assert queue.unfinished() == 0
+    
+    assert queue.retry_dead() == 1
+    task = queue.lease('w1')
+    assert task is not None and task['attempts'] == 1
+    assert queue.complete(task)
+    queue.close()
+    print("✓ Failing tasks are dead-lettered and can be retried")
+
+def test_queue_interface():
+    """A WorkQueue missing part of the interface cannot be created"""
+    class PartialWorkQueue(WorkQueue):
+        def put(self, kind, payload, key=None, priority=0, delay=0, max_attempts=None):
+            return True
+    
+    try:
+        PartialWorkQueue()
+        assert False, "PartialWorkQueue should not be instantiable"
+    except TypeError:
+        pass
+    print("✓ Incomplete work queues are rejected")
+
+def test_restarted_worker_keeps_its_results():
+    """A worker restarted after a crash keeps the listings of the tasks it completed"""
+    os.chdir(TEST_DIR)  # parse_page saves page sources in the working directory
+    queue = new_queue('restart')
+    output_file = os.path.join(TEST_DIR, 'restart', 'properties.json')
+    fetched = []
+    
+    def crash_on_page_3(url):
+        if page_number(url) == 3:
+            raise KeyboardInterrupt()
+        fetched.append(page_number(url))
+        return results_page(page_number(url))
+    
+    try:
+        run_worker(queue, output_file, 'w1', crash_on_page_3)
+        assert False, "the worker should have been interrupted"
+    except KeyboardInterrupt:
+        pass
+    assert sorted(fetched) == [1, 2]
+    
+    # A write torn by the crash is dropped when the worker restarts
+    scraper = ImprovedPropertyScraper(BASE_URL, output_file=output_file)
+    shard_path, checkpoint = scraper.queue_shard('w1')
+    with open(shard_path, 'a', encoding='utf-8') as f:
+        f.write('{"listing_id": "torn')
+    
+    def fetch(url):
+        fetched.append(page_number(url))
+        return results_page(page_number(url))
+    
+    completed = run_worker(queue, output_file, 'w1', fetch)
+    assert completed == PAGES - 2
+    assert sorted(fetched) == [1, 2] + list(range(3, PAGES + 1))
+    
+    with open(output_file, 'r', encoding='utf-8') as f:
+        properties = json.load(f)
+    listing_ids = [property_data['listing_id'] for property_data in properties]
+    assert len(listing_ids) == len(set(listing_ids)) == PAGES * PER_PAGE
+    for page in (1, 2):
+        assert f"RR{4000000 + page * 100}" in listing_ids
+    queue.close()
+    print("✓ A restarted worker keeps the listings of its completed tasks")
+
+def test_workers_share_one_output():
+    """Two workers on one queue write separate shards that are merged into one output"""
+    os.chdir(TEST_DIR)
+    queue = new_queue('shared')
+    output_file = os.path.join(TEST_DIR, 'shared', 'properties.json')
+    
+    def first_two(url):
+        if page_number(url) > 2:
+            raise KeyboardInterrupt()
+        return results_page(page_number(url))
+    
+    try:
+        run_worker(queue, output_file, 'w1', first_two)
+    except KeyboardInterrupt:
+        pass
+    
+    # w2 picks up the rest once w1's lease on page 3 expires
+    run_worker(queue, output_file, 'w2', lambda url: results_page(page_number(url)))
+    
+    shards = [name for name in os.listdir(os.path.join(TEST_DIR, 'shared', 'properties.shards'))
+              if name.endswith('.jsonl')]
+    assert sorted(shards) == ['worker_w1.jsonl', 'worker_w2.jsonl']
+    with open(output_file, 'r', encoding='utf-8') as f:
+        properties = json.load(f)
+    listing_ids = [property_data['listing_id'] for property_data in properties]
+    assert len(listing_ids) == len(set(listing_ids)) == PAGES * PER_PAGE
+    queue.close()
+    print("✓ Worker shards are merged into one output")
+
+if __name__ == "__main__":
+    try:
+        test_lease_expiry()
+        test_dead_letter_and_retry()
+        test_queue_interface()
+        test_restarted_worker_keeps_its_results()
+        test_workers_share_one_output()
+    except AssertionError as e:
+        print(f"✗ Test failed: {e}")
+        sys.exit(1)
+    print("All work queue tests passed")
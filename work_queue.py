@@ -0,0 +1,315 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_DB = os.environ.get('WORK_QUEUE_DB', 'work_queue.db')
+
+# A leased task that is neither completed nor failed within this many seconds
+# is handed to another worker
+DEFAULT_VISIBILITY_TIMEOUT = 300
+
+# Attempts before a task is dead-lettered, and the first retry delay (doubled per attempt)
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY = 30
+MAX_RETRY_DELAY = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue         TEXT NOT NULL,
+    kind          TEXT NOT NULL,
+    task_key      TEXT NOT NULL,
+    payload       TEXT NOT NULL,
+    status        TEXT NOT NULL DEFAULT 'pending',
+    priority      INTEGER NOT NULL DEFAULT 0,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    max_attempts  INTEGER NOT NULL,
+    available_at  REAL NOT NULL,
+    lease_id      TEXT,
+    lease_owner   TEXT,
+    lease_expires REAL,
+    last_error    TEXT,
+    created_at    REAL NOT NULL,
+    updated_at    REAL NOT NULL,
+    UNIQUE (queue, task_key)
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_ready ON tasks (queue, status, available_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_lease ON tasks (queue, status, lease_expires);
+"""
+
+def default_worker_id():
+    """host:pid, so leases show which machine and process hold them"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class WorkQueue(ABC):
+    """
+    Durable queue of crawl tasks with leases
+    
+    A task is a kind ('page', 'listing', ...) plus a JSON payload, unique
+    per queue by its key, so producers can put the same task repeatedly.
+    lease() hands a task to one worker for a visibility timeout; the worker
+    then calls complete() or fail(). A failed task is retried after an
+    exponential backoff and dead-lettered once it has used max_attempts;
+    a lease that runs out (its worker died) counts as a failed attempt.
+    
+    Subclasses implement the storage (SqliteWorkQueue here) and cannot be
+    created until they implement every abstract method; tasks are dicts
+    with id, kind, key, payload, attempts, max_attempts and lease_id.
+    """
+    
+    @abstractmethod
+    def put(self, kind, payload, key=None, priority=0, delay=0, max_attempts=None):
+        """
+        Add a task unless one with the same key exists
+        
+        Returns:
+            bool: True if the task was added
+        """
+    
+    def put_many(self, tasks):
+        """Add (kind, payload, key) tasks; returns the number added"""
+        return sum(1 for kind, payload, key in tasks if self.put(kind, payload, key))
+    
+    @abstractmethod
+    def lease(self, worker_id=None, kinds=None, visibility_timeout=None):
+        """The next ready task (now leased to worker_id), or None"""
+    
+    @abstractmethod
+    def extend(self, task, visibility_timeout=None):
+        """Push back a leased task's deadline; returns False if the lease was lost"""
+    
+    @abstractmethod
+    def complete(self, task):
+        """Mark a leased task done; returns False if the lease was lost"""
+    
+    @abstractmethod
+    def fail(self, task, error, retry=True):
+        """
+        Give a leased task back after a failure
+        
+        It is retried after a backoff unless retry is False or it has used
+        all its attempts, in which case it is dead-lettered.
+        
+        Returns:
+            str: The task's new status ('pending' or 'dead'), or None if the lease was lost
+        """
+    
+    @abstractmethod
+    def counts(self):
+        """Number of tasks per status"""
+    
+    def unfinished(self):
+        """Tasks still pending or leased"""
+        counts = self.counts()
+        return counts.get('pending', 0) + counts.get('leased', 0)
+    
+    @abstractmethod
+    def dead_letters(self, limit=100):
+        """Dead-lettered tasks, with their last error"""
+    
+    @abstractmethod
+    def retry_dead(self):
+        """Requeue every dead-lettered task with fresh attempts; returns how many"""
+    
+    def close(self):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+class SqliteWorkQueue(WorkQueue):
+    """
+    WorkQueue in a SQLite database (WAL mode)
+    
+    Any number of processes, and containers sharing the database file, can
+    drain one queue: a task is claimed in a BEGIN IMMEDIATE transaction, so
+    exactly one worker gets it. Several named queues can share a database.
+    """
+    
+    def __init__(self, db_path=DEFAULT_QUEUE_DB, name='default', visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, retry_delay=DEFAULT_RETRY_DELAY):
+        self.db_path = db_path
+        self.name = name
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lock = threading.Lock()
+        
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+    
+    def _task(self, row, lease_id=None):
+        task_id, kind, key, payload, attempts, max_attempts = row[:6]
+        return {'id': task_id, 'kind': kind, 'key': key, 'payload': json.loads(payload),
+                'attempts': attempts, 'max_attempts': max_attempts, 'lease_id': lease_id}
+    
+    def _backoff(self, attempts):
+        return min(MAX_RETRY_DELAY, self.retry_delay * 2 ** max(0, attempts - 1))
+    
+    def put(self, kind, payload, key=None, priority=0, delay=0, max_attempts=None):
+        now = time.time()
+        data = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+        with self.lock:
+            cursor = self.conn.execute(
+                'INSERT OR IGNORE INTO tasks (queue, kind, task_key, payload, priority, max_attempts, '
+                'available_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (self.name, kind, key or f"{kind}:{data}", data, priority,
+                 max_attempts or self.max_attempts, now + delay, now, now))
+        return cursor.rowcount > 0
+    
+    def put_many(self, tasks):
+        now = time.time()
+        rows = []
+        for kind, payload, key in tasks:
+            data = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+            rows.append((self.name, kind, key or f"{kind}:{data}", data, 0, self.max_attempts, now, now, now))
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO tasks (queue, kind, task_key, payload, priority, max_attempts, '
+                    'available_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            return self.conn.total_changes - before
+    
+    def lease(self, worker_id=None, kinds=None, visibility_timeout=None):
+        now = time.time()
+        worker_id = worker_id or default_worker_id()
+        timeout = visibility_timeout or self.visibility_timeout
+        kind_filter = ''
+        params = [self.name, now, now]
+        if kinds:
+            kind_filter = f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params.extend(kinds)
+        
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Leases that ran out used up an attempt; the last one sends the task to the dead letters
+                expired = self.conn.execute(
+                    "UPDATE tasks SET status = 'dead', last_error = 'Lease expired', lease_id = NULL, updated_at = ? "
+                    "WHERE queue = ? AND status = 'leased' AND lease_expires <= ? AND attempts >= max_attempts",
+                    (now, self.name, now)).rowcount
+                if expired:
+                    logger.warning(f"Dead-lettered {expired} tasks whose last lease expired")
+                
+                row = self.conn.execute(
+                    'SELECT id, kind, task_key, payload, attempts + 1, max_attempts FROM tasks '
+                    "WHERE queue = ? AND ((status = 'pending' AND available_at <= ?) "
+                    "OR (status = 'leased' AND lease_expires <= ?))" + kind_filter +
+                    ' ORDER BY priority DESC, id LIMIT 1', params).fetchone()
+                if row is None:
+                    self.conn.execute('COMMIT')
+                    return None
+                
+                lease_id = uuid.uuid4().hex
+                self.conn.execute(
+                    "UPDATE tasks SET status = 'leased', attempts = attempts + 1, lease_id = ?, lease_owner = ?, "
+                    'lease_expires = ?, updated_at = ? WHERE id = ?',
+                    (lease_id, worker_id, now + timeout, now, row[0]))
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+        return self._task(row, lease_id)
+    
+    def extend(self, task, visibility_timeout=None):
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE tasks SET lease_expires = ?, updated_at = ? WHERE id = ? AND lease_id = ? AND status = 'leased'",
+                (now + (visibility_timeout or self.visibility_timeout), now, task['id'], task['lease_id']))
+        return cursor.rowcount > 0
+    
+    def complete(self, task):
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE tasks SET status = 'done', lease_id = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND lease_id = ? AND status = 'leased'",
+                (now, task['id'], task['lease_id']))
+        if cursor.rowcount == 0:
+            logger.warning(f"Lost the lease on task {task['id']} before completing it")
+        return cursor.rowcount > 0
+    
+    def fail(self, task, error, retry=True):
+        now = time.time()
+        dead = not retry or task['attempts'] >= task['max_attempts']
+        status = 'dead' if dead else 'pending'
+        with self.lock:
+            cursor = self.conn.execute(
+                'UPDATE tasks SET status = ?, available_at = ?, last_error = ?, lease_id = NULL, '
+                "lease_expires = NULL, updated_at = ? WHERE id = ? AND lease_id = ? AND status = 'leased'",
+                (status, now + self._backoff(task['attempts']), str(error), now, task['id'], task['lease_id']))
+        if cursor.rowcount == 0:
+            logger.warning(f"Lost the lease on task {task['id']} before failing it")
+            return None
+        if dead:
+            logger.error(f"Task {task['id']} ({task['key']}) dead-lettered after {task['attempts']} attempts: {error}")
+        else:
+            logger.warning(f"Task {task['id']} failed (attempt {task['attempts']}), retrying in "
+                           f"{self._backoff(task['attempts']):.0f}s: {error}")
+        return status
+    
+    def counts(self):
+        now = time.time()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT CASE WHEN status = 'leased' AND lease_expires <= ? THEN 'pending' ELSE status END, COUNT(*) "
+                'FROM tasks WHERE queue = ? GROUP BY 1', (now, self.name)).fetchall()
+        counts = {}
+        for status, count in rows:
+            counts[status] = counts.get(status, 0) + count
+        return counts
+    
+    def dead_letters(self, limit=100):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, kind, task_key, payload, attempts, max_attempts, last_error FROM tasks "
+                "WHERE queue = ? AND status = 'dead' ORDER BY updated_at LIMIT ?", (self.name, limit)).fetchall()
+        return [dict(self._task(row), error=row[6]) for row in rows]
+    
+    def retry_dead(self):
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE tasks SET status = 'pending', attempts = 0, available_at = ?, updated_at = ? "
+                "WHERE queue = ? AND status = 'dead'", (now, now, self.name))
+        return cursor.rowcount
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def open_work_queue(location=DEFAULT_QUEUE_DB, name='default', **options):
+    """
+    Open a work queue by location
+    
+    'sqlite:///path/to/queue.db' or a plain path opens a SqliteWorkQueue;
+    other backends plug in here by URL scheme.
+    """
+    if '://' not in location:
+        return SqliteWorkQueue(location, name, **options)
+    scheme, path = location.split('://', 1)
+    if scheme == 'sqlite':
+        return SqliteWorkQueue(path, name, **options)
+    raise ValueError(f"Unsupported work queue backend: {scheme}")